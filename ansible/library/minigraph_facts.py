@@ -2,6 +2,9 @@
 from __future__ import print_function
 from ansible.module_utils.basic import AnsibleModule
 import calendar
+import gzip
+import hashlib
+import inspect
 import os
 import sys
 import traceback
@@ -29,12 +32,37 @@ options:
         description:
             - Set to target snmp server (normally {{inventory_hostname}})
         required: true
+    filename:
+        description:
+            - The minigraph file, /etc/sonic/minigraph.xml by default
+        required: false
+    namespace:
+        description:
+            - The ASIC namespace to get the facts of, e.g. asic0
+        required: false
+    namespaces:
+        description:
+            - The ASIC namespaces to get the facts of, the minigraph is parsed once for all of them
+              and the facts are returned in minigraph_namespaces_facts, keyed by namespace
+        required: false
+    cache:
+        description:
+            - Cache the facts in ~/.ansible/minigraph, keyed by the minigraph path, mtime and size,
+              the namespace, the host and the source of this module and of port_utils
+        required: false
+        default: true
 '''
 
 EXAMPLES = '''
 # Gather minigraph facts
 - name: Gathering minigraph facts about the device
   minigraph_facts: host={{ hostname }}
+
+# Gather the minigraph facts of all the ASIC namespaces at once
+- name: Gathering minigraph facts about the ASICs
+  minigraph_facts:
+    host: "{{ hostname }}"
+    namespaces: ['asic0', 'asic1', 'asic2']
 '''
 
 ns = "Microsoft.Search.Autopilot.Evolution"
@@ -48,6 +76,8 @@ ANSIBLE_USER_MINIGRAPH_MAX_AGE = 86400  # 24-hours (in seconds)
 backend_device_types = ['BackEndToRRouter', 'BackEndLeafRouter']
 VLAN_SUB_INTERFACE_VLAN_ID = '10'
 VLAN_SUB_INTERFACE_SEPARATOR = '.'
+# Top level elements of the minigraph parsed for the facts
+MINIGRAPH_SECTIONS = ["DpgDec", "CpgDec", "PngDec", "UngDec", "MetadataDeclaration", "LinkMetadataDeclaration"]
 
 
 class minigraph_encoder(json.JSONEncoder):
@@ -621,17 +651,19 @@ def reconcile_mini_graph_locations(filename, hostname):
     :param hostname: the hostname to load (required)
     :return: tuple(the absolute filepath of the {cached,loaded} mini-graph, the root node of the loaded graph)
     """
-    if filename is not None:
-        # literal filename specified. read directly from the file.
-        mini_graph_path = filename
-    else:
-        # only the hostname was specified, determine the output path
-        mini_graph_path = '/etc/sonic/minigraph.xml'
-
+    mini_graph_path = get_mini_graph_path(filename)
     root = ET.parse(mini_graph_path).getroot()
     return mini_graph_path, root
 
 
+def get_mini_graph_path(filename):
+    if filename is not None:
+        # literal filename specified. read directly from the file.
+        return filename
+    # only the hostname was specified, determine the output path
+    return '/etc/sonic/minigraph.xml'
+
+
 def port_alias_to_name_map_50G(all_ports, s100G_ports):
     # 50G ports
     s50G_ports = list(set(all_ports) - set(s100G_ports))
@@ -680,7 +712,66 @@ def parse_linkmeta(meta, hname):
 
 def parse_xml(filename, hostname, asic_name=None):
     mini_graph_path, root = reconcile_mini_graph_locations(filename, hostname)
+    return parse_minigraph_root(root, mini_graph_path, asic_name)
+
+
+def parse_xml_namespaces(filename, hostname, asic_names):
+    """
+    Parse the minigraph once for all the ASIC namespaces.
+
+    :return: generator of tuple(asic name, facts of the namespace)
+    """
+    mini_graph_path, root = reconcile_mini_graph_locations(filename, hostname)
+    root_index = index_minigraph_root(root)
+    for asic_name in asic_names:
+        yield asic_name, parse_minigraph_root(root, mini_graph_path, asic_name, root_index)
+
+
+def index_minigraph_root(root):
+    """
+    Walk the top level of the minigraph once, the index is shared by the parses of all the ASIC namespaces.
+
+    :return: tuple(hwsku, hostname, list of tuple(section name, element) in document order)
+    """
+    hwsku = None
+    hostname = None
+    hwsku_tag = str(QName(ns, "HwSku"))
+    hostname_tag = str(QName(ns, "Hostname"))
+    section_tags = {str(QName(ns, section)): section for section in MINIGRAPH_SECTIONS}
+    sections = []
+    for child in root:
+        if child.tag == hwsku_tag:
+            hwsku = child.text
+        elif child.tag == hostname_tag:
+            hostname = child.text
+        elif child.tag in section_tags:
+            sections.append((section_tags[child.tag], child))
+    return hwsku, hostname, sections
+
+
+def get_port_maps(hwsku, asic_name):
+    """
+    Build the port maps of the namespace from its port table, see get_port_alias_to_name_map.
+
+    :return: tuple(port_alias_to_name_map, port_name_to_alias_map, port_alias_asic_map, port_name_to_index_map,
+                   port_alias_to_port_asic_alias_map)
+    """
+    port_alias_to_name_map, port_alias_asic_map, port_name_to_index_map = get_port_alias_to_name_map(
+        hwsku, asic_name)
+
+    # Create inverse mapping between port name and alias
+    port_name_to_alias_map = {v: k for k, v in port_alias_to_name_map.items()}
+
+    # Map the port alias to the ASIC alias of the same port name, the last ASIC alias wins if there are several
+    port_name_to_asic_alias_map = {v: k for k, v in port_alias_asic_map.items()}
+    port_alias_to_port_asic_alias_map = {k: port_name_to_asic_alias_map[v]
+                                         for k, v in port_alias_to_name_map.items()
+                                         if v in port_name_to_asic_alias_map}
+    return (port_alias_to_name_map, port_name_to_alias_map, port_alias_asic_map, port_name_to_index_map,
+            port_alias_to_port_asic_alias_map)
+
 
+def parse_minigraph_root(root, mini_graph_path, asic_name=None, root_index=None):
     u_neighbors = None
     u_devices = None
     hwsku = None
@@ -715,60 +806,49 @@ def parse_xml(filename, hostname, asic_name=None):
     else:
         asic_id = None
 
-    hwsku_qn = QName(ns, "HwSku")
-    hostname_qn = QName(ns, "Hostname")
-    for child in root:
-        if child.tag == str(hwsku_qn):
-            hwsku = child.text
-        if child.tag == str(hostname_qn):
-            hostname = child.text
+    hwsku, hostname, sections = root_index or index_minigraph_root(root)
 
+    global ports
     global port_alias_to_name_map
     global port_name_to_alias_map
     global port_alias_asic_map
     global port_alias_to_port_asic_alias_map
     global port_name_to_index_map
 
-    port_alias_to_name_map, port_alias_asic_map, port_name_to_index_map = get_port_alias_to_name_map(
-        hwsku, asic_name)
-
-    # Create inverse mapping between port name and alias
-    port_name_to_alias_map = {v: k for k, v in port_alias_to_name_map.items()}
+    # The root may be parsed for several namespaces in a row, start from empty maps
+    ports = {}
+    (port_alias_to_name_map, port_name_to_alias_map, port_alias_asic_map, port_name_to_index_map,
+     port_alias_to_port_asic_alias_map) = get_port_maps(hwsku, asic_name)
 
-    for k, v in port_alias_to_name_map.items():
-        for i, j in port_alias_asic_map.items():
-            if v == j:
-                port_alias_to_port_asic_alias_map[k] = i
-
-    for child in root:
+    for section, child in sections:
         if asic_name is None:
-            if child.tag == str(QName(ns, "DpgDec")):
+            if section == "DpgDec":
                 (intfs, lo_intfs, mgmt_intf, vlans, pcs, acls,
                  dhcp_servers, dhcpv6_servers) = parse_dpg(child, hostname)
-            elif child.tag == str(QName(ns, "CpgDec")):
+            elif section == "CpgDec":
                 (bgp_sessions, bgp_asn, bgp_peers_with_range) = parse_cpg(
                     child, hostname)
-            elif child.tag == str(QName(ns, "PngDec")):
+            elif section == "PngDec":
                 (neighbors, devices, console_dev, console_port,
                  mgmt_dev, mgmt_port) = parse_png(child, hostname)
-            elif child.tag == str(QName(ns, "UngDec")):
+            elif section == "UngDec":
                 (u_neighbors, u_devices, _, _, _, _) = parse_png(child, hostname)
-            elif child.tag == str(QName(ns, "MetadataDeclaration")):
+            elif section == "MetadataDeclaration":
                 (syslog_servers, ntp_servers, mgmt_routes, deployment_id,
                  resource_type, zebra_nexthop) = parse_meta(child, hostname)
-            elif child.tag == str(QName(ns, "LinkMetadataDeclaration")):
+            elif section == "LinkMetadataDeclaration":
                 macsec_enabled_ports, macsec_neighbors = parse_linkmeta(child, hostname)
         else:
-            if child.tag == str(QName(ns, "DpgDec")):
+            if section == "DpgDec":
                 (intfs, lo_intfs, mgmt_intf, vlans, pcs, acls,
                  dhcp_servers, dhcpv6_servers) = parse_dpg(child, asic_name)
                 host_lo_intfs = parse_host_loopback(child, hostname)
-            elif child.tag == str(QName(ns, "CpgDec")):
+            elif section == "CpgDec":
                 (bgp_sessions, bgp_asn, bgp_peers_with_range) = parse_cpg(
                     child, asic_name)
-            elif child.tag == str(QName(ns, "PngDec")):
+            elif section == "PngDec":
                 (neighbors, devices, _) = parse_asic_png(child, asic_name, hostname)
-            elif child.tag == str(QName(ns, "LinkMetadataDeclaration")):
+            elif section == "LinkMetadataDeclaration":
                 macsec_enabled_ports, macsec_neighbors = parse_linkmeta(child, hostname)
 
     current_device = [devices[key]
@@ -920,12 +1000,118 @@ port_name_to_index_map = {}
 port_alias_to_port_asic_alias_map = {}
 
 
+def get_source_digest(modules):
+    """
+    :return: the digest of the source of the modules, None if the source of a module is not available
+    """
+    digest = hashlib.sha1()
+    for module in modules:
+        try:
+            digest.update(inspect.getsource(module).encode('utf-8'))
+        except (IOError, OSError, TypeError):
+            return None
+    return digest.hexdigest()
+
+
+# The facts depend on the parsing code and on the port maps of the HwSKUs, so the cached facts are keyed by
+# the source of this module and of port_utils, without cache if the source is not available.
+MINIGRAPH_FACTS_SOURCE_DIGEST = get_source_digest(
+    [sys.modules.get(__name__), sys.modules.get(get_port_alias_to_name_map.__module__)])
+
+
+def clean_facts(results):
+    return json.loads(json.dumps(results, cls=minigraph_encoder))
+
+
+def get_facts_cache_path(mini_graph_path, hostname, asic_name):
+    """
+    :return: the path of the cached facts, None if the minigraph does not exist or the facts can't be cached
+    """
+    if MINIGRAPH_FACTS_SOURCE_DIGEST is None:
+        return None
+    try:
+        stat = os.stat(mini_graph_path)
+    except OSError:
+        return None
+    key = json.dumps([MINIGRAPH_FACTS_SOURCE_DIGEST, os.path.abspath(mini_graph_path),
+                      stat.st_mtime, stat.st_size, asic_name, hostname])
+    return os.path.join(ANSIBLE_USER_MINIGRAPH_PATH,
+                        'facts_{}.json.gz'.format(hashlib.sha1(key.encode('utf-8')).hexdigest()))
+
+
+def load_cached_facts(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return None
+    try:
+        with gzip.open(cache_path, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, EOFError, ValueError):
+        # the cache is only an optimization, parse the minigraph again
+        return None
+
+
+def store_cached_facts(cache_path, facts):
+    if cache_path is None:
+        return
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(json.dumps(facts, separators=(',', ':')).encode('utf-8'))
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune_cached_facts():
+    """
+    Remove the cached facts older than ANSIBLE_USER_MINIGRAPH_MAX_AGE, e.g. the ones of the
+    previous versions of a minigraph.
+    """
+    for name in os.listdir(ANSIBLE_USER_MINIGRAPH_PATH):
+        if not name.startswith('facts_'):
+            continue
+        path = os.path.join(ANSIBLE_USER_MINIGRAPH_PATH, name)
+        try:
+            if file_age(path) > ANSIBLE_USER_MINIGRAPH_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def get_minigraph_facts(filename, hostname, asic_names, use_cache=True):
+    """
+    Get the facts of the ASIC namespaces, from the cache or else by parsing the minigraph once
+    for all the namespaces not cached.
+
+    :param asic_names: list of the ASIC names, None for the facts of the host
+    :return: dict of asic name => facts
+    """
+    mini_graph_path = get_mini_graph_path(filename)
+    facts = {}
+    cache_paths = {}
+    for asic_name in asic_names:
+        cache_paths[asic_name] = get_facts_cache_path(mini_graph_path, hostname, asic_name) if use_cache else None
+        cached = load_cached_facts(cache_paths[asic_name])
+        if cached is not None:
+            facts[asic_name] = cached
+
+    missing = [asic_name for asic_name in asic_names if asic_name not in facts]
+    if missing:
+        for asic_name, results in parse_xml_namespaces(filename, hostname, missing):
+            facts[asic_name] = clean_facts(results)
+            store_cached_facts(cache_paths[asic_name], facts[asic_name])
+    return facts
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
             host=dict(required=True),
             filename=dict(),
             namespace=dict(required=False, default=None),
+            namespaces=dict(required=False, type='list', default=None),
+            cache=dict(required=False, type='bool', default=True),
         ),
         supports_check_mode=True
     )
@@ -952,11 +1138,16 @@ def main():
         filename = None
 
     namespace = m_args['namespace']
+    namespaces = m_args['namespaces']
 
     try:
-        results = parse_xml(filename, m_args['host'], namespace)
-        results_clean = json.loads(json.dumps(results, cls=minigraph_encoder))
-        module.exit_json(ansible_facts=results_clean)
+        if m_args['cache']:
+            prune_cached_facts()
+        if namespaces:
+            facts = get_minigraph_facts(filename, m_args['host'], namespaces, m_args['cache'])
+            module.exit_json(ansible_facts={'minigraph_namespaces_facts': facts})
+        facts = get_minigraph_facts(filename, m_args['host'], [namespace], m_args['cache'])
+        module.exit_json(ansible_facts=facts[namespace])
     except Exception as e:
         tb = traceback.format_exc()
         # all attempts to find a minigraph failed.
@@ -0,0 +1,198 @@
+"""Interface plumbing with netlink for the testbed topology modules.
+
+Creating a topology runs a lot of short interface operations, like checking whether an interface exists, creating
+veth pairs, moving interfaces to the PTF docker or to a network namespace, renaming them and setting them up. Running
+an "ip"/"nsenter"/"ifconfig" process for every operation is slow. NetlinkPlumbing sends the requests over one netlink
+socket per network namespace instead, the sockets are opened on first use and reused for all the requests of the
+namespace.
+
+The network namespace of a request is selected the same way as the commands of vm_topology:
+
+* pid: network namespace of the process, e.g. the PTF docker.
+* netns: network namespace created with "ip netns add".
+* neither of them: network namespace of the host.
+
+pyroute2 is optional. If it is not installed, or the socket of a namespace can't be opened, NetlinkUnavailable is
+raised and the callers fall back to the commands.
+"""
+import logging
+import socket
+import threading
+
+try:
+    from pyroute2 import IPRoute, NetNS
+    from pyroute2.netlink.exceptions import NetlinkError
+except ImportError:
+    IPRoute = None
+    NetNS = None
+    NetlinkError = None
+
+# Main routing table, used by "ip route" by default
+RT_TABLE_MAIN = 254
+
+ADDRESS_FAMILIES = {
+    4: socket.AF_INET,
+    6: socket.AF_INET6,
+}
+
+
+class NetlinkUnavailable(Exception):
+    """Netlink can't be used for the request, the caller should run the command instead."""
+    pass
+
+
+class NetlinkPlumbing(object):
+    """Interface operations over netlink sockets, one socket per network namespace.
+
+    The sockets are not thread safe, the requests to the same namespace are serialized with a lock of the namespace.
+    The requests to different namespaces can run in parallel.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # namespace key => (lock, socket)
+        self._sockets = {}
+
+    @staticmethod
+    def available():
+        """Check if pyroute2 is installed."""
+        return IPRoute is not None
+
+    @staticmethod
+    def _ns_key(pid=None, netns=None):
+        if pid is not None:
+            return ('pid', str(pid))
+        elif netns is not None:
+            return ('netns', netns)
+        return ('host', )
+
+    def _socket(self, pid=None, netns=None):
+        if not self.available():
+            raise NetlinkUnavailable("pyroute2 is not installed")
+
+        key = self._ns_key(pid=pid, netns=netns)
+        with self._lock:
+            entry = self._sockets.get(key)
+            if entry is None:
+                try:
+                    if key[0] == 'pid':
+                        # flags=0, don't create the namespace if it doesn't exist
+                        nl = NetNS('/proc/%s/ns/net' % key[1], flags=0)
+                    elif key[0] == 'netns':
+                        nl = NetNS(netns, flags=0)
+                    else:
+                        nl = IPRoute()
+                except Exception as e:
+                    raise NetlinkUnavailable("Failed to open netlink socket of %s: %s" % (key, repr(e)))
+                entry = (threading.Lock(), nl)
+                self._sockets[key] = entry
+        return entry
+
+    def _request(self, desc, func, pid=None, netns=None):
+        """Run func with the netlink socket of the namespace, func is called with the socket."""
+        lock, nl = self._socket(pid=pid, netns=netns)
+        logging.debug('*** NETLINK: %s, pid: %s, netns: %s' % (desc, pid, netns))
+        with lock:
+            try:
+                return func(nl)
+            except NetlinkError as e:
+                raise Exception("Netlink request '%s' failed in namespace %s: %s" %
+                                (desc, self._ns_key(pid=pid, netns=netns), repr(e)))
+
+    @staticmethod
+    def _index(nl, ifname):
+        indexes = nl.link_lookup(ifname=ifname)
+        if not indexes:
+            raise Exception("Interface %s not found" % ifname)
+        return indexes[0]
+
+    def close(self):
+        """Close the sockets of all the namespaces."""
+        with self._lock:
+            sockets, self._sockets = self._sockets, {}
+        for _, nl in sockets.values():
+            try:
+                nl.close()
+            except Exception:
+                pass
+
+    def link_exists(self, ifname, pid=None, netns=None):
+        return self._request('lookup %s' % ifname,
+                             lambda nl: len(nl.link_lookup(ifname=ifname)) > 0,
+                             pid=pid, netns=netns)
+
+    def add_veth(self, ifname, peer, pid=None, netns=None):
+        self._request('add veth %s peer %s' % (ifname, peer),
+                      lambda nl: nl.link('add', ifname=ifname, kind='veth', peer=peer),
+                      pid=pid, netns=netns)
+
+    def add_vlan(self, ifname, link, vlan_id, pid=None, netns=None):
+        def _add_vlan(nl):
+            nl.link('add', ifname=ifname, kind='vlan', link=self._index(nl, link), vlan_id=int(vlan_id))
+
+        self._request('add vlan %s link %s id %s' % (ifname, link, vlan_id), _add_vlan, pid=pid, netns=netns)
+
+    def del_link(self, ifname, pid=None, netns=None):
+        self._request('del %s' % ifname,
+                      lambda nl: nl.link('del', index=self._index(nl, ifname)),
+                      pid=pid, netns=netns)
+
+    def set_link(self, ifname, pid=None, netns=None, new_name=None, **kwargs):
+        """Change the interface in one request.
+
+        Args:
+            ifname (str): Name of the interface.
+            pid (str): Pid of the process in the namespace of the interface.
+            netns (str): Name of the namespace of the interface.
+            new_name (str): New name of the interface.
+            kwargs: Other attributes to be changed, e.g. state='up', mtu=9100, net_ns_pid=<pid> or
+                net_ns_fd=<netns name> to move the interface to another namespace.
+        """
+        if new_name is not None:
+            kwargs['ifname'] = new_name
+        desc = 'set %s %s' % (ifname, ' '.join('%s %s' % item for item in sorted(kwargs.items())))
+        self._request(desc,
+                      lambda nl: nl.link('set', index=self._index(nl, ifname), **kwargs),
+                      pid=pid, netns=netns)
+
+    def flush_addr(self, ifname, version=None, pid=None, netns=None):
+        """Remove the addresses of the interface, of both IPv4 and IPv6 if version is not specified."""
+        def _flush_addr(nl):
+            index = self._index(nl, ifname)
+            if version is None:
+                nl.flush_addr(index=index)
+            else:
+                nl.flush_addr(index=index, family=ADDRESS_FAMILIES[version])
+
+        self._request('flush addr %s' % ifname, _flush_addr, pid=pid, netns=netns)
+
+    def replace_addr(self, ifname, address, pid=None, netns=None):
+        """Add an address to the interface, address is in format of <ip>[/<prefix length>]."""
+        if '/' in address:
+            ip, prefixlen = address.split('/')
+        else:
+            ip, prefixlen = address, 128 if ':' in address else 32
+        self._request('replace addr %s %s' % (ifname, address),
+                      lambda nl: nl.addr('replace', index=self._index(nl, ifname), address=ip,
+                                         prefixlen=int(prefixlen)),
+                      pid=pid, netns=netns)
+
+    def flush_default_routes(self, version, pid=None, netns=None):
+        """Remove the default routes of the main table."""
+        def _flush_default_routes(nl):
+            for route in nl.get_routes(family=ADDRESS_FAMILIES[version], table=RT_TABLE_MAIN):
+                if route['dst_len'] == 0 and route.get_attr('RTA_DST') is None:
+                    nl.route('del', family=ADDRESS_FAMILIES[version], dst_len=0, table=RT_TABLE_MAIN,
+                             priority=route.get_attr('RTA_PRIORITY'), oif=route.get_attr('RTA_OIF'),
+                             gateway=route.get_attr('RTA_GATEWAY'))
+
+        self._request('flush default routes -%d' % version, _flush_default_routes, pid=pid, netns=netns)
+
+    def add_default_route(self, ifname, gateway, version, pid=None, netns=None):
+        def _add_default_route(nl):
+            dst = '0.0.0.0/0' if version == 4 else '::/0'
+            nl.route('add', family=ADDRESS_FAMILIES[version], dst=dst, gateway=gateway,
+                     oif=self._index(nl, ifname))
+
+        self._request('add default route -%d via %s dev %s' % (version, gateway, ifname), _add_default_route,
+                      pid=pid, netns=netns)
@@ -1,8 +1,6 @@
 import re
-import six
 
-from ipaddress import ip_address, ip_network
-from lpm import LpmDict
+from lpm import LpmTable
 
 # These subnets are excluded from FIB test
 # reference: RFC 5735 Special Use IPv4 Addresses
@@ -46,42 +44,53 @@ class Fib():
 
     # Initialize FIB with FIB file
     def __init__(self, file_path):
-        self._ipv4_lpm_dict = LpmDict()
+        self._ipv4_lpm_dict = LpmTable()
         for ip in EXCLUDE_IPV4_PREFIXES:
             self._ipv4_lpm_dict[ip] = self.NextHop()
 
-        self._ipv6_lpm_dict = LpmDict(ipv4=False)
+        self._ipv6_lpm_dict = LpmTable(ipv4=False)
         for ip in EXCLUDE_IPV6_PREFIXES:
             self._ipv6_lpm_dict[ip] = self.NextHop()
 
         # filter out empty lines and lines starting with '#'
         pattern = re.compile("^#.*$|^[ \t]*$")
 
+        # Routes share a small number of next hop groups, parse each of them once
+        next_hops = {}
         with open(file_path, 'r') as f:
-            for line in f.readlines():
+            for line in f:
                 if pattern.match(line):
                     continue
-                entry = line.split(' ', 1)
-                prefix = ip_network(six.text_type(entry[0]))
-                next_hop = self.NextHop(entry[1])
-                if prefix.version == 4:
-                    self._ipv4_lpm_dict[str(prefix)] = next_hop
-                elif prefix.version == 6:
-                    self._ipv6_lpm_dict[str(prefix)] = next_hop
+                prefix, next_hop_str = line.split(' ', 1)
+                next_hop = next_hops.get(next_hop_str)
+                if next_hop is None:
+                    next_hop = next_hops[next_hop_str] = self.NextHop(next_hop_str)
+                if ':' in prefix:
+                    self._ipv6_lpm_dict[prefix] = next_hop
+                else:
+                    self._ipv4_lpm_dict[prefix] = next_hop
+
+    def _lpm_dict(self, ip):
+        return self._ipv6_lpm_dict if ':' in str(ip) else self._ipv4_lpm_dict
 
     def __getitem__(self, ip):
-        ip = ip_address(six.text_type(ip))
-        if ip.version == 4:
-            return self._ipv4_lpm_dict[str(ip)]
-        elif ip.version == 6:
-            return self._ipv6_lpm_dict[str(ip)]
+        return self._lpm_dict(ip)[ip]
 
     def __contains__(self, ip):
-        ip_obj = ip_address(six.text_type(ip))
-        if ip_obj.version == 4:
-            return self._ipv4_lpm_dict.contains(ip)
-        elif ip_obj.version == 6:
-            return self._ipv6_lpm_dict.contains(ip)
+        return self._lpm_dict(ip).contains(ip)
+
+    def get_next_hops(self, ips):
+        """Get the next hop of each IP in a batch of IPv4 and IPv6 addresses.
+
+        The next hop is None for the IPs not covered by any route.
+        """
+        ips = list(ips)
+        next_hops = [None] * len(ips)
+        for lpm_dict in (self._ipv4_lpm_dict, self._ipv6_lpm_dict):
+            indexes = [index for index, ip in enumerate(ips) if self._lpm_dict(ip) is lpm_dict]
+            for index, next_hop in zip(indexes, lpm_dict.lookup_many([ips[index] for index in indexes])):
+                next_hops[index] = next_hop
+        return next_hops
 
     def ipv4_ranges(self):
         return self._ipv4_lpm_dict.ranges()
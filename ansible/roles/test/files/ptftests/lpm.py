@@ -1,9 +1,22 @@
+import binascii
+import bisect
 import random
 import six
+import socket
 
-from ipaddress import ip_address, ip_network
+from ipaddress import ip_address, ip_network, IPv4Address, IPv6Address
 from SubnetTree import SubnetTree
 
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 '''
 LpmDict is a class used in FIB test for LPM and IP segmentation.
 
@@ -22,9 +35,92 @@ this range.
 To achieve the LPM functionality, use the LpmDict as a dictionary and use
 [] operator to get the corresponding value using the key (IP).
 
+LpmTable provides the same interface for large tables, like the FIB of a DUT
+with full routes. The prefixes are kept as integers. On the first lookup after
+the prefixes are changed, the IP space is segmented into a sorted list of
+range boundaries and the longest matching prefix of each range is resolved
+once, so a lookup is a binary search of the boundaries. When numpy is
+available, lookup_many() resolves a batch of IPs with one vectorized search.
+The ranges are returned as an IpRanges sequence, which only creates the
+IpInterval of a range when the range is accessed.
+
 Please check the test_lpm.py file to see the details of how this class works.
 '''
 
+IPV4_BITS = 32
+IPV6_BITS = 128
+
+# Value of the IP ranges which are not covered by any prefix
+_NO_MATCH = object()
+
+
+def _to_int(packed):
+    return int(binascii.hexlify(packed), 16)
+
+
+def _to_packed(value, width):
+    return binascii.unhexlify('%0*x' % (width * 2, value))
+
+
+def _parse_ip(ip):
+    """Parse an IP address into (version, packed address)"""
+    ip = str(ip)
+    if ':' in ip:
+        return 6, socket.inet_pton(socket.AF_INET6, ip)
+    return 4, socket.inet_pton(socket.AF_INET, ip)
+
+
+def _parse_prefix(prefix):
+    """Parse a prefix into (version, first IP as integer, prefix length)
+
+    Same as ip_network(), a prefix with host bits set is rejected.
+    """
+    addr, _, prefixlen = str(prefix).partition('/')
+    try:
+        version, packed = _parse_ip(addr)
+    except (socket.error, ValueError):
+        raise ValueError('{} does not appear to be an IPv4 or IPv6 network'.format(prefix))
+    bits = len(packed) * 8
+    prefixlen = int(prefixlen) if prefixlen else bits
+    if not 0 <= prefixlen <= bits:
+        raise ValueError('{} has invalid prefix length'.format(prefix))
+    start = _to_int(packed)
+    if start & ((1 << (bits - prefixlen)) - 1):
+        raise ValueError('{} has host bits set'.format(prefix))
+    return version, start, prefixlen
+
+
+class IpRanges(Sequence):
+    """Sequence of the IP ranges between sorted integer boundaries.
+
+    The IpInterval of a range is created only when the range is accessed.
+    Slicing returns a list of IpIntervals, same as slicing the list returned
+    by ranges() before.
+    """
+
+    def __init__(self, boundaries, ipv4=True):
+        self._boundaries = boundaries
+        self._address = IPv4Address if ipv4 else IPv6Address
+        self._max_ip = (1 << (IPV4_BITS if ipv4 else IPV6_BITS)) - 1
+
+    def __len__(self):
+        return len(self._boundaries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('IP range index out of range')
+        start = self._boundaries[index]
+        end = self._boundaries[index + 1] - 1 if index + 1 < len(self) else self._max_ip
+        return LpmDict.IpInterval(self._address(start), self._address(end))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
 
 class LpmDict():
     class IpInterval:
@@ -94,21 +190,135 @@ class LpmDict():
         self._subnet_tree.__delitem__(key)
 
     def ranges(self):
-        sorted_boundaries = sorted(self._boundaries.keys())
-        ranges = []
-        for index, boundary in enumerate(sorted_boundaries):
-            if index != len(sorted_boundaries) - 1:
-                interval = self.IpInterval(
-                    sorted_boundaries[index], sorted_boundaries[index + 1] - 1)
-            else:
-                if self._ipv4:
-                    interval = self.IpInterval(
-                        sorted_boundaries[index], ip_address(u'255.255.255.255'))
-                else:
-                    interval = self.IpInterval(sorted_boundaries[index], ip_address(
-                        u'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'))
-            ranges.append(interval)
-        return ranges
+        # Sorting integers is much cheaper than sorting ip_address objects
+        return IpRanges(sorted(int(boundary) for boundary in self._boundaries), self._ipv4)
 
     def contains(self, key):
         return key in self._subnet_tree
+
+
+class LpmTable():
+    """Integer backed LPM table with the interface of LpmDict.
+
+    The table is compiled into the sorted boundaries of the IP ranges and the
+    value of the longest matching prefix of each range on the first lookup
+    after a change, it is meant to be filled once and then looked up.
+    """
+
+    def __init__(self, ipv4=True):
+        self._ipv4 = ipv4
+        self._version = 4 if ipv4 else 6
+        self._bits = IPV4_BITS if ipv4 else IPV6_BITS
+        # (first IP, prefix length) => value
+        self._prefixes = {}
+        self._boundaries = None
+        self._range_values = None
+        self._boundary_array = None
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def _prefix_key(self, key):
+        version, start, prefixlen = _parse_prefix(key)
+        if version != self._version:
+            raise ValueError('{} is not an IPv{} prefix'.format(key, self._version))
+        return start, prefixlen
+
+    def __setitem__(self, key, value):
+        self._prefixes[self._prefix_key(key)] = value
+        self._boundaries = None
+
+    def __delitem__(self, key):
+        del self._prefixes[self._prefix_key(key)]
+        self._boundaries = None
+
+    def _compile(self):
+        max_ip = (1 << self._bits) - 1
+        # 0.0.0.0 is a non-routable meta-address that needs to be skipped
+        boundaries = set([0])
+        prefixes = []
+        for (start, prefixlen), value in six.iteritems(self._prefixes):
+            end = start | ((1 << (self._bits - prefixlen)) - 1)
+            # the default route doesn't split the IP space
+            if prefixlen:
+                boundaries.add(start)
+                if end != max_ip:
+                    boundaries.add(end + 1)
+            prefixes.append((start, prefixlen, end, value))
+        boundaries = sorted(boundaries)
+        # Shorter prefixes first, so the longest prefix covering a range is on the top of the stack.
+        # (first IP, prefix length) is unique, the values are never compared.
+        prefixes.sort()
+        prefixes.append((max_ip + 1, 0, max_ip, _NO_MATCH))
+
+        range_values = []
+        stack = [(max_ip, _NO_MATCH)]
+        prefix_iter = iter(prefixes)
+        next_start, _, next_end, next_value = next(prefix_iter)
+        for boundary in boundaries:
+            while stack[-1][0] < boundary:
+                stack.pop()
+            while next_start == boundary:
+                stack.append((next_end, next_value))
+                next_start, _, next_end, next_value = next(prefix_iter)
+            range_values.append(stack[-1][1])
+
+        self._boundaries = boundaries
+        self._range_values = range_values
+        self._boundary_array = None
+
+    def _packed(self, key):
+        version, packed = _parse_ip(key)
+        if version != self._version:
+            raise KeyError(key)
+        return packed
+
+    def _lookup(self, packed):
+        if self._boundaries is None:
+            self._compile()
+        return self._range_values[bisect.bisect_right(self._boundaries, _to_int(packed)) - 1]
+
+    def __getitem__(self, key):
+        value = self._lookup(self._packed(key))
+        if value is _NO_MATCH:
+            raise KeyError(key)
+        return value
+
+    def contains(self, key):
+        try:
+            return self._lookup(self._packed(key)) is not _NO_MATCH
+        except (KeyError, socket.error, ValueError):
+            return False
+
+    def lookup_many(self, keys, default=None):
+        """Look up the values of a batch of IPs.
+
+        Args:
+            keys: Iterable of IPs of the address family of the table.
+            default: Value returned for the IPs not covered by any prefix.
+
+        Returns:
+            list: The value of the longest matching prefix of each IP.
+        """
+        packed = [self._packed(key) for key in keys]
+        if not packed:
+            return []
+        if self._boundaries is None:
+            self._compile()
+        if numpy is None:
+            indexes = [bisect.bisect_right(self._boundaries, _to_int(ip)) - 1 for ip in packed]
+        else:
+            # Fixed width big-endian addresses sort in the same order as their integer values
+            dtype = 'S{}'.format(self._bits // 8)
+            if self._boundary_array is None:
+                self._boundary_array = numpy.frombuffer(
+                    b''.join(_to_packed(boundary, self._bits // 8) for boundary in self._boundaries), dtype=dtype)
+            queries = numpy.frombuffer(b''.join(packed), dtype=dtype)
+            indexes = (numpy.searchsorted(self._boundary_array, queries, side='right') - 1).tolist()
+        range_values = self._range_values
+        return [default if range_values[index] is _NO_MATCH else range_values[index] for index in indexes]
+
+    def ranges(self):
+        if self._boundaries is None:
+            self._compile()
+        return IpRanges(self._boundaries, self._ipv4)
@@ -73,6 +73,7 @@ import scapy.all as scapyall
 from scapy.arch.linux import attach_filter as attach_filter
 
 import sad_path as sp
+import pcap_flow
 
 from ptf import config
 from ptf.base_tests import BaseTest
@@ -304,6 +305,7 @@ class ReloadTest(BaseTest):
 
         self.sender_thr = threading.Thread(target=self.send_in_background)
         self.sniff_thr = threading.Thread(target=self.sniff_in_background)
+        self.captured_pcap = None
         self.start_sender_delay = 60
 
         # Check if platform type is kvm
@@ -1953,8 +1955,7 @@ class ReloadTest(BaseTest):
     def sniff_in_background(self, wait=None):
         """
         This function listens on all ports, in both directions, for the TCP src=1234 dst=5000 packets, until timeout.
-        Once found, all packets are dumped to local pcap file,
-        and all packets are saved to self.packets as scapy type(pcap format).
+        Once found, all packets are dumped to local pcap file, which is analyzed by examine_flow().
         """
         if not wait:
             wait = self.time_to_listen + self.test_params['sniff_time_incr']
@@ -1988,8 +1989,9 @@ class ReloadTest(BaseTest):
             else:
                 self.start_sniffer_on_ptf(self.capture_pcap, sniff_filter, wait)
 
-            self.packets = scapyall.rdpcap(self.capture_pcap)
-            self.log("Number of all packets captured: {}".format(len(self.packets)))
+            # The capture is streamed from the file by examine_flow(), not loaded into scapy packets
+            self.log("Size of the capture file: {} bytes".format(os.path.getsize(self.capture_pcap)))
+            self.captured_pcap = self.capture_pcap
         except Exception:
             traceback_msg = traceback.format_exc()
             self.log("Error in tcpdump_sniff: {}".format(traceback_msg))
@@ -2089,83 +2091,37 @@ class ReloadTest(BaseTest):
         if process.returncode is not None:
             self.log("Dumpcap process killed")
 
-    def check_tcp_payload(self, packet):
-        """
-        This method is used by examine_flow() method.
-        It returns True if a packet is not corrupted and has a valid TCP sequential TCP Payload
-        """
-        try:
-            int(bytes(packet[scapyall.TCP].payload)
-                ) in range(self.sent_packet_count)
-            return True
-        except Exception:
-            return False
-
-    def no_flood(self, packet):
-        """
-        This method filters packets which are unique (i.e. no floods).
-        """
-        if (not int(bytes(packet[scapyall.TCP].payload)) in self.unique_id) and \
-                (packet[scapyall.Ether].src == self.dut_mac or packet[scapyall.Ether].src == self.vlan_mac):
-            # This is a unique (no flooded) received packet.
-            # for dualtor, t1->server rcvd pkt will have src MAC as vlan_mac,
-            # and server->t1 rcvd pkt will have src MAC as dut_mac
-            self.unique_id.append(int(bytes(packet[scapyall.TCP].payload)))
-            return True
-        elif packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
-            # This is a sent packet.
-            # for dualtor, t1->server sent pkt will have dst MAC as dut_mac,
-            # and server->t1 sent pkt will have dst MAC as vlan_mac
-            return True
-        else:
-            return False
-
     def examine_flow(self, filename=None):
         """
-        This method examines pcap file (if given), or self.packets scapy file.
+        This method examines pcap file (if given), or the pcap file captured by the sniffer.
         The method compares TCP payloads of the packets one by one (assuming all payloads are consecutive integers),
         and the losses if found - are treated as disruptions in Dataplane forwarding.
         All disruptions are saved to self.lost_packets dictionary, in format:
         disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
         """
-        if filename:
-            all_packets = scapyall.rdpcap(filename)
-        elif self.packets:
-            all_packets = self.packets
-        else:
-            self.log("Filename and self.packets are not defined.")
-            self.fails['dut'].add("Filename and self.packets are not defined")
+        filename = filename or self.captured_pcap
+        if not filename:
+            self.log("Filename and the captured pcap file are not defined.")
+            self.fails['dut'].add("Filename and the captured pcap file are not defined")
             return None
-        # Filter out packets and remove floods:
-        # This list will contain all unique Payload ID, to filter out received floods.
-        self.unique_id = list()
-        filtered_packets = [pkt for pkt in all_packets if
-                            scapyall.TCP in pkt and
-                            scapyall.ICMP not in pkt and
-                            pkt[scapyall.TCP].sport == 1234 and
-                            pkt[scapyall.TCP].dport == 5000 and
-                            self.check_tcp_payload(pkt) and
-                            self.no_flood(pkt)
-                            ]
-
-        if self.vnet:
-            decap_packets = [scapyall.Ether(bytes(pkt.payload.payload.payload)[8:]) for pkt in all_packets if
-                             scapyall.UDP in pkt and
-                             pkt[scapyall.UDP].sport == 1234
-                             ]
-            filtered_decap_packets = [pkt for pkt in decap_packets if
-                                      scapyall.TCP in pkt and
-                                      scapyall.ICMP not in pkt and
-                                      pkt[scapyall.TCP].sport == 1234 and
-                                      pkt[scapyall.TCP].dport == 5000 and
-                                      self.check_tcp_payload(pkt) and
-                                      self.no_flood(pkt)
-                                      ]
-            filtered_packets = filtered_packets + filtered_decap_packets
+        # Read the packets of the test flow and remove floods:
+        # only the first received packet of each payload ID is kept.
+        # for dualtor both MACs are needed:
+        #   t1->server sent pkt will have dst MAC as dut_mac, and server->t1 sent pkt will have dst MAC as vlan_mac
+        #   t1->server rcvd pkt will have src MAC as vlan_mac, and server->t1 rcvd pkt will have src MAC as dut_mac
+        filtered_pcap = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
+                         else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
+        flows, captured_count = pcap_flow.read_flows(
+            filename, 1234, 5000,
+            sent_dst_macs=[self.dut_mac, self.vlan_mac],
+            received_src_macs=[self.dut_mac, self.vlan_mac],
+            unique_received=True,
+            vxlan_sport=1234 if self.vnet else None,
+            filtered_pcap=filtered_pcap)
+        self.log("Number of all packets captured: {}".format(captured_count))
 
         # Re-arrange packets, if delayed, by Payload ID and Timestamp:
-        packets = sorted(filtered_packets, key=lambda packet: (
-            int(bytes(packet[scapyall.TCP].payload)), float(packet.time)))
+        packets = flows.get(None, pcap_flow.FlowRecords())
         self.lost_packets = dict()
         self.max_disrupt, self.total_disruption = 0, 0
         sent_packets = dict()
@@ -2187,25 +2143,19 @@ class ReloadTest(BaseTest):
             missed_t1_to_vlan = 0
             flooded_pkts = []
             self.disruption_start, self.disruption_stop = None, None
-            for packet in packets:
-                if packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
+            for payload_id, packet_time, direction in packets.sorted():
+                if direction == pcap_flow.SENT:
                     # This is a sent packet - keep track of it as payload_id:timestamp.
-                    # for dualtor both MACs are needed:
-                    #   t1->server sent pkt will have dst MAC as dut_mac,
-                    #   and server->t1 sent pkt will have dst MAC as vlan_mac
-                    sent_payload = int(bytes(packet[scapyall.TCP].payload))
+                    sent_payload = payload_id
                     if sent_payload in sent_packets:
                         flooded_pkts.append(sent_payload)
-                    sent_packets[sent_payload] = float(packet.time)
+                    sent_packets[sent_payload] = packet_time
                     sent_counter += 1
                     continue
-                if packet[scapyall.Ether].src == self.dut_mac or packet[scapyall.Ether].src == self.vlan_mac:
+                if direction == pcap_flow.RECEIVED:
                     # This is a received packet.
-                    # for dualtor both MACs are needed:
-                    #   t1->server rcvd pkt will have src MAC as vlan_mac,
-                    #   and server->t1 rcvd pkt will have src MAC as dut_mac
-                    received_time = float(packet.time)
-                    received_payload = int(bytes(packet[scapyall.TCP].payload))
+                    received_time = packet_time
+                    received_payload = payload_id
                     if (received_payload % 5) == 0:   # From vlan to T1.
                         received_vlan_to_t1 += 1
                     else:
@@ -2359,10 +2309,7 @@ class ReloadTest(BaseTest):
 
         self.log("Total incoming packets captured %d" % received_counter)
         if packets:
-            filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
-                        else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
-            scapyall.wrpcap(filename, packets)
-            self.log("Filtered pcap dumped to %s" % filename)
+            self.log("Filtered pcap dumped to %s" % filtered_pcap)
 
     def check_forwarding_stop(self, signal):
         self.asic_start_recording_vlan_reachability()
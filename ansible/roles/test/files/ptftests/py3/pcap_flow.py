@@ -0,0 +1,369 @@
+"""
+Streaming reader of the TCP test flows captured by the dataplane disruption tests.
+
+The senders of advanced-reboot and of the dualtor IO tests send TCP packets carrying a sequential packet id in the
+payload, the disruptions are measured from the gaps in the ids of the received packets. A capture of a few minutes
+at line rate holds millions of packets, loading it with scapy.rdpcap takes many minutes and gigabytes of memory.
+
+Here the pcap or pcapng file is read record by record, the Ethernet/802.1Q/IP/TCP headers are decoded at fixed
+offsets, and only the payload id, timestamp and direction of the packets of the test flow are kept, in arrays.
+
+This file is used by both the PTF tests and the sonic-mgmt tests, tests/common/dualtor/pcap_flow.py links to it.
+"""
+import array
+import socket
+import struct
+
+# Direction of a captured packet
+SENT = 0
+RECEIVED = 1
+
+LINKTYPE_ETHERNET = 1
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+VLAN_ETHERTYPES = (0x8100, 0x88a8, 0x9100)
+
+IPPROTO_IPIP = 4
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_IPV6 = 41
+# Hop-by-hop, routing and destination options
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+
+VXLAN_HEADER_LEN = 8
+
+# Magic number of the pcap file header => (byte order, number of decimal digits of the timestamp fraction)
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 6),
+    b'\xa1\xb2\xc3\xd4': ('>', 6),
+    b'\x4d\x3c\xb2\xa1': ('<', 9),
+    b'\xa1\xb2\x3c\x4d': ('>', 9),
+}
+PCAP_HEADER_LEN = 24
+PCAP_RECORD_HEADER_LEN = 16
+
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_INTERFACE_DESCRIPTION = 1
+PCAPNG_PACKET = 2
+PCAPNG_ENHANCED_PACKET = 6
+PCAPNG_OPTION_TSRESOL = 9
+PCAPNG_DEFAULT_TSRESOL = 6
+
+
+def _timestamp(ticks, tsresol):
+    """Convert a timestamp in units of the pcapng if_tsresol to seconds.
+
+    Decimal resolutions are converted through the decimal string, so the result is the correctly rounded float,
+    the same as float() of the Decimal timestamp of scapy.
+    """
+    if tsresol & 0x80:
+        return ticks / float(1 << (tsresol & 0x7f))
+    if not tsresol:
+        return float(ticks)
+    seconds, fraction = divmod(ticks, 10 ** tsresol)
+    return float('%d.%0*d' % (seconds, tsresol, fraction))
+
+
+def _read_pcap(f, header):
+    endian, digits = PCAP_MAGIC[header[:4]]
+    rest = f.read(PCAP_HEADER_LEN - len(header))
+    linktype = struct.unpack(endian + 'I', (header + rest)[20:24])[0]
+    record_header = struct.Struct(endian + 'IIII')
+    fmt = '%d.%0{}d'.format(digits)
+    while True:
+        data = f.read(PCAP_RECORD_HEADER_LEN)
+        if len(data) < PCAP_RECORD_HEADER_LEN:
+            return
+        seconds, fraction, caplen, _ = record_header.unpack(data)
+        frame = f.read(caplen)
+        if len(frame) < caplen:
+            # Truncated by the capture process being killed
+            return
+        yield float(fmt % (seconds, fraction)), linktype, frame
+
+
+def _read_pcapng_options(endian, options):
+    """Parse the options of a pcapng block into {code: value}"""
+    result = {}
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, offset)
+        if code == 0:
+            break
+        result[code] = options[offset + 4:offset + 4 + length]
+        offset += 4 + ((length + 3) & ~3)
+    return result
+
+
+def _read_pcapng(f, header):
+    endian = '<'
+    interfaces = []
+    data = header + f.read(8 - len(header))
+    while len(data) == 8:
+        if data[:4] == header:
+            # The block type of the section header block reads the same in both byte orders
+            magic = f.read(4)
+            endian = '<' if struct.unpack('<I', magic)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            block_len = struct.unpack(endian + 'I', data[4:])[0]
+            f.read(block_len - 12)
+            # Interface ids are local to a section
+            interfaces = []
+            data = f.read(8)
+            continue
+        block_type, block_len = struct.unpack(endian + 'II', data)
+        body = f.read(block_len - 8)
+        if len(body) < block_len - 8:
+            return
+        if block_type == PCAPNG_INTERFACE_DESCRIPTION:
+            linktype = struct.unpack_from(endian + 'H', body)[0]
+            tsresol = _read_pcapng_options(endian, body[8:-4]).get(PCAPNG_OPTION_TSRESOL)
+            interfaces.append((linktype, tsresol[0] if tsresol else PCAPNG_DEFAULT_TSRESOL))
+        elif block_type in (PCAPNG_ENHANCED_PACKET, PCAPNG_PACKET):
+            if block_type == PCAPNG_ENHANCED_PACKET:
+                interface, ts_high, ts_low, caplen = struct.unpack_from(endian + 'IIII', body)
+            else:
+                interface, _, ts_high, ts_low, caplen = struct.unpack_from(endian + 'HHIII', body)
+            linktype, tsresol = interfaces[interface]
+            yield _timestamp((ts_high << 32) | ts_low, tsresol), linktype, body[20:20 + caplen]
+        data = f.read(8)
+
+
+def read_packets(filename):
+    """Read a pcap or pcapng file packet by packet.
+
+    Yields:
+        tuple: (timestamp, link type, frame bytes) of each packet.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(4)
+        if header in PCAP_MAGIC:
+            reader = _read_pcap(f, header)
+        elif header == struct.pack('<I', PCAPNG_SECTION_HEADER):
+            reader = _read_pcapng(f, header)
+        elif not header:
+            return
+        else:
+            raise ValueError('{} is not a pcap or pcapng file'.format(filename))
+        for packet in reader:
+            yield packet
+
+
+def decode_frame(frame, vxlan_sport=None):
+    """Decode an Ethernet frame carrying TCP over IPv4 or IPv6.
+
+    802.1Q tags and IPv4/IPv6 tunnels are skipped. Non-first IPv4 fragments are not decoded, same as scapy.
+
+    Args:
+        frame (bytes): The Ethernet frame.
+        vxlan_sport (int): Decode the inner frame of the VXLAN packets with this UDP source port.
+
+    Returns:
+        tuple: (Ethernet dst, Ethernet src, IP src, IP dst, TCP sport, TCP dport, TCP payload, inner frame) or None
+            if the frame is not TCP. The MAC and IP addresses are bytes, the IP addresses are from the outer IP header,
+            the payload is the rest of the frame after the TCP header, including the Ethernet padding if any, same as
+            the bytes of the TCP payload in scapy. The inner frame is the decapsulated Ethernet frame of a VXLAN
+            packet, None for other packets, the other fields are decoded from the inner frame.
+    """
+    offset = 12
+    ethertype = struct.unpack_from('!H', frame, offset)[0] if len(frame) >= 14 else None
+    while ethertype in VLAN_ETHERTYPES and len(frame) >= offset + 6:
+        offset += 4
+        ethertype = struct.unpack_from('!H', frame, offset)[0]
+    offset += 2
+
+    ip_src = ip_dst = None
+    while True:
+        if ethertype == ETHERTYPE_IPV4:
+            if len(frame) < offset + 20:
+                return None
+            ihl = (frame[offset] & 0x0f) * 4
+            protocol = frame[offset + 9]
+            if struct.unpack_from('!H', frame, offset + 6)[0] & 0x1fff:
+                return None
+            if ip_src is None:
+                ip_src, ip_dst = frame[offset + 12:offset + 16], frame[offset + 16:offset + 20]
+            offset += ihl
+        elif ethertype == ETHERTYPE_IPV6:
+            if len(frame) < offset + 40:
+                return None
+            protocol = frame[offset + 6]
+            if ip_src is None:
+                ip_src, ip_dst = frame[offset + 8:offset + 24], frame[offset + 24:offset + 40]
+            offset += 40
+            while protocol in IPV6_EXTENSION_HEADERS and len(frame) >= offset + 2:
+                protocol = frame[offset]
+                offset += (frame[offset + 1] + 1) * 8
+        else:
+            return None
+
+        if protocol == IPPROTO_IPIP:
+            ethertype = ETHERTYPE_IPV4
+        elif protocol == IPPROTO_IPV6:
+            ethertype = ETHERTYPE_IPV6
+        else:
+            break
+
+    if protocol == IPPROTO_UDP and vxlan_sport is not None and len(frame) >= offset + 8 \
+            and struct.unpack_from('!H', frame, offset)[0] == vxlan_sport:
+        inner_frame = frame[offset + 8 + VXLAN_HEADER_LEN:]
+        inner = decode_frame(inner_frame)
+        return inner[:7] + (inner_frame,) if inner else None
+    if protocol != IPPROTO_TCP or len(frame) < offset + 20:
+        return None
+    sport, dport = struct.unpack_from('!HH', frame, offset)
+    data_offset = (frame[offset + 12] >> 4) * 4
+    return frame[0:6], frame[6:12], ip_src, ip_dst, sport, dport, frame[offset + data_offset:], None
+
+
+class FlowRecords(object):
+    """Payload id, timestamp and direction of the captured packets of a test flow, one array per field."""
+
+    def __init__(self):
+        self.payload_ids = array.array('q')
+        self.timestamps = array.array('d')
+        self.directions = array.array('b')
+
+    def append(self, payload_id, timestamp, direction):
+        self.payload_ids.append(payload_id)
+        self.timestamps.append(timestamp)
+        self.directions.append(direction)
+
+    def __len__(self):
+        return len(self.payload_ids)
+
+    def __iter__(self):
+        return zip(self.payload_ids, self.timestamps, self.directions)
+
+    def sorted(self):
+        """Iterate (payload id, timestamp, direction) ordered by payload id then timestamp.
+
+        Records with the same payload id and timestamp keep their capture order, the same as sorting the packets
+        with key (payload id, time).
+        """
+        order = sorted(range(len(self)), key=self.timestamps.__getitem__)
+        order.sort(key=self.payload_ids.__getitem__)
+        payload_ids, timestamps, directions = self.payload_ids, self.timestamps, self.directions
+        for index in order:
+            yield payload_ids[index], timestamps[index], directions[index]
+
+
+class _PcapWriter(object):
+    """Writer of the frames of the kept packets to a pcap file, with microsecond timestamps."""
+
+    def __init__(self, filename):
+        self._file = open(filename, 'wb')
+        self._file.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+
+    def write(self, timestamp, frame):
+        seconds = int(timestamp)
+        microseconds = int(round((timestamp - seconds) * 1000000))
+        if microseconds == 1000000:
+            seconds, microseconds = seconds + 1, 0
+        self._file.write(struct.pack('<IIII', seconds, microseconds, len(frame), len(frame)))
+        self._file.write(frame)
+
+    def close(self):
+        self._file.close()
+
+
+def _mac_bytes(mac):
+    return bytes(bytearray.fromhex(mac.replace(':', '')))
+
+
+def read_flows(filename, sport, dport, sent_dst_macs, received_src_macs, parse_payload=int, group_by=None,
+               unique_received=False, vxlan_sport=None, filtered_pcap=None):
+    """Read the packets of a TCP test flow from a capture file.
+
+    A packet is sent if its destination MAC is one of sent_dst_macs, otherwise it is received if its source MAC is
+    one of received_src_macs. Other packets, and packets whose payload can't be parsed, are ignored.
+
+    Args:
+        filename (str): Path of the pcap or pcapng file.
+        sport (int): TCP source port of the flow.
+        dport (int): TCP destination port of the flow.
+        sent_dst_macs (list): Destination MACs of the sent packets.
+        received_src_macs (list): Source MACs of the received packets.
+        parse_payload (callable): Get the payload id from the TCP payload bytes, raises an exception if the payload
+            is not valid.
+        group_by (str): None, 'ip_src' or 'ip_dst'. Split the flow by the source or destination IP address.
+        unique_received (bool): Only keep the first received packet of each payload id, to filter out floods.
+            Decapsulated VXLAN packets are only kept if no packet with the same id was received without
+            encapsulation.
+        vxlan_sport (int): Also read the inner packets of the VXLAN packets with this UDP source port.
+        filtered_pcap (str): Path of the pcap file the kept packets are written to, in capture order. '{}' in the
+            path is replaced by the IP address of the group when group_by is set.
+
+    Returns:
+        tuple: ({group: FlowRecords}, number of packets in the capture file). The group is the IP address, or None
+            when group_by is None.
+    """
+    sent_dst_macs = set(_mac_bytes(mac) for mac in sent_dst_macs)
+    received_src_macs = set(_mac_bytes(mac) for mac in received_src_macs)
+    group_index = {'ip_src': 2, 'ip_dst': 3}.get(group_by)
+    ip_strings = {}
+    flows = {}
+    writers = {}
+    received_ids = set()
+    decapsulated = []
+    packet_count = 0
+
+    def _group(packet):
+        if group_index is None:
+            return None
+        ip = packet[group_index]
+        if ip not in ip_strings:
+            ip_strings[ip] = socket.inet_ntop(socket.AF_INET if len(ip) == 4 else socket.AF_INET6, ip)
+        return ip_strings[ip]
+
+    def _keep(group, payload_id, timestamp, direction, frame):
+        if group not in flows:
+            flows[group] = FlowRecords()
+            if filtered_pcap:
+                writers[group] = _PcapWriter(filtered_pcap.format(group) if group_index is not None
+                                             else filtered_pcap)
+        flows[group].append(payload_id, timestamp, direction)
+        if filtered_pcap:
+            writers[group].write(timestamp, frame)
+
+    try:
+        for timestamp, linktype, frame in read_packets(filename):
+            packet_count += 1
+            if linktype != LINKTYPE_ETHERNET:
+                continue
+            packet = decode_frame(frame, vxlan_sport)
+            if packet is None or packet[4] != sport or packet[5] != dport:
+                continue
+            eth_dst, eth_src = packet[0], packet[1]
+            if eth_dst in sent_dst_macs:
+                direction = SENT
+            elif eth_src in received_src_macs:
+                direction = RECEIVED
+            else:
+                continue
+            try:
+                payload_id = parse_payload(packet[6])
+            except Exception:
+                continue
+            if packet[7] is not None:
+                # Decapsulated packets are checked for floods after all the other packets
+                decapsulated.append((_group(packet), payload_id, timestamp, direction, packet[7]))
+                continue
+            if direction == RECEIVED and unique_received:
+                if payload_id in received_ids:
+                    continue
+                received_ids.add(payload_id)
+            _keep(_group(packet), payload_id, timestamp, direction, frame)
+
+        for group, payload_id, timestamp, direction, frame in decapsulated:
+            if direction == RECEIVED and unique_received:
+                if payload_id in received_ids:
+                    continue
+                received_ids.add(payload_id)
+            _keep(group, payload_id, timestamp, direction, frame)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return flows, packet_count
@@ -25,10 +25,14 @@ Usage:          Examples of how to use log analyzer
 
 import sys
 import getopt
+import io
 import re
 import os
 import os.path
 import csv
+import fcntl
+import json
+import shutil
 import time
 import logging
 import logging.handlers
@@ -50,12 +54,135 @@ err_invalid_string_format = -5
 err_invalid_input = -6
 err_end_ignore_marker = -7
 err_start_ignore_marker = -8
+err_no_log_offsets = -9
 
 # -- Max log message length
 # The default maximum length of a single log message. Any line longer than MAX_LOG_MESSAGE_LENGTH
 # will not be picked up by the analyzer.
 MAX_LOG_MESSAGE_LENGTH = 1000
 
+# -- Size of the block read at a time while scanning a log file backwards for the start marker
+MARKER_SCAN_BLOCK_SIZE = 1024 * 1024
+
+# -- Maximum number of uncompressed rotated log files followed by the incremental extraction
+MAX_ROTATED_LOG_FILES = 5
+
+# -- Age in seconds after which the log offsets of a run are dropped, when the run never
+# -- reached the 'extract' action (e.g. an aborted test)
+MAX_LOG_OFFSETS_AGE = 24 * 60 * 60
+
+# -- All the markers placed by the log analyzer contain this substring, it is used
+# -- to skip the marker checks for the regular log lines.
+MARKER_KEYWORD = "LogAnalyzer"
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+def required_literal(pattern):
+    '''
+    @summary: Find the longest literal substring that must be present in any string
+              matched by the regular expression.
+
+    @param pattern: regular expression string
+
+    @return: literal string, or None if the pattern has no mandatory literal part
+             or if it can not be determined safely (e.g. case insensitive patterns).
+    '''
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+
+    state = getattr(parsed, 'state', None) or getattr(parsed, 'pattern', None)
+    if state is None or state.flags & re.IGNORECASE:
+        return None
+
+    best = ''
+    current = []
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            current.append(chr(av))
+            continue
+        if len(current) > len(best):
+            best = ''.join(current)
+        current = []
+    if len(current) > len(best):
+        best = ''.join(current)
+
+    return best or None
+
+
+class MultiPatternMatcher(object):
+    '''
+    @summary: Matcher for a list of regular expressions.
+
+    All the patterns are compiled once into a single alternation which is used to
+    quickly reject the lines that do not match any pattern. For the lines that do
+    match, the index of the first matching pattern is found by checking the patterns
+    one by one, skipping the ones whose mandatory literal is not part of the line.
+    '''
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.regex = re.compile('|'.join(self.patterns)) if self.patterns else None
+        self._candidates = []
+        for index, pattern in enumerate(self.patterns):
+            try:
+                compiled = re.compile(pattern)
+            except re.error:
+                # -- The pattern is only valid as a part of the alternation,
+                # -- the line will be reported without the pattern index.
+                continue
+            self._candidates.append((index, compiled, required_literal(pattern)))
+
+    @classmethod
+    def create(cls, regex):
+        '''
+        @summary: Build a matcher from a list of patterns, a compiled regex or a matcher.
+        '''
+        if regex is None or isinstance(regex, cls):
+            return regex
+        if isinstance(regex, (list, tuple)):
+            return cls(regex) if regex else None
+        return cls([regex.pattern])
+
+    @property
+    def pattern(self):
+        return self.regex.pattern if self.regex is not None else ''
+
+    def search(self, line, match_start=False):
+        '''
+        @summary: Find the pattern matching given line.
+
+        @param line: string to match against the patterns.
+        @param match_start: match only at the beginning of the line (re.match semantics).
+
+        @return: index of the first matching pattern, -1 if the line matches the patterns
+                 but no individual pattern could be identified, None if there is no match.
+        '''
+        if self.regex is None:
+            return None
+
+        if match_start:
+            if self.regex.match(line) is None:
+                return None
+        elif self.regex.search(line) is None:
+            return None
+
+        for index, compiled, literal in self._candidates:
+            if literal is not None and literal not in line:
+                continue
+            if match_start:
+                if compiled.match(line) is not None:
+                    return index
+            elif compiled.search(line) is not None:
+                return index
+
+        return -1
+
 
 class AnsibleLogAnalyzer:
     '''
@@ -267,6 +394,92 @@ class AnsibleLogAnalyzer:
         return
     # ---------------------------------------------------------------------
 
+    def record_log_offsets(self, log_file_list, offsets_file):
+        '''
+        @summary: Record inode and size of each log file before placing the start marker.
+                  The offsets are persisted in the offsets file under the run_id, so the
+                  'extract' action can copy only the data written after the start marker.
+        @param log_file_list : List of log file paths.
+        @param offsets_file:   Path to the file keeping the offsets of all runs.
+        '''
+        positions = {}
+        for log_file in log_file_list:
+            try:
+                stat = os.stat(log_file)
+            except OSError:
+                self.print_diagnostic_message('Log file {} not found. Skip recording offset.'.format(log_file))
+                continue
+            positions[log_file] = {'inode': stat.st_ino, 'offset': stat.st_size}
+
+        def _record(offsets):
+            offsets[self.run_id] = {'time': time.time(), 'files': positions}
+
+        update_log_offsets(offsets_file, _record)
+    # ---------------------------------------------------------------------
+
+    def extract_log_range(self, log_file, position, target_file):
+        '''
+        @summary: Copy the content of the log file written after the recorded position into target file.
+                  If the log file was rotated, the rotated file is located by its inode and the
+                  data from the recorded offset up to the current log file is combined.
+        @param log_file:    Log file path.
+        @param position:    Recorded inode and offset of the log file.
+        @param target_file: File path to write the extracted content to.
+
+        @return: True if extracted, False if the recorded position can not be followed
+                 (e.g. the log file was rotated into a compressed file or truncated).
+        '''
+        rotated_files = [log_file] + ['{}.{}'.format(log_file, index) for index in range(1, MAX_ROTATED_LOG_FILES)]
+        files_to_copy = []
+        for path in rotated_files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            files_to_copy.append(path)
+            if stat.st_ino == position['inode']:
+                if stat.st_size < position['offset']:
+                    return False
+                break
+        else:
+            return False
+
+        self.print_diagnostic_message('extract {} from offset {} of {}'.format(
+            log_file, position['offset'], files_to_copy[-1]))
+        with open(target_file, 'wb') as out_file:
+            for index, path in enumerate(reversed(files_to_copy)):
+                with open(path, 'rb') as in_file:
+                    if index == 0:
+                        in_file.seek(position['offset'])
+                    shutil.copyfileobj(in_file, out_file)
+        return True
+    # ---------------------------------------------------------------------
+
+    def extract_logs(self, log_file_list, offsets_file, out_dir):
+        '''
+        @summary: Extract the content of the log files written since the start marker of the run
+                  into out_dir, see extract_log_range().
+
+        @return: True if all the log files were extracted
+        '''
+        run_offsets = update_log_offsets(offsets_file, lambda offsets: offsets.pop(self.run_id, None))
+        if run_offsets is None:
+            print('ERROR: no log offsets recorded for run_id {}'.format(self.run_id))
+            return False
+        positions = run_offsets['files']
+
+        for log_file in log_file_list:
+            if log_file not in positions:
+                print('ERROR: no log offset recorded for {}'.format(log_file))
+                return False
+            target_file = os.path.join(out_dir, os.path.basename(log_file))
+            if not self.extract_log_range(log_file, positions[log_file], target_file):
+                print('ERROR: unable to follow rotation of {}'.format(log_file))
+                return False
+
+        return True
+    # ---------------------------------------------------------------------
+
     def error_to_regx(self, error_string):
         r'''
         This method converts a (list of) strings to one regular expression.
@@ -386,17 +599,33 @@ class AnsibleLogAnalyzer:
         @return: True is str matches regex criteria, otherwise False.
         '''
 
-        ret_code = False
+        return self.line_match_index(str, MultiPatternMatcher.create(match_messages_regex),
+                                     MultiPatternMatcher.create(ignore_messages_regex)) is not None
+    # ---------------------------------------------------------------------
+
+    def line_match_index(self, str, match_matcher, ignore_matcher):
+        '''
+        @summary: Same as line_matches(), but reports which 'match' pattern matched.
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
-            if (ignore_messages_regex is None):
-                ret_code = True
+        @param match_matcher: MultiPatternMatcher with messages to match against.
 
-            elif (not ignore_messages_regex.findall(str)):
-                self.print_diagnostic_message('matching line: %s' % str)
-                ret_code = True
+        @param ignore_matcher: MultiPatternMatcher with messages to ignore.
 
-        return ret_code
+        @return: index of the matching pattern in the 'match' set or None.
+        '''
+
+        if match_matcher is None:
+            return None
+
+        index = match_matcher.search(str)
+        if index is None:
+            return None
+
+        if ignore_matcher is not None and ignore_matcher.search(str) is not None:
+            return None
+
+        self.print_diagnostic_message('matching line: %s' % str)
+        return index
     # ---------------------------------------------------------------------
 
     def line_is_expected(self, str, expect_messages_regex):
@@ -405,146 +634,245 @@ class AnsibleLogAnalyzer:
                   set of "expected" regular expressions.
         '''
 
-        ret_code = False
-        if self.run_id.startswith("test_advanced_reboot_test_"):
-            # Use the stricter (and better-performing) match instead of findall, but only when analyzing
-            # logs for advanced reboot test cases. This is so that other test cases are not affected in
-            # case their regexes don't start with .*
-            if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
-                ret_code = True
+        return self.line_expect_index(str, MultiPatternMatcher.create(expect_messages_regex)) is not None
+    # ---------------------------------------------------------------------
+
+    def line_expect_index(self, str, expect_matcher):
+        '''
+        @summary: Same as line_is_expected(), but reports which "expected" pattern matched.
+
+        @return: index of the matching pattern in the "expected" set or None.
+        '''
+
+        if expect_matcher is None:
+            return None
+
+        # Use the stricter (and better-performing) match instead of search, but only when analyzing
+        # logs for advanced reboot test cases. This is so that other test cases are not affected in
+        # case their regexes don't start with .*
+        return expect_matcher.search(str, match_start=self.run_id.startswith("test_advanced_reboot_test_"))
+    # ---------------------------------------------------------------------
+
+    def find_start_marker_offset(self, log_file, start_marker):
+        '''
+        @summary: Scan the log file backwards, block by block, for the last line containing
+                  the start marker.
+
+        @param log_file: log file opened in binary mode.
+
+        @param start_marker: start marker string.
+
+        @return: offset of the first byte after the start marker line, or None if not found.
+        '''
+
+        marker = start_marker.encode()
+        log_file.seek(0, os.SEEK_END)
+        position = log_file.tell()
+        # -- Beginning of the line that was cut by the block boundary of the previous block
+        tail = b''
+        while position > 0:
+            read_size = min(MARKER_SCAN_BLOCK_SIZE, position)
+            position -= read_size
+            log_file.seek(position)
+            block = log_file.read(read_size) + tail
+
+            # -- The first line of the block is complete only at the beginning of the file
+            head_len = 0
+            if position > 0:
+                head_len = block.find(b'\n') + 1
+                if head_len == 0:
+                    tail = block
+                    continue
+
+            index = block.rfind(marker, head_len)
+            while index != -1:
+                line_start = block.rfind(b'\n', head_len, index) + 1
+                line_start = max(line_start, head_len)
+                line_end = block.find(b'\n', index)
+                line_end = len(block) if line_end == -1 else line_end + 1
+                if b'extract_log' not in block[line_start:line_end]:
+                    return position + line_end
+                index = block.rfind(marker, head_len, line_start)
+
+            tail = block[:head_len]
+
+        return None
+    # ---------------------------------------------------------------------
+
+    def open_analysis_range(self, log_file_path, check_marker):
+        '''
+        @summary: Open the log file positioned right after the last start marker.
+
+        @return: text file object, None if the start marker is required but not found.
+        '''
+
+        log_file = io.open(log_file_path, 'rb')
+        offset = self.find_start_marker_offset(log_file, self.create_start_marker())
+        if offset is None:
+            if check_marker:
+                log_file.close()
+                return None
+            offset = 0
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
-                ret_code = True
+            self.print_diagnostic_message(
+                'found start marker: %s' % self.create_start_marker())
 
-        return ret_code
+        log_file.seek(offset)
+        return io.TextIOWrapper(log_file)
+    # ---------------------------------------------------------------------
 
-    def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-                     maximum_log_length=None):
+    def scan_file(self, log_file_path, match_matcher, ignore_matcher, expect_matcher, maximum_log_length=None):
         '''
-        @summary: Analyze input file content for messages matching input regex
-                  expressions. See line_matches() for details on matching criteria.
+        @summary: Single pass analysis of the log file content between start/end markers.
 
-        @param log_file_path: Patch to the log file.
+        The start marker is located by scanning the file backwards, then the file is
+        streamed forward from it, so the file is never loaded into memory as a whole.
 
-        @param match_messages_regex:
-            regex class instance containing messages to match against.
+        @param log_file_path: Path to the log file, '-' for stdin.
 
-        @param ignore_messages_regex:
-            regex class instance containing messages to ignore match against.
+        @param match_matcher: MultiPatternMatcher with messages to match against.
 
-        @param expect_messages_regex:
-            regex class instance containing messages that are expected to appear in logfile.
+        @param ignore_matcher: MultiPatternMatcher with messages to ignore.
 
-        @param end_marker_regex - end marker
+        @param expect_matcher: MultiPatternMatcher with messages expected to appear in logfile.
 
         @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
 
-        @return: List of strings match search criteria.
+        @return: Lists of (line, pattern index) tuples of matching and expected lines, in file order.
         '''
 
         self.print_diagnostic_message('analyzing file: %s' % log_file_path)
 
-        # -- indicates whether log analyzer currently is in the log range between start
-        # -- and end marker. see analyze_file method.
+        if maximum_log_length is None:
+            maximum_log_length = MAX_LOG_MESSAGE_LENGTH
+
         check_marker = self.require_marker_check(log_file_path)
-        in_analysis_range = not check_marker
         stdin_as_input = self.is_filename_stdin(log_file_path)
         matching_lines = []
         expected_lines = []
-        found_start_marker = False
-        found_end_marker = False
+
         if stdin_as_input:
             log_file = sys.stdin
         else:
-            log_file = open(log_file_path, 'r')
+            log_file = self.open_analysis_range(log_file_path, check_marker)
+            if log_file is None:
+                print('ERROR: start marker was not found')
+                sys.exit(err_no_start_marker)
 
-        start_marker = self.create_start_marker()
         end_marker = self.create_end_marker()
-
-        ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
-            if stdin_as_input:
-                in_analysis_range = True
-            else:
-                if end_marker in rev_line:
-                    self.print_diagnostic_message(
-                        'found end marker: %s' % end_marker)
-                    if (found_end_marker):
-                        print('ERROR: duplicate end marker found')
-                        sys.exit(err_duplicate_end_marker)
-                    found_end_marker = True
-                    in_analysis_range = True
-                    continue
-                elif self.end_ignore_marker_prefix in rev_line:
-                    marker_run_id = rev_line.split(
-                        self.end_ignore_marker_prefix)[1]
-                    ignore_marker_run_ids.append(marker_run_id)
-                    self.print_diagnostic_message('found end ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.end_ignore_marker_prefix):])
-                    if not in_analysis_range:
-                        print('ERROR: duplicate end ignore marker found')
-                        sys.exit(err_end_ignore_marker)
-                    in_analysis_range = False
-                    continue
-
-                elif self.start_ignore_marker_prefix in rev_line:
-                    marker_run_id = ignore_marker_run_ids.pop()
-                    self.print_diagnostic_message('found start ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.start_ignore_marker_prefix):])
-                    if in_analysis_range or marker_run_id not in rev_line:
-                        print('ERROR: unexpected start ignore marker found')
-                        sys.exit(err_start_ignore_marker)
-                    in_analysis_range = True
+        found_end_marker = False
+        # -- Lines after the end marker are analyzed only for files without default markers
+        in_analysis_range = True
+        # -- Start ignore marker line of the currently open ignore range
+        start_ignore_line = None
+
+        try:
+            for line in log_file:
+                if not stdin_as_input and MARKER_KEYWORD in line:
+                    if end_marker in line:
+                        self.print_diagnostic_message(
+                            'found end marker: %s' % end_marker)
+                        if found_end_marker:
+                            print('ERROR: duplicate end marker found')
+                            sys.exit(err_duplicate_end_marker)
+                        if start_ignore_line is not None:
+                            print('ERROR: unexpected start ignore marker found')
+                            sys.exit(err_start_ignore_marker)
+                        found_end_marker = True
+                        in_analysis_range = not check_marker
+                        continue
+
+                    if self.end_ignore_marker_prefix in line:
+                        self.print_diagnostic_message('found end ignore marker: %s'
+                                                      % line[line.index(self.end_ignore_marker_prefix):])
+                        if start_ignore_line is None:
+                            print('ERROR: duplicate end ignore marker found')
+                            sys.exit(err_end_ignore_marker)
+                        marker_run_id = line.split(self.end_ignore_marker_prefix)[1]
+                        if marker_run_id not in start_ignore_line:
+                            print('ERROR: unexpected start ignore marker found')
+                            sys.exit(err_start_ignore_marker)
+                        start_ignore_line = None
+                        continue
+
+                    if self.start_ignore_marker_prefix in line:
+                        self.print_diagnostic_message('found start ignore marker: %s'
+                                                      % line[line.index(self.start_ignore_marker_prefix):])
+                        if start_ignore_line is not None or not in_analysis_range:
+                            print('ERROR: unexpected start ignore marker found')
+                            sys.exit(err_start_ignore_marker)
+                        start_ignore_line = line
+                        continue
+
+                if not in_analysis_range or start_ignore_line is not None:
                     continue
 
-            if not stdin_as_input:
-                if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
-                    self.print_diagnostic_message(
-                        'found start marker: %s' % start_marker)
-                    if (found_start_marker):
-                        print('ERROR: duplicate start marker found')
-                        sys.exit(err_duplicate_start_marker)
-                    found_start_marker = True
-
-                    if (not in_analysis_range):
-                        print(
-                            ('ERROR: found start marker:%s without corresponding end marker' % rev_line))
-                        sys.exit(err_no_end_marker)
-                    in_analysis_range = False
-                    break
-
-            if in_analysis_range:
                 # Skip long logs in sairedis recording since most likely
                 # they are bulk set operations for non-default routes
                 # without much insight while they are time consuming to analyze
                 # In advanced_reboot test, we need to analyze the bulk operations for mac learning
                 # So we need to allow long lines
-                if maximum_log_length is None:
-                    maximum_log_length = MAX_LOG_MESSAGE_LENGTH
-                if not check_marker and len(rev_line) > maximum_log_length:
+                if not check_marker and len(line) > maximum_log_length:
                     continue
 
-                if self.line_is_expected(rev_line, expect_messages_regex):
-                    expected_lines.append(rev_line)
+                index = self.line_expect_index(line, expect_matcher)
+                if index is not None:
+                    expected_lines.append((line, index))
+                    continue
 
-                elif self.line_matches(rev_line, match_messages_regex, ignore_messages_regex):
-                    matching_lines.append(rev_line)
+                index = self.line_match_index(line, match_matcher, ignore_matcher)
+                if index is not None:
+                    matching_lines.append((line, index))
+        finally:
+            if not stdin_as_input:
+                log_file.close()
 
-        # care about the markers only if input is not stdin or no need to check start marker
-        if not stdin_as_input and check_marker:
-            if (not found_start_marker):
-                print('ERROR: start marker was not found')
-                sys.exit(err_no_start_marker)
+        if start_ignore_line is not None:
+            print('ERROR: unexpected start ignore marker found')
+            sys.exit(err_start_ignore_marker)
 
-            if (not found_end_marker):
-                print('ERROR: end marker was not found')
-                sys.exit(err_no_end_marker)
+        # care about the markers only if input is not stdin or no need to check start marker
+        if not stdin_as_input and check_marker and not found_end_marker:
+            print('ERROR: end marker was not found')
+            sys.exit(err_no_end_marker)
 
         return matching_lines, expected_lines
     # ---------------------------------------------------------------------
 
+    def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                     maximum_log_length=None):
+        '''
+        @summary: Analyze input file content for messages matching input regex
+                  expressions. See line_matches() for details on matching criteria.
+
+        @param log_file_path: Patch to the log file.
+
+        @param match_messages_regex:
+            regex class instance or MultiPatternMatcher containing messages to match against.
+
+        @param ignore_messages_regex:
+            regex class instance or MultiPatternMatcher containing messages to ignore match against.
+
+        @param expect_messages_regex:
+            regex class instance or MultiPatternMatcher containing messages that are expected to appear in logfile.
+
+        @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
+
+        @return: Lists of matching and expected strings, in reverse file order.
+        '''
+
+        matching_lines, expected_lines = self.scan_file(log_file_path,
+                                                        MultiPatternMatcher.create(match_messages_regex),
+                                                        MultiPatternMatcher.create(ignore_messages_regex),
+                                                        MultiPatternMatcher.create(expect_messages_regex),
+                                                        maximum_log_length=maximum_log_length)
+
+        return ([line for line, _ in reversed(matching_lines)],
+                [line for line, _ in reversed(expected_lines)])
+    # ---------------------------------------------------------------------
+
     def analyze_file_list(self, log_file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-                          maximum_log_length=None):
+                          maximum_log_length=None, matched_expect_indexes=None):
         '''
         @summary: Analyze input files messages matching input regex expressions.
             See line_matches() for details on matching criteria.
@@ -552,36 +880,89 @@ class AnsibleLogAnalyzer:
         @param log_file_list: List of paths to the log files.
 
         @param match_messages_regex:
-            regex class instance containing messages to match against.
+            regex class instance or MultiPatternMatcher containing messages to match against.
 
         @param ignore_messages_regex:
-            regex class instance containing messages to ignore match against.
+            regex class instance or MultiPatternMatcher containing messages to ignore match against.
 
         @param expect_messages_regex:
-            regex class instance containing messages that are expected to appear in logfile.
+            regex class instance or MultiPatternMatcher containing messages that are expected to appear in logfile.
 
         @param maximum_log_length
             The maximum length of the log message. If the length of the log message is greater than this value,
 
+        @param matched_expect_indexes
+            Optional set, updated with the indexes of the expected patterns found in the log files.
+
         @return: Returns map <file_name, list_of_matching_strings>
         '''
         res = {}
 
+        match_matcher = MultiPatternMatcher.create(match_messages_regex)
+        ignore_matcher = MultiPatternMatcher.create(ignore_messages_regex)
+        expect_matcher = MultiPatternMatcher.create(expect_messages_regex)
+
         for log_file in log_file_list:
             if not len(log_file):
                 continue
-            match_strings, expect_strings = self.analyze_file(log_file, match_messages_regex, ignore_messages_regex,
-                                                              expect_messages_regex,
-                                                              maximum_log_length=maximum_log_length)
+            matching_lines, expected_lines = self.scan_file(log_file, match_matcher, ignore_matcher, expect_matcher,
+                                                            maximum_log_length=maximum_log_length)
 
-            match_strings.reverse()
-            expect_strings.reverse()
-            res[log_file] = [match_strings, expect_strings]
+            if matched_expect_indexes is not None:
+                matched_expect_indexes.update(index for _, index in expected_lines if index >= 0)
+            res[log_file] = [[line for line, _ in matching_lines], [line for line, _ in expected_lines]]
 
         return res
     # ---------------------------------------------------------------------
 
 
+def load_log_offsets(offsets_file):
+    '''
+    @summary: Load log offsets recorded by the 'init' action.
+
+    @return: map run_id: {'time': time recorded, 'files': {log_file: {'inode': inode, 'offset': offset}}}
+    '''
+    try:
+        with open(offsets_file, 'r') as in_file:
+            return json.load(in_file)
+    except (IOError, OSError, ValueError):
+        return {}
+# ---------------------------------------------------------------------
+
+
+def save_log_offsets(offsets_file, offsets):
+    '''
+    @summary: Atomically replace the offsets file content.
+    '''
+    tmp_file = '{}.{}.tmp'.format(offsets_file, os.getpid())
+    with open(tmp_file, 'w') as out_file:
+        json.dump(offsets, out_file)
+    os.rename(tmp_file, offsets_file)
+# ---------------------------------------------------------------------
+
+
+def update_log_offsets(offsets_file, update):
+    '''
+    @summary: Update the log offsets under a lock, so that the runs of concurrent sessions on the DUT
+              don't overwrite the offsets of each other. The offsets of the runs older than
+              MAX_LOG_OFFSETS_AGE are dropped.
+    @param update: Function updating the map of log offsets, see load_log_offsets().
+
+    @return: The value returned by update.
+    '''
+    with open(offsets_file + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        offsets = load_log_offsets(offsets_file)
+        result = update(offsets)
+        now = time.time()
+        for run_id in [run_id for run_id, run_offsets in offsets.items()
+                       if now - run_offsets.get('time', 0) > MAX_LOG_OFFSETS_AGE]:
+            del offsets[run_id]
+        save_log_offsets(offsets_file, offsets)
+    return result
+# ---------------------------------------------------------------------
+
+
 def usage():
     print('loganalyzer input parameters:')
     print('--help                           Print usage')
@@ -591,6 +972,8 @@ def usage():
     print('                                 to all log files specified in --logs parameter.')
     print('                                 analyze - perform log analysis of files specified in --logs parameter.')
     print('                                 add_end_marker - add end marker to all log files specified in --logs parameter.')           # noqa: E501
+    print('                                 extract - copy the content of system log and files specified in --logs parameter')           # noqa: E501
+    print('                                 written since the init action into --out_dir. Requires --offsets_file.')
     print('--out_dir path                   Directory path where to place output files, ')
     print('                                 must be present when --action == analyze')
     print('--logs path{,path}               List of full paths to log files to be analyzed.')
@@ -609,11 +992,13 @@ def usage():
     print('                                 All the strings from these files will be expected to present')
     print('                                 in one of specified log files during the analysis. Must be present')
     print('                                 when action == analyze.')
+    print('--offsets_file path              File keeping log files offsets recorded by init action for the')
+    print('                                 extract action.')
 
 # ---------------------------------------------------------------------
 
 
-def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in):
+def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in, offsets_file=None):
     '''
     @summary: This function validates command line parameter 'action' and
         other related parameters.
@@ -625,6 +1010,15 @@ def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in,
 
     if action in ['init', 'add_end_marker', 'add_start_ignore_mark', 'add_end_ignore_mark']:
         ret_code = True
+    elif action == 'extract':
+        if out_dir is None or len(out_dir) == 0:
+            print('ERROR: missing required out_dir for extract action')
+            ret_code = False
+
+        elif offsets_file is None or len(offsets_file) == 0:
+            print('ERROR: missing required offsets_file for extract action')
+            ret_code = False
+
     elif action == 'analyze':
         if out_dir is None or len(out_dir) == 0:
             print('ERROR: missing required out_dir for analyze action')
@@ -661,7 +1055,8 @@ def check_run_id(run_id):
 # ---------------------------------------------------------------------
 
 
-def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_e, unused_regex_messages):
+def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_e, unused_regex_messages,
+                      matched_expect_indexes=None):
     '''
     @summary: Write results of analysis into a file.
 
@@ -671,6 +1066,8 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
 
     @param analysis_result_per_file: map file_name: [list of found matching strings]
 
+    @param matched_expect_indexes: indexes of the expected regexes already known to be found
+
     @return: void
     '''
 
@@ -703,7 +1100,9 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
             "\n-------------------------------------------------\n\n")
         out_file.write('Total matches:%d\n' % match_cnt)
         # Find unused regex matches
-        for regex in messages_regex_e:
+        for index, regex in enumerate(messages_regex_e):
+            if matched_expect_indexes and index in matched_expect_indexes:
+                continue
             for line in expected_lines_total:
                 if re.search(regex, line):
                     break
@@ -773,13 +1172,14 @@ def main(argv):
     match_files_in = None
     ignore_files_in = None
     expect_files_in = None
+    offsets_file = None
     verbose = False
 
     try:
-        opts, args = getopt.getopt(argv, "a:r:s:l:o:m:i:e:vh",
+        opts, args = getopt.getopt(argv, "a:r:s:l:o:m:i:e:f:vh",
                                    ["action=", "run_id=", "start_marker=", "logs=",
                                     "out_dir=", "match_files_in=", "ignore_files_in=",
-                                    "expect_files_in=", "verbose", "help"])
+                                    "expect_files_in=", "offsets_file=", "verbose", "help"])
 
     except getopt.GetoptError:
         print("Invalid option specified")
@@ -815,10 +1215,14 @@ def main(argv):
         elif (opt in ("-e", "--expect_files_in")):
             expect_files_in = arg
 
+        elif (opt in ("-f", "--offsets_file")):
+            offsets_file = arg
+
         elif (opt in ("-v", "--verbose")):
             verbose = True
 
-    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in)
+    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in,
+                         offsets_file)
             and check_run_id(run_id)):
         usage()
         sys.exit(err_invalid_input)
@@ -829,8 +1233,14 @@ def main(argv):
 
     result = {}
     if action == "init":
+        if offsets_file:
+            analyzer.record_log_offsets([system_log_file] + log_file_list, offsets_file)
         analyzer.place_marker(log_file_list, analyzer.create_start_marker())
         return 0
+    elif action == "extract":
+        if not analyzer.extract_logs([system_log_file] + log_file_list, offsets_file, out_dir):
+            sys.exit(err_no_log_offsets)
+        return 0
     elif action == "analyze":
         match_file_list = match_files_in.split(tokenizer)
         ignore_file_list = ignore_files_in.split(tokenizer)
@@ -850,11 +1260,15 @@ def main(argv):
         if not log_file_list:
             log_file_list.append(system_log_file)
 
-        result = analyzer.analyze_file_list(log_file_list, match_messages_regex,
-                                            ignore_messages_regex, expect_messages_regex)
+        matched_expect_indexes = set()
+        result = analyzer.analyze_file_list(log_file_list,
+                                            MultiPatternMatcher(messages_regex_m),
+                                            MultiPatternMatcher(messages_regex_i),
+                                            MultiPatternMatcher(messages_regex_e),
+                                            matched_expect_indexes=matched_expect_indexes)
         unused_regex_messages = []
         write_result_file(run_id, out_dir, result,
-                          messages_regex_e, unused_regex_messages)
+                          messages_regex_e, unused_regex_messages, matched_expect_indexes)
         write_summary_file(run_id, out_dir, result, unused_regex_messages)
     elif action == "add_end_marker":
         analyzer.place_marker(
@@ -1,6 +1,7 @@
 
 from __future__ import print_function
 
+import copy
 import json
 import logging
 import os
@@ -13,13 +14,14 @@ import sys
 import threading
 import traceback
 import time
+import uuid
 
 if sys.version_info.major == 2:
     from multiprocessing.pool import ThreadPool
 else:
     from concurrent.futures import ThreadPoolExecutor as ThreadPool
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from logging.handlers import RotatingFileHandler
 
 from flask import Flask, request, abort
@@ -33,9 +35,13 @@ MUX_BRIDGE_TEMPLATE = 'mbr-%s-%d'
 
 LIST_PORTS_CMD = 'ovs-vsctl list-ports {}'
 DUMP_FLOW_CMD = 'ovs-ofctl --names dump-flows {}'
-DEL_FLOW_CMD = 'ovs-ofctl --names del-flows {} in_port="{}"'
-ADD_FLOW_CMD = 'ovs-ofctl --names add-flow {} in_port="{}",actions={}'
-MOD_FLOW_CMD = 'ovs-ofctl --names mod-flows {} in_port="{}",actions={}'
+# The flow changes of a mux bridge are applied with one ovs-ofctl command reading the flow mods from stdin. With
+# '--bundle', the flow mods are applied in one OpenFlow bundle, atomically.
+BUNDLE_FLOWS_CMD = 'ovs-ofctl --names --bundle add-flows {} -'
+FLOWS_CMD = 'ovs-ofctl --names add-flows {} -'
+DEL_FLOW_MOD = 'delete in_port="{}"'
+ADD_FLOW_MOD = 'add in_port="{}",actions={}'
+MOD_FLOW_MOD = 'modify in_port="{}",actions={}'
 
 RANDOM = 'random'
 TOGGLE = 'toggle'
@@ -106,11 +112,12 @@ def adaptive_name(template, vm_set, index):
     return rendered_name
 
 
-def run_cmd(cmdline):
+def run_cmd(cmdline, input=None):
     """Use subprocess to run a command line with shell=True
 
     Args:
         cmdline (string): The command to be executed.
+        input (string): Optional data sent to stdin of the command.
 
     Raises:
         Exception: If return code of running command line is not zero, an exception is raised.
@@ -124,11 +131,12 @@ def run_cmd(cmdline):
         stdout=subprocess.PIPE,
         stdin=subprocess.PIPE,
         stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
+    stdout, stderr = process.communicate(input.encode('utf-8') if input is not None else None)
     ret_code = process.returncode
 
     msg = {
         'cmd': cmdline,
+        'input': input.splitlines() if input is not None else None,
         'ret_code': ret_code,
         'stdout': stdout.decode('utf-8').splitlines(),
         'stderr': stderr.decode('utf-8').splitlines()
@@ -163,6 +171,19 @@ def config_logging(http_port):
 
 # ==================================================== Models ==================================================== #
 
+class BulkToggleError(Exception):
+    """Error of setting the active side of some of the muxes in a bulk toggle.
+
+    Attributes:
+        results (dict): Result of every port of the bulk toggle, see Muxes.bulk_set_active_side.
+    """
+
+    def __init__(self, errors, results):
+        super(BulkToggleError, self).__init__('Failed to set the active side of {} of {} ports, first error: {}'
+                                              .format(len(errors), len(results), repr(errors[0])))
+        self.results = results
+
+
 class Mux(object):
     '''Object represents a single mux bridge
 
@@ -187,6 +208,9 @@ class Mux(object):
         self.port_index = port_index
         self.bridge = adaptive_name(MUX_BRIDGE_TEMPLATE, vm_set, port_index)
 
+        # Whether the flow mods can be applied to the bridge in a bundle, cleared if the bridge doesn't support it
+        self.bundle_supported = True
+
         self._init_ports()
 
         # If the mux does not have valid ports attached, it is invalid
@@ -386,12 +410,36 @@ class Mux(object):
             }
             return status
 
+    def _apply_flow_mods(self, flow_mods):
+        """Apply the flow mods to the mux bridge with one ovs-ofctl command.
+
+        The flow mods are applied in one OpenFlow bundle, so the flows are changed atomically, e.g. there is no moment
+        without downstream flow when toggling. If the bridge doesn't support bundles, the flow mods are applied
+        without bundle.
+        """
+        if not flow_mods:
+            return
+        input = '\n'.join(flow_mods) + '\n'
+        if self.bundle_supported:
+            try:
+                run_cmd(BUNDLE_FLOWS_CMD.format(self.bridge), input=input)
+                return
+            except Exception as e:
+                self.info('failed to apply flows in bundle, fallback to no bundle: {}'.format(repr(e)))
+                self.bundle_supported = False
+        run_cmd(FLOWS_CMD.format(self.bridge), input=input)
+
+    def _commit_flows(self, flows):
+        """Update the in-memory state of the mux after the flows have been applied to the bridge."""
+        self.flows = flows
+        self._active_standby_state_helper(flows['downstream']['in_side'])
+
     def set_active_side(self, new_active_side):
         """Set the active side of the mux bridge to the specified side.
 
         If the specified side is same as the current active side of bridge, no config change is required. Otherwise,
-        this method will run ovs-ofctl command to remove flow and add a new flow to switch active side. All the
-        related instance attributes are updated after open flow rules are changed.
+        this method will run ovs-ofctl command to remove flow and add a new flow to switch active side in one bundle.
+        All the related instance attributes are updated after open flow rules are changed.
         """
         with self.lock:
             self.info('>>>>>> updating mux active side from {} to {}'.format(self.active_side, new_active_side))
@@ -408,129 +456,97 @@ class Mux(object):
                 new_active_side = UPPER_TOR if self.active_side == LOWER_TOR else LOWER_TOR
 
             new_active_port = self.ports[new_active_side]
+            flows = copy.deepcopy(self.flows)
+            flows['downstream']['in_side'] = new_active_side
 
             if len(self.flows['downstream']['out_sides']) == 1:
                 action_desc = '{}:"{}"'.format(OUTPUT, self.ports[NIC])
-                run_cmd(DEL_FLOW_CMD.format(
-                    self.bridge,
-                    self.active_port))
-                # Immediately update state after flow config changed to ensure consistency
-                self._active_standby_state_helper(None)
-                self.flows['downstream']['in_side'] = self.active_side
-                self.flows['downstream']['out_sides'] = []
-
-                run_cmd(ADD_FLOW_CMD.format(
-                    self.bridge,
-                    new_active_port,
-                    action_desc))
-                # Immediately update state after flow config changed to ensure consistency
-                self._active_standby_state_helper(new_active_side)
-                self.flows['downstream']['in_side'] = self.active_side
-                self.flows['downstream']['out_sides'] = [NIC]
-
+                self._apply_flow_mods([
+                    DEL_FLOW_MOD.format(self.active_port),
+                    ADD_FLOW_MOD.format(new_active_port, action_desc)
+                ])
+                flows['downstream']['out_sides'] = [NIC]
             else:
                 # If currently downstream flow action is drop, there should be no downstream flow config.
                 # Then no flow config change required, only need to update the state.
-                self._active_standby_state_helper(new_active_side)
-                self.flows['downstream']['in_side'] = self.active_side
-                self.flows['downstream']['out_sides'] = []
+                flows['downstream']['out_sides'] = []
+
+            # Update state after flow config changed to ensure consistency
+            self._commit_flows(flows)
 
             # Increase flap counter
             self.flap_counter += 1
 
             self.info('updated mux active side to {} <<<<<<'.format(new_active_side))
 
-    def _update_downstream_flow(self, new_action):
+    def _update_downstream_flow(self, new_action, flows):
+        """Get the flow mods for applying the new action to the downstream flow.
+
+        The flows dict is updated to the target flows of the bridge.
+        """
         self.debug('updating downstream flow, new_action={}'.format(new_action))
 
         # No action required for below scenarios
-        if new_action == DROP and len(self.flows['downstream']['out_sides']) == 0:
+        if new_action == DROP and len(flows['downstream']['out_sides']) == 0:
             self.debug('no downstream flow change required')
-            return
-        elif new_action == OUTPUT and len(self.flows['downstream']['out_sides']) == 1:
+            return []
+        elif new_action == OUTPUT and len(flows['downstream']['out_sides']) == 1:
             self.debug('no downstream flow change required')
-            return
+            return []
 
         if new_action == DROP:
             # Update action from OUTPUT to DROP, del-flow
-            run_cmd(DEL_FLOW_CMD.format(
-                self.bridge,
-                self.active_port))
-            self.flows['downstream']['out_sides'] = []
+            flows['downstream']['out_sides'] = []
+            return [DEL_FLOW_MOD.format(self.active_port)]
 
+        # Update action from DROP to OUTPUT, add-flow
+        action_desc = '{}:"{}"'.format(OUTPUT, self.ports[NIC])
+        if self.active_side is None:
+            active_side = random.choice([UPPER_TOR, LOWER_TOR])
         else:
-            # Update action from DROP to OUTPUT, add-flow
-            action_desc = '{}:"{}"'.format(OUTPUT, self.ports[NIC])
-            if self.active_side is None:
-                active_side = random.choice([UPPER_TOR, LOWER_TOR])
-            else:
-                active_side = self.active_side
-
-            run_cmd(ADD_FLOW_CMD.format(
-                self.bridge,
-                self.ports[active_side],
-                action_desc))
-            self._active_standby_state_helper(active_side)
-            self.flows['downstream']['in_side'] = active_side
-            self.flows['downstream']['out_sides'] = [NIC]
+            active_side = self.active_side
 
-        self.debug('updated downstream flow, new_action={}, flows={}'
-                   .format(new_action, json.dumps(self.flows, indent=2)))
+        flows['downstream']['in_side'] = active_side
+        flows['downstream']['out_sides'] = [NIC]
+        return [ADD_FLOW_MOD.format(self.ports[active_side], action_desc)]
 
-    def _update_upstream_flow(self, new_action, out_sides=[]):
-        """Update upstream flow. Apply new action to sides specified in out_sides.
+    def _update_upstream_flow(self, new_action, flows, out_sides=[]):
+        """Get the flow mods for updating upstream flow. Apply new action to sides specified in out_sides.
 
         The upstream flow has 2 output sides, to UPPER_TOR or LOWER_TOR. This is to update the action (OUTPUT or DROP)
-        for the specified output sides.
+        for the specified output sides. The flows dict is updated to the target flows of the bridge.
         """
         self.debug('updating upstream flow, new_action={}, out_sides={}'.format(new_action, out_sides))
 
         if len(out_sides) == 0:
             # Need to specify sides that need to apply the new OUTPUT or DROP action
             app.logger.debug('no out_sides specified, skip updating upstream flow')
-            return
+            return []
 
         # Figure out target upstream out_sides
         if new_action == DROP:
-            target_out_sides = [out_side for out_side in self.flows['upstream']['out_sides']
+            target_out_sides = [out_side for out_side in flows['upstream']['out_sides']
                                 if out_side not in out_sides]
         else:
-            target_out_sides = list(set(self.flows['upstream']['out_sides'] + out_sides))
+            target_out_sides = list(set(flows['upstream']['out_sides'] + out_sides))
 
         # Based on current out_sides and target out_sides to determine what to do
-        if set(self.flows['upstream']['out_sides']) == set(target_out_sides):
+        if set(flows['upstream']['out_sides']) == set(target_out_sides):
             app.logger.debug('target_out_sides same as current out_sides, no upstream flow change required')
-            return
-        operation = None
+            return []
+
+        action_desc = ','.join(['{}:"{}"'.format(OUTPUT, self.ports[out_side]) for out_side in target_out_sides])
         if len(target_out_sides) == 0:
-            operation = 'DEL-FLOW'   # Remove the upstream flow
+            # Remove the upstream flow
+            flow_mod = DEL_FLOW_MOD.format(self.ports[NIC])
+        elif len(flows['upstream']['out_sides']) == 0:
+            # Need to add upstream flow
+            flow_mod = ADD_FLOW_MOD.format(self.ports[NIC], action_desc)
         else:
-            if len(self.flows['upstream']['out_sides']) == 0:
-                operation = 'ADD-FLOW'   # Need to add upstream flow
-            else:
-                operation = 'MOD-FLOW'   # Need to modify upstream flow
-
-        if operation == 'DEL-FLOW':
-            run_cmd(DEL_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC]))
-            self.flows['upstream']['out_sides'] = []
-        elif operation == 'ADD-FLOW':
-            action_desc = ','.join(['{}:"{}"'.format(OUTPUT, self.ports[out_side]) for out_side in target_out_sides])
-            run_cmd(ADD_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC],
-                    action_desc))
-            self.flows['upstream']['out_sides'] = target_out_sides
-        elif operation == 'MOD-FLOW':
-            action_desc = ','.join(['{}:"{}"'.format(OUTPUT, self.ports[out_side]) for out_side in target_out_sides])
-            run_cmd(MOD_FLOW_CMD.format(
-                    self.bridge,
-                    self.ports[NIC],
-                    action_desc))
-            self.flows['upstream']['out_sides'] = target_out_sides
-        self.debug('updated upstream flow, new_action={}, out_sides={}, flows={}'
-                   .format(new_action, out_sides, json.dumps(self.flows, indent=2)))
+            # Need to modify upstream flow
+            flow_mod = MOD_FLOW_MOD.format(self.ports[NIC], action_desc)
+        flows['upstream']['out_sides'] = target_out_sides
+        return [flow_mod]
 
     def update_flows(self, new_action, out_sides):
         """
@@ -541,11 +557,15 @@ class Mux(object):
         with self.lock:
             self.info('>>>>> calling update_flows, new_action={}, out_sides={}, current flow:\n{}'
                       .format(new_action, out_sides, json.dumps(self.flows, indent=2)))
+            flows = copy.deepcopy(self.flows)
+            flow_mods = []
             if NIC in out_sides:
-                self._update_downstream_flow(new_action)
+                flow_mods.extend(self._update_downstream_flow(new_action, flows))
             tor_sides = [out_side for out_side in out_sides if out_side != NIC]
             if len(tor_sides) > 0:
-                self._update_upstream_flow(new_action, tor_sides)
+                flow_mods.extend(self._update_upstream_flow(new_action, flows, tor_sides))
+            self._apply_flow_mods(flow_mods)
+            self._commit_flows(flows)
             self.info('update_flows completed, current flows:\n{} <<<<<<'.format(json.dumps(self.flows, indent=2)))
 
     def reset_flows(self):
@@ -565,11 +585,18 @@ class Mux(object):
 class Muxes(object):
 
     MUXES_CONCURRENCY = 4
+    # Toggling all the muxes runs an ovs-ofctl command per mux bridge, run more of them in parallel
+    BULK_CONCURRENCY = 32
+    # Number of finished bulk toggles kept for querying their results
+    MAX_BULK_TOGGLES = 64
 
     def __init__(self, vm_set):
         self.vm_set = vm_set
         self.muxes = {}
         self.thread_pool = ThreadPool(Muxes.MUXES_CONCURRENCY)
+        self.bulk_thread_pool = ThreadPool(Muxes.BULK_CONCURRENCY)
+        self.bulk_toggles = OrderedDict()
+        self.bulk_toggles_lock = threading.Lock()
         for bridge in self._mux_bridges():
             bridge_fields = bridge.split('-')
             port_index = int(bridge_fields[-1])
@@ -616,10 +643,99 @@ class Muxes(object):
             mux.set_active_side(new_active_side)
             return mux.status
         else:
-            list(self.thread_pool.map(lambda args: Mux.set_active_side(*args),
-                                      [(mux, new_active_side) for mux in self.muxes.values()]))
+            self.bulk_set_active_side(new_active_side)
             return {mux.bridge: mux.status for mux in self.muxes.values()}
 
+    def bulk_set_active_side(self, new_active_side, port_indexes=None):
+        """Set the active side of multiple muxes in parallel.
+
+        Args:
+            new_active_side (string): One of 'upper_tor', 'lower_tor', 'toggle' or 'random'.
+            port_indexes (list): Indexes of the ports to be set, all the ports if not specified. A port listed more
+                than once is set once.
+
+        Raises:
+            BulkToggleError: If setting any of the muxes failed, after all the muxes have been tried. Its results has
+                the error of the failed ports.
+
+        Returns:
+            dict: Result of every port, key is port index. The completion_time is the time when the flows of the port
+                have been changed.
+        """
+        if port_indexes is None:
+            muxes = list(self.muxes.values())
+        else:
+            muxes = [self._port_to_mux(port_index) for port_index in OrderedDict.fromkeys(port_indexes)]
+
+        def _set_active_side(mux):
+            error = None
+            try:
+                mux.set_active_side(new_active_side)
+            except Exception as e:
+                error = e
+            return mux, time.time(), error
+
+        results = {}
+        errors = []
+        for mux, completion_time, error in self.bulk_thread_pool.map(_set_active_side, muxes):
+            results[mux.port_index] = {
+                'bridge': mux.bridge,
+                'active_side': mux.active_side,
+                'completion_time': completion_time,
+                'error': repr(error) if error is not None else None
+            }
+            if error is not None:
+                errors.append(error)
+        if errors:
+            raise BulkToggleError(errors, results)
+        return results
+
+    def start_bulk_toggle(self, new_active_side, port_indexes=None):
+        """Start setting the active side of multiple muxes in background.
+
+        Returns:
+            dict: The bulk toggle, its result can be queried with get_bulk_toggle by the toggle_id.
+        """
+        toggle = {
+            'toggle_id': uuid.uuid4().hex,
+            'active_side': new_active_side,
+            'port_indexes': port_indexes,
+            'state': 'running',
+            'start_time': time.time(),
+            'end_time': None,
+            'results': None,
+            'err_msg': None
+        }
+        with self.bulk_toggles_lock:
+            self.bulk_toggles[toggle['toggle_id']] = toggle
+            while len(self.bulk_toggles) > Muxes.MAX_BULK_TOGGLES:
+                self.bulk_toggles.popitem(last=False)
+
+        def _bulk_toggle():
+            try:
+                results = self.bulk_set_active_side(new_active_side, port_indexes)
+                state = 'done'
+            except Exception as e:
+                app.logger.error('Bulk toggle {} failed: {}'.format(toggle['toggle_id'], repr(e)))
+                # The ports which were set successfully are in the results too
+                results = getattr(e, 'results', None)
+                toggle['err_msg'] = repr(e)
+                state = 'failed'
+            with self.bulk_toggles_lock:
+                toggle['results'] = results
+                toggle['end_time'] = time.time()
+                toggle['state'] = state
+
+        thread = threading.Thread(target=_bulk_toggle)
+        thread.daemon = True
+        thread.start()
+        return self.get_bulk_toggle(toggle['toggle_id'])
+
+    def get_bulk_toggle(self, toggle_id):
+        with self.bulk_toggles_lock:
+            toggle = self.bulk_toggles.get(toggle_id)
+            return copy.deepcopy(toggle) if toggle is not None else None
+
     def update_flows(self, new_action, out_sides, port_index=None):
         if port_index is not None:
             mux = self._port_to_mux(port_index)
@@ -825,6 +941,53 @@ def mux_cable_flow_update(vm_set, port_index, action):
         return g_muxes.update_flows(action, data['out_sides'], port_index)
 
 
+@app.route('/mux/<vm_set>/bulk_toggle', methods=['POST'])
+def bulk_toggle_handler(vm_set):
+    """Handler for setting the active side of multiple muxes in background.
+
+    Posted json data should be like:
+        {"active_side": "upper_tor|lower_tor|toggle|random", "port_indexes": [<port_index>, ...]}
+    where "port_indexes" is optional, all the ports are set if it is not specified.
+
+    Returns:
+        object: Return the started bulk toggle with HTTP code 202. Its "toggle_id" is used for querying the result
+            by GET /mux/<vm_set>/bulk_toggle/<toggle_id>.
+    """
+    _validate_vm_set(vm_set)
+    data = _validate_posted_data(request)
+    port_indexes = data.get('port_indexes')
+    if port_indexes is not None:
+        # Not isinstance, bool is an int and JSON true/false are not port indexes
+        if not isinstance(port_indexes, list) \
+                or not all(type(port_index) is int and g_muxes.has_mux(port_index) for port_index in port_indexes):
+            abort(400, description='remote_addr={} method={} url={} data={} msg={}'.format(
+                request.remote_addr,
+                request.method,
+                request.url,
+                json.dumps(data),
+                'Expect "port_indexes" to be a list of indexes of existing ports'
+            ))
+    app.logger.info('===== {} POST {} with {} ====='.format(request.remote_addr, request.url, json.dumps(data)))
+    return g_muxes.start_bulk_toggle(data['active_side'], port_indexes), 202
+
+
+@app.route('/mux/<vm_set>/bulk_toggle/<toggle_id>', methods=['GET'])
+def bulk_toggle_result(vm_set, toggle_id):
+    """Handler for querying the result of a bulk toggle.
+
+    Returns:
+        object: The bulk toggle. Its "state" is "running", "done" or "failed". When it is done, "results" has the
+            "completion_time" of every port, which can be used for measuring the switchover time. When it failed,
+            "err_msg" has the number of failed ports and the first error, and "results" has the "error" of every
+            port, None if the port was set.
+    """
+    _validate_vm_set(vm_set)
+    toggle = g_muxes.get_bulk_toggle(toggle_id)
+    if toggle is None:
+        abort(404, 'Unknown bulk toggle "{}"'.format(toggle_id))
+    return toggle
+
+
 @app.route('/mux/<vm_set>/reset', methods=['POST'])
 def reset_flow_handler(vm_set):
     _validate_vm_set(vm_set)
@@ -2,6 +2,7 @@
 
 from contextlib import contextmanager
 import functools
+import csv
 import hashlib
 import json
 import multiprocessing
@@ -33,6 +34,12 @@ except ImportError:
     from ansible.module_utils.dualtor_utils import generate_mux_cable_facts
 
 from ansible.module_utils.debug_utils import config_module_logging
+try:
+    from ansible.module_utils.netlink_utils import NetlinkPlumbing, NetlinkUnavailable
+except ImportError:
+    # Add parent dir for using outside Ansible
+    sys.path.append('..')
+    from ansible.module_utils.netlink_utils import NetlinkPlumbing, NetlinkUnavailable
 
 if sys.version_info.major == 2:
     from multiprocessing.pool import ThreadPool
@@ -92,6 +99,8 @@ Parameters:
     - duts_mgmt_port: duts mgmt port
     - duts_name: duts names
     - fp_mtu: MTU for FP ports
+    - use_netlink: use netlink sockets instead of "ip" commands for the interface operations if pyroute2
+      is installed, default True
 '''
 
 EXAMPLES = '''
@@ -232,6 +241,9 @@ def adaptive_temporary_interface(vm_set_name, interface_name, reserved_space=0):
 
 class VMTopology(object):
 
+    # NetlinkPlumbing for the interface operations, the "ip" commands are used if it is None
+    netlink = None
+
     def __init__(self, vm_names, vm_properties, fp_mtu, max_fp_num, topo, worker, current_vm_name=None,
                  is_dpu=False, is_vs_chassis=False, dut_interfaces=None):
         self.vm_names = vm_names
@@ -638,16 +650,13 @@ class VMTopology(object):
                 vlan_intf_name = "%s.%d" % (BP_PORT_NAME, vlan_id)
 
                 if VMTopology.intf_exists(vlan_intf_name,  pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip addr flush dev %s" % (self.pid, vlan_intf_name))
+                    VMTopology.iface_flush_addr(vlan_intf_name, pid=self.pid)
                 else:
-                    VMTopology.cmd("nsenter -t %s -n ip link add link %s name %s type vlan id %d" %
-                                   (self.pid, BP_PORT_NAME, vlan_intf_name, vlan_id))
+                    VMTopology.add_vlan_iface(vlan_intf_name, BP_PORT_NAME, vlan_id, pid=self.pid)
                 if addr:
-                    VMTopology.cmd(
-                        "nsenter -t %s -n ip address add %s dev %s" % (self.pid, addr, vlan_intf_name))
+                    VMTopology.iface_replace_addr(vlan_intf_name, addr, pid=self.pid)
                 if addr6:
-                    VMTopology.cmd(
-                        "nsenter -t %s -n ip -6 address add %s dev %s" % (self.pid, addr6, vlan_intf_name))
+                    VMTopology.iface_replace_addr(vlan_intf_name, addr6, pid=self.pid)
 
                 VMTopology.iface_up(vlan_intf_name, pid=self.pid)
 
@@ -659,7 +668,7 @@ class VMTopology(object):
             if vlan_id:
                 vlan_intf_name = "%s.%d" % (BP_PORT_NAME, vlan_id)
                 if VMTopology.intf_exists(vlan_intf_name, pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip link del %s" % (self.pid, vlan_intf_name))
+                    VMTopology.del_iface(vlan_intf_name, pid=self.pid)
 
     def add_br_if_to_docker(self, bridge, ext_if, int_if):
         # add unique suffix to int_if to support multiple tasks run concurrently
@@ -668,8 +677,7 @@ class VMTopology(object):
         logging.info('=== For veth pair, add %s to bridge %s, set %s to PTF docker, tmp intf %s' % (
             ext_if, bridge, int_if, tmp_int_if))
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, tmp_int_if))
+            VMTopology.add_veth(ext_if, tmp_int_if)
 
         _, if_to_br = VMTopology.brctl_show(bridge)
         if ext_if not in if_to_br:
@@ -678,8 +686,8 @@ class VMTopology(object):
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(tmp_int_if) and VMTopology.intf_not_exists(tmp_int_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s " % (tmp_int_if, self.pid))
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, tmp_int_if, int_if))
+            VMTopology.iface_move(tmp_int_if, target_pid=self.pid)
+            VMTopology.iface_rename(tmp_int_if, int_if, pid=self.pid)
 
         VMTopology.iface_up(int_if, pid=self.pid)
 
@@ -691,8 +699,7 @@ class VMTopology(object):
         logging.info('=== For veth pair, add %s to bridge %s, set %s to netns, tmp intf %s' % (
             ext_if, bridge, int_if, tmp_int_if))
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, tmp_int_if))
+            VMTopology.add_veth(ext_if, tmp_int_if)
 
         _, if_to_br = VMTopology.brctl_show(bridge)
         if ext_if not in if_to_br:
@@ -701,8 +708,8 @@ class VMTopology(object):
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(tmp_int_if) and VMTopology.intf_not_exists(tmp_int_if, netns=self.netns):
-            VMTopology.cmd("ip link set dev %s netns %s" % (tmp_int_if, self.netns))
-            VMTopology.cmd("ip netns exec %s ip link set dev %s name %s" % (self.netns, tmp_int_if, int_if))
+            VMTopology.iface_move(tmp_int_if, target_netns=self.netns)
+            VMTopology.iface_rename(tmp_int_if, int_if, netns=self.netns)
 
         VMTopology.iface_up(int_if, netns=self.netns)
 
@@ -713,54 +720,38 @@ class VMTopology(object):
             self.pid = api_server_pid
 
         if VMTopology.intf_exists(int_if, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip addr flush dev %s" %
-                           (self.pid, int_if))
-            VMTopology.cmd("nsenter -t %s -n ip addr replace %s dev %s" %
-                           (self.pid, mgmt_ip_addr, int_if))
+            VMTopology.iface_flush_addr(int_if, pid=self.pid)
+            VMTopology.iface_replace_addr(int_if, mgmt_ip_addr, pid=self.pid)
             if extra_mgmt_ip_addr is not None:
                 for ip_addr in extra_mgmt_ip_addr:
                     if ip_addr != "":
-                        VMTopology.cmd("nsenter -t %s -n ip addr replace %s dev %s" %
-                                       (self.pid, ip_addr, int_if))
+                        VMTopology.iface_replace_addr(int_if, ip_addr, pid=self.pid)
             if mgmt_gw:
                 if api_server_pid:
                     VMTopology.cmd(
                         "nsenter -t %s -n ip route del default" % (self.pid))
-                VMTopology.cmd(
-                    "nsenter -t %s -n ip route add default via %s dev %s" % (self.pid, mgmt_gw, int_if))
+                VMTopology.add_default_route(int_if, mgmt_gw, 4, pid=self.pid)
             if mgmt_ipv6_addr:
-                VMTopology.cmd(
-                    "nsenter -t %s -n ip -6 addr flush dev %s" % (self.pid, int_if))
-                VMTopology.cmd("nsenter -t %s -n ip -6 addr replace %s dev %s" %
-                               (self.pid, mgmt_ipv6_addr, int_if))
+                VMTopology.iface_flush_addr(int_if, version=6, pid=self.pid)
+                VMTopology.iface_replace_addr(int_if, mgmt_ipv6_addr, pid=self.pid)
             if mgmt_ipv6_addr and mgmt_gw_v6:
-                VMTopology.cmd(
-                    "nsenter -t %s -n ip -6 route flush default" % (self.pid))
-                VMTopology.cmd(
-                    "nsenter -t %s -n ip -6 route add default via %s dev %s" % (self.pid, mgmt_gw_v6, int_if))
+                VMTopology.flush_default_routes(6, pid=self.pid)
+                VMTopology.add_default_route(int_if, mgmt_gw_v6, 6, pid=self.pid)
 
     def add_ip_to_netns_if(self, int_if, ip_addr, ipv6_addr=None, default_gw=None, default_gw_v6=None):
         """Add ip address to netns interface."""
         if VMTopology.intf_exists(int_if, netns=self.netns):
-            VMTopology.cmd("ip netns exec %s ip addr flush dev %s" %
-                           (self.netns, int_if))
-            VMTopology.cmd("ip netns exec %s ip addr add %s dev %s" %
-                           (self.netns, ip_addr, int_if))
+            VMTopology.iface_flush_addr(int_if, netns=self.netns)
+            VMTopology.iface_replace_addr(int_if, ip_addr, netns=self.netns)
             if default_gw:
-                VMTopology.cmd(
-                    "ip netns exec %s ip route flush default" % (self.netns))
-                VMTopology.cmd("ip netns exec %s ip route add default via %s dev %s" % (
-                    self.netns, default_gw, int_if))
+                VMTopology.flush_default_routes(4, netns=self.netns)
+                VMTopology.add_default_route(int_if, default_gw, 4, netns=self.netns)
             if ipv6_addr:
-                VMTopology.cmd(
-                    "ip netns exec %s ip -6 addr flush dev %s" % (self.netns, int_if))
-                VMTopology.cmd("ip netns exec %s ip -6 addr replace %s dev %s" %
-                               (self.netns, ipv6_addr, int_if))
+                VMTopology.iface_flush_addr(int_if, version=6, netns=self.netns)
+                VMTopology.iface_replace_addr(int_if, ipv6_addr, netns=self.netns)
                 if default_gw_v6:
-                    VMTopology.cmd(
-                        "ip netns exec %s ip -6 route flush default" % (self.netns))
-                    VMTopology.cmd("ip netns exec %s ip -6 route add default via %s dev %s" %
-                                   (self.netns, default_gw_v6, int_if))
+                    VMTopology.flush_default_routes(6, netns=self.netns)
+                    VMTopology.add_default_route(int_if, default_gw_v6, 6, netns=self.netns)
 
     def add_dut_if_to_docker(self, iface_name, dut_iface):
         logging.info("=== Add DUT interface %s to PTF docker as %s ===" %
@@ -768,10 +759,10 @@ class VMTopology(object):
         if VMTopology.intf_exists(dut_iface) \
                 and VMTopology.intf_not_exists(dut_iface, pid=self.pid) \
                 and VMTopology.intf_not_exists(iface_name, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" % (dut_iface, self.pid))
+            VMTopology.iface_move(dut_iface, target_pid=self.pid)
 
         if VMTopology.intf_exists(dut_iface, pid=self.pid) and VMTopology.intf_not_exists(iface_name, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, dut_iface, iface_name))
+            VMTopology.iface_rename(dut_iface, iface_name, pid=self.pid)
 
         VMTopology.iface_up(iface_name, pid=self.pid)
 
@@ -780,10 +771,8 @@ class VMTopology(object):
         if VMTopology.intf_not_exists(iface_name, pid=self.pid):
             raise ValueError("Interface %s not present in docker" % iface_name)
         vlan_sub_iface_name = iface_name + vlan_separator + vlan_id
-        VMTopology.cmd("nsenter -t %s -n ip link add link %s name %s type vlan id %s" %
-                       (self.pid, iface_name, vlan_sub_iface_name, vlan_id))
-        VMTopology.cmd("nsenter -t %s -n ip link set %s up" %
-                       (self.pid, vlan_sub_iface_name))
+        VMTopology.add_vlan_iface(vlan_sub_iface_name, iface_name, vlan_id, pid=self.pid)
+        VMTopology.iface_up(vlan_sub_iface_name, pid=self.pid)
 
     def remove_dut_if_from_docker(self, iface_name, dut_iface):
         logging.info("=== Restore docker interface %s as dut interface %s ===" % (iface_name, dut_iface))
@@ -794,12 +783,10 @@ class VMTopology(object):
             VMTopology.iface_down(iface_name, pid=self.pid)
 
             if VMTopology.intf_not_exists(dut_iface, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                               (self.pid, iface_name, dut_iface))
+                VMTopology.iface_rename(iface_name, dut_iface, pid=self.pid)
 
         if VMTopology.intf_not_exists(dut_iface) and VMTopology.intf_exists(dut_iface, pid=self.pid):
-            VMTopology.cmd(
-                "nsenter -t %s -n ip link set dev %s netns 1" % (self.pid, dut_iface))
+            VMTopology.iface_move(dut_iface, target_pid=1, pid=self.pid)
 
     def remove_dut_vlan_subif_from_docker(self, iface_name, vlan_separator, vlan_id):
         """Remove the vlan sub interface created for the ptf interface."""
@@ -809,8 +796,7 @@ class VMTopology(object):
         vlan_sub_iface_name = iface_name + vlan_separator + vlan_id
         if VMTopology.intf_exists(vlan_sub_iface_name, pid=self.pid):
             VMTopology.iface_down(vlan_sub_iface_name, pid=self.pid)
-            VMTopology.cmd("nsenter -t %s -n ip link del %s" %
-                           (self.pid, vlan_sub_iface_name))
+            VMTopology.del_iface(vlan_sub_iface_name, pid=self.pid)
 
     def add_veth_if_to_docker(self, ext_if, int_if, create_vlan_subintf=False, **kwargs):
         """Create vethernet devices (ext_if, int_if) and put int_if into the ptf docker."""
@@ -833,59 +819,48 @@ class VMTopology(object):
             t_int_sub_if = t_int_if + vlan_subintf_sep + vlan_subintf_vlan_id
 
         if VMTopology.intf_exists(t_int_if):
-            VMTopology.cmd("ip link del dev %s" % t_int_if)
+            VMTopology.del_iface(t_int_if)
 
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, t_int_if))
+            VMTopology.add_veth(ext_if, t_int_if)
             if create_vlan_subintf:
                 VMTopology.cmd("vconfig add %s %s" %
                                (t_int_if, vlan_subintf_vlan_id))
 
         if self.fp_mtu != DEFAULT_MTU:
-            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu))
+            VMTopology.iface_set_mtu(ext_if, self.fp_mtu)
             if VMTopology.intf_exists(t_int_if):
-                VMTopology.cmd("ip link set dev %s mtu %d" %
-                               (t_int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(t_int_if, self.fp_mtu)
             elif VMTopology.intf_exists(t_int_if, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                               (self.pid, t_int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(t_int_if, self.fp_mtu, pid=self.pid)
             elif VMTopology.intf_exists(int_if, pid=self.pid):
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                               (self.pid, int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(int_if, self.fp_mtu, pid=self.pid)
             if create_vlan_subintf:
                 if VMTopology.intf_exists(t_int_sub_if):
-                    VMTopology.cmd("ip link set dev %s mtu %d" %
-                                   (t_int_sub_if, self.fp_mtu))
+                    VMTopology.iface_set_mtu(t_int_sub_if, self.fp_mtu)
                 elif VMTopology.intf_exists(t_int_sub_if, pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                                   (self.pid, t_int_sub_if, self.fp_mtu))
+                    VMTopology.iface_set_mtu(t_int_sub_if, self.fp_mtu, pid=self.pid)
                 elif VMTopology.intf_exists(int_sub_if, pid=self.pid):
-                    VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" %
-                                   (self.pid, int_sub_if, self.fp_mtu))
+                    VMTopology.iface_set_mtu(int_sub_if, self.fp_mtu, pid=self.pid)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(t_int_if) \
                 and VMTopology.intf_not_exists(t_int_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_if, self.pid))
+            VMTopology.iface_move(t_int_if, target_pid=self.pid)
         if create_vlan_subintf \
                 and VMTopology.intf_exists(t_int_sub_if) \
                 and VMTopology.intf_not_exists(t_int_sub_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_sub_if, pid=self.pid):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_sub_if, self.pid))
+            VMTopology.iface_move(t_int_sub_if, target_pid=self.pid)
 
         if VMTopology.intf_exists(t_int_if, pid=self.pid) and VMTopology.intf_not_exists(int_if, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                           (self.pid, t_int_if, int_if))
+            VMTopology.iface_rename(t_int_if, int_if, pid=self.pid)
         if create_vlan_subintf \
                 and VMTopology.intf_exists(t_int_sub_if, pid=self.pid) \
                 and VMTopology.intf_not_exists(int_sub_if, pid=self.pid):
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" %
-                           (self.pid, t_int_sub_if, int_sub_if))
+            VMTopology.iface_rename(t_int_sub_if, int_sub_if, pid=self.pid)
 
         VMTopology.iface_up(int_if, pid=self.pid)
         if create_vlan_subintf:
@@ -899,35 +874,29 @@ class VMTopology(object):
         t_int_if = adaptive_temporary_interface(self.vm_set_name, int_if)
 
         if VMTopology.intf_exists(t_int_if):
-            VMTopology.cmd("ip link del dev %s" % t_int_if)
+            VMTopology.del_iface(t_int_if)
 
         if VMTopology.intf_not_exists(ext_if):
-            VMTopology.cmd("ip link add %s type veth peer name %s" %
-                           (ext_if, t_int_if))
+            VMTopology.add_veth(ext_if, t_int_if)
 
         if self.fp_mtu != DEFAULT_MTU:
-            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu))
+            VMTopology.iface_set_mtu(ext_if, self.fp_mtu)
             if VMTopology.intf_exists(t_int_if):
-                VMTopology.cmd("ip link set dev %s mtu %d" %
-                               (t_int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(t_int_if, self.fp_mtu)
             elif VMTopology.intf_exists(t_int_if, netns=self.netns):
-                VMTopology.cmd("ip netns exec %s ip link set dev %s mtu %d" % (
-                    self.netns, t_int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(t_int_if, self.fp_mtu, netns=self.netns)
             elif VMTopology.intf_exists(int_if, netns=self.netns):
-                VMTopology.cmd("ip netns exec %s ip link set dev %s mtu %d" % (
-                    self.netns, int_if, self.fp_mtu))
+                VMTopology.iface_set_mtu(int_if, self.fp_mtu, netns=self.netns)
 
         VMTopology.iface_up(ext_if)
 
         if VMTopology.intf_exists(t_int_if) \
                 and VMTopology.intf_not_exists(t_int_if, netns=self.netns) \
                 and VMTopology.intf_not_exists(int_if, netns=self.netns):
-            VMTopology.cmd("ip link set dev %s netns %s" %
-                           (t_int_if, self.netns))
+            VMTopology.iface_move(t_int_if, target_netns=self.netns)
 
         if VMTopology.intf_exists(t_int_if, netns=self.netns) and VMTopology.intf_not_exists(int_if, netns=self.netns):
-            VMTopology.cmd("ip netns exec %s ip link set dev %s name %s" % (
-                self.netns, t_int_if, int_if))
+            VMTopology.iface_rename(t_int_if, int_if, netns=self.netns)
 
         VMTopology.iface_up(int_if, netns=self.netns)
 
@@ -985,12 +954,10 @@ class VMTopology(object):
         bindings = VMTopology.get_ovs_port_bindings(br_name)
         vlan1_iface_id = bindings[vlan1_iface]
         vlan2_iface_id = bindings[vlan2_iface]
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
-        VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                       (br_name, vlan1_iface_id, vlan2_iface_id))
-        VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                       (br_name, vlan2_iface_id, vlan1_iface_id))
+        VMTopology.replace_ovs_flows(br_name, [
+            "table=0,in_port=%s,action=output:%s" % (vlan1_iface_id, vlan2_iface_id),
+            "table=0,in_port=%s,action=output:%s" % (vlan2_iface_id, vlan1_iface_id),
+        ])
 
     def bind_fp_ports(self, disconnect_vm=False):
         """
@@ -1024,9 +991,7 @@ class VMTopology(object):
                     (br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
                      injected_iface, vm_iface, disconnect_vm)
                 )
-        with VMTopologyWorker.safe_subprocess_manager() as [processes, tmpdir]:
-            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes,
-                                                             tmpdir=tmpdir), bind_ovs_ports_args)
+        self.bind_ovs_ports_flows(bind_ovs_ports_args)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Create VM links for {} : {}".format(k, attr))
@@ -1061,9 +1026,22 @@ class VMTopology(object):
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
                 bind_ovs_links_args.append((br_name, port1, injected_iface, port2, disconnect_vm))
 
+        # The vlans of an OVS link share the bridge, their flows are applied to the bridge together
+        self.bind_ovs_ports_flows(bind_ovs_links_args)
+
+    def bind_ovs_ports_flows(self, bind_ovs_ports_args):
+        """Bind the ports of the ovs bridges and replace the flows of every bridge at once."""
+        port_bridges = VMTopology.get_ovs_port_bridges()
+        all_flows = self.worker.map(lambda args: self.bind_ovs_ports(*args, port_bridges=port_bridges),
+                                    bind_ovs_ports_args)
+
+        bridge_flows = {}
+        for args, flows in zip(bind_ovs_ports_args, all_flows):
+            bridge_flows.setdefault(args[0], []).extend(flows)
+
         with VMTopologyWorker.safe_subprocess_manager() as [processes, tmpdir]:
-            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes, tmpdir=tmpdir),
-                            bind_ovs_links_args)
+            for br_name, flows in bridge_flows.items():
+                VMTopology.replace_ovs_flows(br_name, flows, processes=processes, tmpdir=tmpdir)
 
     def unbind_fp_ports(self):
         logging.info("=== unbind front panel ports ===")
@@ -1077,7 +1055,7 @@ class VMTopology(object):
                 unbind_ovs_ports_args.append((br_name, vm_iface))
 
         with VMTopologyWorker.safe_subprocess_manager() as [processes, _]:
-            self.worker.map(lambda args: self.unbind_ovs_ports(*args, processes=processes), unbind_ovs_ports_args)
+            self.unbind_ovs_ports(unbind_ovs_ports_args, processes=processes)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Remove VM links for {} : {}".format(k, attr))
@@ -1119,7 +1097,7 @@ class VMTopology(object):
                 unbind_ovs_links_args.append((br_name, injected_iface))
 
         with VMTopologyWorker.safe_subprocess_manager() as [processes, _]:
-            self.worker.map(lambda args: self.unbind_ovs_ports(*args, processes=processes), unbind_ovs_links_args)
+            self.unbind_ovs_ports(unbind_ovs_links_args, processes=processes)
 
     def unbind_vm_link(self, br_name, port1, port2):
         _, if_to_br = VMTopology.brctl_show()
@@ -1219,7 +1197,7 @@ class VMTopology(object):
                 if port in br_ports:
                     VMTopology.cmd('ovs-vsctl --if-exists del-port {} {}'.format(br_name, port))
 
-    def bind_ovs_ports(self, br_name, dut_iface, injected_iface, vm_iface, disconnect_vm=False, **kwargs):
+    def bind_ovs_ports(self, br_name, dut_iface, injected_iface, vm_iface, disconnect_vm=False, port_bridges=None):
         """
         bind dut/injected/vm ports under an ovs bridge as follows
 
@@ -1228,108 +1206,81 @@ class VMTopology(object):
             PTF (injected_iface) --+ OVS bridge (br_name) |
                                    |                      +---- vm_iface
                                    +----------------------+
-        """
-        br = VMTopology.get_ovs_bridge_by_port(injected_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, injected_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(dut_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, dut_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(vm_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, vm_iface))
-
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' %
-                           (br_name, injected_iface))
-
-        if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, dut_iface))
 
-        if vm_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, vm_iface))
+        The flows of the bridge are returned instead of being installed, so the flows of all the
+        bindings of a bridge can be applied together with replace_ovs_flows.
+        """
+        VMTopology.add_ovs_ports(br_name, [injected_iface, dut_iface, vm_iface], port_bridges)
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
         dut_iface_id = bindings[dut_iface]
         injected_iface_id = bindings[injected_iface]
         vm_iface_id = bindings[vm_iface]
 
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
-
+        flows = []
         if disconnect_vm:
             # Drop packets from VM
-            VMTopology.cmd(
-                "ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
+            flows.append("table=0,in_port=%s,action=drop" % vm_iface_id)
         else:
             # Add flow from a VM to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, vm_iface_id, dut_iface_id))
+            flows.append("table=0,in_port=%s,action=output:%s" % (vm_iface_id, dut_iface_id))
 
         if disconnect_vm:
             # Add flow from external iface to ptf container
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
+            flows.append("table=0,in_port=%s,action=output:%s" % (dut_iface_id, injected_iface_id))
         else:
-            all_cmds = []
-            bind_helper = lambda cmd: \
-                all_cmds.append(cmd.split()[-1])  # noqa: E731
-
             # Add flow from external iface to a VM and a ptf container
             # Allow BGP, IPinIP, fragmented packets, ICMP, SNMP packets and layer2 packets from DUT to neighbors
             # Block other traffic from DUT to EOS for EOS's stability,
             # Allow all traffic from DUT to PTF.
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_src=179,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_dst=179,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_dst=22,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp,in_port=%s,tp_src=22,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_src=179,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_dst=179,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_dst=22,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,tcp6,in_port=%s,tp_src=22,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,ip,in_port=%s,nw_proto=4,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,ip,in_port=%s,nw_frag=yes,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,ipv6,in_port=%s,nw_frag=yes,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,icmp,in_port=%s,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,icmp6,in_port=%s,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,udp,in_port=%s,udp_src=161,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,udp,in_port=%s,udp_src=53,action=output:%s" %
-                        (br_name, dut_iface_id, vm_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=8,udp6,in_port=%s,udp_src=161,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=6,udp6,in_port=%s,udp_dst=4784,action=output:%s" %
-                        (br_name, dut_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp,in_port=%s,tp_src=179,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp,in_port=%s,tp_dst=179,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp,in_port=%s,tp_dst=22,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp,in_port=%s,tp_src=22,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp6,in_port=%s,tp_src=179,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp6,in_port=%s,tp_dst=179,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp6,in_port=%s,tp_dst=22,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,tcp6,in_port=%s,tp_src=22,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,ip,in_port=%s,nw_proto=4,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,ip,in_port=%s,nw_frag=yes,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,ipv6,in_port=%s,nw_frag=yes,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,icmp,in_port=%s,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,icmp6,in_port=%s,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,udp,in_port=%s,udp_src=161,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=8,udp,in_port=%s,udp_src=53,action=output:%s" %
+                         (dut_iface_id, vm_iface_id))
+            flows.append("table=0,priority=8,udp6,in_port=%s,udp_src=161,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=6,udp6,in_port=%s,udp_dst=4784,action=output:%s" %
+                         (dut_iface_id, injected_iface_id))
             if self._is_smartswitch_ha:
-                bind_helper("ovs-ofctl add-flow %s table=0,priority=5,ip,in_port=%s,action=output:%s,%s" %
-                            (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
+                flows.append("table=0,priority=5,ip,in_port=%s,action=output:%s,%s" %
+                             (dut_iface_id, vm_iface_id, injected_iface_id))
             else:
-                bind_helper("ovs-ofctl add-flow %s table=0,priority=5,ip,in_port=%s,action=output:%s" %
-                            (br_name, dut_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=5,ipv6,in_port=%s,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=3,in_port=%s,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,ip,in_port=%s,nw_proto=89,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,ipv6,in_port=%s,nw_proto=89,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
+                flows.append("table=0,priority=5,ip,in_port=%s,action=output:%s" %
+                             (dut_iface_id, injected_iface_id))
+            flows.append("table=0,priority=5,ipv6,in_port=%s,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=3,in_port=%s,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,ip,in_port=%s,nw_proto=89,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,ipv6,in_port=%s,nw_proto=89,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
             # added ovs rules for HA
             # cp_data_channel_port: 11362, dp_channel_dst_port: 11364
             # swbus_port: 23606-23613 (one per DPU)
@@ -1337,58 +1288,56 @@ class VMTopology(object):
             for ha_port in [11362, 11364, 11367, 11368,
                             23606, 23607, 23608, 23609, 23610, 23611, 23612, 23613]:
                 for proto in ['tcp', 'udp', 'tcp6', 'udp6']:
-                    bind_helper("ovs-ofctl add-flow %s table=0,priority=10,%s,in_port=%s,tp_dst=%d,action=output:%s,%s" %  # noqa: E501
-                                (br_name, proto, dut_iface_id, ha_port, vm_iface_id, injected_iface_id))
-                    bind_helper("ovs-ofctl add-flow %s table=0,priority=10,%s,in_port=%s,tp_src=%d,action=output:%s,%s" %  # noqa: E501
-                                (br_name, proto, dut_iface_id, ha_port, vm_iface_id, injected_iface_id))
-                    bind_helper("ovs-ofctl add-flow %s table=0,priority=10,%s,in_port=%s,tp_dst=%d,action=output:%s" %
-                                (br_name, proto, vm_iface_id, ha_port, dut_iface_id))
-                    bind_helper("ovs-ofctl add-flow %s table=0,priority=10,%s,in_port=%s,tp_src=%d,action=output:%s" %
-                                (br_name, proto, vm_iface_id, ha_port, dut_iface_id))
+                    flows.append("table=0,priority=10,%s,in_port=%s,tp_dst=%d,action=output:%s,%s" %  # noqa: E501
+                                 (proto, dut_iface_id, ha_port, vm_iface_id, injected_iface_id))
+                    flows.append("table=0,priority=10,%s,in_port=%s,tp_src=%d,action=output:%s,%s" %  # noqa: E501
+                                 (proto, dut_iface_id, ha_port, vm_iface_id, injected_iface_id))
+                    flows.append("table=0,priority=10,%s,in_port=%s,tp_dst=%d,action=output:%s" %
+                                 (proto, vm_iface_id, ha_port, dut_iface_id))
+                    flows.append("table=0,priority=10,%s,in_port=%s,tp_src=%d,action=output:%s" %
+                                 (proto, vm_iface_id, ha_port, dut_iface_id))
         # Add flow for BFD Control packets (UDP port 3784)
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,udp,in_port=%s,"
-                        "udp_dst=3784,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,udp6,in_port=%s,"
-                        "udp_dst=3784,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,udp,in_port=%s,"
+                         "udp_dst=3784,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,udp6,in_port=%s,"
+                         "udp_dst=3784,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
             # Add flow for BFD Control packets (UDP port 3784)
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,udp,in_port=%s,"
-                        "udp_src=49152,udp_dst=3784,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
-            bind_helper("ovs-ofctl add-flow %s table=0,priority=10,udp6,in_port=%s,"
-                        "udp_src=49152,udp_dst=3784,action=output:%s,%s" %
-                        (br_name, dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,udp,in_port=%s,"
+                         "udp_src=49152,udp_dst=3784,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
+            flows.append("table=0,priority=10,udp6,in_port=%s,"
+                         "udp_src=49152,udp_dst=3784,action=output:%s,%s" %
+                         (dut_iface_id, vm_iface_id, injected_iface_id))
 
         # Add flow from a ptf container to an external iface
-            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                        (br_name, injected_iface_id, dut_iface_id))
+            flows.append("table=0,in_port=%s,action=output:%s" %
+                         (injected_iface_id, dut_iface_id))
 
-            if all_cmds:
-                processes = kwargs.get("processes")
-                tmpdir = kwargs.get("tmpdir")
-                with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
-                    for rule in all_cmds:
-                        f.write(rule.strip("'") + "\n")
+        return flows
 
-                processes.append(VMTopology.fire_and_forget("ovs-ofctl add-flows {} {}".format(br_name, f.name)))
+    def unbind_ovs_ports(self, unbind_ovs_ports_args, **kwargs):
+        """unbind all ports except the vm port from the ovs bridges
 
-    def unbind_ovs_ports(self, br_name, vm_port, **kwargs):
-        """unbind all ports except the vm port from an ovs bridge"""
-        if VMTopology.intf_exists(br_name):
-            ports = VMTopology.get_ovs_br_ports(br_name)
-            all_cmds = []
-            bind_helper = lambda cmd: \
-                all_cmds.append(cmd[len("ovs-vsctl "):])  # noqa: E731
+        Args:
+            unbind_ovs_ports_args (list): (bridge name, vm port) pairs, a port of a bridge is kept if
+                it is the vm port of every pair of the bridge.
+        """
+        kept_ports = {}
+        for br_name, vm_port in unbind_ovs_ports_args:
+            kept_ports[br_name] = kept_ports.get(br_name, {vm_port}) & {vm_port}
 
-            for port in ports:
-                if port != vm_port:
-                    bind_helper('ovs-vsctl --if-exists del-port %s %s' % (br_name, port))
+        port_bridges = VMTopology.get_ovs_port_bridges()
+        all_cmds = []
+        for port, br_name in sorted(port_bridges.items()):
+            if br_name in kept_ports and port not in kept_ports[br_name]:
+                all_cmds.append('--if-exists del-port %s %s' % (br_name, port))
 
-            if all_cmds:
-                processes = kwargs.get("processes")
-                batch_cmd = 'ovs-vsctl -- %s' % (' -- '.join(all_cmds))
-                processes.append(VMTopology.fire_and_forget(batch_cmd))
+        if all_cmds:
+            processes = kwargs.get("processes")
+            batch_cmd = 'ovs-vsctl -- %s' % (' -- '.join(all_cmds))
+            processes.append(VMTopology.fire_and_forget(batch_cmd))
 
     def unbind_ovs_port(self, br_name, port):
         """unbind a port from an ovs bridge"""
@@ -1423,18 +1372,10 @@ class VMTopology(object):
 
         self.create_ovs_bridge(br_name, self.fp_mtu)
 
-        for intf in [host_if, upper_if, lower_if]:
-            br = VMTopology.get_ovs_bridge_by_port(intf)
-            if br is not None and br != br_name:
-                VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, intf))
-
-        ports = VMTopology.get_ovs_br_ports(br_name)
         ports_to_be_attached = [host_if, upper_if, lower_if]
         if nic_if is not None:
             ports_to_be_attached.append(nic_if)
-        for intf in ports_to_be_attached:
-            if intf not in ports:
-                VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, intf))
+        VMTopology.add_ovs_ports(br_name, ports_to_be_attached)
 
         bridge_ports = [upper_if, lower_if]
         if nic_if is not None:
@@ -1444,22 +1385,18 @@ class VMTopology(object):
         upper_if_id = bindings[upper_if]
         lower_if_id = bindings[lower_if]
 
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
-
+        flows = []
         if nic_if is not None:
             # TODO: open-flow configuration for ovs-bridge simulating server smart NIC
             pass
         else:
             # open-flow configuration for ovs-bridge simulating mux of dualtor y-cable
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s,%s" %
-                           (br_name, host_if_id, upper_if_id, lower_if_id))
+            flows.append("table=0,in_port=%s,action=output:%s,%s" % (host_if_id, upper_if_id, lower_if_id))
             if active_if_index == 0:
-                VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                               (br_name, upper_if_id, host_if_id))
+                flows.append("table=0,in_port=%s,action=output:%s" % (upper_if_id, host_if_id))
             else:
-                VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                               (br_name, lower_if_id, host_if_id))
+                flows.append("table=0,in_port=%s,action=output:%s" % (lower_if_id, host_if_id))
+        VMTopology.replace_ovs_flows(br_name, flows)
 
     def remove_dualtor_cable(self, host_ifindex, is_active_active=False):
         """
@@ -1662,13 +1599,13 @@ class VMTopology(object):
         if self.pid is not None and VMTopology.intf_exists(int_if, pid=self.pid):
             # Name it back to temp name in PTF container to avoid potential conflicts
             VMTopology.iface_down(int_if, pid=self.pid)
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, int_if, tmp_name))
+            VMTopology.iface_rename(int_if, tmp_name, pid=self.pid)
             # Set it to default namespace
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s netns 1" % (self.pid, tmp_name))
+            VMTopology.iface_move(tmp_name, target_pid=1, pid=self.pid)
 
         # Delete its peer in default namespace
         if VMTopology.intf_exists(ext_if):
-            VMTopology.cmd("ip link delete dev %s" % ext_if)
+            VMTopology.del_iface(ext_if)
 
     def remove_ptf_mgmt_port(self):
         ext_if = PTF_MGMT_IF_TEMPLATE % self.vm_set_name
@@ -1735,6 +1672,11 @@ class VMTopology(object):
         Returns:
             bool: True if the interface exists. Otherwise False.
         """
+        try:
+            return VMTopology._netlink_request('link_exists', intf, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1762,6 +1704,11 @@ class VMTopology(object):
         Returns:
             bool: True if the interface does not exist. Otherwise False.
         """
+        try:
+            return not VMTopology._netlink_request('link_exists', intf, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
         cmdline = VMTopology._intf_cmd(intf, pid=pid, netns=netns)
 
         try:
@@ -1780,12 +1727,143 @@ class VMTopology(object):
 
     @staticmethod
     def iface_updown(iface_name, state, pid, netns):
+        try:
+            return VMTopology._netlink_request('set_link', iface_name, pid=pid, netns=netns, state=state)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link set %s %s' % (iface_name, state), pid=pid, netns=netns))
+
+    @staticmethod
+    def _netlink_request(method, *args, **kwargs):
+        """Run a NetlinkPlumbing request.
+
+        Raises:
+            NetlinkUnavailable: If netlink is not used or not usable in the namespace, the caller should run the
+                "ip" command instead.
+        """
+        if VMTopology.netlink is None:
+            raise NetlinkUnavailable("Netlink is not used")
+        return getattr(VMTopology.netlink, method)(*args, **kwargs)
+
+    @staticmethod
+    def _ip_cmd(args, pid=None, netns=None):
+        """Get the "ip" command line running in the namespace of the pid or the netns, or on the host."""
         if pid is not None:
-            return VMTopology.cmd('nsenter -t %s -n ip link set %s %s' % (pid, iface_name, state))
+            return 'nsenter -t %s -n ip %s' % (pid, args)
         elif netns is not None:
-            return VMTopology.cmd('ip netns exec %s ip link set %s %s' % (netns, iface_name, state))
+            return 'ip netns exec %s ip %s' % (netns, args)
+        else:
+            return 'ip %s' % args
+
+    @staticmethod
+    def add_veth(iface_name, peer_name):
+        try:
+            return VMTopology._netlink_request('add_veth', iface_name, peer_name)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd('ip link add %s type veth peer name %s' % (iface_name, peer_name))
+
+    @staticmethod
+    def add_vlan_iface(iface_name, link, vlan_id, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('add_vlan', iface_name, link, vlan_id, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link add link %s name %s type vlan id %s' %
+                                                 (link, iface_name, vlan_id), pid=pid, netns=netns))
+
+    @staticmethod
+    def del_iface(iface_name, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('del_link', iface_name, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link del dev %s' % iface_name, pid=pid, netns=netns))
+
+    @staticmethod
+    def iface_set_mtu(iface_name, mtu, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('set_link', iface_name, pid=pid, netns=netns, mtu=mtu)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link set dev %s mtu %d' % (iface_name, mtu), pid=pid, netns=netns))
+
+    @staticmethod
+    def iface_rename(iface_name, new_name, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('set_link', iface_name, pid=pid, netns=netns, new_name=new_name)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link set dev %s name %s' % (iface_name, new_name),
+                                                 pid=pid, netns=netns))
+
+    @staticmethod
+    def iface_move(iface_name, target_pid=None, target_netns=None, pid=None):
+        """Move the interface to the namespace of target_pid or to target_netns.
+
+        Args:
+            iface_name (str): Name of the interface.
+            target_pid (str): Pid of the process in the target namespace, 1 for the host.
+            target_netns (str): Name of the target namespace.
+            pid (str): Pid of the process in the namespace of the interface, the interface is on the host if None.
+        """
+        if target_pid is not None:
+            attrs = {'net_ns_pid': int(target_pid)}
+            target = target_pid
         else:
-            return VMTopology.cmd('ip link set %s %s' % (iface_name, state))
+            attrs = {'net_ns_fd': target_netns}
+            target = target_netns
+        try:
+            return VMTopology._netlink_request('set_link', iface_name, pid=pid, **attrs)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('link set dev %s netns %s' % (iface_name, target), pid=pid))
+
+    @staticmethod
+    def iface_flush_addr(iface_name, version=None, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('flush_addr', iface_name, version=version, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        option = '' if version is None else '-%d ' % version
+        return VMTopology.cmd(VMTopology._ip_cmd('%saddr flush dev %s' % (option, iface_name), pid=pid, netns=netns))
+
+    @staticmethod
+    def iface_replace_addr(iface_name, addr, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('replace_addr', iface_name, addr, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('addr replace %s dev %s' % (addr, iface_name), pid=pid, netns=netns))
+
+    @staticmethod
+    def flush_default_routes(version, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('flush_default_routes', version, pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('-%d route flush default' % version, pid=pid, netns=netns))
+
+    @staticmethod
+    def add_default_route(iface_name, gateway, version, pid=None, netns=None):
+        try:
+            return VMTopology._netlink_request('add_default_route', iface_name, gateway, version,
+                                               pid=pid, netns=netns)
+        except NetlinkUnavailable:
+            pass
+
+        return VMTopology.cmd(VMTopology._ip_cmd('-%d route add default via %s dev %s' %
+                                                 (version, gateway, iface_name), pid=pid, netns=netns))
 
     @staticmethod
     def iface_disable_txoff(iface_name, pid=None):
@@ -1904,6 +1982,82 @@ class VMTopology(object):
         bridge = out.rstrip()
         return bridge
 
+    @staticmethod
+    def get_ovs_port_bridges():
+        """Get the bridges of all the ovs ports with two queries, the bridge local ports are excluded."""
+        out = VMTopology.cmd('ovs-vsctl --format=csv --data=bare --no-headings --columns=_uuid,name list Port')
+        port_names = {}
+        for row in csv.reader(out.splitlines()):
+            if len(row) == 2:
+                port_names[row[0]] = row[1]
+
+        out = VMTopology.cmd('ovs-vsctl --format=csv --data=bare --no-headings --columns=name,ports list Bridge')
+        port_bridges = {}
+        for row in csv.reader(out.splitlines()):
+            if len(row) != 2:
+                continue
+            bridge = row[0]
+            for port_uuid in row[1].split():
+                port = port_names.get(port_uuid)
+                if port is not None and port != bridge:
+                    port_bridges[port] = bridge
+        return port_bridges
+
+    @staticmethod
+    def add_ovs_ports(bridge, ports, port_bridges=None):
+        """Move the ports to the ovs bridge in one ovs-vsctl transaction.
+
+        Args:
+            bridge (str): The bridge name.
+            ports (list): The ports to be attached to the bridge.
+            port_bridges (dict): Optional snapshot of port => bridge from get_ovs_port_bridges,
+                the bridge of every port is queried if it is not supplied.
+        """
+        all_cmds = []
+        for port in ports:
+            if port_bridges is None:
+                br = VMTopology.get_ovs_bridge_by_port(port)
+            else:
+                br = port_bridges.get(port)
+            if br == bridge:
+                continue
+            if br is not None:
+                all_cmds.append('--if-exists del-port %s %s' % (br, port))
+            all_cmds.append('--may-exist add-port %s %s' % (bridge, port))
+
+        if all_cmds:
+            VMTopology.cmd('ovs-vsctl -- %s' % (' -- '.join(all_cmds)))
+
+    @staticmethod
+    def replace_ovs_flows(bridge, flows, processes=None, tmpdir=None):
+        """Replace all the flows of the ovs bridge with the flows.
+
+        ovs-ofctl replace-flows only sends the differences between the flows and the flows of the
+        bridge, in one OpenFlow bundle so the flows are changed atomically. Bundles need OpenFlow 1.4,
+        plain replace-flows is used if the bridge doesn't support it.
+
+        Args:
+            bridge (str): The bridge name.
+            flows (list): Flows without the 'ovs-ofctl add-flow <bridge>' prefix.
+            processes (list): If supplied, the command is started in the background and appended to it.
+            tmpdir (str): Directory of the flows file, the file is removed with the directory if
+                processes is supplied.
+        """
+        with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
+            for flow in flows:
+                f.write(flow + "\n")
+
+        cmdline = "sh -c 'ovs-ofctl --bundle replace-flows {0} {1} || ovs-ofctl replace-flows {0} {1}'".format(
+            bridge, f.name)
+        if processes is not None:
+            processes.append(VMTopology.fire_and_forget(cmdline))
+            return
+
+        try:
+            VMTopology.cmd(cmdline)
+        finally:
+            os.remove(f.name)
+
     @staticmethod
     def get_ovs_port_bindings(bridge, vlan_iface=[]):
         # Vlan interface addition may take few secs to reflect in OVS Command,
@@ -2221,7 +2375,7 @@ class VMTopologyWorker(object):
                 logging.debug("Start task %s, arguments (%s, %s), worker %s",
                               func, args, kwargs, threading.current_thread().ident)
             try:
-                func(*args, **kwargs)
+                return func(*args, **kwargs)
             finally:
                 if self.use_thread_worker:
                     logging.debug("Finish task %s, arguments (%s, %s), worker %s",
@@ -2329,6 +2483,7 @@ def main():
             is_dpu=(dict(required=False, type='bool', default=False)),
             is_vs_chassis=(dict(required=False, type='bool', default=False)),
             use_thread_worker=dict(required=False, type='bool', default=True),
+            use_netlink=dict(required=False, type='bool', default=True),
             thread_worker_count=dict(required=False, type='int',
                                      default=max(MIN_THREAD_WORKER_COUNT,
                                                  multiprocessing.cpu_count() // 8)),
@@ -2350,9 +2505,14 @@ def main():
     dut_interfaces = module.params['dut_interfaces']
     use_thread_worker = module.params['use_thread_worker']
     thread_worker_count = module.params['thread_worker_count']
+    use_netlink = module.params['use_netlink']
 
     config_module_logging(construct_log_filename(cmd, vm_set_name))
 
+    if use_netlink and NetlinkPlumbing.available():
+        VMTopology.netlink = NetlinkPlumbing()
+    logging.info("Use netlink for the interface operations: %s", VMTopology.netlink is not None)
+
     if cmd == 'bind_keysight_api_server_ip':
         vm_names = []
 
@@ -2692,6 +2852,9 @@ def main():
     except Exception as error:
         logging.error(traceback.format_exc())
         module.fail_json(msg=str(error))
+    finally:
+        if VMTopology.netlink is not None:
+            VMTopology.netlink.close()
 
     module.exit_json(changed=True)
 
@@ -16,6 +16,7 @@ from spytest import paths
 from spytest import env
 from spytest import tcmap
 from spytest import item_utils
+from spytest import batch_history
 from spytest.st_time import get_timenow
 from spytest.st_time import get_elapsed
 from spytest.st_time import get_timestamp
@@ -69,6 +70,7 @@ def batch_init():
     wa.tclist_cache = {}
     wa.chip_coverate_history = {}
     wa.platform_coverate_history = {}
+    wa.history = None
 
     # None disable backup/rerun nodes
     # 0 create same number of backup/rerun nodes
@@ -116,6 +118,36 @@ def load_coverage_history():
         tcmap.read_coverage_history(csv_file)
 
 
+def load_module_history():
+    if env.get("SPYTEST_BATCH_SCHEDULER", "default") != "lpt":
+        return
+    history_db = env.get("SPYTEST_BATCH_HISTORY_DB", "")
+    wa.history = batch_history.ModuleHistory(history_db)
+    for results_csv in env.get("SPYTEST_BATCH_HISTORY_RESULTS", "").split(","):
+        results_csv = results_csv.strip()
+        if not results_csv:
+            continue
+        try:
+            count = wa.history.add_results_csv(results_csv)
+            trace("Loaded {} modules history from {}".format(count, results_csv))
+        except Exception as exp:
+            warn("Failed to load modules history from {}: {}".format(results_csv, exp))
+    trace("LPT scheduling with {} modules history {}".format(len(wa.history.modules()), history_db))
+
+
+def save_module_history(worker):
+    if not wa.history:
+        return
+    results_file = paths.get_results_csv(os.path.join(wa.logs_path, worker.name))
+    if not os.path.exists(results_file):
+        return
+    try:
+        topos = wa.sched.assigned_topos if wa.sched else None
+        wa.history.add_results_csv(results_file, wa.logs_path, worker.name, topos)
+    except Exception as exp:
+        warn("Failed to save modules history from {}: {}".format(results_file, exp))
+
+
 def init_type_nodes():
     node_types = ["one", "two", "three", "four"]
     backup_nodes = env.get("SPYTEST_BATCH_BACKUP_NODES")
@@ -548,6 +580,8 @@ class SpyTestScheduling(object):
         self.base_names = {}
         self.wa = wa
         self.default_bucket = int(env.get("SPYTEST_BATCH_DEFAULT_BUCKET", "1"))
+        self.topo_switch_cost = env.getint("SPYTEST_BATCH_TOPO_SWITCH_COST", 60)
+        self.assigned_topos = {}
         self.default_order = 2
         self.default_topo = ""
         self.max_order = self.default_order
@@ -1022,27 +1056,49 @@ class SpyTestScheduling(object):
         if env.match("SPYTEST_BATCH_ORDER_HIGH2LOW", "1", "1"):
             orders = reversed(orders)
         for order in orders:
+            candidates = []
             for mname, minfo in modules.items():
                 if name not in minfo.nodes:
                     continue
                 md = self.get_module_data(mname, minfo.used_tpref)
                 if self.order_support and md.order != order:
                     continue
-                if self._assign_pretest(node):
-                    return True
-                del modules[mname]
-                self.node_modules[node].extend(minfo.node_indexes)
-                if self.test_spytest_infra_last is not None:
-                    if env.match("SPYTEST_BATCH_APPEND_INFRA_TEST", "1", "1"):
-                        self.node_modules[node].append(self.test_spytest_infra_last)
-                worker.assigned = worker.assigned + len(minfo.node_indexes)
-                debug("[{}]: ===== Assigned order:{} {} {}".format(name, md.order, mname, minfo.node_indexes))
-                for item_index in minfo.node_indexes:
-                    report("add", self.collection[item_index], name)
-                report("save", "", "")
+                candidates.append([mname, minfo, md])
+                if not wa.history:
+                    break
+            if not candidates:
+                continue
+            if self._assign_pretest(node):
                 return True
+            mname, minfo, md = self._pick_module(worker, candidates)
+            del modules[mname]
+            self.node_modules[node].extend(minfo.node_indexes)
+            if self.test_spytest_infra_last is not None:
+                if env.match("SPYTEST_BATCH_APPEND_INFRA_TEST", "1", "1"):
+                    self.node_modules[node].append(self.test_spytest_infra_last)
+            worker.assigned = worker.assigned + len(minfo.node_indexes)
+            worker.last_topo = md.topo
+            self.assigned_topos[batch_history.module_key(mname)] = md.topo
+            debug("[{}]: ===== Assigned order:{} {} {}".format(name, md.order, mname, minfo.node_indexes))
+            for item_index in minfo.node_indexes:
+                report("add", self.collection[item_index], name)
+            report("save", "", "")
+            return True
         return False
 
+    # longest expected module first, penalizing the topology switch
+    def _pick_module(self, worker, candidates):
+        if not wa.history or len(candidates) < 2:
+            return candidates[0]
+        items = []
+        for mname, minfo, md in candidates:
+            expected = wa.history.expected(mname, len(minfo.node_indexes))
+            items.append([expected, md.topo])
+        index = batch_history.pick(items, worker.last_topo, self.topo_switch_cost)
+        msg = "[{}]: ===== LPT picked {} expected {} of {} candidates"
+        debug(msg.format(worker.name, candidates[index][0], utils.time_format(int(items[index][0])), len(items)))
+        return candidates[index]
+
     def _pending_count(self, worker, modules=None, dbg=False):
         count, modules = 0, modules or self.main_modules
         for mname, minfo in modules.items():
@@ -1626,6 +1682,8 @@ def configure(config, logs_path, root_logs_path):
     wa.tcmap = dict()
     load_module_csv()
     load_coverage_history()
+    if is_master():
+        load_module_history()
     init_stdout(config, logs_path)
     dist.configure(config, logs_path, is_worker(), wa)
     create_dashboard()
@@ -1855,6 +1913,9 @@ def finish_node_locked(gw, gid, error, reader, status=None):
 
     ptestbed = worker.parent_testbed or worker.testbed
 
+    # save the module execution times for the next runs
+    save_module_history(worker)
+
     if wa.rerun_list and worker.gw_node_index < wa.testbed_count:
         results_file = paths.get_results_csv(os.path.join(wa.logs_path, worker.name))
         debug("============== NODE {} {}".format(results_file, gid))
@@ -2237,6 +2298,7 @@ def create_worker(i, j, node_type, prefix="", auto_start=True):
     worker.pid = 0
     worker.applicable = 0
     worker.errored = False
+    worker.last_topo = None
     if not auto_start:
         worker.started = False
     elif i >= wa.testbed_count:
@@ -0,0 +1,293 @@
+"""
+Module execution time history used by the batch scheduling
+
+The execution time of every module, i.e. the sum of the prolog, function
+and epilog times in the results csv, is saved per run and node in a local
+sqlite database. The expected execution time of a module is the median
+of its last runs, the modules without history are estimated from the
+number of their test functions.
+
+The expected times are used by the longest processing time first (LPT)
+scheduling: the longest pending module is given to the free worker, so
+that a long module is not picked last leaving the other workers idle.
+The modules having a different topology than the last module executed
+on the worker are penalized by the topology switch cost.
+
+The simulator replays the modules of a past run to report the projected
+makespan with the pending order and LPT scheduling:
+
+    python -m spytest.batch_history import --db history.db <logs>/results_functions_all.csv
+    python -m spytest.batch_history simulate --db history.db <logs>/results_functions_all.csv
+"""
+
+import os
+import csv
+import time
+import heapq
+import sqlite3
+import argparse
+
+import utilities.common as utils
+
+# expected time of a test function when there is no history at all
+default_function_time = 60
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return 0
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def module_key(name):
+    """
+    modules are stored with base name as the results csv may or may not have
+    the path of the module depending on SPYTEST_REPEAT_MODULE_SUPPORT
+    """
+    return os.path.basename(name.split("::", 1)[0])
+
+
+def read_results_csv(filepath, node=""):
+    """
+    Read the module execution times from results csv of a node or consolidated
+    @filepath results_functions.csv or results_functions_all.csv
+    @node name of node used when the csv is not consolidated
+    Returns dict of (node, module) => [seconds, functions]
+    """
+    retval = {}
+    with utils.open_file(filepath) as fd:
+        cols = None
+        for row in csv.reader(fd):
+            if not row:
+                continue
+            if cols is None:
+                cols = {col: index for index, col in enumerate(row)}
+                if "Module" not in cols or "TimeTaken" not in cols:
+                    return retval
+                continue
+            try:
+                module = module_key(row[cols["Module"]])
+                secs = utils.time_parse(row[cols["TimeTaken"]])
+                desc = row[cols["Description"]] if "Description" in cols else ""
+                name = row[cols["Node"]] if "Node" in cols else node
+            except IndexError:
+                continue
+            if not module:
+                continue
+            entry = retval.setdefault((name, module), [0, 0])
+            entry[0] = entry[0] + secs
+            if "Prolog" not in desc and "Epilog" not in desc:
+                entry[1] = entry[1] + 1
+    return retval
+
+
+class ModuleHistory(object):
+
+    def __init__(self, filepath=None, max_runs=5):
+        """
+        @filepath sqlite database, the history is kept in memory when not given
+        @max_runs number of the last runs used to compute the expected time
+        """
+        self.filepath = filepath or ":memory:"
+        self.max_runs = max_runs
+        if filepath:
+            utils.ensure_parent(os.path.abspath(filepath))
+        self.db = sqlite3.connect(self.filepath, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS module_runs (run TEXT, node TEXT, module TEXT, "
+                        "topo TEXT, seconds INTEGER, functions INTEGER, stamp REAL, "
+                        "PRIMARY KEY (run, node, module))")
+        self.db.commit()
+        self.durations, self.topos, self.function_time = None, None, None
+
+    def close(self):
+        self.db.close()
+
+    def add(self, run, node, module, seconds, functions=0, topo="", stamp=None):
+        self._add(run, node, module, seconds, functions, topo, stamp)
+        self.db.commit()
+
+    def _add(self, run, node, module, seconds, functions, topo, stamp):
+        stamp = time.time() if stamp is None else stamp
+        self.db.execute("INSERT OR REPLACE INTO module_runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (run, node, module_key(module), topo or "", seconds, functions, stamp))
+        self.durations = None
+
+    def add_results_csv(self, filepath, run=None, node="", topos=None):
+        """
+        Add the module execution times from the results csv
+        @run identifier of the run, defaults to the folder of the csv
+        @node name of the node when the csv is not consolidated
+        @topos dict of module => topology
+        Returns the number of modules added
+        """
+        run = run or os.path.abspath(os.path.dirname(filepath))
+        stamp = os.path.getmtime(filepath)
+        topos = topos or {}
+        entries = read_results_csv(filepath, node)
+        for (name, module), (seconds, functions) in entries.items():
+            self._add(run, name, module, seconds, functions, topos.get(module), stamp)
+        self.db.commit()
+        return len(entries)
+
+    def _load(self):
+        if self.durations is not None:
+            return
+        self.durations, self.topos, rates = {}, {}, []
+        query = "SELECT module, topo, seconds, functions FROM module_runs ORDER BY stamp DESC"
+        for module, topo, seconds, functions in self.db.execute(query):
+            durations = self.durations.setdefault(module, [])
+            if len(durations) >= self.max_runs:
+                continue
+            durations.append(seconds)
+            if topo and module not in self.topos:
+                self.topos[module] = topo
+            if functions > 0:
+                rates.append(float(seconds) / functions)
+        self.function_time = median(rates) or default_function_time
+
+    def expected(self, module, functions=0):
+        """
+        Returns the expected execution time of the module in seconds
+        @functions number of test functions used when the module has no history
+        """
+        self._load()
+        durations = self.durations.get(module_key(module))
+        if durations:
+            return median(durations)
+        return max(functions, 1) * self.function_time
+
+    def get_topo(self, module, default=""):
+        self._load()
+        return self.topos.get(module_key(module), default)
+
+    def modules(self):
+        self._load()
+        return list(self.durations.keys())
+
+
+def pick(candidates, last_topo=None, switch_cost=0):
+    """
+    Pick the longest processing time first
+    @candidates list of [expected seconds, topology] in pending order
+    @last_topo topology of the last module executed on the worker
+    @switch_cost seconds penalized when the topology is changed
+    Returns index of the chosen candidate, the first one among equals
+    """
+    best, best_score = 0, None
+    for index, (seconds, topo) in enumerate(candidates):
+        score = seconds
+        if last_topo is not None and topo != last_topo:
+            score = score - switch_cost
+        if best_score is None or score > best_score:
+            best, best_score = index, score
+    return best
+
+
+class SimModule(object):
+
+    def __init__(self, name, seconds, expected=None, topo="", order=0, nodes=None):
+        self.name = name
+        self.seconds = seconds
+        self.expected = seconds if expected is None else expected
+        self.topo = topo
+        self.order = order
+        self.nodes = nodes
+
+
+def simulate(modules, workers, policy="lpt", switch_cost=0, high2low=True):
+    """
+    Simulate the batch scheduling of the modules
+    @modules list of SimModule in pending order
+    @workers list of worker names
+    @policy "pending" to pick the first pending module, "lpt" for the longest one
+    @switch_cost seconds taken to change the topology of the worker
+    Returns makespan and dict of worker => [names of the modules]
+    """
+    free = [(0, index, worker) for index, worker in enumerate(workers)]
+    heapq.heapify(free)
+    pending, last_topo, finish = list(modules), {}, {}
+    assigned = {worker: [] for worker in workers}
+    while free:
+        now, index, worker = heapq.heappop(free)
+        eligible = [m for m in pending if not m.nodes or worker in m.nodes]
+        if not eligible:
+            finish[worker] = now
+            continue
+        # same as batch, modules of the higher order first
+        order = max(m.order for m in eligible) if high2low else min(m.order for m in eligible)
+        eligible = [m for m in eligible if m.order == order]
+        choice = 0
+        if policy == "lpt":
+            candidates = [[m.expected, m.topo] for m in eligible]
+            choice = pick(candidates, last_topo.get(worker), switch_cost)
+        module = eligible[choice]
+        pending.remove(module)
+        seconds = module.seconds
+        if worker in last_topo and last_topo[worker] != module.topo:
+            seconds = seconds + switch_cost
+        last_topo[worker] = module.topo
+        assigned[worker].append(module.name)
+        heapq.heappush(free, (now + seconds, index, worker))
+    return max(list(finish.values()) or [0]), assigned
+
+
+def replay(filepath, history=None, switch_cost=0, workers=None):
+    """
+    Replay the modules of a past run with the pending order and LPT scheduling
+    @filepath results csv of the run to replay, consolidated for batch runs
+    @history ModuleHistory to estimate the modules, recorded times when not given
+    @workers number of workers, defaults to the nodes of the run
+    Returns dict of policy => makespan, recorded one is the slowest node in the run
+    """
+    entries = read_results_csv(filepath)
+    nodes, modules = {}, []
+    for (node, name), (seconds, functions) in entries.items():
+        nodes[node] = nodes.get(node, 0) + seconds
+        expected = history.expected(name, functions) if history else seconds
+        topo = history.get_topo(name) if history else ""
+        modules.append(SimModule(name, seconds, expected, topo))
+    names = sorted(nodes.keys())
+    if workers:
+        names = ["W{}".format(index) for index in range(workers)]
+    retval = {"recorded": max(list(nodes.values()) or [0])}
+    for policy in ["pending", "lpt"]:
+        retval[policy] = simulate(modules, names, policy, switch_cost)[0]
+    return retval
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Module execution time history.")
+    parser.add_argument("action", choices=["import", "show", "simulate"])
+    parser.add_argument("results", nargs="*", help="results csv files")
+    parser.add_argument("--db", default="", help="history database")
+    parser.add_argument("--switch-cost", type=int, default=60, help="topology switch cost in seconds")
+    parser.add_argument("--workers", type=int, default=0, help="number of workers to simulate")
+    args = parser.parse_intermixed_args(args)
+
+    history = ModuleHistory(args.db)
+    if args.action == "import":
+        for filepath in args.results:
+            count = history.add_results_csv(filepath)
+            print("{}: {} modules".format(filepath, count))
+    elif args.action == "show":
+        rows = []
+        for module in sorted(history.modules()):
+            seconds = history.expected(module)
+            rows.append([module, utils.time_format(int(seconds)), history.get_topo(module)])
+        rows = sorted(rows, key=lambda row: utils.time_parse(row[1]), reverse=True)
+        print(utils.sprint_vtable(["Module", "Expected", "Topology"], rows))
+    else:
+        for filepath in args.results:
+            result = replay(filepath, history if args.db else None, args.switch_cost, args.workers)
+            rows = [[policy, utils.time_format(int(value))] for policy, value in result.items()]
+            print(filepath)
+            print(utils.sprint_vtable(["Policy", "Makespan"], rows))
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
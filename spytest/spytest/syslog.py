@@ -49,52 +49,132 @@ def get_config():
     return config
 
 
-def match(lvl, line):
-    index = levels.index(lvl)
-    needed = "|".join(levels[:index + 1])
-    regex = r"^\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}\s+\S+\s+({})\s+"
-    cre = re.compile(regex.format(needed.upper()))
-    return cre.search(line)
+class RuleMatcher(object):
+    """
+    Matches the text against a list of regular expressions in one pass.
+    The rules are combined into one alternation with a named group per
+    rule so that the matched rule can be reported. The rules which can't
+    be combined, e.g. having back references or global flags, are matched
+    one after the other as before.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules or [])
+        self.combined, self.cre_list = None, []
+        if not self.rules:
+            return
+        try:
+            if any(re.search(r"\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)", rule) for rule in self.rules):
+                raise ValueError("back reference or global flags")
+            parts = ["(?P<r{}>{})".format(i, rule) for i, rule in enumerate(self.rules)]
+            self.combined = re.compile("|".join(parts))
+        except Exception:
+            self.combined = None
+            self.cre_list = [re.compile(rule) for rule in self.rules]
+
+    def match(self, text):
+        """
+        returns the first rule matching the beginning of the text or None
+        """
+        if self.combined is not None:
+            rv = self.combined.match(text)
+            if not rv:
+                return None
+            return self.rules[int(rv.lastgroup[1:])]
+        for rule, cre in zip(self.rules, self.cre_list):
+            if cre.match(text):
+                return rule
+        return None
+
+
+class SyslogClassifier(object):
+    """
+    Parses and classifies the syslog messages of the given level using
+    the regular expressions compiled only once.
+    """
+
+    date_regex = r"^\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}"
+    line_regex = date_regex + r"\s+\S+\s+({})\s+"
+    parse_regex = r"^(\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}(\+\d+:\d+){{0,1}}(\s+\d+){{0,1}})\s+(\S+)\s+({})\s+(.*)"
+    chars = r"[a-zA-Z0-9-_/\.]+"
+    module_cre_list = [
+        re.compile(r"^\s*({0}#{0}):*\s(.*)".format(chars)),
+        re.compile(r"^\s*({0}#{0}\[\d+\]):*\s(.*)".format(chars)),
+        re.compile(r"^\s*({0}\[\d+\]):\s*(.*)".format(chars)),
+        re.compile(r"^\s*({0}):\s*(.*)".format(chars)),
+    ]
+
+    def __init__(self, lvl, cfg):
+        self.lvl, self.cfg = lvl, cfg
+        index = levels.index(lvl)
+        needed = "|".join(levels[:index + 1]).upper()
+        self.line_cre = re.compile(self.line_regex.format(needed))
+        # the output is scanned as a whole, so the white space
+        # in the regular expression should not match the new line
+        regex = self.parse_regex.format(needed).replace(r"\s", r"[^\S\n]")
+        self.parse_cre = re.compile(regex, re.MULTILINE)
+        self.rules = {}
+        for color in ["yellow", "green", "red"]:
+            self.rules[color] = RuleMatcher(cfg.get(color, []))
 
+    def match(self, line):
+        return self.line_cre.search(line)
 
-def parse(phase, lvl, msgtype, dut_name, output, filemode=False):
-    entries = []
-    if lvl in levels:
-        index = levels.index(lvl)
-        needed = "|".join(levels[:index + 1])
-        regex = r"^(\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}(\+\d+:\d+){{0,1}}(\s+\d+){{0,1}})\s+(\S+)\s+({})\s+(.*)"
-        cre = re.compile(regex.format(needed.upper()))
-        cre_list = []
-        chars = r"[a-zA-Z0-9-_/\.]+"
-        cre_list.append(re.compile(r"^\s*({0}#{0}):*\s(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}#{0}\[\d+\]):*\s(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}\[\d+\]):\s*(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}):\s*(.*)".format(chars)))
-        for line in output.split("\n"):
-            rv = cre.search(line)
-            if not rv:
-                continue
+    def parse(self, msgtype, dut_name, output):
+        entries = []
+        for rv in self.parse_cre.finditer(output):
             entry = [dut_name, msgtype]
-            off = 0 if len(rv.groups()) == 6 else 1
             date = re.split(r" |\+", rv.group(1))
             if len(date) > 4:
                 date.pop(3)
             entry.append(" ".join(date))  # date
-            entry.append(rv.group(4 + off))  # host
-            entry.append(rv.group(5 + off))  # level
-            msg = rv.group(6 + off)
+            entry.append(rv.group(5))  # host
+            entry.append(rv.group(6))  # level
+            msg = rv.group(7)
             entry.append(msg)  # message
-            rv = None
-            for cre2 in cre_list:
-                rv = cre2.search(msg)
+            for cre in self.module_cre_list:
+                rv = cre.search(msg)
                 if rv:
                     entry.append(rv.group(1))  # module
                     entry.append(rv.group(2))  # message
                     break
-            if not rv:
+            else:
                 entry.append("")  # module
                 entry.append(msg)  # message
             entries.append(entry)
+        return entries
+
+    def classify(self, msg, colors=None):
+        """
+        returns the first color and the rule matching the message
+        """
+        for color in colors or ["green", "yellow", "red"]:
+            rule = self.rules[color].match(msg)
+            if rule is not None:
+                return color, rule
+        return None, None
+
+
+classifiers = {}
+
+
+def get_classifier(lvl="none"):
+    cfg = get_config()
+    classifier = classifiers.get(lvl)
+    if classifier is None or classifier.cfg is not cfg:
+        classifier = SyslogClassifier(lvl, cfg)
+        classifiers[lvl] = classifier
+    return classifier
+
+
+def match(lvl, line):
+    return get_classifier(lvl).match(line)
+
+
+def parse(phase, lvl, msgtype, dut_name, output, filemode=False):
+    entries = []
+    if lvl in levels:
+        entries = get_classifier(lvl).parse(msgtype, dut_name, output)
 
     if filemode and lvl != "none":
         val = random.randint(1, 1000)
@@ -106,43 +186,30 @@ def parse(phase, lvl, msgtype, dut_name, output, filemode=False):
 
 
 def store(phase, prev, current):
-    cfg = get_config()
-    rmatch, offset = None, 7
+    rules = get_classifier().rules
+    rmatch, offset, noted = None, 7, None
     for entry in current:
-        gmatch, ymatch, pmatch = None, None, None
-
         # find green syslogs to discard
-        for regex in cfg.get("green", []):
-            if re.compile(regex).match(entry[offset]):
-                gmatch = regex
-                break
-        if gmatch is not None:
+        if rules["green"].match(entry[offset]) is not None:
             continue  # ignore the syslog
 
         # find yellow syslogs to report only once
-        for regex in cfg.get("yellow", []):
-            if re.compile(regex).match(entry[offset]):
-                ymatch = regex
-                break
-
-        # check if yellow syslog already noted
-        for pentry in prev:
-            if pentry[offset] == entry[offset]:
-                pmatch = ymatch
-                break
-        if pmatch is not None:
-            continue  # syslog already reported once
+        if rules["yellow"].match(entry[offset]) is not None:
+            if noted is None:
+                noted = set([pentry[offset] for pentry in prev])
+            if entry[offset] in noted:
+                continue  # syslog already reported once
 
         # add the entry to current syslogs
         prev.append(entry)
+        if noted is not None:
+            noted.add(entry[offset])
 
         if rmatch is not None:
             continue  # first red syslog already noted
 
         # check if red syslog to report SW Issue
-        for regex in cfg.get("red", []):
-            if re.compile(regex).match(entry[offset]):
-                rmatch = " ".join(entry)
-                break
+        if rules["red"].match(entry[offset]) is not None:
+            rmatch = " ".join(entry)
 
     return rmatch
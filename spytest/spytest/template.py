@@ -2,6 +2,9 @@ import sys
 import os
 import re
 import json
+import time
+import hashlib
+import threading
 from collections import OrderedDict
 
 bundled_parser = os.getenv("SPYTEST_TEXTFSM_USE_BUNDLED_PARSER")
@@ -19,6 +22,107 @@ from spytest import env  # noqa: E402
 import utilities.common as utils  # noqa: E402
 
 
+class TemplateCache(object):
+    """
+    Per process cache of the compiled TextFSM templates and parsed results
+
+    The compiled templates are keyed by the template path and modification time.
+    A compiled template is used by one parse at a time, another one is compiled
+    when all of them are in use by other threads. The parsed results are kept
+    for the last memoize_size outputs, when memoization is enabled.
+    """
+
+    def __init__(self, memoize_size=0):
+        self.lock = threading.Lock()
+        # path => [mtime, [idle TextFSM objects]]
+        self.fsms = {}
+        self.memoize_size = memoize_size
+        self.results = OrderedDict()
+
+    def parse(self, tmpl_path, data):
+        mtime = os.path.getmtime(tmpl_path)
+        fsm = None
+        with self.lock:
+            entry = self.fsms.get(tmpl_path)
+            if entry and entry[0] == mtime and entry[1]:
+                fsm = entry[1].pop()
+        if fsm is None:
+            with open(tmpl_path, "r") as tmpl_fp:
+                fsm = textfsm.TextFSM(tmpl_fp)
+        try:
+            fsm.Reset()
+            rows = fsm.ParseText(data)
+            return fsm.header, rows, fsm.GetValuesByAttrib('Key')
+        finally:
+            fsm.Reset()
+            with self.lock:
+                entry = self.fsms.get(tmpl_path)
+                if not entry or entry[0] != mtime:
+                    entry = self.fsms[tmpl_path] = [mtime, []]
+                entry[1].append(fsm)
+
+    def result_key(self, kind, tmpl_paths, data):
+        if not self.memoize_size:
+            return None
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8", "replace")
+        tmpls = tuple([(path, os.path.getmtime(path)) for path in tmpl_paths])
+        return kind, tmpls, hashlib.sha1(data).hexdigest()
+
+    def get_result(self, key):
+        if key is None:
+            return None, None
+        with self.lock:
+            result = self.results.pop(key, None)
+            if result is None:
+                return None, None
+            self.results[key] = result
+        return self.copy_result(*result)
+
+    def put_result(self, key, header, objs):
+        if key is None:
+            return
+        result = self.copy_result(header, objs)
+        with self.lock:
+            self.results.pop(key, None)
+            self.results[key] = result
+            while len(self.results) > self.memoize_size:
+                self.results.popitem(last=False)
+
+    @staticmethod
+    def copy_result(header, objs):
+        # the callers can modify the parsed entries
+        retval = []
+        for obj in objs:
+            retval.append({k: list(v) if isinstance(v, list) else v for k, v in obj.items()})
+        return list(header), retval
+
+
+tmpl_cache = TemplateCache(env.getint("SPYTEST_TEXTFSM_MEMOIZE", 0))
+
+
+class CachedCliTable(clitable.CliTable):
+    """
+    CliTable parsing the command output with the cached TextFSM templates
+    """
+
+    def __init__(self, index_file, template_dir, cache=None):
+        clitable.CliTable.__init__(self, index_file, template_dir)
+        self.cache = cache
+
+    def _ParseCmdItem(self, cmd_input, template_file=None):
+        if not self.cache:
+            return clitable.CliTable._ParseCmdItem(self, cmd_input, template_file)
+        header, rows, keys = self.cache.parse(template_file.name, cmd_input)
+        if not self._keys:
+            self._keys = set(keys)
+        table = clitable.texttable.TextTable()
+        table.header = header
+        for row in rows:
+            table.Append(row)
+        return table
+
+
 class Template(object):
 
     def __init__(self, platform=None, cli=None, root=None):
@@ -38,26 +142,51 @@ class Template(object):
         for index in index.split(","):
             if not os.path.exists(os.path.join(self.root, index)):
                 index = "index"
-            self.cli_tables[index] = clitable.CliTable(index, self.root)
+            self.cli_tables[index] = CachedCliTable(index, self.root)
         self.platform = platform
         self.cli = cli
+        self.set_cache(tmpl_cache if env.get("SPYTEST_TEXTFSM_CACHE", "1") != "0" else None)
 
-    # find the template given command
-    def get_tmpl(self, cmd):
-        attrs = dict(Command=cmd)
+    def set_cache(self, cache):
+        self.cache = cache
+        # command => [template, cli table, templates to parse]
+        self.cmd_cache = {}
         for cli_table in self.cli_tables.values():
-            row_idx = cli_table.index.GetRowMatch(attrs)
-            if row_idx != 0:
-                return cli_table.index.index[row_idx]['Template']
-        return None
+            cli_table.cache = cache
 
-    def get_table(self, cmd):
+    def get_attrs(self, cmd):
+        attrs = dict(Command=cmd)
+        if self.platform:
+            attrs["Platform"] = self.platform
+        if self.cli:
+            attrs["cli"] = self.cli
+        return attrs
+
+    # find the template, the table and the templates to parse given command
+    def resolve(self, cmd):
+        if cmd in self.cmd_cache:
+            return self.cmd_cache[cmd]
+        retval = [None, None, None]
         attrs = dict(Command=cmd)
         for cli_table in self.cli_tables.values():
             row_idx = cli_table.index.GetRowMatch(attrs)
             if row_idx != 0:
-                return cli_table
-        return None
+                retval[0] = cli_table.index.index[row_idx]['Template']
+                retval[1] = cli_table
+                row_idx = cli_table.index.GetRowMatch(self.get_attrs(cmd))
+                if row_idx != 0:
+                    retval[2] = cli_table.index.index[row_idx]['Template']
+                break
+        if self.cache:
+            self.cmd_cache[cmd] = retval
+        return retval
+
+    # find the template given command
+    def get_tmpl(self, cmd):
+        return self.resolve(cmd)[0]
+
+    def get_table(self, cmd):
+        return self.resolve(cmd)[1]
 
     # retrieve template and sample file given the command
     def read_sample(self, cmd):
@@ -84,22 +213,30 @@ class Template(object):
 
     # find template the given command and apply on given data
     def apply(self, output, cmd):
-        attrs = dict(Command=cmd)
-        if self.platform:
-            attrs["Platform"] = self.platform
-        if self.cli:
-            attrs["cli"] = self.cli
+        attrs = self.get_attrs(cmd)
 
-        tmpl_file = self.get_tmpl(cmd)
+        tmpl_file, cli_table, templates = self.resolve(cmd)
         if not tmpl_file:
             raise ValueError('Unknown command "%s"' % (cmd))
 
-        cli_table = self.get_table(cmd)
         if not cli_table:
             raise ValueError('Unable to parse command "%s"' % (cmd))
 
-        cli_table.ParseCmd(output, attrs)
+        if not templates:
+            raise clitable.CliTableError('No template found for attributes: "%s"' % attrs)
+
+        key = None
+        if self.cache:
+            tmpl_paths = [os.path.join(self.root, tmpl) for tmpl in templates.split(":")]
+            key = self.cache.result_key("cmd", tmpl_paths, output)
+            _, objs = self.cache.get_result(key)
+            if objs is not None:
+                return [tmpl_file, objs]
+
+        cli_table.ParseCmd(output, attrs, templates)
         objs = self.result(cli_table.header, cli_table)
+        if key:
+            self.cache.put_result(key, cli_table.header, objs)
         return [tmpl_file, objs]
 
     def result(self, header, rows):
@@ -160,18 +297,76 @@ class Template(object):
     # apply the given template on given data
     def apply_textfsm(self, tmpl_file, data):
         tmpl_file2 = os.path.join(self.root, tmpl_file)
-        tmpl_fp = open(tmpl_file2, "r")
-        re_table = textfsm.TextFSM(tmpl_fp)
-        out = re_table.ParseText(data)
-        tmpl_fp.close()
-        objs = self.result(re_table.header, out)
-        return re_table.header, objs
+        if not self.cache:
+            tmpl_fp = open(tmpl_file2, "r")
+            re_table = textfsm.TextFSM(tmpl_fp)
+            out = re_table.ParseText(data)
+            tmpl_fp.close()
+            objs = self.result(re_table.header, out)
+            return re_table.header, objs
+
+        key = self.cache.result_key("fsm", [tmpl_file2], data)
+        header, objs = self.cache.get_result(key)
+        if objs is not None:
+            return header, objs
+
+        header, out, _ = self.cache.parse(tmpl_file2, data)
+        objs = self.result(header, out)
+        self.cache.put_result(key, header, objs)
+        return header, objs
+
+
+def benchmark(template, path=None, repeat=100):
+    """
+    Parse the samples repeatedly without cache, with cache and with memoization
+    Returns the number of samples and the elapsed time of each mode
+    """
+    samples, path = [], path or template.samples
+    # <template name>[_<index>].txt samples
+    for sample_file in sorted(utils.list_files_tree(path, "*.txt")):
+        name = re.sub(r"_\d+$", "", os.path.splitext(os.path.basename(sample_file))[0])
+        if os.path.isfile(os.path.join(template.root, name + ".tmpl")):
+            with open(sample_file, "r") as fh:
+                samples.append([None, name + ".tmpl", fh.read()])
+    # samples saved by save_sample
+    for info_file in sorted(utils.list_files_tree(path, "*.info.log")):
+        lines = utils.read_lines(info_file, [])
+        for i in range(0, len(lines), 4):
+            tmpl, cmd, _, md5 = [data.strip() for data in lines[i:i + 4]]
+            data_file = os.path.join(path, "{}.{}.data.log".format(tmpl, md5))
+            samples.append([cmd, tmpl, "\n".join(utils.read_lines(data_file, []))])
+
+    results, cache = OrderedDict(), template.cache
+    modes = [["no-cache", None], ["cache", TemplateCache()], ["memoize", TemplateCache(len(samples))]]
+    try:
+        for mode, mode_cache in modes:
+            template.set_cache(mode_cache)
+            start = time.time()
+            for _ in range(repeat):
+                for cmd, tmpl, data in samples:
+                    if cmd:
+                        template.apply(data, cmd)
+                    else:
+                        template.apply_textfsm(tmpl, data)
+            results[mode] = time.time() - start
+    finally:
+        template.set_cache(cache)
+    return len(samples), results
 
 
 if __name__ == "__main__":
     template = Template()
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        path = sys.argv[2] if len(sys.argv) > 2 else None
+        count, results = benchmark(template, path)
+        print("============ Samples: {}".format(count))
+        for mode, elapsed in results.items():
+            print("{}: {:.3f} sec".format(mode, elapsed))
+        sys.exit(0)
+
     if len(sys.argv) <= 2:
         print("USAGE: template.py <command> <data file> [<template file>]")
+        print("       template.py --benchmark [<samples path>]")
         sys.exit(0)
 
     cmd, data_file = sys.argv[1:3]
@@ -6,8 +6,22 @@ in the data returned by recv. Instead, it delivers the VLAN TCI in a control
 message. Python 2.x doesn't have built-in support for recvmsg, so we have to
 use ctypes to call it. The recv function exported by this module reconstructs
 the VLAN tag if it was offloaded.
+
+AF_PACKET receive ring support
+
+The RxRing class receives the frames from a TPACKET_V3 PACKET_RX_RING shared
+with the kernel, a block of frames at a time. The VLAN tag is reconstructed
+from the VLAN TCI in the header of each frame.
+
+AF_PACKET transmit support
+
+The TxRing class queues the frames in a PACKET_TX_RING shared with the kernel
+and sends all the queued frames with a single system call.
 """
 
+import mmap
+import select
+import socket
 import struct
 from ctypes import sizeof
 from ctypes import get_errno
@@ -29,6 +43,25 @@ ETH_P_8021Q = 0x8100
 SOL_PACKET = 263
 PACKET_AUXDATA = 8
 TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_LOSS = 14
+TPACKET_V2 = 1
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1
+# struct tpacket_block_desc: block_status, num_pkts, offset_to_first_pkt
+TPACKET3_BLOCK_STATUS = 8
+tpacket3_block = struct.Struct("II")
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len,
+# tp_status, tp_mac, tp_net, tp_rxhash, tp_vlan_tci, tp_vlan_tpid
+tpacket3_hdr = struct.Struct("IIIIIIHHIIH")
+# TPACKET_ALIGN(sizeof(struct tpacket2_hdr)), the frame data starts here in TX ring
+TPACKET2_HDRLEN = 32
 
 
 class struct_iovec(Structure):
@@ -131,3 +164,154 @@ def recv(sk, bufsize):
         return buf.raw[:12] + tag + buf.raw[12:rv]
     else:
         return buf.raw[:rv]
+
+
+class RxRing(object):
+    """
+    AF_PACKET socket with TPACKET_V3 PACKET_RX_RING
+
+    The kernel fills the ring blocks with the received frames and hands over
+    a block when it is full or when the block timeout expires.
+    @iface Interface to receive the frames
+    @block_size Size of each ring block, must be a multiple of the page size
+    @block_nr Number of ring blocks
+    @timeout_ms Block retire timeout in milli seconds
+    """
+
+    def __init__(self, iface, block_size=1 << 20, block_nr=16, timeout_ms=10):
+        ETH_P_ALL = 3
+        self.block_size = block_size
+        self.block_nr = block_nr
+        self.index = 0
+        self.ring = None
+        self.sk = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            self.sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            # frame size is not used for TPACKET_V3, the frames are variable length in the blocks
+            frame_size = 2048
+            req = struct.pack("IIIIIII", block_size, block_nr, frame_size,
+                              block_size * block_nr // frame_size, timeout_ms, 0, 0)
+            self.sk.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.sk.bind((iface, ETH_P_ALL))
+            self.ring = mmap.mmap(self.sk.fileno(), block_size * block_nr,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sk.close()
+            raise
+
+    def recv(self, timeout=None):
+        """
+        Receive the frames of the next block
+        @timeout Seconds to wait for the block, None waits forever
+        Returns the list of frames, empty when no block is ready
+        """
+        ring = self.ring
+        offset = self.index * self.block_size
+        status = struct.unpack_from("I", ring, offset + TPACKET3_BLOCK_STATUS)[0]
+        if not status & TP_STATUS_USER:
+            select.select([self.sk], [], [], timeout)
+            status = struct.unpack_from("I", ring, offset + TPACKET3_BLOCK_STATUS)[0]
+            if not status & TP_STATUS_USER:
+                return []
+
+        num_pkts, first = tpacket3_block.unpack_from(ring, offset + TPACKET3_BLOCK_STATUS + 4)
+        frames = []
+        pos = offset + first
+        for _ in range(num_pkts):
+            (next_offset, _, _, snaplen, _, tp_status, tp_mac, _, _,
+             vlan_tci, vlan_tpid) = tpacket3_hdr.unpack_from(ring, pos)
+            start = pos + tp_mac
+            if vlan_tci != 0 or tp_status & TP_STATUS_VLAN_VALID:
+                # Insert VLAN tag
+                if not tp_status & TP_STATUS_VLAN_TPID_VALID:
+                    vlan_tpid = ETH_P_8021Q
+                tag = struct.pack("!HH", vlan_tpid, vlan_tci)
+                frames.append(ring[start:start + 12] + tag + ring[start + 12:start + snaplen])
+            else:
+                frames.append(ring[start:start + snaplen])
+            pos = pos + next_offset
+
+        # hand over the block back to the kernel
+        struct.pack_into("I", ring, offset + TPACKET3_BLOCK_STATUS, TP_STATUS_KERNEL)
+        self.index = (self.index + 1) % self.block_nr
+        return frames
+
+    def close(self):
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+        self.sk.close()
+
+
+class TxRing(object):
+    """
+    AF_PACKET socket with PACKET_TX_RING
+
+    The frames are copied into the ring by put and the kernel sends
+    all of them when flush is called.
+    @iface Interface to send the frames
+    @frame_size Size of each ring frame, must be a multiple of the page size
+    @frame_nr Number of ring frames
+    """
+
+    def __init__(self, iface, frame_size=16384, frame_nr=64):
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self.max_len = frame_size - TPACKET2_HDRLEN
+        self.index = 0
+        self.pending = 0
+        self.ring = None
+        self.sk = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self.sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            # skip the malformed frames instead of stopping the ring
+            self.sk.setsockopt(SOL_PACKET, PACKET_LOSS, 1)
+            req = struct.pack("IIII", frame_size, frame_nr, frame_size, frame_nr)
+            self.sk.setsockopt(SOL_PACKET, PACKET_TX_RING, req)
+            self.sk.bind((iface, 0))
+            self.ring = mmap.mmap(self.sk.fileno(), frame_size * frame_nr,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sk.close()
+            raise
+
+    def put(self, data):
+        """
+        Queue the frame, the ring is flushed when it is full
+        @data Frame bytes
+        Returns False if the frame can't be queued
+        """
+        if len(data) > self.max_len:
+            return False
+        offset = self.index * self.frame_size
+        if struct.unpack_from("I", self.ring, offset)[0] != TP_STATUS_AVAILABLE:
+            self.flush()
+            if struct.unpack_from("I", self.ring, offset)[0] != TP_STATUS_AVAILABLE:
+                return False
+        start = offset + TPACKET2_HDRLEN
+        self.ring[start:start + len(data)] = data
+        # tp_len and then tp_status, the kernel sends the frame once the status is set
+        struct.pack_into("I", self.ring, offset + 4, len(data))
+        struct.pack_into("I", self.ring, offset, TP_STATUS_SEND_REQUEST)
+        self.index = (self.index + 1) % self.frame_nr
+        self.pending = self.pending + 1
+        if self.pending >= self.frame_nr:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Send the queued frames, waits till the kernel sends all of them
+        Returns the number of frames sent
+        """
+        pending = self.pending
+        if pending:
+            self.sk.send(b"")
+            self.pending = 0
+        return pending
+
+    def close(self):
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+        self.sk.close()
@@ -8,6 +8,7 @@ from or_event import OrEvent
 from utils import Utils
 from logger import Logger
 from lock import Lock
+from stats import StatsBatch
 
 
 def isLinkUp(intf, dbg=False):
@@ -121,9 +122,9 @@ class ScapyDriver(object):
             # read packets
             while self.rx_any_enable():
                 try:
-                    packet = self.packet.readp(self.iface, self.port)
-                    if packet:
-                        self.handle_recv(packet)
+                    packets = self.packet.readp_block(self.iface, self.port)
+                    if packets:
+                        self.handle_recv(packets)
                 except Exception as e:
                     if str(e) != "[Errno 100] Network is down":
                         self.logger.debug(e, traceback.format_exc())
@@ -145,28 +146,33 @@ class ScapyDriver(object):
                 self.packet.set_link(status)
             self.iface_status = status
 
-    def handle_stats(self, packet):
-        pktlen = 0 if not packet else len(packet)
-        framesReceived = self.port.incrStat('framesReceived')
-        self.port.incrStat('bytesReceived', pktlen)
+    def handle_stats(self, packets):
+        # the counters of the packets are updated together
+        batch = StatsBatch()
+        signatures = self.packet.stream_signatures(self.port.track_streams)
+        for packet in packets:
+            pktlen = 0 if not packet else len(packet)
+            batch.add(self.port, 'framesReceived')
+            batch.add(self.port, 'bytesReceived', pktlen)
+            if pktlen > 1518:
+                batch.add(self.port, 'oversizeFramesReceived')
+            stream = self.packet.lookup_stream(signatures, packet)
+            if stream:
+                batch.add(stream, 'framesReceived')
+                batch.add(stream, 'bytesReceived', pktlen)
+        batch.apply()
         if self.dbg > 2:
+            framesReceived = self.port.getStats().framesReceived
             self.logger.debug("{} framesReceived: {}".format(self.iface, framesReceived))
-        if pktlen > 1518:
-            self.port.incrStat('oversizeFramesReceived')
-        for stream in self.port.track_streams:
-            if self.packet.match_stream(stream, packet):
-                stream.incrStat('framesReceived')
-                stream.incrStat('bytesReceived', pktlen)
-                break  # no need to check in other streams
-
-    def handle_capture(self, packet):
-        self.pkts_captured.append(packet)
-
-    def handle_recv(self, packet):
+
+    def handle_capture(self, packets):
+        self.pkts_captured.extend(packets)
+
+    def handle_recv(self, packets):
         if self.statState.is_set():
-            self.handle_stats(packet)
+            self.handle_stats(packets)
         if self.captureState.is_set():
-            self.handle_capture(packet)
+            self.handle_capture(packets)
 
     def txInit(self):
         self.txState = threading.Event()
@@ -444,6 +450,7 @@ class ScapyDriver(object):
                     pwa_next.tx_time = self.utils.clock() + ipg - build_time - send_time
                     pwa_next_list.append(pwa_next)
             pwa_list = pwa_next_list
+        self.packet.flush()
         self.logger.debug("{} {} Completed {}".format(func, self.iface, tx_count))
 
     def pwa_sort(self, pwa):
@@ -454,6 +461,9 @@ class ScapyDriver(object):
         if self.dbg > 2 or (self.dbg > 1 and pwa.left != 0):
             self.logger.debug("stream: {} delay: {} pps: {}".format(pwa.stream.stream_id, delay, pwa.rate_pps))
         delay = 0 if delay < 0 else delay
+        if delay > 0:
+            # send the queued packets before waiting
+            self.packet.flush()
         if delay > 1.0 / 10:
             self.utils.msleep(delay * 1000, 10)
         elif delay > 1.0 / 100:
@@ -466,7 +476,7 @@ class ScapyDriver(object):
             self.utils.usleep(delay * 1000 * 1000)
 
     def send_packet(self, pwa, stream_name):
-        return self.packet.send_packet(pwa, self.iface, stream_name, pwa.left)
+        return self.packet.send_packet(pwa, self.iface, stream_name, pwa.left, self.packet.fast_path)
 
     def createInterface(self, intf):
         return self.packet.if_create(intf)
@@ -0,0 +1,176 @@
+"""
+Stream packet templates
+
+The stream packet is built by scapy only once, the built bytes are kept
+as a template. The fields changed by build_next_dma, i.e. MAC/IP/IPv6
+addresses, VLAN ID and TCP/UDP ports, are patched in the template bytes
+for the next packets and the checksums covering them are updated
+incrementally as per RFC 1624 instead of building the packet again.
+"""
+
+import zlib
+import struct
+import socket
+
+from scapy.packet import Raw, Padding
+from scapy.layers.l2 import Ether, Dot1Q, ARP
+from scapy.layers.inet import IP, UDP, TCP, ICMP
+from scapy.layers.inet6 import IPv6
+
+# the packets having any other layer are always built by scapy
+patchable_layers = (Ether, Dot1Q, ARP, IP, IPv6, TCP, UDP, ICMP, Raw, Padding)
+
+# stream mode option, layer, field, offset of the field in the layer
+patchable_fields = [
+    ("mac_src_mode", Ether, "src", 6),
+    ("mac_dst_mode", Ether, "dst", 0),
+    ("arp_src_hw_mode", ARP, "hwsrc", 8),
+    ("arp_dst_hw_mode", ARP, "hwdst", 18),
+    ("ip_src_mode", IP, "src", 12),
+    ("ip_dst_mode", IP, "dst", 16),
+    ("ipv6_src_mode", IPv6, "src", 8),
+    ("ipv6_dst_mode", IPv6, "dst", 24),
+    ("vlan_id_mode", Dot1Q, "vlan", 0),
+    ("tcp_src_port_mode", TCP, "sport", 0),
+    ("tcp_dst_port_mode", TCP, "dport", 2),
+    ("udp_src_port_mode", UDP, "sport", 0),
+    ("udp_dst_port_mode", UDP, "dport", 2),
+]
+
+# offset of the checksum in the layer
+checksum_offsets = {IP: 10, TCP: 16, UDP: 6}
+
+
+def frame_crc(data):
+    return struct.pack("!I", socket.htonl(zlib.crc32(data) & 0xFFFFFFFF))
+
+
+def checksum_update(csum, old, new):
+    """
+    Update the 16-bit one's complement checksum (RFC 1624 Eqn. 3)
+    @csum Current checksum
+    @old Old bytes of the field, 16-bit aligned in the checksum data
+    @new New bytes of the field
+    """
+    fmt = "!{}H".format(len(old) // 2)
+    total = ~csum & 0xFFFF
+    for word in struct.unpack(fmt, old):
+        total = total + (~word & 0xFFFF)
+    total = total + sum(struct.unpack(fmt, new))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def encode_field(layer, name):
+    if isinstance(layer, Dot1Q):
+        # the VLAN ID is the lower 12 bits of TCI
+        prio, dei, vlan = [layer.getfieldval(fld.name) for fld in layer.fields_desc[:3]]
+        return struct.pack("!H", ((prio & 0x7) << 13) | ((dei & 0x1) << 12) | (vlan & 0xFFF))
+    return layer.get_field(name).addfield(layer, b"", layer.getfieldval(name))
+
+
+class PatchField(object):
+
+    def __init__(self, layer, name, offset, value, checksums):
+        self.layer = layer
+        self.name = name
+        self.offset = offset
+        self.value = value
+        # (offset of the checksum, zero checksum means not used)
+        self.checksums = checksums
+
+
+class PacketTemplate(object):
+    """
+    Bytes of the stream packet with the fields to be patched
+    """
+
+    def __init__(self, pkt, frame, fields):
+        self.pkt = pkt
+        self.buf = bytearray(frame)
+        self.fields = fields
+
+    @staticmethod
+    def create(pkt, frame, kws):
+        """
+        Create the template of the stream packet
+        @pkt Scapy packet, the fields are read from its layers
+        @frame Bytes of the packet without CRC
+        @kws Stream options
+        Returns None if the packet can't be patched
+        """
+        layers, layer = [], pkt
+        while layer:
+            if not isinstance(layer, patchable_layers):
+                return None
+            layers.append(layer)
+            layer = layer.payload
+        if not layers or not isinstance(layers[0], Ether):
+            return None
+
+        # offset of each layer in the frame
+        built = bytes(pkt)
+        offsets = {}
+        for layer in layers:
+            offsets[id(layer)] = len(built) - len(bytes(layer))
+
+        # the bytes after the stream signature is inserted can't be patched
+        if len(built) != len(frame):
+            return None
+        limit = len(frame)
+        for index, (byte1, byte2) in enumerate(zip(bytearray(frame), bytearray(built))):
+            if byte1 != byte2:
+                limit = index
+                break
+
+        fields = []
+        for mode, cls, name, offset in patchable_fields:
+            if kws.get(mode, "fixed").strip() == "fixed":
+                continue
+            layer = layers[0] if cls is Ether else pkt.getlayer(cls)
+            if layer is None:
+                continue
+            if cls is ARP and (layer.hwlen not in [None, 6] or layer.plen not in [None, 4]):
+                return None
+            offset = offsets[id(layer)] + offset
+            value = encode_field(layer, name)
+            if frame[offset:offset + len(value)] != value:
+                return None
+            checksums = []
+            if isinstance(layer, IP) and layer.chksum is None:
+                checksums.append((offsets[id(layer)] + checksum_offsets[IP], False))
+            for l4 in [TCP, UDP]:
+                l4_layer = pkt.getlayer(l4)
+                if l4_layer is None or l4_layer.chksum is not None:
+                    continue
+                # the addresses of IP/IPv6 layer are in the pseudo header
+                if l4_layer is layer or (cls in [IP, IPv6] and l4_layer.underlayer is layer):
+                    checksums.append((offsets[id(l4_layer)] + checksum_offsets[l4], l4 is UDP))
+            if max([offset + len(value)] + [csum + 2 for csum, _ in checksums]) > limit:
+                return None
+            fields.append(PatchField(layer, name, offset, value, checksums))
+
+        return PacketTemplate(pkt, frame, fields)
+
+    def render(self):
+        """
+        Patch the changed fields and return the frame bytes with CRC
+        """
+        buf = self.buf
+        for field in self.fields:
+            value = encode_field(field.layer, field.name)
+            if value == field.value:
+                continue
+            for offset, zero_is_none in field.checksums:
+                csum = (buf[offset] << 8) | buf[offset + 1]
+                if zero_is_none and csum == 0:
+                    continue
+                csum = checksum_update(csum, field.value, value)
+                if zero_is_none and csum == 0:
+                    csum = 0xFFFF
+                buf[offset:offset + 2] = struct.pack("!H", csum)
+            buf[field.offset:field.offset + len(value)] = value
+            field.value = value
+        data = bytes(buf)
+        return data + frame_crc(data)
@@ -1,5 +1,4 @@
 import os
-import zlib
 import time
 import copy
 import random
@@ -31,6 +30,7 @@ from interface import PacketInterface
 from bgp_exabgp import ExaBgp
 from dot1x import Dot1x
 from dhcps import Dhcps
+from fastpath import PacketTemplate, frame_crc
 
 try:
     print("SCAPY VERSION = {}".format(Conf().version))
@@ -143,14 +143,21 @@ class ScapyPacket(object):
         self.dbg = dbg
         self.show_summary = bool(self.dbg > 2)
         self.hex = bool(os.getenv("SPYTEST_SCAPY_HEXDUMP", "0") != "0")
+        self.fast_path = bool(os.getenv("SPYTEST_SCAPY_FAST_PATH", "0") != "0")
+        self.tx_ring_size = self.utils.get_env_int("SPYTEST_SCAPY_TX_RING_SIZE", 64)
+        # 0: no RX ring, 1: RX ring on all ports, or the comma separated interfaces
+        self.rx_ring_ifaces = os.getenv("SPYTEST_SCAPY_RX_RING", "0").strip()
         self.iface = iface
         self.is_vde = not dry and iface.startswith("vde")
         self.stats_lock = Lock()
         self.tx_count = 0
         self.rx_count = 0
         self.rx_sock = None
+        self.rx_ring = None
         self.tx_sock = None
         self.tx_sock_failed = False
+        self.tx_ring = None
+        self.tx_ring_failed = False
         self.finished = False
         self.mtu = 9194
         self.use_bridge = bool(os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1") != "0")
@@ -262,14 +269,31 @@ class ScapyPacket(object):
         self.dhcps.cleanup()
         self.finished = True
         self.rx_sock = self.close_sock(self.rx_sock)
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
+        self.tx_ring = self.close_sock(self.tx_ring)
+        self.tx_ring_failed = False
         self.init_bridge(self.iface)
         self.finished = False
 
+    def use_rx_ring(self):
+        if self.rx_ring_ifaces in ["0", ""]:
+            return False
+        if self.rx_ring_ifaces == "1":
+            return True
+        return self.iface in [iface.strip() for iface in self.rx_ring_ifaces.split(",")]
+
     def rx_open(self):
         if not self.iface or self.dry:
             return
+        if self.use_rx_ring():
+            try:
+                self.rx_ring = afpacket.RxRing(self.iface + "-rx")
+                self.logger.info("using RX ring on {}".format(self.iface))
+                return
+            except Exception as exp:
+                self.logger.error("Failed to create RX ring {} {}".format(self.iface, exp))
         ETH_P_ALL = 3
         self.rx_sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
         self.rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 12 * 1024)
@@ -302,12 +326,45 @@ class ScapyPacket(object):
             if self.finished:
                 return None
             raise exp
-        packet = Ether(data)
         self.stats_lock.acquire()
         self.rx_count = self.rx_count + 1
         self.stats_lock.release()
         self.trace_stats()
 
+        return self.rx_frame(iface, port, data)
+
+    def readp_block(self, iface, port):
+        """
+        Read the frames of a block from the RX ring
+        Reads a single frame when the RX ring is not used
+        """
+        if not self.rx_ring:
+            packet = self.readp(iface, port)
+            return [] if packet is None else [packet]
+
+        try:
+            frames = self.rx_ring.recv(1)
+        except Exception as exp:
+            if self.finished:
+                return []
+            raise exp
+        if not frames:
+            return []
+        self.stats_lock.acquire()
+        self.rx_count = self.rx_count + len(frames)
+        self.stats_lock.release()
+        self.trace_stats()
+
+        return [self.rx_frame(iface, port, data) for data in frames]
+
+    def rx_frame(self, iface, port, data):
+
+        # in fast path the frame is dissected only when needed
+        # stats and captures work with the frame bytes
+        packet = None
+        if not self.fast_path or self.dbg > 3 or self.show_summary or self.pp.rx_enabled(port):
+            packet = Ether(data)
+
         if self.dbg > 1:
             cmd = "" if not self.show_summary else packet.command()
             msg = "readp:{} len:{} count:{} {}".format
@@ -319,24 +376,61 @@ class ScapyPacket(object):
         # handle protocol packets
         self.pp.process(port, packet)
 
-        return packet
+        return data if packet is None else packet
 
-    def sendp(self, pkt, data, iface, stream_name, left):
+    def sendp(self, pkt, data, iface, stream_name, left, defer=False):
         self.stats_lock.acquire()
         self.tx_count = self.tx_count + 1
         self.stats_lock.release()
         self.trace_stats()
 
         if self.dbg > 2 or (self.dbg > 1 and left != 0):
-            cmd = "" if not self.show_summary else pkt.command()
+            cmd = "" if not self.show_summary else (pkt or Ether(data)).command()
             msg = "sendp:{}:{} len:{} count:{} {}".format
             self.logger.debug(msg(iface, stream_name, len(data), self.tx_count, cmd))
 
         if self.dbg > 3:
-            self.trace_packet(pkt, self.hex)
+            self.trace_packet(pkt or Ether(data), self.hex)
+
+        if defer and self.queue(data, iface):
+            return None
 
         return self.send(data, iface)
 
+    def queue(self, data, iface):
+        """
+        Queue the frame in TX ring, the queued frames are sent by flush
+        Returns False if the frame needs to be sent directly
+        """
+        if self.dry or self.tx_ring_failed:
+            return False
+
+        if not self.tx_ring:
+            try:
+                self.tx_ring = afpacket.TxRing(iface, frame_nr=self.tx_ring_size)
+            except Exception as exp:
+                self.tx_ring_failed = True
+                self.logger.debug("Failed to create TX ring {} {}".format(iface, exp))
+                return False
+
+        try:
+            if self.tx_ring.put(data):
+                return True
+            # send the queued frames first to keep the order
+            self.tx_ring.flush()
+        except Exception as exp:
+            self.logger.error(self.expmsg(data, iface, exp, "ring-send"))
+        return False
+
+    def flush(self):
+        if not self.tx_ring:
+            return 0
+        try:
+            return self.tx_ring.flush()
+        except Exception as exp:
+            self.logger.error("Failed to flush TX ring {} {}".format(self.iface, exp))
+        return 0
+
     def mkcmd(self, data):
         try:
             pkt = Ether(data)
@@ -413,7 +507,7 @@ class ScapyPacket(object):
         if hex:
             self.logger.debug(hexdump(pkt, dump=True))
 
-    def send_packet(self, pwa, iface, stream_name, left):
+    def build_frame(self, pwa):
         if pwa.padding:
             strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
         else:
@@ -427,13 +521,23 @@ class ScapyPacket(object):
                 sid = binascii.unhexlify(sid)
                 strpkt = strpkt[:-len(sid)] + sid
 
-        try:
-            crc1 = '{:08x}'.format(socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
-            crc = binascii.unhexlify(crc1)
-        except Exception:
-            crc = binascii.unhexlify('00' * 4)
-        bstr = strpkt + self.utils.tobytes(crc)
-        self.sendp(Ether(bstr), bstr, iface, stream_name, left)
+        return strpkt
+
+    def send_packet(self, pwa, iface, stream_name, left, defer=False):
+        template = pwa.get("template")
+        if template and template.pkt is pwa.pkt and not pwa.padding:
+            # fast path: patch the changed fields in the template
+            bstr = template.render()
+        else:
+            strpkt = self.build_frame(pwa)
+            try:
+                crc = frame_crc(strpkt)
+            except Exception:
+                crc = binascii.unhexlify('00' * 4)
+            bstr = strpkt + crc
+            if self.fast_path and pwa.length_mode == "fixed" and not pwa.padding:
+                pwa.template = PacketTemplate.create(pwa.pkt, strpkt, pwa.stream.kws)
+        self.sendp(None, bstr, iface, stream_name, left, defer)
         return bstr
 
     def check(self, pkt):
@@ -1238,6 +1342,26 @@ class ScapyPacket(object):
             self.trace_packet(pkt, hex=True, force=True)
         return False
 
+    def stream_signatures(self, streams):
+        """
+        Map the signatures to the streams for lookup_stream
+        """
+        signatures = {}
+        for stream in streams:
+            sid = stream.get_sid()
+            if sid:
+                sid = binascii.unhexlify(sid)
+                signatures.setdefault(len(sid), {}).setdefault(sid, stream)
+        return signatures
+
+    def lookup_stream(self, signatures, pkt):
+        strpkt = self.utils.tobytes(pkt)
+        for size, streams in signatures.items():
+            stream = streams.get(strpkt[-size - 4:-4])
+            if stream:
+                return stream
+        return None
+
     def if_create(self, intf):
         return self.pi.if_create(intf)
 
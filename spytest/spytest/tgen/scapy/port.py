@@ -16,6 +16,11 @@ def incrStat(stats, name, val=1):
     return val
 
 
+def incrStats(stats, vals):
+    for name, val in vals.items():
+        incrStat(stats, name, val)
+
+
 class ScapyStream(object):
     def __init__(self, port, index, stream_id, track_ports, *args, **kws):
         self.port = port
@@ -54,6 +59,11 @@ class ScapyStream(object):
         # print("incrStat: {} {} {} = {}".format(self.port, self.stream_id, name, val))
         return val
 
+    def incrStats(self, vals):
+        self.stats_lock.acquire()
+        incrStats(self.stats, vals)
+        self.stats_lock.release()
+
     def clearStat(self, name):
         self.stats_lock.acquire()
         old = self.stats[name]
@@ -302,6 +312,11 @@ class ScapyPort(object):
         self.stats_lock.release()
         return rv
 
+    def incrStats(self, vals):
+        self.stats_lock.acquire()
+        incrStats(self.stats, vals)
+        self.stats_lock.release()
+
     def getStats(self):
         self.stats_lock.acquire()
         rv = self.stats
@@ -32,8 +32,25 @@ class PacketProtocol(object):
     def __del__(self):
         pass
 
+    def rx_enabled(self, port):
+        if port.dhcp_clients or port.dot1x_clients:
+            return True
+        for intf in port.interfaces.values():
+            if intf.ospf_sessions or intf.igmp_queriers or intf.igmp_hosts:
+                return True
+        return False
+
     def process(self, port, pkt):
 
+        # pkt is None when none of the handlers is enabled
+        if pkt is not None:
+            self.process_rx(port, pkt)
+
+        self.igmp_tx_query_periodic(port)
+        self.dot1x_tx_periodic(port)
+
+    def process_rx(self, port, pkt):
+
         if IP in pkt and pkt.proto == 89:
             self.ospf_rx(port, pkt)
 
@@ -46,9 +63,6 @@ class PacketProtocol(object):
         if EAP in pkt:
             self.dot1x_rx(port, pkt)
 
-        self.igmp_tx_query_periodic(port)
-        self.dot1x_tx_periodic(port)
-
     def pkt_write(self, file_path, pkt, append):
         try:
             self.logger.write_pcap(pkt, append=True, filename=file_path)
@@ -0,0 +1,114 @@
+"""
+Benchmark of the AF_PACKET receive backends over a veth pair
+
+The frames are sent on one end of the veth pair using TX ring and received
+on the other end using either the per frame recvmsg (afpacket.recv) or the
+TPACKET_V3 RX ring (afpacket.RxRing). Needs root to create the veth pair.
+
+    python rx_bench.py --backend ring --duration 10 --size 128
+"""
+
+import os
+import time
+import socket
+import argparse
+import threading
+
+import afpacket
+
+
+def os_system(cmd):
+    print("EXEC: {}".format(cmd))
+    return os.system(cmd)
+
+
+def make_frame(size):
+    header = b"\xff" * 6 + b"\x02\x00\x00\x00\x00\x01" + b"\x88\xb5"
+    return header + b"\x00" * (size - len(header))
+
+
+def is_bench_frame(data):
+    return data[6:14] == b"\x02\x00\x00\x00\x00\x01\x88\xb5"
+
+
+class Receiver(object):
+
+    def __init__(self, iface, backend):
+        self.backend = backend
+        self.frames = 0
+        self.bytes = 0
+        self.finished = False
+        if backend == "ring":
+            self.ring = afpacket.RxRing(iface)
+        else:
+            ETH_P_ALL = 3
+            self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 12 * 1024)
+            self.sock.bind((iface, ETH_P_ALL))
+            self.sock.settimeout(0.2)
+            afpacket.enable_auxdata(self.sock)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def recv(self):
+        if self.backend == "ring":
+            return self.ring.recv(0.2)
+        try:
+            return [afpacket.recv(self.sock, 12 * 1024)]
+        except Exception:
+            return []
+
+    def run(self):
+        while not self.finished:
+            frames, size = 0, 0
+            for data in self.recv():
+                if is_bench_frame(data):
+                    frames = frames + 1
+                    size = size + len(data)
+            self.frames = self.frames + frames
+            self.bytes = self.bytes + size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AF_PACKET receive benchmark")
+    parser.add_argument("--backend", choices=["socket", "ring"], default="ring")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to send")
+    parser.add_argument("--size", type=int, default=128, help="frame size")
+    parser.add_argument("--iface", default="rxbench", help="prefix of the veth pair names")
+    args = parser.parse_args()
+
+    tx_iface, rx_iface = args.iface + "0", args.iface + "1"
+    os_system("ip link add {} type veth peer name {}".format(tx_iface, rx_iface))
+    try:
+        os_system("ip link set dev {} up".format(tx_iface))
+        os_system("ip link set dev {} up".format(rx_iface))
+        receiver = Receiver(rx_iface, args.backend)
+        receiver.thread.start()
+        ring = afpacket.TxRing(tx_iface)
+        frame = make_frame(args.size)
+
+        sent, start = 0, time.time()
+        while time.time() - start < args.duration:
+            for _ in range(ring.frame_nr):
+                if ring.put(frame):
+                    sent = sent + 1
+            ring.flush()
+        elapsed = time.time() - start
+
+        # wait for the last block
+        time.sleep(0.5)
+        receiver.finished = True
+        receiver.thread.join()
+        ring.close()
+
+        dropped = sent - receiver.frames
+        print("backend: {} frame size: {} duration: {:.1f}s".format(args.backend, args.size, elapsed))
+        print("sent: {} ({:.0f} pps)".format(sent, sent / elapsed))
+        print("received: {} ({:.0f} pps)".format(receiver.frames, receiver.frames / elapsed))
+        print("dropped: {} ({:.2f}%)".format(dropped, 100.0 * dropped / max(sent, 1)))
+    finally:
+        os_system("ip link del {}".format(tx_iface))
+
+
+if __name__ == "__main__":
+    main()
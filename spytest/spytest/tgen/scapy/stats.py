@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from dicts import SpyTestDict
 
 
@@ -111,3 +113,24 @@ def dhcps_stats_aggregate_init(port_name):
     res.nak_sent = 0
     res.solicits_ignored = 0
     return res
+
+
+class StatsBatch(object):
+    """
+    Counters accumulated for a batch of frames
+
+    The counters are added to the port/stream stats with a single
+    incrStats call per port/stream when the batch is applied.
+    """
+
+    def __init__(self):
+        self.counters = OrderedDict()
+
+    def add(self, target, name, val=1):
+        vals = self.counters.setdefault(target, OrderedDict())
+        vals[name] = vals.get(name, 0) + val
+
+    def apply(self):
+        for target, vals in self.counters.items():
+            target.incrStats(vals)
+        self.counters.clear()
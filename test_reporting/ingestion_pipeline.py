@@ -0,0 +1,242 @@
+"""Batched, compressed and resumable ingestion of test report data.
+
+The rows uploaded to a table are batched up to IngestionPipeline.BATCH_SIZE bytes of JSON lines. Each batch
+is gzip-compressed once into a file and ingested by all the ingestion clients concurrently, e.g. by the
+primary and the backup Kusto clusters.
+
+The batches acknowledged by each client are recorded in a journal file. The batches of a table are numbered
+in the order they are made, so when an interrupted upload is run again with the same journal and the same
+data, the batches already acknowledged by a client are skipped and the upload resumes from there.
+
+The ingestion clients only need an ingest_from_file(path, ingestion_properties=...) method, so the pipeline
+can be used with any fake client, see tests/test_ingestion_pipeline.py.
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class IngestionError(Exception):
+    """Errors of the batches which could not be ingested."""
+
+
+class IngestionJournal:
+    """Journal of the batches acknowledged by the ingestion clients.
+
+    The journal is a JSON lines file, each line is either an acknowledged batch or a value of the run, e.g.
+    the report GUID which has to be the same when the upload is resumed. Without path the journal is only
+    kept in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._acked = {}
+        self._values = {}
+        if not path or not os.path.exists(path):
+            return
+
+        line = ""
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line is truncated if the upload was killed while writing it.
+                    continue
+                if "key" in entry:
+                    self._values[entry["key"]] = entry["value"]
+                else:
+                    self._acked[(entry["table"], entry["batch"], entry["client"])] = entry["rows"]
+
+        if line and not line.endswith("\n"):
+            with open(path, "a") as f:
+                f.write("\n")
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def setdefault(self, key, value):
+        """Returns the value of the key recorded by a previous run, else records the given value."""
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = value
+                self._append({"key": key, "value": value})
+            return self._values[key]
+
+    def is_acked(self, table, batch, client, rows):
+        return self._acked.get((table, batch, client)) == rows
+
+    def ack(self, table, batch, client, rows):
+        with self._lock:
+            self._acked[(table, batch, client)] = rows
+            self._append({"table": table, "batch": batch, "client": client, "rows": rows})
+
+
+class IngestionPipeline:
+    """Batch the rows of each table and ingest the batches concurrently.
+
+    Args:
+        clients: Dict of client name => ingestion client, the None clients are ignored.
+        properties: Function returning the ingestion properties of a table.
+        journal: The IngestionJournal of the acknowledged batches.
+        batch_size: Size in bytes of JSON lines of a batch.
+        max_workers: Number of batches compressed and ingested at once, adding rows blocks while as many other
+            batches are waiting for them.
+        retries: Number of retries of a failed ingestion, with exponential backoff from retry_delay.
+    """
+
+    BATCH_SIZE = 64 * 1024 * 1024
+
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, clients, properties, journal=None, batch_size=None, max_workers=4, retries=3,
+                 retry_delay=5.0):
+        self.clients = {name: client for name, client in clients.items() if client is not None}
+        self.properties = properties
+        self.journal = journal or IngestionJournal()
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self._rows = {}
+        self._sizes = {}
+        self._batches = {}
+        self._futures = []
+        # Batches made but not ingested yet, they are kept in memory until ingested.
+        self._pending = threading.BoundedSemaphore(2 * max_workers)
+        self._batch_executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._ingest_executor = ThreadPoolExecutor(max_workers=max_workers * max(1, len(self.clients)))
+        self._work_dir = tempfile.mkdtemp(prefix="ingestion_")
+
+    def add(self, table, data):
+        """Add a row or a list of rows to the current batch of the table."""
+        rows = data if isinstance(data, list) else [data]
+        lines = self._rows.setdefault(table, [])
+        for row in rows:
+            line = json.dumps(row)
+            lines.append(line)
+            self._sizes[table] = self._sizes.get(table, 0) + len(line) + 1
+            if self._sizes[table] >= self.batch_size:
+                self.flush(table)
+                lines = self._rows.setdefault(table, [])
+
+    def add_file(self, table, path, properties=None, clients=None):
+        """Ingest a file as a batch of its own.
+
+        Args:
+            properties: The ingestion properties, the ones of the table by default.
+            clients: The names of the clients ingesting the file, all of them by default.
+        """
+        with open(path, "rb") as f:
+            rows = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1024 * 1024), b""))
+        self._submit(table, rows, None, path, properties, clients)
+
+    def flush(self, table=None):
+        """Make a batch of the rows added to the table, or to all the tables."""
+        for name in [table] if table else list(self._rows):
+            lines = self._rows.pop(name, None)
+            self._sizes.pop(name, None)
+            if lines:
+                self._submit(name, len(lines), lines, None, None, None)
+
+    def discard(self, table=None):
+        """Drop the rows added to the table, or to all the tables, which are not in a batch yet.
+
+        E.g. when the data of the table is found incomplete, so that close() doesn't ingest a partial batch.
+        Resuming the upload with the journal ingests them again.
+        """
+        for name in [table] if table else list(self._rows):
+            self._rows.pop(name, None)
+            self._sizes.pop(name, None)
+
+    def close(self):
+        """Ingest the remaining rows and wait for all the batches.
+
+        Raises:
+            IngestionError: if any of the batches could not be ingested.
+        """
+        try:
+            self.flush()
+            wait(self._futures)
+            errors = [future.exception() for future in self._futures if future.exception()]
+        finally:
+            self._batch_executor.shutdown()
+            self._ingest_executor.shutdown()
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+
+        if errors:
+            resume = f", run again with the journal {self.journal.path} to resume" if self.journal.path else ""
+            raise IngestionError(f"{len(errors)} batch(es) could not be ingested{resume}: {errors[0]}") from errors[0]
+
+    def _submit(self, table, rows, lines, source, properties, clients):
+        batch = self._batches.get(table, 0)
+        self._batches[table] = batch + 1
+
+        clients = [name for name in clients or self.clients
+                   if name in self.clients and not self.journal.is_acked(table, batch, name, rows)]
+        if not clients:
+            print(f"Skip batch {batch} of {table}, already ingested")
+            return
+
+        if properties is None:
+            properties = self.properties(table)
+        self._pending.acquire()
+        try:
+            future = self._batch_executor.submit(
+                self._ingest_batch, table, batch, rows, lines, source, properties, clients)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        self._futures.append(future)
+
+    def _ingest_batch(self, table, batch, rows, lines, source, properties, clients):
+        if source and source.endswith((".gz", ".zip")):
+            path = source
+        else:
+            path = os.path.join(self._work_dir, f"{table}_{batch}.json.gz")
+            with gzip.open(path, "wb", compresslevel=self.COMPRESS_LEVEL) as f:
+                if source:
+                    with open(source, "rb") as src:
+                        shutil.copyfileobj(src, f)
+                else:
+                    f.write("\n".join(lines).encode("utf-8"))
+
+        try:
+            futures = [self._ingest_executor.submit(self._ingest, name, table, batch, rows, path, properties)
+                       for name in clients]
+            wait(futures)
+            for future in futures:
+                future.result()
+        finally:
+            if path != source:
+                os.unlink(path)
+
+    def _ingest(self, name, table, batch, rows, path, properties):
+        for attempt in range(self.retries + 1):
+            try:
+                print(f"Ingest batch {batch} of {table} ({rows} rows) to {name} cluster...")
+                self.clients[name].ingest_from_file(path, ingestion_properties=properties)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Ingestion of batch {batch} of {table} to {name} cluster failed with error: {e}")
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                print(f"Ingestion of batch {batch} of {table} to {name} cluster failed with error: {e}, "
+                      f"retry in {delay}s")
+                time.sleep(delay)
+
+        self.journal.ack(table, batch, name, rows)
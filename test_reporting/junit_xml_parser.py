@@ -6,7 +6,8 @@ This library/script should work for any test result XML file generated by Pytest
 
 CLI Usage:
 % python3 junit_xml_parser.py -h
-usage: junit_xml_parser.py [-h] [--validate-only] [--compact] [--output-file OUTPUT_FILE] file
+usage: junit_xml_parser.py [-h] [--validate-only] [--compact] [--output-file OUTPUT_FILE] [--ndjson]
+                           [--workers WORKERS] file
 
 Validate and convert SONiC JUnit XML files into JSON.
 
@@ -19,9 +20,18 @@ optional arguments:
 --compact, -c         Output the JSON in a compact form.
 --output-file OUTPUT_FILE, -o OUTPUT_FILE
                         A file to store the JSON output in.
+--ndjson              Output the test result of each XML file as a JSON line as soon as it is parsed.
+--workers WORKERS, -w WORKERS
+                        Number of processes parsing the XML files of a directory.
 
 Examples:
 python3 junit_xml_parser.py tests/files/sample_tr.xml
+python3 junit_xml_parser.py -d --ndjson -o results.ndjson tests/files/sample_archive
+
+The XML files are validated and parsed in one pass with iterparse: each test case is dropped from the
+XML tree as soon as it is parsed, so large system-out blocks are not kept in memory. The test result of each
+XML file is a partial test result JSON with the same sections, merge_test_results() merges them into the
+test result of the whole directory.
 """
 import argparse
 import glob
@@ -30,6 +40,7 @@ import sys
 import os
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from utilities import TestResultJSONValidationError
 from utilities import validate_json_file
@@ -38,8 +49,9 @@ import defusedxml.ElementTree as ET
 
 
 TEST_REPORT_CLIENT_VERSION = (1, 1, 0)
+REPORT_HEADER = "Script Name, Total, Pass, Fail, Skip, Error, XFail, Time"
 REPORT_LIST = list()
-REPORT_LIST.append("Script Name, Total, Pass, Fail, Skip, Error, XFail, Time")
+REPORT_LIST.append(REPORT_HEADER)
 
 MAXIMUM_XML_SIZE = 20e7  # 20MB
 MAXIMUM_SUMMARY_SIZE = 1024  # 1MB
@@ -94,6 +106,9 @@ REQUIRED_TESTCASE_PROPERTIES = [
 
 REQUIRED_TESTCASE_JSON_FIELDS = ["result", "error", "summary"]
 
+# Elements whose text is not used, dropped as soon as they are parsed.
+OUTPUT_TAGS = {"system-out", "system-err"}
+
 
 class JUnitXMLValidationError(Exception):
     """Expected errors that are thrown while validating the contents of the JUnit XML file."""
@@ -141,11 +156,7 @@ def validate_junit_xml_file(document_name):
             - The provided file is unparseable
             - The provided file is missing required fields
     """
-    if not os.path.exists(document_name) or not os.path.isfile(document_name):
-        raise JUnitXMLValidationError("file not found")
-
-    if os.path.getsize(document_name) > MAXIMUM_XML_SIZE:
-        raise JUnitXMLValidationError("provided file is too large")
+    _check_junit_xml_file(document_name)
 
     try:
         tree = ET.parse(document_name, forbid_dtd=True)
@@ -155,6 +166,35 @@ def validate_junit_xml_file(document_name):
     return _validate_junit_xml(tree.getroot())
 
 
+def _check_junit_xml_file(document_name):
+    if not os.path.exists(document_name) or not os.path.isfile(document_name):
+        raise JUnitXMLValidationError("file not found")
+
+    if os.path.getsize(document_name) > MAXIMUM_XML_SIZE:
+        raise JUnitXMLValidationError("provided file is too large")
+
+
+def _list_junit_xml_archive(directory_name):
+    if not os.path.exists(directory_name) or not os.path.isdir(directory_name):
+        print("directory {} not found".format(directory_name))
+        return None
+
+    doc_list = set(glob.glob(os.path.join(directory_name, "**", "*.xml"), recursive=True))
+
+    total_size = 0
+    for document in doc_list:
+        total_size += os.path.getsize(document)
+
+    if total_size > MAXIMUM_XML_SIZE:
+        raise JUnitXMLValidationError("provided directory is too large")
+
+    return doc_list
+
+
+def _required_metadata(metadata):
+    return {k: v for k, v in metadata.items() if k in REQUIRED_METADATA_PROPERTIES and k != "timestamp"}
+
+
 def validate_junit_xml_archive(directory_name, strict=False):
     """Validate that an XML archive contains valid JUnit XML.
 
@@ -171,27 +211,18 @@ def validate_junit_xml_archive(directory_name, strict=False):
             - Any of the provided files are unparseable
             - Any of the provided files are missing required fields
     """
-    if not os.path.exists(directory_name) or not os.path.isdir(directory_name):
-        print("directory {} not found".format(directory_name))
+    doc_list = _list_junit_xml_archive(directory_name)
+    if doc_list is None:
         return
 
     roots = []
     metadata_source = None
     metadata = {}
-    doc_list = set(glob.glob(os.path.join(directory_name, "**", "*.xml"), recursive=True))
-
-    total_size = 0
-    for document in doc_list:
-        total_size += os.path.getsize(document)
-
-    if total_size > MAXIMUM_XML_SIZE:
-        raise JUnitXMLValidationError("provided directory is too large")
 
     for document in doc_list:
         try:
             root = validate_junit_xml_file(document)
-            root_metadata = {k: v for k, v in _parse_test_metadata(root).items()
-                             if k in REQUIRED_METADATA_PROPERTIES and k != "timestamp"}
+            root_metadata = _required_metadata(_parse_test_metadata(root))
 
             if root_metadata:
                 # All metadata from a single test run should be identical, so we
@@ -244,6 +275,10 @@ def _validate_test_summary(root):
     else:
         raise JUnitXMLValidationError(f"Either {TESTSUITES_TAG} or {TESTSUITE_TAG} tag are not found on root element")
 
+    _validate_testsuite_attributes(testsuit_element)
+
+
+def _validate_testsuite_attributes(testsuit_element):
     for xml_field, expected_type in REQUIRED_TESTSUITE_ATTRIBUTES:
         if xml_field not in testsuit_element.keys():
             raise JUnitXMLValidationError(f"{xml_field} not found in <{TESTSUITE_TAG}> element")
@@ -259,8 +294,10 @@ def _validate_test_summary(root):
 
 
 def _validate_test_metadata(root):
-    properties_element = root.find(PROPERTIES_TAG)
+    _validate_metadata_properties(root.find(PROPERTIES_TAG))
+
 
+def _validate_metadata_properties(properties_element):
     if not properties_element:
         return
 
@@ -327,16 +364,17 @@ def _validate_test_case_properties(root):
         print("missing testcase property: {}".format(list(missing_testcase_property)))
 
 
-def _validate_test_cases(root):
-    def _validate_test_case(test_case):
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            if attribute not in test_case.keys():
-                raise JUnitXMLValidationError(
-                    f'"{attribute}" not found in test case '
-                    f"\"{test_case.get('name', 'Name Not Found')}\""
-                )
-        _validate_test_case_properties(test_case)
+def _validate_test_case(test_case):
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        if attribute not in test_case.keys():
+            raise JUnitXMLValidationError(
+                f'"{attribute}" not found in test case '
+                f"\"{test_case.get('name', 'Name Not Found')}\""
+            )
+    _validate_test_case_properties(test_case)
+
 
+def _validate_test_cases(root):
     cases = root.findall(TESTCASE_TAG)
 
     for test_case in cases:
@@ -352,7 +390,7 @@ def parse_test_result(roots):
     Returns:
         A dict containing the parsed test result.
     """
-    test_result_json = defaultdict(dict)
+    test_result_json = None
     if not roots:
         print("No XML file needs to be parsed or the file is empty.")
         return
@@ -361,20 +399,282 @@ def parse_test_result(roots):
         if root.tag == TESTSUITES_TAG:
             root = root.find(TESTSUITE_TAG)
 
-        test_result_json["test_metadata"] = _update_test_metadata(test_result_json["test_metadata"],
-                                                                  _parse_test_metadata(root))
         test_cases = _parse_test_cases(root)
-        test_result_json["test_cases"] = _update_test_cases(test_result_json["test_cases"], test_cases)
-        parsed_summary = _parse_test_summary(root)
-        # xfails is not a testsuite root attribute; derive it from the per-case
-        # results so xfailed/xpassed (native pytest marks) are surfaced instead of 0.
-        parsed_summary["xfails"] = _extract_test_summary(test_cases).get("xfails", "0")
-        test_result_json["test_summary"] = _update_test_summary(test_result_json["test_summary"],
-                                                                parsed_summary)
+        report_row = _report_row(test_cases)
+        if report_row:
+            REPORT_LIST.append(report_row)
+        document_result = _test_result(_parse_test_metadata(root), test_cases, _parse_test_summary(root))
+        test_result_json = merge_test_results(test_result_json, document_result)
     print(f"Parsed {len(roots)} XML document(s) into test result JSON.")
     return test_result_json
 
 
+def parse_junit_xml_file(document_name):
+    """Validate and parse an XML file in one pass.
+
+    The file is parsed with iterparse and each test case is dropped as soon as it is parsed.
+
+    Args:
+        document_name: The name of the document.
+
+    Returns:
+        A dict containing the parsed test result, same as parse_test_result().
+
+    Raises:
+        JUnitXMLValidationError: if the file is not valid, same as validate_junit_xml_file().
+    """
+    return _parse_junit_xml_document(document_name)[0]
+
+
+def _parse_junit_xml_document(document_name):
+    _check_junit_xml_file(document_name)
+
+    try:
+        events = ET.iterparse(document_name, events=("start", "end"), forbid_dtd=True)
+        return _parse_junit_xml_events(events)
+    except JUnitXMLValidationError:
+        raise
+    except Exception as e:
+        raise JUnitXMLValidationError(f"could not parse {document_name}: {e}") from e
+
+
+def _parse_junit_xml_events(events):
+    """Validate and parse the iterparse events of an XML document.
+
+    The validation is the same as _validate_junit_xml() on the root element and the parsing the same as
+    parse_test_result() on the first test suite, each direct child of them is removed once it is handled.
+
+    Returns:
+        The parsed test result and the metadata of the root element.
+    """
+    stack = []
+    root = suite = None
+    root_properties = suite_properties = None
+    root_metadata, metadata, summary = {}, {}, None
+    test_cases = defaultdict(list)
+
+    for event, elem in events:
+        if event == "start":
+            if root is None:
+                root = elem
+                if root.tag == TESTSUITE_TAG:
+                    suite = root
+                elif root.tag != TESTSUITES_TAG:
+                    raise JUnitXMLValidationError(
+                        f"Either {TESTSUITES_TAG} or {TESTSUITE_TAG} tag are not found on root element")
+            elif suite is None and len(stack) == 1 and elem.tag == TESTSUITE_TAG:
+                suite = elem
+            if elem is suite:
+                _validate_testsuite_attributes(suite)
+                summary = _parse_test_summary(suite)
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if elem.tag in OUTPUT_TAGS:
+            elem.clear()
+        if not stack:
+            break
+        parent = stack[-1]
+
+        if parent is root:
+            if elem.tag == PROPERTIES_TAG and root_properties is None:
+                root_properties = elem
+                _validate_metadata_properties(elem)
+                root_metadata = _parse_metadata_properties(elem)
+            elif elem.tag == TESTCASE_TAG:
+                _validate_test_case(elem)
+
+        if parent is suite:
+            if elem.tag == PROPERTIES_TAG and suite_properties is None:
+                suite_properties = elem
+                metadata = _parse_metadata_properties(elem)
+            elif elem.tag == TESTCASE_TAG:
+                feature, result = _parse_test_case(elem)
+                if feature is not None and result is not None:
+                    test_cases[feature].append(result)
+
+        if parent is root or parent is suite:
+            parent.remove(elem)
+
+    if suite is None:
+        raise JUnitXMLValidationError(f"{TESTSUITE_TAG} tag not found")
+
+    return _test_result(metadata, dict(test_cases), summary), root_metadata
+
+
+def _test_result(metadata, test_cases, summary):
+    # xfails is not a testsuite root attribute; derive it from the per-case
+    # results so xfailed/xpassed (native pytest marks) are surfaced instead of 0.
+    summary["xfails"] = _extract_test_summary(test_cases).get("xfails", "0")
+    return {
+        "test_metadata": metadata,
+        "test_cases": test_cases,
+        "test_summary": summary,
+    }
+
+
+def _parse_junit_xml_document_safe(document):
+    try:
+        test_result, root_metadata = _parse_junit_xml_document(document)
+        return document, test_result, root_metadata, None
+    except Exception as e:
+        return document, None, None, str(e)
+
+
+def _parse_junit_xml_documents(documents, workers=0):
+    workers = min(workers or os.cpu_count() or 1, len(documents))
+    if workers <= 1:
+        for document in documents:
+            yield _parse_junit_xml_document_safe(document)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(documents) // (workers * 4))
+        for parsed in executor.map(_parse_junit_xml_document_safe, documents, chunksize=chunksize):
+            yield parsed
+
+
+def iter_junit_xml_results(path, strict=False, workers=0):
+    """Validate and parse an XML file or archive, yielding the test result of each XML document.
+
+    The documents of an archive are parsed by a pool of worker processes and the test results are yielded in
+    order as soon as they are parsed. The documents are validated the same as validate_junit_xml_path().
+
+    Args:
+        path: The name of the XML file or of the directory containing XML documents.
+        strict: Fail if any of the documents of the directory is not valid, else skip it.
+        workers: The number of worker processes, the number of CPUs if 0.
+
+    Yields:
+        A dict containing the test result of each document, see merge_test_results().
+
+    Raises:
+        JUnitXMLValidationError: if the file is not valid, see validate_junit_xml_path().
+    """
+    if os.path.isfile(path):
+        yield parse_junit_xml_file(path)
+        return
+
+    doc_list = _list_junit_xml_archive(path)
+    if doc_list is None:
+        return
+
+    count = 0
+    metadata_source = None
+    metadata = {}
+    for document, test_result, root_metadata, error in _parse_junit_xml_documents(sorted(doc_list), workers):
+        if error is None:
+            root_metadata = _required_metadata(root_metadata)
+            if root_metadata:
+                # All metadata from a single test run should be identical, so we
+                # just use the first one we see to validate the rest.
+                if not metadata_source:
+                    metadata_source = document
+                    metadata = root_metadata
+
+                if root_metadata != metadata:
+                    error = (f"{document} metadata differs from {metadata_source}\n"
+                             f"{document}: {root_metadata}\n"
+                             f"{metadata_source}: {metadata}")
+
+        if error is not None:
+            if strict:
+                raise JUnitXMLValidationError(f"could not parse {document}: {error}")
+
+            print(f"could not parse {document}: {error} - skipping")
+            continue
+
+        count += 1
+        yield test_result
+
+    if not count:
+        print("provided directory {} does not contain any valid XML files".format(path))
+
+
+def parse_junit_xml_path(path, strict=False, workers=0):
+    """Validate and parse an XML file or archive into JSON, see iter_junit_xml_results().
+
+    Returns:
+        A dict containing the parsed test result, None if there is no valid XML document.
+    """
+    test_result_json = None
+    count = 0
+    for test_result in iter_junit_xml_results(path, strict, workers):
+        test_result_json = merge_test_results(test_result_json, test_result)
+        count += 1
+
+    if test_result_json is None:
+        print("No XML file needs to be parsed or the file is empty.")
+    else:
+        print(f"Parsed {count} XML document(s) into test result JSON.")
+    return test_result_json
+
+
+def merge_test_results(current, update):
+    """Merge the test results of two sets of XML documents.
+
+    The merge is associative, the test results of the documents can be merged in any grouping. The test
+    cases of update are appended to the ones of current, which is updated in place.
+
+    Args:
+        current: The test result to update, None for the first one.
+        update: The test result to merge into current.
+
+    Returns:
+        The merged test result.
+    """
+    if current is None:
+        return {
+            "test_metadata": update["test_metadata"].copy(),
+            "test_cases": {feature: list(cases) for feature, cases in update["test_cases"].items()},
+            "test_summary": update["test_summary"].copy(),
+        }
+
+    current["test_metadata"] = _update_test_metadata(current["test_metadata"], update["test_metadata"])
+    for feature, cases in update["test_cases"].items():
+        current["test_cases"].setdefault(feature, []).extend(cases)
+    current["test_summary"] = _update_test_summary(current["test_summary"], update["test_summary"])
+    return current
+
+
+def write_test_result_ndjson(test_results, output_file):
+    """Write each test result as a JSON line as soon as it is available.
+
+    Args:
+        test_results: An iterable of test results, e.g. iter_junit_xml_results().
+        output_file: A file object open for writing.
+
+    Returns:
+        The number of test results written.
+    """
+    count = 0
+    for test_result in test_results:
+        output_file.write(json.dumps(test_result, separators=(",", ":"), sort_keys=True) + "\n")
+        output_file.flush()
+        count += 1
+    return count
+
+
+def iter_test_result_ndjson(path):
+    """Read the test results of a file written by write_test_result_ndjson().
+
+    Raises:
+        TestResultJSONValidationError: if a line is not a valid test result.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                test_result = json.loads(line)
+            except ValueError as e:
+                raise TestResultJSONValidationError(f"could not parse line {line_number} of {path}: {e}") from e
+            _validate_json_cases(test_result)
+            _validate_json_summary(test_result)
+            yield test_result
+
+
 def _parse_test_summary(root):
     test_result_summary = {}
     for attribute, _ in REQUIRED_TESTSUITE_ATTRIBUTES:
@@ -384,7 +684,7 @@ def _parse_test_summary(root):
 
 
 def _extract_test_summary(test_cases):
-    test_result_summary = defaultdict(int)
+    test_result_summary = {k: 0 for k in ("tests", "failures", "skipped", "errors", "time", "xfails")}
     for _, cases in test_cases.items():
         for case in cases:
             # Error may occur along with other test results, to count error separately.
@@ -399,25 +699,35 @@ def _extract_test_summary(test_cases):
                 case["result"] == "xfail_failure" or case["result"] == \
                 "xfail_error" or case["result"] == "xfail_skipped" or case["result"] == "xfail_success"
 
-    test_result_summary = {k: str(v) for k, v in test_result_summary.items()}
+    return {k: str(v) for k, v in test_result_summary.items()}
+
+
+def _report_row(test_cases):
+    """Returns the row of the CSV report of the test cases of a document, None if there is no test case."""
+    case = None
+    for cases in test_cases.values():
+        if cases:
+            case = cases[-1]
+    if case is None:
+        return None
+
+    test_result_summary = _extract_test_summary(test_cases)
     total = int(test_result_summary["failures"]) + int(test_result_summary["skipped"]) \
         + int(test_result_summary["errors"]) + int(test_result_summary["xfails"])
     passed = int(test_result_summary["tests"]) - int(total)
     passed = max(0, passed)
-    if case is None:
-        return test_result_summary
     name = case['file']
-    REPORT_LIST.append("{}, {}, {}, {}, {}, {}, {}, {}".
-                       format(name, test_result_summary["tests"],
-                              passed, test_result_summary["failures"],
-                              test_result_summary["skipped"], test_result_summary["errors"],
-                              test_result_summary["xfails"], test_result_summary["time"]))
-    return test_result_summary
+    return "{}, {}, {}, {}, {}, {}, {}, {}".format(name, test_result_summary["tests"],
+                                                   passed, test_result_summary["failures"],
+                                                   test_result_summary["skipped"], test_result_summary["errors"],
+                                                   test_result_summary["xfails"], test_result_summary["time"])
 
 
 def _parse_test_metadata(root):
-    properties_element = root.find(PROPERTIES_TAG)
+    return _parse_metadata_properties(root.find(PROPERTIES_TAG))
 
+
+def _parse_metadata_properties(properties_element):
     if not properties_element:
         return {}
 
@@ -450,69 +760,69 @@ def _parse_testcase_properties(root):
     return testcase_properties
 
 
-def _parse_test_cases(root):
-    test_case_results = defaultdict(list)
-
-    def _parse_test_case(test_case):
-
-        # For special case like: <testcase time="17.190" />
-        # There is no required attributes in it, then just return None, None
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            if attribute not in test_case.keys():
-                return None, None
-
-        result = {}
+def _parse_test_case(test_case):
+    # For special case like: <testcase time="17.190" />
+    # There is no required attributes in it, then just return None, None
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        if attribute not in test_case.keys():
+            return None, None
+
+    result = {}
+
+    # FIXME: This is specific to pytest, needs to be extended to support spytest.
+    test_class_tokens = test_case.get("classname").split(".")
+    feature = test_class_tokens[0]
+
+    for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
+        result[attribute] = test_case.get(attribute)
+    testcase_properties = _parse_testcase_properties(test_case)
+    for attribute in REQUIRED_TESTCASE_PROPERTIES:
+        if attribute in testcase_properties:
+            result[attribute] = testcase_properties[attribute]
+
+    # NOTE: "if failure" and "if error" does not work with the ETree library.
+    failure = test_case.find("failure")
+    error = test_case.find("error")
+    skipped = test_case.find("skipped")
+
+    # Count xfails to match pytest's own summary: only tests that actually ran and
+    # failed as expected are "xfailed", which pytest records as <skipped type="pytest.xfail">.
+    # A conditional_mark xfail whose skip condition matched is a plain <skipped> and pytest
+    # counts it as skipped, while an xpassed test is a plain success; neither is an xfail.
+    xfail_case = ""
+    for outcome in (skipped, failure, error):
+        if outcome is not None and (outcome.get("type") or "").startswith("pytest.xfail"):
+            xfail_case = "xfail_"
+            break
+
+    # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
+    # Because of this, we track errors separately so that the error can be correlated with the stage it
+    # occurred.
+    # By looking into test results from past 300 days, error only occur with skipped test result.
+    #
+    # If there is *only* an error tag we note that as well, as this indicates that the framework
+    # errored out during setup or teardown.
+    if failure is not None:
+        result["result"] = "{}failure".format(xfail_case)
+        summary = failure.get("message", "")
+    elif skipped is not None:
+        result["result"] = "{}skipped".format(xfail_case)
+        summary = skipped.get("message", "")
+    elif error is not None:
+        result["result"] = "{}error".format(xfail_case)
+        summary = error.get("message", "")
+    else:
+        result["result"] = "{}success".format(xfail_case)
+        summary = ""
 
-        # FIXME: This is specific to pytest, needs to be extended to support spytest.
-        test_class_tokens = test_case.get("classname").split(".")
-        feature = test_class_tokens[0]
+    result["summary"] = summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]
+    result["error"] = error is not None
 
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            result[attribute] = test_case.get(attribute)
-        for attribute in REQUIRED_TESTCASE_PROPERTIES:
-            testcase_properties = _parse_testcase_properties(test_case)
-            if attribute in testcase_properties:
-                result[attribute] = testcase_properties[attribute]
-
-        # NOTE: "if failure" and "if error" does not work with the ETree library.
-        failure = test_case.find("failure")
-        error = test_case.find("error")
-        skipped = test_case.find("skipped")
-
-        # Count xfails to match pytest's own summary: only tests that actually ran and
-        # failed as expected are "xfailed", which pytest records as <skipped type="pytest.xfail">.
-        # A conditional_mark xfail whose skip condition matched is a plain <skipped> and pytest
-        # counts it as skipped, while an xpassed test is a plain success; neither is an xfail.
-        xfail_case = ""
-        for outcome in (skipped, failure, error):
-            if outcome is not None and (outcome.get("type") or "").startswith("pytest.xfail"):
-                xfail_case = "xfail_"
-                break
-
-        # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
-        # Because of this, we track errors separately so that the error can be correlated with the stage it
-        # occurred.
-        # By looking into test results from past 300 days, error only occur with skipped test result.
-        #
-        # If there is *only* an error tag we note that as well, as this indicates that the framework
-        # errored out during setup or teardown.
-        if failure is not None:
-            result["result"] = "{}failure".format(xfail_case)
-            summary = failure.get("message", "")
-        elif skipped is not None:
-            result["result"] = "{}skipped".format(xfail_case)
-            summary = skipped.get("message", "")
-        elif error is not None:
-            result["result"] = "{}error".format(xfail_case)
-            summary = error.get("message", "")
-        else:
-            result["result"] = "{}success".format(xfail_case)
-            summary = ""
+    return feature, result
 
-        result["summary"] = summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]
-        result["error"] = error is not None
 
-        return feature, result
+def _parse_test_cases(root):
+    test_case_results = defaultdict(list)
 
     for test_case in root.findall("testcase"):
         feature, result = _parse_test_case(test_case)
@@ -561,21 +871,6 @@ def _update_test_metadata(current, update):
     return new_metadata
 
 
-def _update_test_cases(current, update):
-    if not current:
-        return update.copy()
-
-    new_cases = current.copy()
-    for group, cases in update.items():
-        updated_cases = cases.copy()
-        if group in new_cases:
-            updated_cases += new_cases[group]
-
-        new_cases[group] = updated_cases
-
-    return new_cases
-
-
 def validate_junit_json_file(path):
     """Validate that a JSON file is a valid test report.
 
@@ -701,16 +996,51 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
         help="Load an existing test result JSON file from path_name. "
              "Will perform validation only regardless of --validate-only option.",
     )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Output the test result of each XML file as a JSON line as soon as it is parsed.",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=0,
+        help="Number of processes parsing the XML files of a directory, the number of CPUs by default.",
+    )
 
     args = parser.parse_args()
 
+    if args.json:
+        test_results = []
+    elif args.directory:
+        test_results = iter_junit_xml_results(args.file_name, args.strict, args.workers)
+    else:
+        test_results = map(parse_junit_xml_file, [args.file_name])
+
+    # The XML files are validated while they are parsed, so the report rows are
+    # collected as the test results go by to the JSON output.
+    report_rows = []
+
+    def _collect(test_results):
+        for test_result in test_results:
+            report_row = _report_row(test_result["test_cases"])
+            if report_row:
+                report_rows.append(report_row)
+            yield test_result
+
+    output_file = None
     try:
         if args.json:
             validate_junit_json_file(args.file_name)
-        elif args.directory:
-            roots = validate_junit_xml_archive(args.file_name, args.strict)
+        elif args.validate_only:
+            for _ in test_results:
+                pass
+        elif args.ndjson:
+            output_file = open(args.output_file, "w+") if args.output_file else sys.stdout
+            count = write_test_result_ndjson(_collect(test_results), output_file)
+            print(f"Parsed {count} XML document(s) into test result JSON lines.", file=sys.stderr)
         else:
-            roots = [(validate_junit_xml_file(args.file_name), args.file_name)]
+            test_result_json = None
+            for test_result in _collect(test_results):
+                test_result_json = merge_test_results(test_result_json, test_result)
     except JUnitXMLValidationError as e:
         print(f"XML validation failed: {e}")
         sys.exit(1)
@@ -720,26 +1050,29 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
     except Exception as e:
         print(f"Unexpected error occured during validation: {e}")
         sys.exit(2)
+    finally:
+        if output_file and output_file is not sys.stdout:
+            output_file.close()
 
     if args.validate_only or args.json:
         print(f"{args.file_name} validated succesfully!")
         sys.exit(0)
 
-    test_result_json = parse_test_result(roots)
-    if test_result_json is None:
-        print("XML file doesn't exist or no data in the file.")
-        sys.exit(1)
+    if not args.ndjson:
+        if test_result_json is None:
+            print("XML file doesn't exist or no data in the file.")
+            sys.exit(1)
 
-    if args.compact:
-        output = json.dumps(test_result_json, separators=(",", ":"), sort_keys=True)
-    else:
-        output = json.dumps(test_result_json, indent=4, sort_keys=True)
+        if args.compact:
+            output = json.dumps(test_result_json, separators=(",", ":"), sort_keys=True)
+        else:
+            output = json.dumps(test_result_json, indent=4, sort_keys=True)
 
-    if args.output_file:
-        with open(args.output_file, "w+") as output_file:
-            output_file.write(output)
-    else:
-        print(output)
+        if args.output_file:
+            with open(args.output_file, "w+") as output_file:
+                output_file.write(output)
+        else:
+            print(output)
 
     tstamp = datetime.now().strftime("%d-%b-%Y-%H-%M-%S.%f")
 
@@ -748,7 +1081,7 @@ python3 junit_xml_parser.py tests/files/sample_tr.xml
     else:
         csv_file = open('report_{}.csv'.format(tstamp), "w+")
 
-    for test in REPORT_LIST:
+    for test in [REPORT_HEADER] + report_rows:
         csv_file.write(test+'\n')
     csv_file.close()
 
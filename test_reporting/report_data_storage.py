@@ -1,7 +1,6 @@
 """Wrappers and utilities for storing test reports."""
 import json
 import os
-import tempfile
 
 from abc import ABC, abstractmethod
 from azure.kusto.data import KustoConnectionStringBuilder
@@ -25,9 +24,11 @@ try:
 except ImportError:
     DefaultAzureCredential = None
 
+from ingestion_pipeline import IngestionJournal, IngestionPipeline
+from junit_xml_parser import merge_test_results
 from utilities import validate_json_file
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
 
 TASK_RESULT_FILE = "pipeline_task_results.json"
@@ -146,14 +147,18 @@ class KustoConnector(ReportDBConnector):
         SAI_HEADER_INVOC_TABLE: "SAIHeaderDefinitionMapping",
     }
 
-    def __init__(self, db_name: str, auth_method: str = "appKey"):
+    def __init__(self, db_name: str, auth_method: str = "appKey", journal_path: str = None):
         """Initialize a Kusto report DB connector.
 
+        The data is ingested by batches when they are full or when the connector is closed, close() must be
+        called once all the data is uploaded. See ingestion_pipeline.
+
         Args:
             db_name: The Kusto database to connect to.
             auth_method: Authentication method for Kusto connection.
                 Supported methods: appKey, managedId, interactive, azureCli,
                 deviceCode, userToken, appToken, defaultCredential
+            journal_path: The journal of the ingested batches, to resume an interrupted upload.
         """
         self.db_name = db_name
         self.auth_method = auth_method
@@ -182,6 +187,19 @@ class KustoConnector(ReportDBConnector):
                 print(f"Could not create backup Kusto connection: {e}")
                 self._ingestion_client_backup = None
 
+        self.journal = IngestionJournal(journal_path)
+        self._pipeline = IngestionPipeline(
+            {"primary": self._ingestion_client, "backup": self._ingestion_client_backup},
+            self._ingestion_properties, self.journal)
+
+    def close(self) -> None:
+        """Ingest the remaining data and wait for all the batches to be ingested.
+
+        Raises:
+            IngestionError: if any of the batches could not be ingested.
+        """
+        self._pipeline.close()
+
     def _create_connection_string_builder(self, cluster: str, auth_method: str, backup: bool = False):
         """Create KustoConnectionStringBuilder based on authentication method.
 
@@ -291,6 +309,41 @@ class KustoConnector(ReportDBConnector):
         self._upload_summary(report_json, report_guid)
         self._upload_test_cases(report_json, report_guid)
 
+    def upload_report_stream(self, test_results: Iterable[Dict],
+                             external_tracking_id: str = "",
+                             report_guid: str = "",
+                             testbed: str = "",
+                             os_version: str = "") -> None:
+        """Upload a report while its XML documents are being parsed.
+
+        The test cases are ingested by batches as the test results arrive, the metadata and summary are
+        uploaded once all the test results are merged. If the test results can't be parsed till the end, the
+        test cases not ingested yet are discarded, close() doesn't ingest them.
+
+        Args:
+            test_results: The test results of the XML documents of the report, see
+                junit_xml_parser.iter_junit_xml_results.
+            external_tracking_id, report_guid, testbed, os_version: Same as upload_report.
+        """
+        report_json = None
+        try:
+            for test_result in test_results:
+                self._ingest_data(self.TEST_CASE_TABLE, self._test_case_rows(test_result, report_guid))
+                report_json = merge_test_results(report_json, dict(test_result, test_cases={}))
+        except BaseException:
+            self._pipeline.discard(self.TEST_CASE_TABLE)
+            raise
+
+        self._upload_pipeline_results(
+            external_tracking_id, report_guid, testbed, os_version)
+        if not report_json:
+            print(
+                "Test result file is not found or empty. We will only upload pipeline results and summary.")
+            self._upload_summary(report_json, report_guid)
+            return
+        self._upload_metadata(report_json, external_tracking_id, report_guid)
+        self._upload_summary(report_json, report_guid)
+
     def upload_reachability_data(self, ping_output: List) -> None:
         ping_time = str(datetime.utcnow())
         for result in ping_output:
@@ -415,6 +468,11 @@ class KustoConnector(ReportDBConnector):
         self._ingest_data(self.SUMMARY_TABLE, summary)
 
     def _upload_test_cases(self, report_json, report_guid):
+        test_cases = self._test_case_rows(report_json, report_guid)
+        print("Upload test case")
+        self._ingest_data(self.TEST_CASE_TABLE, test_cases)
+
+    def _test_case_rows(self, report_json, report_guid):
         test_cases = []
         for feature, cases in report_json["test_cases"].items():
             for case in cases:
@@ -423,54 +481,20 @@ class KustoConnector(ReportDBConnector):
                     "feature": feature
                 })
                 test_cases.append(case)
-        print("Upload test case")
-        self._ingest_data(self.TEST_CASE_TABLE, test_cases)
+        return test_cases
 
-    def _ingest_data(self, table, data):
-        props = IngestionProperties(
+    def _ingestion_properties(self, table, **kwargs):
+        return IngestionProperties(
             database=self.db_name,
             table=table,
             data_format=self.TABLE_FORMAT_LOOKUP[table],
-            ingestion_mapping_reference=self.TABLE_MAPPING_LOOKUP[table]
+            ingestion_mapping_reference=self.TABLE_MAPPING_LOOKUP[table],
+            **kwargs
         )
 
-        # Create temporary file with delete=False to avoid Windows permission issues
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.json', text=True)
-        try:
-            with os.fdopen(temp_fd, 'w') as temp_file:
-                if isinstance(data, list):
-                    temp_file.write('\n'.join([json.dumps(entry) for entry in data]))
-                else:
-                    temp_file.write(json.dumps(data))
-
-            print("Ingest to primary cluster...")
-            self._ingestion_client.ingest_from_file(
-                temp_path, ingestion_properties=props)
-
-            if self._ingestion_client_backup:
-                print("Ingest to backup cluster...")
-                self._ingestion_client_backup.ingest_from_file(
-                    temp_path, ingestion_properties=props)
-
-        except Exception as e:
-            print(f"Ingestion failed with error: {e}")
-            raise
-        finally:
-            # Clean up the temporary file
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-            except Exception as cleanup_e:
-                print(f"Warning - failed to clean up temp file {temp_path}: {cleanup_e}")
+    def _ingest_data(self, table, data):
+        self._pipeline.add(table, data)
 
     def _ingest_data_file(self, table, data_file):
-        props = IngestionProperties(
-            database=self.db_name,
-            table=table,
-            data_format=self.TABLE_FORMAT_LOOKUP[table],
-            ingestion_mapping_reference=self.TABLE_MAPPING_LOOKUP[table],
-            flush_immediately=True
-        )
-
-        self._ingestion_client.ingest_from_file(
-            data_file, ingestion_properties=props)
+        self._pipeline.add_file(table, data_file, self._ingestion_properties(table, flush_immediately=True),
+                                clients=["primary"])
@@ -7,9 +7,10 @@ import os
 
 from junit_xml_parser import (
     validate_junit_json_file,
-    validate_junit_xml_path,
-    parse_test_result
+    iter_junit_xml_results,
+    iter_test_result_ndjson
 )
+from ingestion_pipeline import IngestionError
 from report_data_storage import KustoConnector
 
 
@@ -36,6 +37,7 @@ def _run_script():
         epilog="""
 Examples:
 python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
+python3 report_uploader.py -c test_result -j results.ndjson <database>
 """,
     )
     parser.add_argument("path_list", metavar="path", nargs="+",
@@ -46,7 +48,8 @@ python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
         "--external_id", "-e", type=str, help="An external tracking ID to append to the report.",
     )
     parser.add_argument(
-        "--json", "-j", action="store_true", help="Load an existing test result JSON file from path_name.",
+        "--json", "-j", action="store_true",
+        help="Load an existing test result JSON file from path_name, or JSON lines file if it ends with .ndjson.",
     )
     parser.add_argument(
         "--category", "-c", type=str, help="Type of data to upload (i.e. test_result, reachability, etc.)"
@@ -61,6 +64,14 @@ python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
         default="appKey",
         help="Authentication method for Kusto connection."
     )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=0,
+        help="Number of processes parsing the XML files of a directory, the number of CPUs by default."
+    )
+    parser.add_argument(
+        "--journal", type=str,
+        help="Journal of the ingested batches, an interrupted upload run again with it resumes where it stopped."
+    )
     os_version = parser.add_mutually_exclusive_group(required=False)
     os_version.add_argument(
         "--image_url", "-i", type=str,
@@ -74,16 +85,28 @@ python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
     args = parser.parse_args()
 
     try:
-        kusto_db = KustoConnector(args.db_name, args.auth_method)
+        kusto_db = KustoConnector(args.db_name, args.auth_method, args.journal)
     except Exception as e:
         print(f"Failed to create KustoConnector: {e}")
         import traceback
         traceback.print_exc()
         raise
 
+    try:
+        _upload(args, kusto_db)
+    finally:
+        try:
+            kusto_db.close()
+        except IngestionError as e:
+            print(f"Failed to upload: {e}")
+            sys.exit(1)
+
+
+def _upload(args, kusto_db):
     if args.category == "test_result":
         tracking_id = args.external_id if args.external_id else ""
-        report_guid = str(uuid.uuid4())
+        # The report GUID of an interrupted upload is reused when it is resumed.
+        report_guid = kusto_db.journal.setdefault("report_guid", str(uuid.uuid4()))
         testbed = args.testbed
         if args.image_url:
             version = _parse_os_version(args.image_url)
@@ -97,13 +120,16 @@ python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
                     '.*test.*_(reboot|sad|upgrade_path).*_(summary|report).json')
                 if reboot_data_regex.match(path_name):
                     kusto_db.upload_reboot_report(path_name, tracking_id, report_guid)
+                elif args.json and not path_name.endswith(".ndjson"):
+                    test_result_json = validate_junit_json_file(path_name)
+                    kusto_db.upload_report(test_result_json, tracking_id, report_guid, testbed, version)
                 else:
+                    # The test cases are uploaded while the XML documents are still being parsed.
                     if args.json:
-                        test_result_json = validate_junit_json_file(path_name)
+                        test_results = iter_test_result_ndjson(path_name)
                     else:
-                        roots = validate_junit_xml_path(path_name)
-                        test_result_json = parse_test_result(roots)
-                    kusto_db.upload_report(test_result_json, tracking_id, report_guid, testbed, version)
+                        test_results = iter_junit_xml_results(path_name, workers=args.workers)
+                    kusto_db.upload_report_stream(test_results, tracking_id, report_guid, testbed, version)
             except Exception as e:
                 print(f"Failed to upload report '{path_name}', exception: {repr(e)}")
                 import traceback
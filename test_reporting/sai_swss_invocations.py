@@ -1,13 +1,27 @@
 import argparse
 from curses.ascii import isupper
+import hashlib
 import json
+import os
+import re
 
+from concurrent.futures import ProcessPoolExecutor
 from os import listdir
 from os.path import isfile, join, basename
 from typing import Dict, List, Tuple
 from report_data_storage import KustoConnector
 import yaml
 
+# timestamp|op|SAI_OBJECT_TYPE_X:key|attr=value|...
+SAI_OP_LINE_RE = re.compile(r"^([^|]*)\|([a-z])\|(SAI_OBJECT_TYPE[^|:]*)(?::([^|]*))?(?:\|.*)?$")
+# timestamp|OP|SAI_OBJECT_TYPE_X||key|attr=value|...||key|attr=value|...
+SAI_BULK_LINE_RE = re.compile(r"^([^|]*)\|([A-Z])\|(SAI_OBJECT_TYPE[^|]*)\|\|(.*)$")
+
+# Size of the parts of a log file scanned in parallel.
+SCAN_CHUNK_SIZE = 32 * 1024 * 1024
+# Max size of the head of a log file identifying it in the scan cache.
+HEAD_DIGEST_SIZE = 1024 * 1024
+
 
 def _run_script() -> Dict:
     '''
@@ -26,9 +40,19 @@ def _run_script() -> Dict:
     )
     parser.add_argument('--config_path', type=str,
                         help="your yaml file path\n")
+    parser.add_argument('--workers', type=int,
+                        help="number of processes scanning the logs, "
+                             "the number of CPUs by default\n")
+    parser.add_argument('--incremental', action='store_true',
+                        help="scan only the lines appended since the last "
+                             "scan, e.g. skip the rotated log files\n")
     args = parser.parse_args()
     with open(args.config_path, 'r', encoding='utf-8') as f:
         yaml_config = yaml.safe_load(f)
+    if args.workers is not None:
+        yaml_config['workers'] = args.workers
+    if args.incremental:
+        yaml_config['incremental'] = True
     return yaml_config
 
 
@@ -329,14 +353,393 @@ def generate_json_logs(config: Dict,
                          sai_obj_feature_map, info)
 
 
-def ingest_json_logs(json_log_path: str) -> None:
+def get_scan_cache_path(config: Dict) -> str:
+    '''
+    Return:
+        path of the scan cache, the header feature maps
+        and the scanned parts of the log files
+    '''
+    return config.get('cache_path') or \
+        join(config['json_log_path'], ".sai_scan_cache.json")
+
+
+def load_scan_cache(path: str) -> Dict:
+    cache = {}
+    if isfile(path):
+        try:
+            with open(path, 'r') as f:
+                cache = json.load(f)
+        except ValueError as e:
+            print("ignore scan cache {}: {}".format(path, e))
+    cache.setdefault('headers', {})
+    cache.setdefault('scanned', {})
+    return cache
+
+
+def save_scan_cache(path: str, cache: Dict) -> None:
+    with open(path + ".tmp", 'w') as f:
+        json.dump(cache, f, sort_keys=True, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def get_sai_feature_maps(sai_path: str, cache: Dict) -> Tuple:
+    '''the feature maps of the sai headers, computed again
+    only when the header folder is modified
+    Args:
+        sai_path: sai header folder
+        cache: scan cache
+    Return:
+        sai_feature_file_map, features
+    '''
+    mtime = os.stat(sai_path).st_mtime
+    headers = cache['headers']
+    if headers.get('sai_path') != sai_path or headers.get('mtime') != mtime:
+        file_list = sorted(get_files_from_path(sai_path))
+        headers.clear()
+        headers.update({
+            'sai_path': sai_path,
+            'mtime': mtime,
+            'sai_feature_file_map':
+                generate_sai_feature_file_map_from_header_files(file_list),
+            'features': generate_sai_feature_from_header_files(file_list),
+        })
+    return headers['sai_feature_file_map'], headers['features']
+
+
+def head_digest(path: str, head_size: int) -> str:
+    '''digest of the first head_size bytes of a log file, the log files
+    are only appended to and renamed on rotation, so it identifies them
+    whatever their name and size
+    '''
+    digest = hashlib.sha1(str(head_size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(head_size))
+    return digest.hexdigest()
+
+
+def get_lines_end(path: str, size: int) -> int:
+    '''
+    Return:
+        end of the last complete line in the first size bytes of the file,
+        the line being written to the active log file is not scanned
+    '''
+    with open(path, 'rb') as f:
+        end = size
+        while end > 0:
+            block = min(end, 64 * 1024)
+            f.seek(end - block)
+            newline = f.read(block).rfind(b'\n')
+            if newline >= 0:
+                return end - block + newline + 1
+            end -= block
+    return 0
+
+
+def find_scanned_log(scanned: Dict, path: str, size: int) -> Tuple:
+    '''find the scan cache entry of a log file by the digest of its head
+    Args:
+        scanned: scan cache entries of the device, by head digest
+        size: size of the log file
+    Return:
+        digest, entry or None, None if the file is not scanned yet
+    '''
+    head_sizes = {entry['head_size'] for entry in scanned.values()
+                  if isinstance(entry, dict)}
+    for head_size in sorted(head_sizes):
+        if head_size > size:
+            break
+        digest = head_digest(path, head_size)
+        entry = scanned.get(digest)
+        if isinstance(entry, dict) and entry['head_size'] == head_size \
+                and entry['offset'] <= size:
+            return digest, entry
+    return None, None
+
+
+def split_file_chunks(path: str, chunk_size: int = SCAN_CHUNK_SIZE,
+                      start: int = 0, end: int = None) -> List:
+    '''
+    Args:
+        start, end: byte range to split, the whole file by default
+    Return:
+        byte ranges (start, end) of the file, each line is scanned
+        by the chunk where it starts
+    '''
+    if end is None:
+        end = os.path.getsize(path)
+    return [(chunk_start, min(chunk_start + chunk_size, end))
+            for chunk_start in range(start, end, chunk_size)]
+
+
+def parse_sai_log_line(line: str, operation_map: Dict) -> Tuple:
+    '''parse a log entry with a single split, same as
+    get_sai_op, get_object_type_from_log, get_sai_obj_type
+    and process_bulk
+    Args:
+        line: log entry
+        operation_map: single character to operation name
+    Return:
+        log_time, op, sai_obj, sai_object_keys, obj_key_attrs
+        or None if the entry is not a sai operation
+    '''
+    match = SAI_OP_LINE_RE.match(line)
+    if match:
+        log_time, op, sai_obj, key = match.group(1, 2, 3, 4)
+        op = operation_map.get(op)
+        if not op:
+            return None
+        attributes = [item.split('=') for item in line.split('|')
+                      if '=' in item]
+        return log_time, op, sai_obj, [key], [attributes]
+
+    match = SAI_BULK_LINE_RE.match(line)
+    if match:
+        log_time, op, sai_obj, rest = match.group(1, 2, 3, 4)
+        op = operation_map.get(op)
+        if not op:
+            return None
+        obj_keys, obj_key_attrs = [], []
+        for joined in rest.split('||'):
+            splits = joined.split('|')
+            obj_keys.append(splits[0])
+            obj_key_attrs.append([split.split('=') for split in splits[1:]])
+        return log_time, op, sai_obj, obj_keys, obj_key_attrs
+
+    # other formats, e.g. query with the object type after the capability
+    is_bulk, op = get_sai_op(line, operation_map)
+    if not op:
+        return None
+    if is_bulk:
+        sai_obj, obj_keys, obj_key_attrs = process_bulk(line)
+    else:
+        obj = get_object_type_from_log(line)
+        if obj is None:
+            return None
+        sai_obj, obj_keys = obj
+        obj_key_attrs = get_sai_obj_type(line)
+    return get_log_time(line), op, sai_obj, obj_keys, obj_key_attrs
+
+
+_encode_json_str = json.encoder.encode_basestring_ascii
+
+
+def _encode_json_value(value) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return _encode_json_str(value)
+    return json.dumps(value)
+
+
+def scan_log_chunk(task: Tuple) -> bytes:
+    '''scan the lines starting in a byte range of a log file
+    Args:
+        task: log_file, start, end and the scan context,
+            see scan_log_file
+    Return:
+        the swss items as json lines, same as Swss_log_item
+    '''
+    log_file, start, end, context = task
+    operation_map = context['operation_map']
+    features = context['features']
+    sai_feature_file_map = context['sai_feature_file_map']
+    common = {key: _encode_json_value(value)
+              for key, value in context['common'].items()}
+    # the items are encoded the same as json.dumps(item, sort_keys=True),
+    # the fields of a line are encoded once for all its items
+    prefix = ('{{"deployment_subtype": {deployment_subtype}, '
+              '"deployment_type": {deployment_type}, "device": {device}, '
+              '"header_file": ').format(**common)
+    middle = (', "ngsdevice_type": {ngsdevice_type}, '
+              '"os_version": {os_version}, "sai_api": ').format(**common)
+    log_file_json = _encode_json_value(log_file)
+    sai_obj_feature_map = {}
+    obj_infos = {}
+    out = []
+    with open(log_file, 'rb') as f:
+        if start:
+            # the line going over start is scanned by the previous chunk
+            f.seek(start - 1)
+            start += len(f.readline()) - 1
+        pos = start
+        while pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            if b'SAI_OBJECT_TYPE' not in raw:
+                continue
+            line = raw.decode('utf-8').rstrip()
+            parsed = parse_sai_log_line(line, operation_map)
+            if parsed is None:
+                continue
+            log_time, op, sai_obj, obj_keys, obj_key_attrs = parsed
+
+            info = obj_infos.get((op, sai_obj))
+            if info is None:
+                feature = get_sai_feature_from_sai_obj(
+                    sai_obj, features, sai_obj_feature_map)
+                header_file = get_sai_header_file_from_sai_obj(
+                    feature, sai_feature_file_map)
+                info = obj_infos[(op, sai_obj)] = (
+                    feature and header_file,
+                    _encode_json_value(header_file),
+                    _encode_json_value(get_sai_api(op, sai_obj)),
+                    _encode_json_value(feature),
+                    _encode_json_value(sai_obj),
+                    _encode_json_value(op))
+            valid, header_json, api_json, feature_json, obj_json, op_json = info
+            if not valid:
+                continue
+
+            head = ''.join((prefix, header_json,
+                            ', "log": ', _encode_json_str(line),
+                            ', "log_file": ', log_file_json,
+                            ', "log_time": ', _encode_json_value(log_time),
+                            middle, api_json,
+                            ', "sai_feature": ', feature_json,
+                            ', "sai_obj": ', obj_json,
+                            ', "sai_obj_attr_key": '))
+            for obj_key, attributes in zip(obj_keys, obj_key_attrs):
+                tail = ''.join((', "sai_object_key": ', _encode_json_value(obj_key),
+                                ', "sai_op": ', op_json, '}'))
+                if not attributes:
+                    out.append(head + 'null, "sai_obj_attr_value": null' + tail)
+                    continue
+                for attribute in attributes:
+                    out.append(''.join((
+                        head, _encode_json_value(attribute[0]),
+                        ', "sai_obj_attr_value": ',
+                        _encode_json_value(attribute[1]), tail)))
+    if not out:
+        return b''
+    return ('\n'.join(out) + '\n').encode('utf-8')
+
+
+def scan_log_file(config: Dict, info: Dict, log_file: str,
+                  features: List, sai_feature_file_map: Dict,
+                  json_file: str, executor=None,
+                  chunk_size: int = SCAN_CHUNK_SIZE,
+                  start: int = 0, end: int = None) -> None:
+    '''convert a log file to swss items, one json line per item
+    Args:
+        config: swss config
+        info: info of the one device log config
+        json_file: output file
+        executor: process pool scanning the chunks of the file
+        start, end: byte range of the lines to scan, at line boundaries,
+            the whole file by default
+    '''
+    context = {
+        'operation_map': config['operation_map'],
+        'features': features,
+        'sai_feature_file_map': sai_feature_file_map,
+        'common': {
+            'device': info['device'],
+            'os_version': info['os_version'],
+            'deployment_type': info['deployment_type'],
+            'deployment_subtype': info['deployment_subtype'],
+            'ngsdevice_type': config['ngsdevice_type'],
+        },
+    }
+    tasks = [(log_file, start, end, context)
+             for start, end in split_file_chunks(log_file, chunk_size,
+                                                 start, end)]
+    chunks = executor.map(scan_log_chunk, tasks) if executor \
+        else map(scan_log_chunk, tasks)
+    print("write to file {}".format(json_file))
+    with open(json_file, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def scan_json_logs(config: Dict) -> List:
+    '''scan the log files of all the devices in parallel
+    Args:
+        config: swss config, the number of processes is
+            config['workers'], only the lines appended since the last
+            scan are scanned if config['incremental'] is set
+    Return:
+        json files written
+    '''
+    cache_path = get_scan_cache_path(config)
+    cache = load_scan_cache(cache_path)
+    sai_feature_file_map, features = get_sai_feature_maps(
+        config['sai_path'], cache)
+    incremental = config.get('incremental', False)
+    workers = config.get('workers') or os.cpu_count() or 1
+    chunk_size = config.get('chunk_size', SCAN_CHUNK_SIZE)
+    json_files = []
+    executor = ProcessPoolExecutor(max_workers=workers) \
+        if workers > 1 else None
+    try:
+        for info in config['swss_device_log_items']:
+            scanned = cache['scanned'].setdefault(info['device'], {})
+            files = get_files_from_path_and_name_pattern(
+                info['log_path'], "sairedis.rec", ".gz")
+            file_sum = len(files)
+            for count, log_file in enumerate(sorted(files), 1):
+                log_name = basename(log_file)
+                start, end = 0, None
+                if incremental:
+                    # the active log file is appended to and renamed on
+                    # rotation, so only the complete lines after the
+                    # scanned offset of the file are scanned
+                    end = get_lines_end(log_file, os.path.getsize(log_file))
+                    digest, entry = find_scanned_log(scanned, log_file, end)
+                    if entry:
+                        del scanned[digest]
+                    if entry and all(isfile(f) for f in entry['json_files']):
+                        start = entry['offset']
+                    else:
+                        entry = {'json_files': []}
+                    if start == end:
+                        print("Skip scanned file {}, {}/{}".format(
+                            log_file, count, file_sum))
+                        if end:
+                            scanned[digest] = entry
+                        continue
+                    # name the json file by the head digest and the offset
+                    # to not overwrite the ones of the previous scans
+                    head_size = min(end, HEAD_DIGEST_SIZE)
+                    digest = head_digest(log_file, head_size)
+                    json_file = "{}/{}.{}.{}.{}.json".format(
+                        config['json_log_path'], log_name,
+                        digest[:12], start, info['device'])
+                else:
+                    json_file = "{}/{}.{}.json".format(
+                        config['json_log_path'], log_name, info['device'])
+                print("Generate json from file {}, {}/{}".format(
+                    log_file, count, file_sum))
+                scan_log_file(config, info, log_file, features,
+                              sai_feature_file_map, json_file, executor,
+                              chunk_size, start, end)
+                json_files.append(json_file)
+                if incremental:
+                    entry.update({
+                        'head_size': head_size,
+                        'offset': end,
+                        'json_files': entry['json_files'] + [json_file],
+                    })
+                    scanned[digest] = entry
+                    save_scan_cache(cache_path, cache)
+    finally:
+        if executor:
+            executor.shutdown()
+    save_scan_cache(cache_path, cache)
+    return json_files
+
+
+def ingest_json_logs(json_log_path: str, files: List = None) -> None:
     '''ingest json to the kusto table
     Args:
         path:json path
+        files: json files to ingest, all the ones in path by default
     '''
     kusto_db = KustoConnector("SaiTestData")
-    files = get_files_from_path_and_name_pattern(
-        json_log_path, "sairedis.rec", ".gz")
+    if files is None:
+        files = get_files_from_path_and_name_pattern(
+            json_log_path, "sairedis.rec", ".gz")
     file_sum = len(files)
     count = 0
     try:
@@ -344,6 +747,7 @@ def ingest_json_logs(json_log_path: str) -> None:
             kusto_db.upload_swss_report_file(f)
             count += 1
             print("Ingested file {}, {}/{}".format(f, count, file_sum))
+        kusto_db.close()
     except Exception as e:
         print("upload to kusto", e)
 
@@ -391,7 +795,5 @@ if __name__ == "__main__":
     3. set the swss log input folders swss_log_paths
     '''
     config = _run_script()
-    sai_obj_feature_map = {}
-    for info in config['swss_device_log_items']:
-        generate_json_logs(config, info, sai_obj_feature_map)
-    ingest_json_logs(config['json_log_path'])
+    json_files = scan_json_logs(config)
+    ingest_json_logs(config['json_log_path'], json_files)
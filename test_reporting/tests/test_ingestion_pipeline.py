@@ -0,0 +1,156 @@
+"""Tests for the ingestion pipeline, with fake ingestion clients."""
+import gzip
+import json
+import threading
+
+import pytest
+
+from test_reporting.ingestion_pipeline import IngestionError, IngestionJournal, IngestionPipeline
+
+
+class FakeIngestClient:
+    """Ingestion client keeping the rows of the ingested files, failing the ingestions listed in fail."""
+
+    def __init__(self, fail=None):
+        self.fail = fail or {}
+        self.ingested = []
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    def ingest_from_file(self, path, ingestion_properties=None):
+        with self._lock:
+            self.attempts += 1
+            with gzip.open(path, "rt") as f:
+                lines = f.read().split("\n")
+            key = (ingestion_properties, lines[0])
+            if self.fail.get(key, 0):
+                self.fail[key] -= 1
+                raise RuntimeError("ingestion failed")
+            self.ingested.append((ingestion_properties, [json.loads(line) for line in lines if line]))
+
+
+def _rows(table, count):
+    return [{"table": table, "index": index} for index in range(count)]
+
+
+def _ingested_rows(client, table):
+    rows = [row for properties, rows in client.ingested if properties == table for row in rows]
+    return sorted(rows, key=lambda row: row.get("index", 0))
+
+
+def _pipeline(clients, journal=None, batch_size=100):
+    return IngestionPipeline(clients, lambda table: table, journal, batch_size=batch_size, max_workers=2,
+                             retries=1, retry_delay=0)
+
+
+def test_batches_ingested_by_all_clients():
+    primary, backup = FakeIngestClient(), FakeIngestClient()
+    pipeline = _pipeline({"primary": primary, "backup": backup, "missing": None})
+    pipeline.add("TestCases", _rows("TestCases", 20))
+    pipeline.add("TestReportSummary", {"tests": 20})
+    pipeline.close()
+
+    for client in (primary, backup):
+        assert _ingested_rows(client, "TestCases") == _rows("TestCases", 20)
+        assert _ingested_rows(client, "TestReportSummary") == [{"tests": 20}]
+        batches = [rows for properties, rows in client.ingested if properties == "TestCases"]
+        assert len(batches) > 1
+        assert all(len(json.dumps(rows[:-1])) < 100 for rows in batches)
+
+
+def test_failed_ingestion_retried():
+    first_row = json.dumps(_rows("TestCases", 1)[0])
+    backup = FakeIngestClient(fail={("TestCases", first_row): 1})
+    pipeline = _pipeline({"primary": FakeIngestClient(), "backup": backup})
+    pipeline.add("TestCases", _rows("TestCases", 3))
+    pipeline.close()
+
+    assert _ingested_rows(backup, "TestCases") == _rows("TestCases", 3)
+    assert backup.attempts == len(backup.ingested) + 1
+
+
+def test_interrupted_upload_resumed(tmp_path):
+    journal_path = str(tmp_path / "journal")
+    rows = _rows("TestCases", 20)
+    # 3 rows of ~35 bytes per batch of 100 bytes
+    second_batch = json.dumps(rows[3])
+
+    primary = FakeIngestClient(fail={("TestCases", second_batch): 10})
+    backup = FakeIngestClient()
+    journal = IngestionJournal(journal_path)
+    guid = journal.setdefault("report_guid", "guid-1")
+    pipeline = _pipeline({"primary": primary, "backup": backup}, journal)
+    pipeline.add("TestCases", rows)
+    with pytest.raises(IngestionError, match="1 batch"):
+        pipeline.close()
+
+    ingested = _ingested_rows(primary, "TestCases")
+    assert rows[3] not in ingested
+    assert _ingested_rows(backup, "TestCases") == rows
+
+    # The last line of the journal is truncated when the upload is killed while writing it.
+    with open(journal_path, "a") as f:
+        f.write('{"table": "TestCa')
+
+    primary, backup = FakeIngestClient(), FakeIngestClient()
+    journal = IngestionJournal(journal_path)
+    assert journal.setdefault("report_guid", "guid-2") == guid
+    pipeline = _pipeline({"primary": primary, "backup": backup}, journal)
+    pipeline.add("TestCases", rows)
+    pipeline.close()
+
+    assert backup.ingested == []
+    assert sorted(ingested + _ingested_rows(primary, "TestCases"), key=lambda row: row["index"]) == rows
+
+    journal = IngestionJournal(journal_path)
+    assert all(journal.is_acked("TestCases", batch, "primary", 3) for batch in range(6))
+
+
+def test_file_ingested_by_given_clients(tmp_path):
+    data_file = tmp_path / "swss.json"
+    data_file.write_text("\n".join(json.dumps(row) for row in _rows("SwssInvocationReport", 5)))
+
+    primary, backup = FakeIngestClient(), FakeIngestClient()
+    pipeline = _pipeline({"primary": primary, "backup": backup})
+    pipeline.add_file("SwssInvocationReport", str(data_file), properties="file", clients=["primary"])
+    pipeline.close()
+
+    assert _ingested_rows(primary, "file") == _rows("SwssInvocationReport", 5)
+    assert backup.ingested == []
+
+
+def test_discarded_rows_not_ingested():
+    client = FakeIngestClient()
+    pipeline = _pipeline({"primary": client})
+    # 3 rows of ~35 bytes per batch of 100 bytes, the 2 last rows are not in a batch yet
+    pipeline.add("TestCases", _rows("TestCases", 5))
+    pipeline.add("TestReportSummary", {"tests": 5})
+    pipeline.discard("TestCases")
+    pipeline.close()
+
+    assert _ingested_rows(client, "TestCases") == _rows("TestCases", 3)
+    assert _ingested_rows(client, "TestReportSummary") == [{"tests": 5}]
+
+
+def test_add_blocks_while_batches_pending():
+    ingesting = threading.Event()
+
+    class BlockedIngestClient(FakeIngestClient):
+        def ingest_from_file(self, path, ingestion_properties=None):
+            ingesting.wait()
+            super().ingest_from_file(path, ingestion_properties)
+
+    client = BlockedIngestClient()
+    # a batch per row, 2 batches ingested and 2 waiting at once
+    pipeline = _pipeline({"primary": client}, batch_size=10)
+    adding = threading.Thread(target=pipeline.add, args=("TestCases", _rows("TestCases", 10)))
+    adding.start()
+    adding.join(0.5)
+    assert adding.is_alive()
+    assert len(pipeline._futures) == 4
+
+    ingesting.set()
+    adding.join(5)
+    assert not adding.is_alive()
+    pipeline.close()
+    assert _ingested_rows(client, "TestCases") == _rows("TestCases", 10)
@@ -4,6 +4,8 @@ import pytest
 
 from test_reporting.junit_xml_parser import validate_junit_xml_stream, validate_junit_xml_file
 from test_reporting.junit_xml_parser import validate_junit_xml_archive, parse_test_result, JUnitXMLValidationError
+from test_reporting.junit_xml_parser import parse_junit_xml_file, parse_junit_xml_path, iter_junit_xml_results
+from test_reporting.junit_xml_parser import merge_test_results, write_test_result_ndjson, iter_test_result_ndjson
 
 
 VALID_TEST_RESULT = """<?xml version="1.0" encoding="utf-8"?>
@@ -284,6 +286,97 @@ def test_xpass_not_counted_as_xfail():
     assert bgp_fact == ["success"]
 
 
+def _write_xml(tmp_path, content, name="result.xml"):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_streaming_parser_matches_tree_parser():
+    root = validate_junit_xml_file(VALID_TEST_RESULT_FILE)
+    expected = parse_test_result([(root, VALID_TEST_RESULT_FILE)])
+    assert ordered(parse_junit_xml_file(VALID_TEST_RESULT_FILE)) == ordered(expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streaming_parser_matches_tree_parser_archive(workers):
+    expected = parse_test_result(validate_junit_xml_archive(VALID_TEST_RESULT_ARCHIVE))
+    assert ordered(parse_junit_xml_path(VALID_TEST_RESULT_ARCHIVE, workers=workers)) == ordered(expected)
+
+
+def test_streaming_parser_testsuites_root(tmp_path):
+    xml = VALID_TEST_RESULT.replace('<?xml version="1.0" encoding="utf-8"?>', "")
+    xml = "<testsuites>{}<testsuite tests='0' time='0' skipped='0' failures='0' errors='0'/></testsuites>".format(xml)
+    expected = parse_test_result([(validate_junit_xml_stream(xml), "doc")])
+    assert ordered(parse_junit_xml_file(_write_xml(tmp_path, xml))) == ordered(expected)
+
+
+def test_streaming_parser_drops_output(tmp_path):
+    xml = VALID_TEST_RESULT.replace('time="109.472" />',
+                                    'time="109.472"><system-out>{}</system-out></testcase>'.format("x" * 100000))
+    xml = xml.replace("</testsuite>", "<system-err>{}</system-err></testsuite>".format("y" * 100000))
+    expected = parse_test_result([(validate_junit_xml_stream(xml), "doc")])
+    assert ordered(parse_junit_xml_file(_write_xml(tmp_path, xml))) == ordered(expected)
+
+
+@pytest.mark.parametrize(
+    "token,replacement,message",
+    [
+        ("testsuite", "fail", ".* tag are not found on root element"),
+        ("errors", "bunnies", ".* not found in .* element"),
+        ("hwsku", "host", "duplicate metadata element: .*"),
+        ("classname", "hehe", ".* not found in test case .*"),
+        ("</", "<", "could not parse .*"),
+    ],
+)
+def test_streaming_parser_validation_errors(tmp_path, token, replacement, message):
+    path = _write_xml(tmp_path, VALID_TEST_RESULT.replace(token, replacement))
+    with pytest.raises(JUnitXMLValidationError, match=message):
+        parse_junit_xml_file(path)
+
+
+def test_streaming_parser_archive_skips_invalid(tmp_path):
+    _write_xml(tmp_path, VALID_TEST_RESULT, "a_valid.xml")
+    _write_xml(tmp_path, VALID_TEST_RESULT.replace("</", "<"), "b_broken.xml")
+    _write_xml(tmp_path, VALID_TEST_RESULT.replace("vlab-01", "vlab-02"), "c_other_host.xml")
+
+    results = list(iter_junit_xml_results(str(tmp_path), workers=1))
+    assert len(results) == 1
+    assert results[0]["test_metadata"]["host"] == "vlab-01"
+
+    with pytest.raises(JUnitXMLValidationError, match="could not parse .*"):
+        list(iter_junit_xml_results(str(tmp_path), strict=True, workers=1))
+
+
+def test_merge_test_results_is_associative():
+    results = [parse_junit_xml_file(VALID_TEST_RESULT_FILE) for _ in range(3)]
+    results[1]["test_summary"]["failures"] = "5"
+    results[2]["test_metadata"]["timestamp"] = "2020-09-13 18:24:19.675190"
+
+    def copies():
+        return [merge_test_results(None, result) for result in results]
+
+    a, b, c = copies()
+    left = merge_test_results(merge_test_results(a, b), c)
+    a, b, c = copies()
+    right = merge_test_results(a, merge_test_results(b, c))
+    assert ordered(left) == ordered(right)
+    assert left["test_summary"]["tests"] == "12"
+    assert left["test_summary"]["failures"] == "7"
+    assert left["test_metadata"]["timestamp"] == "2020-09-13 18:24:19.675190"
+
+
+def test_ndjson_round_trip(tmp_path):
+    path = tmp_path / "results.ndjson"
+    with open(path, "w") as f:
+        assert write_test_result_ndjson(iter_junit_xml_results(VALID_TEST_RESULT_ARCHIVE, workers=1), f) == 2
+
+    merged = None
+    for test_result in iter_test_result_ndjson(str(path)):
+        merged = merge_test_results(merged, test_result)
+    assert ordered(merged) == ordered(parse_junit_xml_path(VALID_TEST_RESULT_ARCHIVE, workers=1))
+
+
 # credit to: https://stackoverflow.com/questions/25851183/
 def ordered(obj):
     if isinstance(obj, dict):
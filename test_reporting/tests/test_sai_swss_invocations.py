@@ -0,0 +1,165 @@
+"""Tests for the sairedis log scanner."""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from test_reporting import sai_swss_invocations as scanner
+
+
+SAI_HEADERS = ["saifdb.h", "sainexthop.h", "saiport.h", "sairoute.h", "saiswitch.h", "saitypes.h"]
+
+SAIREDIS_LOG = """2023-05-01.10:00:00.000001|a|INIT_VIEW
+2023-05-01.10:00:00.000002|c|SAI_OBJECT_TYPE_SWITCH:oid:0x21000000000000|SAI_SWITCH_ATTR_INIT_SWITCH=true
+2023-05-01.10:00:00.000003|g|SAI_OBJECT_TYPE_SWITCH:oid:0x21000000000000|SAI_SWITCH_ATTR_PORT_NUMBER=0
+2023-05-01.10:00:00.000004|G|SAI_STATUS_SUCCESS|SAI_SWITCH_ATTR_PORT_NUMBER=32
+2023-05-01.10:00:00.000005|s|SAI_OBJECT_TYPE_PORT:oid:0x1000000000002|SAI_PORT_ATTR_MTU=9122
+2023-05-01.10:00:00.000006|c|SAI_OBJECT_TYPE_ROUTE_ENTRY:{"dest":"10.0.0.0/24","switch_id":"oid:0x21000000000000"}|\
+SAI_ROUTE_ENTRY_ATTR_PACKET_ACTION=SAI_PACKET_ACTION_FORWARD|SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID=oid:0x40000000005
+2023-05-01.10:00:00.000007|r|SAI_OBJECT_TYPE_NEXT_HOP:oid:0x40000000005
+2023-05-01.10:00:00.000008|C|SAI_OBJECT_TYPE_FDB_ENTRY||{"mac":"00:01"}|SAI_FDB_ENTRY_ATTR_TYPE=SAI_FDB_ENTRY_TYPE_STATIC\
+||{"mac":"00:02"}|SAI_FDB_ENTRY_ATTR_TYPE=SAI_FDB_ENTRY_TYPE_DYNAMIC|SAI_FDB_ENTRY_ATTR_PACKET_ACTION=SAI_PACKET_ACTION_DROP
+2023-05-01.10:00:00.000009|R|SAI_OBJECT_TYPE_ROUTE_ENTRY||{"dest":"10.0.1.0/24"}||{"dest":"10.0.2.0/24"}
+2023-05-01.10:00:00.000010|q|attr_enum_values_capability|SAI_OBJECT_TYPE_PORT:oid:0x1000000000002|SAI_PORT_ATTR_FEC_MODE=3
+2023-05-01.10:00:00.000011|n|port_state_change|[{"port_id":"oid:0x1000000000002"}]|
+2023-05-01.10:00:00.000012|c|SAI_OBJECT_TYPE_UNKNOWN_THING:oid:0x99
+2023-05-01.10:00:00.000013|s|SAI_OBJECT_TYPE_PORT
+"""
+
+
+@pytest.fixture
+def config(tmp_path):
+    sai_path = tmp_path / "sai"
+    sai_path.mkdir()
+    for header in SAI_HEADERS:
+        (sai_path / header).write_text("")
+    log_path = tmp_path / "logs"
+    log_path.mkdir()
+    json_log_path = tmp_path / "json"
+    json_log_path.mkdir()
+    return {
+        "ngsdevice_type": "ToRRouter",
+        "sai_path": str(sai_path),
+        "json_log_path": str(json_log_path),
+        "operation_map": {"r": "remove", "c": "create", "g": "get", "s": "set", "q": "query",
+                          "C": "bulk_create", "R": "bulk_reomve", "S": "bulk_set"},
+        "swss_device_log_items": [{
+            "log_path": str(log_path),
+            "os_version": "20181130.101",
+            "deployment_type": "type",
+            "deployment_subtype": "subtype",
+            "device": "dut",
+        }],
+        "workers": 1,
+    }
+
+
+def _write_log(config, name, content=SAIREDIS_LOG):
+    path = os.path.join(config["swss_device_log_items"][0]["log_path"], name)
+    with open(path, "w") as f:
+        f.write(content * 5)
+    return path
+
+
+def _legacy_items(config, log_file):
+    info = config["swss_device_log_items"][0]
+    file_list = scanner.get_files_from_path(config["sai_path"])
+    scanner.convert_log_item(config, log_file, scanner.generate_sai_feature_from_header_files(file_list),
+                             scanner.generate_sai_feature_file_map_from_header_files(file_list), {}, info)
+    json_file = "{}/{}.{}.json".format(config["json_log_path"], os.path.basename(log_file), info["device"])
+    with open(json_file) as f:
+        return json.load(f)
+
+
+def _read_items(json_file):
+    with open(json_file) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scan_matches_legacy_convert(config, workers):
+    log_file = _write_log(config, "sairedis.rec")
+    expected = _legacy_items(config, log_file)
+
+    info = config["swss_device_log_items"][0]
+    cache = scanner.load_scan_cache(scanner.get_scan_cache_path(config))
+    sai_feature_file_map, features = scanner.get_sai_feature_maps(config["sai_path"], cache)
+    json_file = os.path.join(config["json_log_path"], "scanned.json")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # chunks smaller than the lines to check the line alignment
+        scanner.scan_log_file(config, info, log_file, features, sai_feature_file_map, json_file, executor,
+                              chunk_size=97)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    assert _read_items(json_file) == expected
+    with open(json_file) as f:
+        assert all(line == json.dumps(json.loads(line), sort_keys=True) + "\n" for line in f)
+    assert {item["sai_api"] for item in expected} >= {"bulk_create_fdb_entry", "query_port", "remove_next_hop"}
+
+
+def test_scan_cache_and_incremental(config):
+    _write_log(config, "sairedis.rec")
+    _write_log(config, "sairedis.rec.1", SAIREDIS_LOG.replace("10:00", "09:00"))
+    config["incremental"] = True
+
+    json_files = scanner.scan_json_logs(config)
+    assert len(json_files) == 2
+    cache = scanner.load_scan_cache(scanner.get_scan_cache_path(config))
+    assert cache["headers"]["features"] == ["fdb", "nexthop", "port", "route", "switch", "types"]
+    assert sorted(sum((entry["json_files"] for entry in cache["scanned"]["dut"].values()), [])) == sorted(json_files)
+
+    assert scanner.scan_json_logs(config) == []
+
+    # log rotation: the scanned files are renamed and a new one is started
+    log_path = config["swss_device_log_items"][0]["log_path"]
+    os.rename(os.path.join(log_path, "sairedis.rec.1"), os.path.join(log_path, "sairedis.rec.2"))
+    os.rename(os.path.join(log_path, "sairedis.rec"), os.path.join(log_path, "sairedis.rec.1"))
+    _write_log(config, "sairedis.rec", SAIREDIS_LOG.replace("10:00", "11:00"))
+
+    json_files = scanner.scan_json_logs(config)
+    assert len(json_files) == 1
+    assert all(item["log_time"].startswith("2023-05-01.11:00") for item in _read_items(json_files[0]))
+    assert len(os.listdir(config["json_log_path"])) == 4
+
+
+def test_incremental_scan_of_appended_lines(config):
+    log_file = _write_log(config, "sairedis.rec")
+    config["incremental"] = True
+    # chunks smaller than the lines to check the line alignment at the scanned offset
+    config["chunk_size"] = 97
+
+    json_files = scanner.scan_json_logs(config)
+    assert len(json_files) == 1
+    items = _read_items(json_files[0])
+
+    # lines appended to the active log file, the last one is still being written
+    appended = SAIREDIS_LOG.replace("10:00", "10:01")
+    with open(log_file, "a") as f:
+        f.write(appended + appended[:60])
+    json_files = scanner.scan_json_logs(config)
+    assert len(json_files) == 1
+    new_items = _read_items(json_files[0])
+    assert new_items and all(item["log_time"].startswith("2023-05-01.10:01") for item in new_items)
+    assert len(new_items) == len(items) // 5
+
+    # the line is completed, then the log file is rotated
+    with open(log_file, "a") as f:
+        f.write(appended[60:])
+    log_path = config["swss_device_log_items"][0]["log_path"]
+    os.rename(log_file, os.path.join(log_path, "sairedis.rec.1"))
+    _write_log(config, "sairedis.rec", SAIREDIS_LOG.replace("10:00", "11:00"))
+
+    json_files = scanner.scan_json_logs(config)
+    assert len(json_files) == 2
+    rotated_items, = (_read_items(f) for f in json_files if os.path.basename(f).startswith("sairedis.rec.1."))
+    new_log_items, = (_read_items(f) for f in json_files if not os.path.basename(f).startswith("sairedis.rec.1."))
+    assert rotated_items == [dict(item, log_file=os.path.join(log_path, "sairedis.rec.1")) for item in new_items]
+    assert len(new_log_items) == len(items)
+
+    assert scanner.scan_json_logs(config) == []
+    cache = scanner.load_scan_cache(scanner.get_scan_cache_path(config))
+    assert len(cache["scanned"]["dut"]) == 2
@@ -1,4 +1,7 @@
 from .facts_cache import FactsCache
 from .facts_cache import cached
+from .config_fingerprint import changes_config
+from .config_fingerprint import config_fingerprint_getter
+from .config_fingerprint import mark_dirty
 
-__all__ = [FactsCache, cached]
+__all__ = [FactsCache, cached, changes_config, config_fingerprint_getter, mark_dirty]
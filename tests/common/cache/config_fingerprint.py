@@ -0,0 +1,116 @@
+"""Fingerprint of the DUT configuration, used for invalidating cached facts which depend on it.
+
+The fingerprint is computed from the size and modification time of the DUT config files plus the image version, so
+a single remote command is enough to tell whether facts cached for the DUT are still valid. The fingerprint is
+validated lazily: once computed it is reused until the DUT is marked dirty, e.g. by config_reload or by a
+'config reload/load/load_minigraph' command run through SonicHost.
+"""
+import hashlib
+import logging
+import os
+import re
+from threading import Lock
+
+from .facts_cache import FactsCache
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FINGERPRINT_CMD = "stat -c '%n %s %Y' /etc/sonic/config_db*.json /etc/sonic/minigraph.xml 2>/dev/null; " \
+                         "grep '^build_version' /etc/sonic/sonic_version.yml 2>/dev/null; true"
+GENERATION_FILE = '.config_generation'
+CONFIG_CHANGE_CMD_PATTERN = re.compile(r'\bconfig\s+(reload|load_minigraph|load)\b')
+CONFIG_CHANGE_MODULES = ('shell', 'command', 'shell_cmds')
+
+_lock = Lock()
+_fingerprints = {}  # hostname -> (generation, fingerprint)
+
+
+def _generation_file(hostname):
+    return os.path.join(FactsCache()._cache_location, hostname, GENERATION_FILE)
+
+
+def _get_generation(hostname):
+    """Generation of the DUT config, it is changed by mark_dirty of any process sharing the cache folder."""
+    try:
+        return os.stat(_generation_file(hostname)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def fingerprint_of(output):
+    """Fingerprint from the output of CONFIG_FINGERPRINT_CMD."""
+    return hashlib.sha1(output.strip().encode()).hexdigest()
+
+
+def mark_dirty(hostname):
+    """Mark the config of the DUT changed, facts cached with the config fingerprint will be revalidated on next read.
+
+    Args:
+        hostname (str): Hostname of the DUT.
+    """
+    with _lock:
+        _fingerprints.pop(hostname, None)
+    generation_file = _generation_file(hostname)
+    try:
+        if not os.path.exists(os.path.dirname(generation_file)):
+            os.makedirs(os.path.dirname(generation_file), exist_ok=True)
+        with open(generation_file, 'a'):
+            os.utime(generation_file)
+        logger.info('[Cache] Marked config of {} dirty'.format(hostname))
+    except OSError as e:
+        logger.warning('[Cache] Failed to mark config of {} dirty: {}'.format(hostname, repr(e)))
+
+
+def changes_config(module_name, module_args, complex_args):
+    """Whether an ansible module run on the DUT could change its config, like shell('config reload -y').
+
+    Args:
+        module_name (str): Name of the ansible module.
+        module_args (tuple): Positional arguments of the module.
+        complex_args (dict): Keyword arguments of the module.
+
+    Returns:
+        bool: True if the module runs a command matching CONFIG_CHANGE_CMD_PATTERN.
+    """
+    if module_name not in CONFIG_CHANGE_MODULES:
+        return False
+    cmds = list(module_args) + [complex_args.get('cmd'), complex_args.get('_raw_params')]
+    if isinstance(complex_args.get('argv'), (list, tuple)):
+        cmds.append(' '.join(str(arg) for arg in complex_args['argv']))
+    if module_name == 'shell_cmds':
+        cmds.extend(complex_args.get('cmds') or [])
+    return any(isinstance(cmd, str) and CONFIG_CHANGE_CMD_PATTERN.search(cmd) for cmd in cmds)
+
+
+def get_config_fingerprint(host):
+    """Get fingerprint of the DUT config, run the remote command only if the config could have changed.
+
+    Args:
+        host (obj): SonicHost object.
+
+    Returns:
+        str or None: Fingerprint, None if it can't be retrieved.
+    """
+    hostname = host.hostname
+    generation = _get_generation(hostname)
+    with _lock:
+        cached = _fingerprints.get(hostname)
+    if cached and cached[0] == generation:
+        return cached[1]
+
+    result = host.shell(CONFIG_FINGERPRINT_CMD, module_ignore_errors=True)
+    if result.get('failed') or result.get('rc', 0) != 0:
+        logger.warning('[Cache] Failed to get config fingerprint of {}'.format(hostname))
+        return None
+
+    fingerprint = fingerprint_of(result['stdout'])
+    with _lock:
+        _fingerprints[hostname] = (generation, fingerprint)
+    logger.debug('[Cache] Config fingerprint of {}: {}'.format(hostname, fingerprint))
+    return fingerprint
+
+
+def config_fingerprint_getter(function, func_args, func_kargs):
+    """Fingerprint getter for decorator cached, for methods of SonicHost and SonicAsic."""
+    host = func_args[0]
+    return get_config_fingerprint(getattr(host, 'sonichost', host))
@@ -1,17 +1,21 @@
 
 
+import fcntl
+import hashlib
 import inspect
+import json
 import logging
+import mmap
 import os
 import pickle
-import random
 import shutil
 import sys
-import time
+import threading
 
-from collections import defaultdict
+from collections import OrderedDict
+from contextlib import contextmanager
 from pickle import UnpicklingError
-from threading import Lock
+from threading import Lock, RLock
 from six import with_metaclass
 
 
@@ -22,8 +26,12 @@ CACHE_LOCATION = os.path.join(CURRENT_PATH, '../../../_cache')
 
 SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
+MEMORY_LIMIT = 256000000  # 256M bytes, max size of the pickled facts kept in memory
 DISABLE_CACHE_PARAM = "disable_cache"
 
+INDEX_FILE = '.index.json'  # Size and digest of every cache file, shared by all the processes
+LOCK_FILE = '.lock'         # Lock file serializing the cache writers of all the processes
+
 
 class Singleton(type):
 
@@ -43,88 +51,183 @@ class FactsCache(with_metaclass(Singleton, object)):
 
     Used singleton design pattern. Only a single instance of this class can be initialized.
 
+    Cache files are replaced atomically by renaming a fully written temporary file, so concurrent readers always
+    see either the old or the new facts. The disk usage is accounted incrementally in an index file updated under
+    an inter-process lock, together with the digest of each cache file content. The lock serializes the writers,
+    and writing facts identical to the ones already cached in the same cache folder only updates their fingerprint
+    instead of rewriting the file. It does not deduplicate the gathering: processes missing the cache at the same
+    time all gather the facts and write them in turn. Loaded facts are kept in memory in a LRU limited by
+    MEMORY_LIMIT.
+
     Args:
         with_metaclass ([function]): Python 2&3 compatible function from the six library for adding metaclass.
     """
 
     NOTEXIST = object()
 
-    def __init__(self, cache_location=CACHE_LOCATION):
+    def __init__(self, cache_location=CACHE_LOCATION, memory_limit=MEMORY_LIMIT):
         self._cache_location = os.path.abspath(cache_location)
-        self._cache = defaultdict(dict)
+        self._cache = OrderedDict()  # (zone, key) -> (facts, size of the pickled facts)
+        self._fingerprints = {}  # (zone, key) -> fingerprint the facts were cached with
+        self._memory_usage = 0
+        self._memory_limit = memory_limit
+        self._memory_lock = RLock()
         self._write_lock = Lock()
 
-    def _check_usage(self):
-        """Check cache usage, raise exception if usage exceeds the limitations.
+    def _facts_file(self, zone, key):
+        return os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+
+    def _remember(self, zone, key, value, size):
+        """Keep facts in memory, evict the least recently used facts when over the memory limit.
         """
-        total_size = 0
-        total_entries = 0
+        with self._memory_lock:
+            previous = self._cache.pop((zone, key), None)
+            if previous is not None:
+                self._memory_usage -= previous[1]
+            if size > self._memory_limit:
+                return
+            self._cache[(zone, key)] = (value, size)
+            self._memory_usage += size
+            while self._memory_usage > self._memory_limit:
+                (evicted_zone, evicted_key), (_, evicted_size) = self._cache.popitem(last=False)
+                self._memory_usage -= evicted_size
+                logger.debug('[Cache] Evicted "{}.{}" from memory'.format(evicted_zone, evicted_key))
+
+    def _recall(self, zone, key):
+        with self._memory_lock:
+            item = self._cache.get((zone, key))
+            if item is None:
+                return self.NOTEXIST
+            self._cache.move_to_end((zone, key))
+            return item[0]
+
+    def _forget(self, zone=None, key=None):
+        with self._memory_lock:
+            for cached_zone, cached_key in list(self._cache):
+                if (zone is None or cached_zone == zone) and (key is None or cached_key == key):
+                    self._memory_usage -= self._cache.pop((cached_zone, cached_key))[1]
+            for cached_zone, cached_key in list(self._fingerprints):
+                if (zone is None or cached_zone == zone) and (key is None or cached_key == key):
+                    del self._fingerprints[(cached_zone, cached_key)]
+
+    def _recorded_fingerprint(self, zone, key):
+        """Get fingerprint the facts were cached with, from memory or from the index file.
+        """
+        with self._memory_lock:
+            if (zone, key) in self._fingerprints:
+                return self._fingerprints[(zone, key)]
+        try:
+            with open(os.path.join(self._cache_location, INDEX_FILE)) as f:
+                entry = json.load(f)['entries'].get('{}/{}'.format(zone, key)) or {}
+        except (IOError, ValueError, KeyError, TypeError, AttributeError):
+            entry = {}
+        fingerprint = entry.get('fingerprint')
+        with self._memory_lock:
+            self._fingerprints[(zone, key)] = fingerprint
+        return fingerprint
+
+    def _build_index(self):
+        """Build cache index by walking the cache folder, used when the index file is missing or broken.
+        """
+        index = {'size': 0, 'entries': {}}
         for root, _, files in os.walk(self._cache_location):
             for f in files:
+                if not f.endswith('.pickle'):
+                    continue
                 fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
-
-        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
-            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
-                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
-
-    def _read_facts_file(self, facts_file, z, k):
+                entry = os.path.relpath(fp, self._cache_location)[:-len('.pickle')]
+                size = os.path.getsize(fp)
+                index['entries'][entry] = {'size': size, 'digest': None}
+                index['size'] += size
+        return index
+
+    @contextmanager
+    def _locked_index(self):
+        """Lock the cache index for all the processes, yield it and save it if no exception raised.
+        """
+        if not os.path.exists(self._cache_location):
+            os.makedirs(self._cache_location, exist_ok=True)
+        index_file = os.path.join(self._cache_location, INDEX_FILE)
+        with open(os.path.join(self._cache_location, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(index_file) as f:
+                        index = json.load(f)
+                except (IOError, ValueError):
+                    index = None
+                if not isinstance(index, dict) or not isinstance(index.get('entries'), dict) \
+                        or not isinstance(index.get('size'), int):
+                    index = self._build_index()
+                yield index
+                self._atomic_write(index_file, json.dumps(index).encode())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _atomic_write(self, path, data):
+        tmp_file = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, path)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _read_facts_file(self, facts_file):
         with open(facts_file, 'rb') as f:
-            self._cache[z][k] = pickle.load(f)
-            logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
-            return self._cache[z][k]
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                raise EOFError('Empty cache file')
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return pickle.loads(data), size
 
-    def read(self, zone, key):
+    def read(self, zone, key, fingerprint=None):
         """Read cached facts.
 
         Args:
             zone (str): Cached facts are organized by zones. This argument is to specify the zone name.
                 The zone name could be hostname.
             key (str): Name of cached facts.
+            fingerprint (str): Fingerprint of the data the facts depend on. If specified, the facts cached with
+                a different fingerprint are considered stale. Default is None.
 
         Returns:
             obj: Cached object, usually a dictionary.
         """
+        if fingerprint is not None and self._recorded_fingerprint(zone, key) != fingerprint:
+            logger.info('[Cache] Cached facts "{}.{}" are stale'.format(zone, key))
+            return self.NOTEXIST
+
         # Lazy load
-        if zone in self._cache and key in self._cache[zone]:
+        facts = self._recall(zone, key)
+        if facts is not self.NOTEXIST:
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
-            return self._cache[zone][key]
-        else:
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
-            try:
-                return self._read_facts_file(facts_file, zone, key)
-            except (IOError, ValueError) as e:
-                logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
-            except (EOFError, UnpicklingError) as e:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that
-                #   - a file is being written by process1 while process2 is reading it, causing EOFError in process2
-                #   - a file is being read by multiple processes at the same time, causing UnpicklingError in some of
-                #     the processes
-                # In these cases, we will retry to read the file after a short random sleep. If we still get the same
-                # error after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    time.sleep(random.randint(3, 6))
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except (EOFError, UnpicklingError):
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
-                logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
-                             .format(facts_file, repr(e)))
-                return self.NOTEXIST
-            except Exception as e:
-                logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
+            return facts
 
-    def write(self, zone, key, value):
+        facts_file = self._facts_file(zone, key)
+        try:
+            facts, size = self._read_facts_file(facts_file)
+        except (IOError, ValueError) as e:
+            logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
+                        .format(os.path.abspath(facts_file), repr(e)))
+            return self.NOTEXIST
+        except (EOFError, UnpicklingError) as e:
+            # Cache files are replaced atomically, so a file is never read while it is partially written.
+            # A broken file will be overwritten by the caller.
+            logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
+                         .format(facts_file, repr(e)))
+            return self.NOTEXIST
+        except Exception as e:
+            logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
+                        .format(os.path.abspath(facts_file), repr(e)))
+            return self.NOTEXIST
+
+        self._remember(zone, key, facts, size)
+        logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(zone, key, facts_file))
+        return facts
+
+    def write(self, zone, key, value, fingerprint=None):
         """Store facts to cache.
 
         Args:
@@ -132,24 +235,46 @@ class FactsCache(with_metaclass(Singleton, object)):
                 The zone name could be hostname.
             key (str): Name of cached facts.
             value (obj): Value of cached facts. Usually a dictionary.
+            fingerprint (str): Fingerprint of the data the facts depend on, see read(). Default is None.
 
         Returns:
             boolean: Caching facts is successful or not.
         """
         with self._write_lock:
-            self._check_usage()
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+            facts_file = self._facts_file(zone, key)
+            entry_name = '{}/{}'.format(zone, key)
             try:
-                cache_subfolder = os.path.join(self._cache_location, zone)
-                if not os.path.exists(cache_subfolder):
-                    logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
-
-                with open(facts_file, 'wb') as f:
-                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
-                    return True
+                data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                digest = hashlib.sha1(data).hexdigest()
+                with self._locked_index() as index:
+                    entry = index['entries'].get(entry_name)
+                    if entry and entry['digest'] == digest and os.path.exists(facts_file):
+                        entry['fingerprint'] = fingerprint
+                        logger.debug('[Cache] Facts "{}.{}" are already cached'.format(zone, key))
+                    else:
+                        total_size = index['size'] - (entry['size'] if entry else 0) + len(data)
+                        total_entries = len(index['entries']) + (0 if entry else 1)
+                        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
+                            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, ' \
+                                  'total_entries={}, ENTRY_LIMIT={}' \
+                                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
+                            raise Exception(msg)
+
+                        cache_subfolder = os.path.join(self._cache_location, zone)
+                        if not os.path.exists(cache_subfolder):
+                            logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
+                            os.makedirs(cache_subfolder, exist_ok=True)
+
+                        self._atomic_write(facts_file, data)
+                        index['entries'][entry_name] = {'size': len(data), 'digest': digest,
+                                                        'fingerprint': fingerprint}
+                        index['size'] = total_size
+                        logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+
+                with self._memory_lock:
+                    self._fingerprints[(zone, key)] = fingerprint
+                self._remember(zone, key, value, len(data))
+                return True
             except (IOError, ValueError) as e:
                 logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
                 return False
@@ -164,29 +289,33 @@ class FactsCache(with_metaclass(Singleton, object)):
             key (str): Name of cached facts. Default is None.
         """
         if zone:
+            self._forget(zone, key)
             if key:
-                if zone in self._cache and key in self._cache[zone]:
-                    del self._cache[zone][key]
-                    logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
                 try:
                     cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
-                    os.remove(cache_file)
+                    with self._locked_index() as index:
+                        os.remove(cache_file)
+                        entry = index['entries'].pop('{}/{}'.format(zone, key), None)
+                        if entry:
+                            index['size'] -= entry['size']
                     logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
                 except OSError as e:
                     logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
                                  .format(zone, key, repr(e)))
             else:
-                if zone in self._cache:
-                    del self._cache[zone]
-                    logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
                 try:
                     cache_subfolder = os.path.join(self._cache_location, zone)
-                    shutil.rmtree(cache_subfolder)
+                    with self._locked_index() as index:
+                        shutil.rmtree(cache_subfolder)
+                        for entry in [e for e in index['entries'] if e.startswith(zone + '/')]:
+                            index['size'] -= index['entries'].pop(entry)['size']
                     logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
                 except OSError as e:
                     logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
         else:
-            self._cache = defaultdict(dict)
+            self._forget()
             try:
                 shutil.rmtree(self._cache_location)
                 logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
@@ -241,7 +370,7 @@ def _get_disable_cache(target, args, kwargs):
     return bound_args.arguments.get(DISABLE_CACHE_PARAM, False)
 
 
-def cached(name, zone_getter=None, after_read=None, before_write=None):
+def cached(name, zone_getter=None, after_read=None, before_write=None, fingerprint_getter=None):
     """Decorator for enabling cache for facts.
 
     The cached facts are to be stored by <name>.pickle. Because the cached pickle files must be stored under subfolder
@@ -249,6 +378,9 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
     function must have signature of '(function, func_args, func_kargs)' that 'function' is the decorated function,
     'func_args' and 'func_kargs' are the parameters passed to the decorated function at runtime.
     The zone getter function should raise an error if it fails to return a string as zone.
+    The fingerprint getter function has the same signature as zone getter and returns fingerprint of the data the
+    facts depend on, the facts cached with a different fingerprint are gathered again. See config_fingerprint_getter
+    for facts depending on the DUT config.
     With default zone getter function, this decorator can try to find zone:
     if the function is a bound method of class AnsibleHostBase and its derivatives, it will try to use its
     attribute 'hostname' as zone, or raises an error if 'hostname' doesn't exists or is not a string.
@@ -258,6 +390,7 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
         zone_getter ([function]): Function used to get hostname used as zone.
         after_read ([function]): Hook function used to process facts after read from cache.
         before_write ([function]): Hook function used to process facts before write into cache.
+        fingerprint_getter ([function]): Function used to get fingerprint of the data the facts depend on.
     Returns:
         [function]: Decorator function.
     """
@@ -274,7 +407,8 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
             _zone_getter = zone_getter or _get_default_zone
             zone = _zone_getter(target, args, kargs)
 
-            cached_facts = cache.read(zone, name)
+            fingerprint = fingerprint_getter(target, args, kargs) if fingerprint_getter else None
+            cached_facts = cache.read(zone, name, fingerprint=fingerprint)
             if after_read:
                 cached_facts = after_read(cached_facts, target, args, kargs)
             if cached_facts is not FactsCache.NOTEXIST:
@@ -284,9 +418,9 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
                 facts = target(*args, **kargs)
                 if before_write:
                     _facts = before_write(facts, target, args, kargs)
-                    cache.write(zone, name, _facts)
+                    cache.write(zone, name, _facts, fingerprint=fingerprint)
                 else:
-                    cache.write(zone, name, facts)
+                    cache.write(zone, name, facts, fingerprint=fingerprint)
                 return facts
         return wrapper
     return decorator
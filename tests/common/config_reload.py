@@ -2,6 +2,7 @@ import time
 import logging
 import os
 
+from tests.common.cache import mark_dirty
 from tests.common.helpers.assertions import pytest_assert
 from tests.common.helpers.parallel_utils import synchronized_config_reload
 from tests.common.plugins.loganalyzer.utils import support_ignore_loganalyzer
@@ -290,6 +291,9 @@ def config_reload(sonic_host, config_source='config_db', wait=120, start_bgp=Tru
             cmd = f'config reload -y -f -l {golden_path}'
         sonic_host.shell(cmd, executable="/bin/bash")
 
+    # Facts cached with the config fingerprint are revalidated on the next read
+    mark_dirty(sonic_host.hostname)
+
     modular_chassis = sonic_host.get_facts().get("modular_chassis")
     wait = max(wait, 600) if modular_chassis else wait
 
@@ -7,25 +7,66 @@ including APPL_DB, CONFIG_DB, and STATE_DB.
 
 Main features:
 - Take snapshots of Redis databases
+- Take compact snapshots streamed on the DUT, see tests/scripts/redis_snapshot.py
 - Compare snapshots and generate detailed diffs
 - Filter out volatile/transient data that changes frequently
 - Provide metrics on database differences
 """
 
 from enum import Enum
+import functools
+import gzip
+import hashlib
 import json
 import logging
 import os
 import re
 import copy
+import zlib
 from typing import Dict, List, Tuple
 from collections import Counter
+from collections.abc import Mapping
 from dataclasses import dataclass
 
 from tests.common.helpers.custom_msg_utils import add_custom_msg
 
 logger = logging.getLogger(__name__)
 
+# Helper run on the DUT to take the compact snapshots
+SNAPSHOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "redis_snapshot.py")
+DUT_SNAPSHOT_SCRIPT = "/tmp/redis_snapshot.py"
+COMPACT_SNAPSHOT_FORMAT = "sonic-redis-snapshot"
+COMPACT_SNAPSHOT_SUFFIX = ".snap.gz"
+
+
+class KeyMatcher:
+    """
+    Patterns of match_key compiled once.
+
+    The prefixes are checked with one str.startswith call and the regular expressions are combined into one
+    alternation, which matches at the start of the key if any of the patterns does.
+    """
+
+    def __init__(self, patterns):
+        self._prefixes = tuple(patterns)
+        self._regexes = []
+        if self._prefixes:
+            try:
+                self._regexes = [re.compile("|".join("(?:{})".format(p) for p in self._prefixes))]
+            except re.error:
+                # e.g. a pattern with a global inline flag can't be combined
+                self._regexes = [re.compile(p) for p in self._prefixes]
+
+    def match(self, key):
+        if key.startswith(self._prefixes):
+            return True
+        return any(regex.match(key) for regex in self._regexes)
+
+
+@functools.lru_cache(maxsize=64)
+def _key_matcher(patterns):
+    return KeyMatcher(patterns)
+
 
 def match_key(key, kset):
     """
@@ -40,12 +81,9 @@ def match_key(key, kset):
     Returns:
         bool: True if the key matches any pattern in kset, False otherwise
     """
-    for k in kset:
-        if key.startswith(k):
-            return True
-        elif re.match(k, key):
-            return True
-    return False
+    if isinstance(kset, KeyMatcher):
+        return kset.match(key)
+    return _key_matcher(tuple(sorted(kset))).match(key)
 
 
 def dut_dump(redis_cmd, duthost, data_dir, fname):
@@ -151,6 +189,113 @@ VOLATILE_VALUES = {
 }
 
 
+def encode_compact_entry(entry: dict, volatile) -> Tuple[str, str, int, int]:
+    """
+    Encode the entry of a key as tests/scripts/redis_snapshot.py does on the DUT.
+
+    Returns:
+        Tuple[str, str, int, int]: The serialized entry, its content hash, the number of values
+                                   including and excluding the volatile ones
+    """
+    data = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+    total_incl_volatile = 0
+    total_excl_volatile = 0
+    for field in entry.get("value", {}):
+        total_incl_volatile += 1
+        if not isinstance(field, str) or field not in volatile:
+            total_excl_volatile += 1
+    return data, digest, total_incl_volatile, total_excl_volatile
+
+
+class CompactSnapshot(Mapping):
+    """
+    Snapshot of a DB in the compact format written by tests/scripts/redis_snapshot.py.
+
+    Only the content hash of each key is kept in memory with the location of its entry. The entries are kept in
+    zlib compressed blocks of ~64KB. It can be used as a read-only dict of key => entry, the block of an entry is
+    decompressed when it is accessed. SnapshotDiff compares the content hashes and decompresses only the entries
+    of the keys which differ.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self):
+        # key => (content hash, block index, offset in block, length)
+        self._keys: Dict[str, Tuple[bytes, int, int, int]] = {}
+        self._blocks: List[bytes] = []
+        self._block: List[bytes] = []
+        self._block_size = 0
+        self._cached_block = (None, b"")
+        self._total_incl_volatile = 0
+        self._total_excl_volatile = 0
+
+    def _add(self, key: str, digest: bytes, total_incl: int, total_excl: int, data: bytes):
+        if key in self._keys:
+            # SCAN can return a key more than once
+            return
+        self._keys[key] = (digest, len(self._blocks), self._block_size, len(data))
+        self._total_incl_volatile += total_incl
+        self._total_excl_volatile += total_excl
+        self._block.append(data)
+        self._block_size += len(data)
+        if self._block_size >= self.BLOCK_SIZE:
+            self._flush_block()
+
+    def _flush_block(self):
+        if self._block:
+            self._blocks.append(zlib.compress(b"".join(self._block)))
+            self._block = []
+            self._block_size = 0
+
+    @classmethod
+    def load(cls, path: str) -> "CompactSnapshot":
+        snapshot = cls()
+        with gzip.open(path, "rb") as f:
+            header = json.loads(f.readline() or b"{}")
+            assert header.get("format") == COMPACT_SNAPSHOT_FORMAT, f"Unexpected snapshot header in {path}: {header}"
+            for line in f:
+                key, digest, total_incl, total_excl, data = line.rstrip(b"\n").split(b"\t", 4)
+                # The key is a JSON string, decode it with json only if it has any escaped character
+                key = json.loads(key) if b"\\" in key else key[1:-1].decode("utf-8")
+                snapshot._add(key, digest, int(total_incl), int(total_excl), data)
+        snapshot._flush_block()
+        return snapshot
+
+    @classmethod
+    def from_dump(cls, db_type: DBType, db_dump: dict) -> "CompactSnapshot":
+        """Convert a redis-dump snapshot, e.g. to compare it with a compact one."""
+        snapshot = cls()
+        volatile = VOLATILE_VALUES.get(db_type, set())
+        for key, entry in db_dump.items():
+            data, digest, total_incl, total_excl = encode_compact_entry(entry, volatile)
+            snapshot._add(key, digest.encode("ascii"), total_incl, total_excl, data.encode("utf-8"))
+        snapshot._flush_block()
+        return snapshot
+
+    def __getitem__(self, key):
+        _, block_index, offset, length = self._keys[key]
+        if self._cached_block[0] != block_index:
+            self._cached_block = (block_index, zlib.decompress(self._blocks[block_index]))
+        return json.loads(self._cached_block[1][offset:offset + length].decode("utf-8"))
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def content_hash(self, key: str) -> bytes:
+        return self._keys[key][0]
+
+    def sum_total_values(self) -> Tuple[int, int]:
+        """Same as _sum_total_values() but from the counts computed when the snapshot was taken."""
+        return self._total_incl_volatile, self._total_excl_volatile
+
+
 @dataclass
 class DbComparisonMetrics:
     """Metrics summarizing the comparison between two DB snapshots"""
@@ -289,11 +434,21 @@ class DbComparisonMetrics:
         self.num_overall_differing_values = num_overall_differing_values
 
 
+PROCESS_STATS_KEY = re.compile(r"^PROCESS_STATS\|\d+")
+
+
 class SnapshotDiff:
     """Container for differing values and metrics of a snapshot comparison for a singleDB supporting metric tracking
     """
     def __init__(self, db_type: DBType, snapshot_a: dict, snapshot_b: dict, label_a: str = "a", label_b: str = "b"):
         self._db_type = db_type
+        self._compact = isinstance(snapshot_a, CompactSnapshot) or isinstance(snapshot_b, CompactSnapshot)
+        if self._compact:
+            # Compare a redis-dump snapshot with a compact one by their content hashes too
+            if not isinstance(snapshot_a, CompactSnapshot):
+                snapshot_a = CompactSnapshot.from_dump(db_type, snapshot_a)
+            if not isinstance(snapshot_b, CompactSnapshot):
+                snapshot_b = CompactSnapshot.from_dump(db_type, snapshot_b)
         self._snapshot_a = snapshot_a
         self._snapshot_b = snapshot_b
         self._label_a = label_a
@@ -312,10 +467,16 @@ class SnapshotDiff:
         if db_type == DBType.STATE:
             state_db_diff = self._diff_state_db_process_stats(self._snapshot_a, self._snapshot_b)
             # Remove all 'PROCESS_STATS|*' keys from the dbs since they've already been diffed
-            self._snapshot_a = {k: v for k, v in self._snapshot_a.items() if not k.startswith("PROCESS_STATS|")}
-            self._snapshot_b = {k: v for k, v in self._snapshot_b.items() if not k.startswith("PROCESS_STATS|")}
-            remaining_diff = self._diff_dict(db_type, self._snapshot_a, self._snapshot_b)
+            if self._compact:
+                remaining_diff = self._diff_compact(db_type, self._snapshot_a, self._snapshot_b,
+                                                    skip_prefix="PROCESS_STATS|")
+            else:
+                self._snapshot_a = {k: v for k, v in self._snapshot_a.items() if not k.startswith("PROCESS_STATS|")}
+                self._snapshot_b = {k: v for k, v in self._snapshot_b.items() if not k.startswith("PROCESS_STATS|")}
+                remaining_diff = self._diff_dict(db_type, self._snapshot_a, self._snapshot_b)
             self._diff = {**state_db_diff, **remaining_diff}
+        elif self._compact:
+            self._diff = self._diff_compact(db_type, self._snapshot_a, self._snapshot_b)
         else:
             self._diff = self._diff_dict(db_type, self._snapshot_a, self._snapshot_b)
 
@@ -345,8 +506,9 @@ class SnapshotDiff:
         db_a_processes = []
         db_b_processes = []
         for extracted_cmd_store, state_db in [(db_a_processes, state_db_a), (db_b_processes, state_db_b)]:
-            for key, content in state_db.items():
-                if re.match(r"^PROCESS_STATS\|\d+", key):
+            for key in state_db:
+                if PROCESS_STATS_KEY.match(key):
+                    content = state_db[key]
                     assert "value" in content and "CMD" in content["value"], \
                         f"Unexpected PROCESS_STATS entry: {key} : {content}"
                     extracted_cmd_store.append(content["value"]["CMD"])
@@ -373,10 +535,30 @@ class SnapshotDiff:
             }
         }
 
+    def _diff_compact(self, db_type: DBType, snapshot_a: CompactSnapshot, snapshot_b: CompactSnapshot,
+                      skip_prefix: str = None) -> dict:
+        """Same diff as _diff_dict() but only the keys whose content hashes differ are decompressed and compared"""
+        always_ignore_keys = set(VOLATILE_VALUES.get(db_type, []))
+
+        a_keys = set(snapshot_a) - always_ignore_keys
+        b_keys = set(snapshot_b) - always_ignore_keys
+        if skip_prefix:
+            a_keys = {k for k in a_keys if not k.startswith(skip_prefix)}
+            b_keys = {k for k in b_keys if not k.startswith(skip_prefix)}
+        changed_keys = [k for k in a_keys & b_keys if snapshot_a.content_hash(k) != snapshot_b.content_hash(k)]
+
+        dict_a = {k: snapshot_a[k] for k in a_keys - b_keys}
+        dict_b = {k: snapshot_b[k] for k in b_keys - a_keys}
+        for key in changed_keys:
+            dict_a[key] = snapshot_a[key]
+            dict_b[key] = snapshot_b[key]
+        return self._diff_dict(db_type, dict_a, dict_b)
+
     def _diff_dict(self, db_type: DBType, dict_a: dict, dict_b: dict) -> dict:
 
         result = {}
         always_ignore_keys = set(VOLATILE_VALUES.get(db_type, []))
+        ignore_matcher = None
 
         a_keys = set(dict_a.keys()) - always_ignore_keys
         b_keys = set(dict_b.keys()) - always_ignore_keys
@@ -389,7 +571,8 @@ class SnapshotDiff:
             if isinstance(dict_a[key], dict):
                 # Remove always ignore keys
                 val = copy.deepcopy(dict_a[key])
-                _recursively_remove_keys_matching_pattern(val, always_ignore_keys)
+                ignore_matcher = ignore_matcher or KeyMatcher(always_ignore_keys)
+                _recursively_remove_keys_matching_pattern(val, ignore_matcher)
             else:
                 val = dict_a[key]
             result[key] = {
@@ -402,7 +585,8 @@ class SnapshotDiff:
             if isinstance(dict_b[key], dict):
                 # Remove always ignore keys
                 val = copy.deepcopy(dict_b[key])
-                _recursively_remove_keys_matching_pattern(val, always_ignore_keys)
+                ignore_matcher = ignore_matcher or KeyMatcher(always_ignore_keys)
+                _recursively_remove_keys_matching_pattern(val, ignore_matcher)
             else:
                 val = dict_b[key]
             result[key] = {
@@ -510,10 +694,12 @@ def _recursively_remove_keys_matching_pattern(d_for_removal, patterns):
 
     Args:
         d_for_removal (dict): Dictionary to remove keys from (modified in-place)
-        patterns (iterable): Set of patterns to match against keys using match_key()
+        patterns (iterable): Set of patterns to match against keys using match_key(), or a KeyMatcher of them
     """
     if isinstance(d_for_removal, dict):
-        keys_to_remove = [k for k in d_for_removal if match_key(k, patterns)]
+        if not isinstance(patterns, KeyMatcher):
+            patterns = KeyMatcher(patterns)
+        keys_to_remove = [k for k in d_for_removal if patterns.match(k)]
         for k in keys_to_remove:
             del d_for_removal[k]
         for v in d_for_removal.values():
@@ -522,6 +708,8 @@ def _recursively_remove_keys_matching_pattern(d_for_removal, patterns):
 
 def _sum_total_values(db_type: DBType, db_dump: dict) -> Tuple[int, int]:
     """Summarize the number of total values in the DB dump."""
+    if isinstance(db_dump, CompactSnapshot):
+        return db_dump.sum_total_values()
     total_incl_volatile = 0
     total_excl_volatile = 0
     always_ignore_keys = VOLATILE_VALUES.get(db_type, [])
@@ -535,6 +723,25 @@ def _sum_total_values(db_type: DBType, db_dump: dict) -> Tuple[int, int]:
     return total_incl_volatile, total_excl_volatile
 
 
+def _list_snapshot_files(snapshot_dir: str) -> Dict[str, str]:
+    """Returns the snapshot files in the directory, DB name => file name"""
+    result = {}
+    for f in os.listdir(snapshot_dir):
+        for suffix in [COMPACT_SNAPSHOT_SUFFIX, ".json"]:
+            if f.endswith(suffix):
+                result[f[:-len(suffix)]] = f
+                break
+    return result
+
+
+def _load_snapshot_file(path: str):
+    """Load the compact snapshot as a CompactSnapshot and the redis-dump snapshot as a dict"""
+    if path.endswith(COMPACT_SNAPSHOT_SUFFIX):
+        return CompactSnapshot.load(path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
 class SonicRedisDBSnapshotter:
     """
     Class for taking and comparing Redis database snapshots on SONiC devices.
@@ -547,27 +754,32 @@ class SonicRedisDBSnapshotter:
         _duthost: The device under test host object
         _snapshot_base_dir (str): Base directory for storing snapshots
         _snapshots (List[str]): List of snapshot names taken
+        _compact (bool): Take compact snapshots with tests/scripts/redis_snapshot.py
     """
 
-    def __init__(self, duthost, snapshot_base_dir):
+    def __init__(self, duthost, snapshot_base_dir, compact: bool = True):
         """
         Initialize the snapshotter with a DUT host and storage directory.
 
         Args:
             duthost: The device under test host object
             snapshot_base_dir (str): Base directory path where snapshots will be stored
+            compact (bool): Take compact snapshots streamed on the DUT instead of redis-dump JSON files. A DB is
+                            dumped with redis-dump if the compact snapshot fails, e.g. redis python module is missing.
         """
         self._duthost = duthost
         self._snapshot_base_dir = snapshot_base_dir
         os.makedirs(self._snapshot_base_dir, exist_ok=True)
         self._snapshots: List[str] = []
+        self._compact = compact
+        self._snapshot_script_copied = False
 
     def take_snapshot(self, snapshot_name: str, snapshot_dbs: List[DBType]):
         """
         Take a snapshot of specified Redis databases on the DUT.
 
         This method captures the current state of the specified Redis databases
-        and stores them as JSON files in a snapshot directory.
+        and stores them as compact snapshot or JSON files in a snapshot directory.
 
         Args:
             snapshot_name (str): Name identifier for this snapshot
@@ -578,6 +790,8 @@ class SonicRedisDBSnapshotter:
         snapshot_dir = f"{self._snapshot_base_dir}/{snapshot_name}/"
         os.makedirs(snapshot_dir, exist_ok=True)
         for db in snapshot_dbs:
+            if self._compact and self._take_compact_snapshot(db, snapshot_dir):
+                continue
             cmd = f"redis-dump -d {db.value} --pretty"
             dump = dut_dump(cmd, self._duthost, snapshot_dir, db.name)
             with open(f"{snapshot_dir}/{db.name}.json", "w") as f:
@@ -585,6 +799,31 @@ class SonicRedisDBSnapshotter:
 
         logger.info(f"Snapshot {snapshot_name} taken for {self._duthost.hostname} at {snapshot_dir}")
 
+    def _take_compact_snapshot(self, db: DBType, snapshot_dir: str) -> bool:
+        """
+        Take the compact snapshot of the DB on the DUT and fetch it, the DB is not loaded in memory on either side.
+
+        Returns:
+            bool: False if the compact snapshot could not be taken
+        """
+        if not self._snapshot_script_copied:
+            self._duthost.copy(src=SNAPSHOT_SCRIPT, dest=DUT_SNAPSHOT_SCRIPT, mode="0755")
+            self._snapshot_script_copied = True
+
+        dump_file = f"/tmp/{db.name}{COMPACT_SNAPSHOT_SUFFIX}"
+        volatile = ",".join(sorted(VOLATILE_VALUES.get(db, [])))
+        cmd = f"python3 {DUT_SNAPSHOT_SCRIPT} -d {db.value} -o {dump_file} -v '{volatile}'"
+        ret = self._duthost.shell(cmd, module_ignore_errors=True)
+        if ret["rc"] != 0:
+            logger.warning(f"Failed to take compact snapshot of {db.name}, using redis-dump: {ret.get('stderr')}")
+            return False
+
+        dest_file = f"{snapshot_dir}{db.name}{COMPACT_SNAPSHOT_SUFFIX}"
+        self._duthost.fetch(src=dump_file, dest=dest_file, flat=True)
+        self._duthost.shell(f"rm -f {dump_file}", module_ignore_errors=True)
+        assert os.path.exists(dest_file), "Fetched file not exist: {}".format(dest_file)
+        return True
+
     def diff_snapshots(self, snapshot_a: str, snapshot_b: str) -> Dict[DBType, SnapshotDiff]:
         """
         Compare two snapshots and return detailed differences for each database.
@@ -605,23 +844,22 @@ class SonicRedisDBSnapshotter:
             AssertionError: If the snapshots don't contain the same database types
         """
         snapshot_a_dir = f"{self._snapshot_base_dir}/{snapshot_a}"
-        snapshot_a_dbs = [f for f in os.listdir(snapshot_a_dir) if f.endswith(".json")]
+        snapshot_a_dbs = _list_snapshot_files(snapshot_a_dir)
 
         snapshot_b_dir = f"{self._snapshot_base_dir}/{snapshot_b}"
-        snapshot_b_dbs = [f for f in os.listdir(snapshot_b_dir) if f.endswith(".json")]
+        snapshot_b_dbs = _list_snapshot_files(snapshot_b_dir)
 
         assert set(snapshot_a_dbs) == set(snapshot_b_dbs), "Snapshotted dbs do not match. Cannot compare"
 
         result = {}
 
-        for db_file in snapshot_a_dbs:
-            db_name = db_file.replace(".json", "")
+        for db_name, db_file in snapshot_a_dbs.items():
             db_type = DBType[db_name]
             if db_type == DBType.ASIC:
                 # NOTE: ASIC DB diffing not currently supported
                 continue
-            db_dump_a = json.load(open(os.path.join(snapshot_a_dir, db_file), 'r'))
-            db_dump_b = json.load(open(os.path.join(snapshot_b_dir, db_file), 'r'))
+            db_dump_a = _load_snapshot_file(os.path.join(snapshot_a_dir, db_file))
+            db_dump_b = _load_snapshot_file(os.path.join(snapshot_b_dir, snapshot_b_dbs[db_name]))
             snapshot_diff = SnapshotDiff(db_type, db_dump_a, db_dump_b, label_a=snapshot_a, label_b=snapshot_b)
 
             result[db_type] = snapshot_diff
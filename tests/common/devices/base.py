@@ -9,6 +9,7 @@ from multiprocessing.pool import ThreadPool
 import ansible
 from pytest_ansible.results import AdHocResult, ModuleResult
 
+from tests.common.devices.ssh_channel import PersistentSSHChannel, SSH_CONNECTIONS
 from tests.common.errors import RunAnsibleModuleFail
 
 
@@ -102,6 +103,11 @@ class AnsibleHostBase(object):
     # Set by the ipv6_only_mgmt_enabled fixture in conftest.py
     _ipv6_only_mgmt_mode = False
 
+    # Class-level flag for running 'shell'/'command' modules over a persistent ssh channel.
+    # Set by the ssh_fast_path_enabled fixture in conftest.py
+    _ssh_fast_path = False
+    _ssh_channel = None
+
     @classmethod
     def set_ipv6_only_mgmt(cls, enabled: bool):
         """Set the IPv6-only management mode flag.
@@ -120,6 +126,16 @@ class AnsibleHostBase(object):
         """
         return cls._ipv6_only_mgmt_mode
 
+    @classmethod
+    def set_ssh_fast_path(cls, enabled: bool):
+        """Set the flag of running 'shell' and 'command' modules over a persistent ssh channel.
+
+        Called by the ssh_fast_path_enabled fixture in conftest.py.
+        """
+        cls._ssh_fast_path = enabled
+        if enabled:
+            logger.info("ssh fast path for shell/command modules enabled")
+
     class CustomEncoder(json.JSONEncoder):
         def default(self, obj):
             if isinstance(obj, bytes):
@@ -155,6 +171,8 @@ class AnsibleHostBase(object):
             else:
                 self.mgmt_ip = ansible_host
                 self.mgmt_ipv6 = ansible_hostv6
+            if kwargs.get('connection', 'ssh') in SSH_CONNECTIONS:
+                self._ssh_channel = PersistentSSHChannel(self.host, hostname, mgmt_ip=self.mgmt_ip)
         self.hostname = hostname
 
     def __getattr__(self, module_name):
@@ -207,18 +225,23 @@ class AnsibleHostBase(object):
             result = pool.apply_async(run_module, (module_args, complex_args))
             return pool, result
 
-        module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
-        complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
+        hostname_res = None
+        if self._ssh_fast_path and self._ssh_channel is not None:
+            hostname_res = self._ssh_channel.run(module_name, module_args, complex_args)
+
+        if hostname_res is None:
+            module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
+            complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
 
-        with suppress_signal_registration_for_non_main_thread():
-            adhoc_res: AdHocResult = module(*module_args, **complex_args)
+            with suppress_signal_registration_for_non_main_thread():
+                adhoc_res: AdHocResult = module(*module_args, **complex_args)
 
-        if module_name == "meta":
-            # The meta module is special in Ansible - it doesn't execute on remote hosts, it controls Ansible's behavior
-            # There are no per-host ModuleResults contained within it
-            return
+            if module_name == "meta":
+                # The meta module is special in Ansible - it doesn't execute on remote hosts, it controls Ansible's
+                # behavior. There are no per-host ModuleResults contained within it
+                return
 
-        hostname_res: ModuleResult = adhoc_res[self.hostname]
+            hostname_res: ModuleResult = adhoc_res[self.hostname]
         hostname_res.encoder = AnsibleHostBase.CustomEncoder
 
         if verbose:
@@ -881,11 +881,10 @@ class MultiAsicSonicHost(object):
     def is_critical_processes_running_per_asic_or_host(self, service):
         duthost = self.sonichost
         if duthost.is_multi_asic:
-            for asic in self.asics:
-                docker_name = asic.get_docker_name(service)
-                if not duthost.critical_processes_running(docker_name):
-                    return False
-            return True
+            # Check the containers of all the asics in one batch
+            docker_names = list(dict.fromkeys(asic.get_docker_name(service) for asic in self.asics))
+            all_status = duthost.critical_process_status_batch(docker_names)
+            return all(all_status[docker_name]['status'] for docker_name in docker_names)
         else:
             return duthost.critical_processes_running(service)
 
@@ -893,11 +892,11 @@ class MultiAsicSonicHost(object):
         """This function tell if service is fully started base on multi-asic/single-asic"""
         duthost = self.sonichost
         if duthost.is_multi_asic:
-            for asic in self.asics:
-                docker_name = asic.get_docker_name(service)
-                if not duthost.is_service_fully_started(docker_name):
-                    return False
-            return True
+            # Check the containers of all the asics in one batch
+            docker_names = list(dict.fromkeys(asic.get_docker_name(service) for asic in self.asics))
+            results = duthost.shell_batch(["docker inspect -f '{{{{.State.Running}}}}' {}".format(docker_name)
+                                           for docker_name in docker_names], module_ignore_errors=True)
+            return all(res['stdout'].strip() == "true" for res in results)
         else:
             return duthost.is_service_fully_started(service)
 
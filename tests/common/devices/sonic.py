@@ -1,3 +1,4 @@
+import copy
 import ipaddress
 import json
 import logging
@@ -15,10 +16,12 @@ from ansible.plugins.loader import connection_loader
 
 from tests.common.devices.base import AnsibleHostBase
 from tests.common.devices.constants import ACL_COUNTERS_UPDATE_INTERVAL_IN_SEC
+from tests.common.helpers.show_parser import iter_parse_show, parse_column_positions, parse_show
+from tests.common.helpers.shell_batch import build_batch_script, new_delimiter, normalize_timeouts, parse_batch_output
 from tests.common.helpers.dut_utils import is_supervisor_node, is_macsec_capable_node
 from tests.common.utilities import get_host_visible_vars, wait_until
-from tests.common.cache import cached
-from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE
+from tests.common.cache import cached, changes_config, config_fingerprint_getter, mark_dirty
+from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE, NAMESPACE_PREFIX
 from tests.common.helpers.platform_api.chassis import is_inband_port
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common import constants
@@ -151,6 +154,16 @@ class SonicHost(AnsibleHostBase):
     def __repr__(self):
         return self.__str__()
 
+    def _run(self, module_name, *module_args, **complex_args):
+        if not changes_config(module_name, module_args, complex_args):
+            return AnsibleHostBase._run(self, module_name, *module_args, **complex_args)
+        # Commands like 'config reload' or 'config load_minigraph' change the config, facts cached with the config
+        # fingerprint have to be revalidated. Marked even if the command failed, it could have changed the config.
+        try:
+            return AnsibleHostBase._run(self, module_name, *module_args, **complex_args)
+        finally:
+            mark_dirty(self.hostname)
+
     @property
     def facts(self):
         """
@@ -458,6 +471,48 @@ class SonicHost(AnsibleHostBase):
 
         return monit_services_status
 
+    def shell_batch(self, cmds, timeout=0, continue_on_fail=True, module_ignore_errors=False, verbose=True):
+        """
+        @summary: Run a list of shell commands in one remote execution.
+
+        Each command runs in its own /bin/sh, so a failing command or an 'exit' in a command doesn't affect the
+        other commands. The cost of running the batch is about the cost of a single shell() call.
+
+        @param cmds: List of shell commands.
+        @param timeout: Time limit in seconds of each command, 0 means no limit. Either an integer applied to all
+            the commands or a list with one time limit per command. A command hitting its time limit gets rc 124
+            and 'timed_out' True in its result.
+        @param continue_on_fail: Whether to run the remaining commands after a command failed.
+        @param module_ignore_errors: If False, raise RunAnsibleModuleFail when any of the commands failed.
+        @param verbose: Log the script and its output.
+        @return: List of per-command results in the order of cmds, with keys 'cmd', 'rc', 'stdout', 'stdout_lines',
+            'stderr', 'stderr_lines', 'failed', 'timeout' and 'timed_out'. Commands skipped after a failed command
+            when continue_on_fail is False are not included.
+        """
+        if not cmds:
+            return []
+        timeouts = normalize_timeouts(cmds, timeout)
+        delimiter = new_delimiter()
+        script = build_batch_script(cmds, timeouts, delimiter, continue_on_fail)
+        batch_res = self.shell(script, module_ignore_errors=True, verbose=verbose)
+        results = parse_batch_output(cmds, timeouts, delimiter, batch_res['stdout'], batch_res['stderr'])
+
+        # Without continue_on_fail, the batch stops after the first failed command
+        stopped_early = not continue_on_fail and results and results[-1]['failed']
+        if len(results) < len(cmds) and not stopped_early:
+            raise RunAnsibleModuleFail("run shell_batch failed, got results of {} out of {} commands".format(
+                len(results), len(cmds)), batch_res)
+
+        failed_cmds = [res['cmd'] for res in results if res['failed']]
+        if failed_cmds and not module_ignore_errors:
+            raise RunAnsibleModuleFail("run shell_batch failed", {
+                'cmds': cmds,
+                'failed_cmds': failed_cmds,
+                'results': results,
+                'failed': True
+            })
+        return results
+
     def _retry_if_oci_exec_race(self, cmd, result, attempts=3, delay=2):
         """
         Re-run `cmd` if `result` is a transient `docker exec` runc-setns race
@@ -496,14 +551,24 @@ class SonicHost(AnsibleHostBase):
                   critical_processes file in the specified container
         @return: Two lists which include the critical groups and critical processes respectively
         """
-        critical_group_list = []
-        critical_process_list = []
-        succeeded = True
-
         cmd = "docker exec {} bash -c '[ -f /etc/supervisor/critical_processes ] \
                 && cat /etc/supervisor/critical_processes'".format(container_name)
         file_content = self.shell(cmd, module_ignore_errors=True)
         file_content = self._retry_if_oci_exec_race(cmd, file_content)
+        return self._parse_critical_group_and_process_lists(container_name, file_content)
+
+    def _parse_critical_group_and_process_lists(self, container_name, file_content, supervisor_status=None):
+        """
+        @summary: Parse the critical_processes file content of the specified container
+        @param file_content: Result of the command reading the critical_processes file
+        @param supervisor_status: Result of "docker exec <container_name> supervisorctl status", only used for
+                                  pmon. The command is run if it is not provided.
+        @return: Same as get_critical_group_and_process_lists
+        """
+        critical_group_list = []
+        critical_process_list = []
+        succeeded = True
+
         for line in file_content["stdout_lines"]:
             line_info = line.strip().split(':')
             if len(line_info) != 2:
@@ -530,9 +595,10 @@ class SonicHost(AnsibleHostBase):
         if succeeded and container_name == "pmon":
             expected_critical_group_list = []
             expected_critical_process_list = []
-            process_list = self.shell("docker exec {} supervisorctl status"
-                                      .format(container_name), module_ignore_errors=True)
-            for process_info in process_list["stdout_lines"]:
+            if supervisor_status is None:
+                supervisor_status = self.shell("docker exec {} supervisorctl status"
+                                               .format(container_name), module_ignore_errors=True)
+            for process_info in supervisor_status["stdout_lines"]:
                 process_name = process_info.split()[0].strip()
                 process_status = process_info.split()[1].strip()
                 if ":" in process_name:
@@ -549,16 +615,22 @@ class SonicHost(AnsibleHostBase):
 
         return critical_group_list, critical_process_list, succeeded
 
+    @staticmethod
+    def _critical_processes_file_cmd(service):
+        return 'docker exec {} bash -c "[ -f /etc/supervisor/critical_processes ]' \
+               ' && cat /etc/supervisor/critical_processes"'.format(service)
+
     def critical_group_process(self):
         # Get critical group and process definitions by running cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} bash -c "[ -f /etc/supervisor/critical_processes ]' \
-                  ' && cat /etc/supervisor/critical_processes"'.format(service)
-
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=30)['results']
+        cmds = [self._critical_processes_file_cmd(service) for service in self.critical_services]
+        results = self.shell_batch(cmds, timeout=30, module_ignore_errors=True)
+        return self._parse_critical_group_process(results)
 
+    def _parse_critical_group_process(self, results):
+        """
+        @summary: Parse the results of reading the critical_processes file of the critical services
+        @return: A dictionary keyed by service name, values are dictionaries of critical groups and processes
+        """
         # Re-run any commands hit by the transient `docker exec` runc-setns race.
         # The target container is still running; only the new exec failed.
         results = [self._retry_if_oci_exec_race(res['cmd'], res) for res in results]
@@ -609,47 +681,70 @@ class SonicHost(AnsibleHostBase):
 
         @param service: Name of the SONiC service
         """
-        result = {
-            'status': True,
-            'exited_critical_process': [],
-            'running_critical_process': []
-        }
+        return self.critical_process_status_batch([service])[service]
 
-        # return false if the service is not started
-        service_status = self.is_service_fully_started(service)
-        if service_status is False:
-            result['status'] = False
-            return result
+    def critical_process_status_batch(self, services):
+        """
+        @summary: Check critical process status of a list of services in one remote execution.
 
-        # get critical group and process lists for the service
-        critical_group_list, critical_process_list, succeeded = self.get_critical_group_and_process_lists(service)
-        if succeeded is False:
-            result['status'] = False
-            return result
+        @param services: List of names of the SONiC services
+        @return: A dictionary keyed by service name, values are the same as the result of critical_process_status
+        """
+        # Service running state, critical_processes file and supervisor process status of each service
+        cmds = []
+        for service in services:
+            cmds.extend([
+                "docker inspect -f '{{{{.State.Running}}}}' {}".format(service),
+                self._critical_processes_file_cmd(service),
+                "docker exec {} supervisorctl status".format(service)
+            ])
+        results = self.shell_batch(cmds, module_ignore_errors=True)
+
+        all_status = {}
+        for index, service in enumerate(services):
+            running, file_content, process_status = results[3 * index:3 * index + 3]
+            result = {
+                'status': True,
+                'exited_critical_process': [],
+                'running_critical_process': []
+            }
 
-        # get process status for the service
-        output = self.command("docker exec {} supervisorctl status".format(service), module_ignore_errors=True)
-        logging.info("====== supervisor process status for service {} ======".format(service))
+            # return false if the service is not started
+            if running['stdout'].strip() != "true":
+                result['status'] = False
+                all_status[service] = result
+                continue
 
-        return self.parse_service_status_and_critical_process(
-            service_result=output,
-            critical_group_list=critical_group_list,
-            critical_process_list=critical_process_list
-        )
+            # get critical group and process lists for the service
+            file_content = self._retry_if_oci_exec_race(file_content['cmd'], file_content)
+            critical_group_list, critical_process_list, succeeded = \
+                self._parse_critical_group_and_process_lists(service, file_content, process_status)
+            if succeeded is False:
+                result['status'] = False
+                all_status[service] = result
+                continue
+
+            logging.info("====== supervisor process status for service {} ======".format(service))
+            all_status[service] = self.parse_service_status_and_critical_process(
+                service_result=process_status,
+                critical_group_list=critical_group_list,
+                critical_process_list=critical_process_list
+            )
+
+        return all_status
 
     def all_critical_process_status(self):
         """
         @summary: Check whether all critical processes status for all critical services
         """
-        # Get critical process definition of all services
-        group_process_results = self.critical_group_process()
-
-        # Get process status of all services. Run cmds in batch to save overhead
-        cmds = []
-        for service in self.critical_services:
-            cmd = 'docker exec {} supervisorctl status'.format(service)
-            cmds.append(cmd)
-        results = self.shell_cmds(cmds=cmds, continue_on_fail=True, module_ignore_errors=True, timeout=60)['results']
+        # Get critical process definition and process status of all services. Run cmds in one batch to save overhead
+        services = self.critical_services
+        cmds = [self._critical_processes_file_cmd(service) for service in services]
+        cmds.extend('docker exec {} supervisorctl status'.format(service) for service in services)
+        batch_results = self.shell_batch(cmds, timeout=[30] * len(services) + [60] * len(services),
+                                         module_ignore_errors=True)
+        group_process_results = self._parse_critical_group_process(batch_results[:len(services)])
+        results = batch_results[len(services):]
 
         # Re-run any commands hit by the transient `docker exec` runc-setns race
         # before we let the result feed parse_service_status_and_critical_process,
@@ -1595,7 +1690,7 @@ Totals               6450                 6449
 
         return container_autorestart_states
 
-    @cached(name='feature_status')
+    @cached(name='feature_status', fingerprint_getter=config_fingerprint_getter)
     def get_feature_status(self, disable_cache=True):
         """
         Gets the list of features and states
@@ -1638,61 +1733,10 @@ Totals               6450                 6449
             Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
             The second element is the end position of the column.
         """
-        prev = ' ',
-        positions = []
-        for pos, char in enumerate(sep_line + ' '):
-            if char == sep_char:
-                if char != prev:
-                    left = pos
-            else:
-                if char != prev:
-                    right = pos
-                    positions.append((left, right))
-            prev = char
-        return positions
-
-    def _parse_show(self, output_lines, header_len=1):
-
-        result = []
-
-        sep_line_pattern = re.compile(r"^( *-+ *)+$")
-        sep_line_found = False
-        for idx, line in enumerate(output_lines):
-            if sep_line_pattern.match(line):
-                sep_line_found = True
-                header_lines = output_lines[idx - header_len:idx]
-                sep_line = output_lines[idx]
-                content_lines = output_lines[idx + 1:]
-                break
-
-        if not sep_line_found:
-            logging.error('Failed to find separation line in the show command output')
-            return result
-
-        try:
-            positions = self._parse_column_positions(sep_line)
-        except Exception as e:
-            logging.error('Possibly bad command output, exception: {}'.format(repr(e)))
-            return result
+        return parse_column_positions(sep_line, sep_char)
 
-        headers = []
-        for (left, right) in positions:
-            header = " ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
-            headers.append(header)
-
-        for content_line in content_lines:
-            # When an empty line is encountered while parsing the tabulate content, it is highly possible that the
-            # tabulate content has been drained. The empty line and rest of the lines should not be parsed.
-            if len(content_line) == 0:
-                break
-            item = {}
-            for idx, (left, right) in enumerate(positions):
-                k = headers[idx]
-                v = content_line[left:right].strip()
-                item[k] = v
-            result.append(item)
-
-        return result
+    def _parse_show(self, output_lines, header_len=1, columnar=False):
+        return parse_show(output_lines, header_len, columnar=columnar)
 
     def show_and_parse(self, show_cmd, header_len=1, **kwargs):
         """Run a show command and parse the output using a generic pattern.
@@ -1756,8 +1800,15 @@ Totals               6450                 6449
               ...
             ]
 
+        The column layout parsed from the header lines is cached per header signature, so parsing the output of
+        the same show command again only costs slicing the content lines.
+
         Args:
             show_cmd: The show command that will be executed.
+            columnar: Return a ShowTable instead of a list. The values are kept column by column, ShowTable.column()
+                returns the values of a column and rows are built as dictionaries only when they are accessed.
+                Useful for large tables like 'show mac' when only a few columns are needed.
+            stream: Return a generator parsing the command output incrementally, one dictionary per content line.
 
         Returns:
             Return the parsed output of the show command in a list of dictionary. Each list item is a dictionary,
@@ -1766,16 +1817,52 @@ Totals               6450                 6449
         """
         start_line_index = kwargs.pop("start_line_index", 0)
         end_line_index = kwargs.pop("end_line_index", None)
+        columnar = kwargs.pop("columnar", False)
+        stream = kwargs.pop("stream", False)
+        if stream and start_line_index >= 0 and (end_line_index is None or end_line_index >= 0):
+            output = self.shell(show_cmd, **kwargs)["stdout"]
+            return iter_parse_show(output, header_len, start_line_index, end_line_index)
+
         output = self.shell(show_cmd, **kwargs)["stdout_lines"]
         if end_line_index is None:
             output = output[start_line_index:]
         else:
             output = output[start_line_index:end_line_index]
-        return self._parse_show(output, header_len)
+        if stream:
+            return iter(self._parse_show(output, header_len))
+        return self._parse_show(output, header_len, columnar=columnar)
 
-    @cached(name='mg_facts')
     def get_extended_minigraph_facts(self, tbinfo, namespace=DEFAULT_NAMESPACE):
-        mg_facts = self.minigraph_facts(host=self.hostname, namespace=namespace)['ansible_facts']
+        if namespace is DEFAULT_NAMESPACE:
+            return self._get_extended_minigraph_facts(tbinfo)
+
+        namespaces_facts = self.get_minigraph_namespaces_facts()
+        if namespace in namespaces_facts:
+            mg_facts = copy.deepcopy(namespaces_facts[namespace])
+        else:
+            mg_facts = self.minigraph_facts(host=self.hostname, namespace=namespace)['ansible_facts']
+        return self._extend_minigraph_facts(tbinfo, mg_facts)
+
+    @cached(name='mg_facts', fingerprint_getter=config_fingerprint_getter)
+    def _get_extended_minigraph_facts(self, tbinfo):
+        mg_facts = self.minigraph_facts(host=self.hostname)['ansible_facts']
+        return self._extend_minigraph_facts(tbinfo, mg_facts)
+
+    @cached(name='mg_namespaces_facts', fingerprint_getter=config_fingerprint_getter)
+    def get_minigraph_namespaces_facts(self):
+        """
+        Get the minigraph facts of all the ASIC namespaces, the minigraph is parsed once for all of them.
+
+        Returns:
+            dict: Minigraph facts keyed by ASIC namespace, e.g. 'asic0', empty on a single ASIC DUT.
+        """
+        if not self.is_multi_asic:
+            return {}
+        namespaces = ['{}{}'.format(NAMESPACE_PREFIX, asic_index) for asic_index in range(self.num_asics())]
+        return self.minigraph_facts(
+            host=self.hostname, namespaces=namespaces)['ansible_facts']['minigraph_namespaces_facts']
+
+    def _extend_minigraph_facts(self, tbinfo, mg_facts):
         mg_facts['minigraph_ptf_indices'] = {}
 
         # Fix the ptf port index for multi-dut testbeds. These testbeds have
@@ -0,0 +1,317 @@
+"""Persistent SSH command channel used as a fast path for the ansible 'shell' and 'command' modules.
+
+Running a one-liner through pytest-ansible costs a full adhoc task: inventory/variable resolution, module
+packaging, a become wrapper and a JSON round trip. For commands like 'cat' or 'redis-cli' that overhead is much
+bigger than the command itself. The PersistentSSHChannel class keeps one authenticated SSH transport per host and
+opens a new multiplexed session channel on it for every command, so a call costs one channel open and the command
+execution only.
+
+The result is a ModuleResult carrying the same keys as the result of the ansible 'shell'/'command' modules.
+Anything the fast path cannot reproduce faithfully (unsupported module arguments, non-ssh connections, hosts
+where passwordless sudo is not available) is reported to the caller by returning None, and the caller falls back
+to ansible.
+"""
+import datetime
+import logging
+import os
+import select
+import shlex
+import socket
+import threading
+
+import paramiko
+from pytest_ansible.errors import AnsibleConnectionFailure
+from pytest_ansible.results import ModuleResult
+
+logger = logging.getLogger(__name__)
+
+# Ansible connection plugins which the fast path can stand in for
+SSH_CONNECTIONS = ("ssh", "smart", "paramiko")
+
+# Module arguments the fast path handles. Any other argument makes the caller fall back to ansible.
+SUPPORTED_ARGS = ("_raw_params", "_uses_shell", "chdir", "executable")
+
+CONNECT_TIMEOUT = 10
+READ_CHUNK_SIZE = 65536
+
+# Consecutive connection failures before the fast path is disabled for the host
+MAX_CONNECT_FAILURES = 3
+
+# Variables of the connection options when the connection plugin doesn't define them, in ascending precedence
+DEFAULT_OPTION_VARS = {
+    "remote_user": ["ansible_user", "ansible_ssh_user"],
+    "password": ["ansible_password", "ansible_ssh_pass", "ansible_ssh_password"],
+    "port": ["ansible_port", "ansible_ssh_port"],
+}
+
+
+def option_var_names(option, connection):
+    """Names of the variables setting an option of an ansible connection plugin, in ascending precedence.
+
+    Same lookup as the one of SonicHost for overriding the credentials of the host.
+    """
+    from ansible import constants as ansible_constants
+    from ansible.plugins.loader import connection_loader
+
+    plugin = "ssh" if connection == "smart" else connection
+    try:
+        connection_loader.get(plugin, class_only=True)
+        definition = ansible_constants.config.get_configuration_definition(option, "connection", plugin)
+    except Exception as e:
+        logger.debug("failed to get the definition of option '%s' of connection '%s': %s", option, plugin, repr(e))
+        definition = None
+    names = [var["name"] for var in (definition or {}).get("vars", [])]
+    return names or DEFAULT_OPTION_VARS[option]
+
+
+class PersistentSSHChannel(object):
+    """
+    @summary: Keep one authenticated SSH transport to a host and run shell/command modules on it.
+
+    The connection parameters are resolved lazily from the ansible inventory of the host on the first command, so
+    changes of the credentials done after the host object was created (for example, SonicHost with shell_user/
+    shell_passwd) are honored. The transport is re-established transparently when it was closed by the remote end,
+    and a new one is created in processes forked from the process which created the transport.
+    """
+
+    def __init__(self, ansible_host, hostname, mgmt_ip=None):
+        """
+        @param ansible_host: The pytest-ansible host object of the host, used for resolving connection variables.
+        @param hostname: Inventory hostname of the host.
+        @param mgmt_ip: Address to connect to. Defaults to 'ansible_host' of the host.
+        """
+        self.ansible_host = ansible_host
+        self.hostname = hostname
+        self.mgmt_ip = mgmt_ip
+        self.disabled = False
+        self._client = None
+        self._pid = None
+        self._use_sudo = None
+        self._connect_failures = 0
+        self._lock = threading.Lock()
+
+    def _connection_params(self):
+        """Resolve address, port, user and password of the host from the ansible inventory.
+
+        Returns:
+            dict or None: Keyword arguments for paramiko.SSHClient.connect, None if the host does not use an ssh
+                connection.
+        """
+        from ansible.template import Templar
+
+        inv_host = self.ansible_host.options["inventory_manager"].get_host(self.hostname)
+        vm = self.ansible_host.options["variable_manager"]
+        host_vars = vm.get_vars(host=inv_host)
+        templar = Templar(loader=vm._loader, variables=host_vars)
+
+        def _get_var(*names):
+            for name in names:
+                if host_vars.get(name) is not None:
+                    return templar.template(host_vars[name])
+            return None
+
+        connection = _get_var("ansible_connection") or "ssh"
+        if connection not in SSH_CONNECTIONS:
+            logger.debug("[%s] ssh fast path is not used for connection '%s'", self.hostname, connection)
+            return None
+
+        def _get_option(option):
+            # Same precedence as ansible: extra vars beat host vars, and the last listed var of the option wins
+            names = option_var_names(option, connection)
+            for source in (vm.extra_vars, host_vars):
+                defined = [name for name in names if source.get(name) is not None]
+                if defined:
+                    return templar.template(source[defined[-1]])
+            return None
+
+        password = _get_option("password")
+        return {
+            "hostname": self.mgmt_ip or _get_var("ansible_host") or self.hostname,
+            "port": int(_get_option("port") or 22),
+            "username": _get_option("remote_user"),
+            "password": password,
+            "allow_agent": password is None,
+            "look_for_keys": password is None,
+            "timeout": CONNECT_TIMEOUT
+        }
+
+    def _connect(self):
+        params = self._connection_params()
+        if params is None:
+            self.disabled = True
+            return None
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(**params)
+        transport = client.get_transport()
+        transport.set_keepalive(30)
+
+        if self._use_sudo is None:
+            # Same as ansible 'become', commands run as root. Without passwordless sudo the fast path can't do that.
+            _, uid, _ = self._exec(transport.open_session(), "id -u")
+            if uid.strip() == b"0":
+                self._use_sudo = False
+            elif self._exec(transport.open_session(), "sudo -n true")[0] == 0:
+                self._use_sudo = True
+            else:
+                logger.info("[%s] passwordless sudo is unavailable, ssh fast path disabled", self.hostname)
+                client.close()
+                self.disabled = True
+                return None
+
+        self._client = client
+        self._pid = os.getpid()
+        logger.debug("[%s] ssh fast path connected to %s:%s", self.hostname, params["hostname"], params["port"])
+        return client
+
+    def _transport(self):
+        with self._lock:
+            if self._client is not None and self._pid != os.getpid():
+                # The transport thread of the parent process doesn't exist in a forked child. Leave the parent's
+                # connection alone and create a new one for this process.
+                self._client = None
+            if self._client is not None:
+                transport = self._client.get_transport()
+                if transport is not None and transport.is_active():
+                    return transport
+                self._client.close()
+                self._client = None
+
+            try:
+                client = self._connect()
+            except (paramiko.SSHException, socket.error, EOFError) as e:
+                self._connect_failures += 1
+                if self._connect_failures >= MAX_CONNECT_FAILURES:
+                    self.disabled = True
+                logger.info("[%s] ssh fast path failed to connect: %s", self.hostname, repr(e))
+                return None
+            self._connect_failures = 0
+            return client.get_transport() if client else None
+
+    @staticmethod
+    def _exec(channel, cmd):
+        """Run a command on a session channel, the channel is closed afterwards.
+
+        Returns:
+            tuple: (rc, stdout, stderr) with stdout and stderr as bytes.
+        """
+        try:
+            channel.exec_command(cmd)
+            channel.shutdown_write()
+            stdout, stderr = [], []
+            # Drain stdout and stderr alternately, the channel window is shared and reading one of them to the
+            # end first could stall a command which writes a lot to the other.
+            while True:
+                got_data = False
+                while channel.recv_ready():
+                    stdout.append(channel.recv(READ_CHUNK_SIZE))
+                    got_data = True
+                while channel.recv_stderr_ready():
+                    stderr.append(channel.recv_stderr(READ_CHUNK_SIZE))
+                    got_data = True
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if not got_data:
+                    select.select([channel], [], [], 1)
+            return channel.recv_exit_status(), b"".join(stdout), b"".join(stderr)
+        finally:
+            channel.close()
+
+    @staticmethod
+    def build_command(module_name, raw_params, chdir=None, executable=None, use_sudo=True):
+        """Build the remote command line equivalent to the ansible 'shell' or 'command' module invocation.
+
+        The 'shell' module runs the command with '/bin/sh -c' (or the given executable), the 'command' module
+        executes the argv split from the command directly, so shell features like pipes and redirections are not
+        interpreted.
+        """
+        if module_name == "shell":
+            argv = [executable or "/bin/sh", "-c", raw_params]
+        else:
+            argv = shlex.split(raw_params)
+        cmd = " ".join(shlex.quote(arg) for arg in argv)
+        if chdir:
+            cmd = "cd {} && exec {}".format(shlex.quote(chdir), cmd)
+        if use_sudo:
+            cmd = "sudo -n -H /bin/sh -c {}".format(shlex.quote(cmd))
+        return cmd
+
+    @staticmethod
+    def build_result(module_name, raw_params, rc, stdout, stderr, start, end):
+        """Build a ModuleResult with the keys of the ansible 'shell'/'command' module result."""
+        stdout = stdout.decode("utf-8", errors="surrogateescape").rstrip("\r\n")
+        stderr = stderr.decode("utf-8", errors="surrogateescape").rstrip("\r\n")
+        result = {
+            "cmd": raw_params if module_name == "shell" else shlex.split(raw_params),
+            "rc": rc,
+            "stdout": stdout,
+            "stderr": stderr,
+            "stdout_lines": stdout.splitlines(),
+            "stderr_lines": stderr.splitlines(),
+            "start": str(start),
+            "end": str(end),
+            "delta": str(end - start),
+            "changed": True,
+            "failed": rc != 0
+        }
+        if rc != 0:
+            result["msg"] = "non-zero return code"
+        return ModuleResult(result)
+
+    def run(self, module_name, module_args, complex_args):
+        """Run a 'shell' or 'command' module invocation over the persistent channel.
+
+        Args:
+            module_name (str): 'shell' or 'command'.
+            module_args (tuple): Positional module arguments, the fast path supports a single command string.
+            complex_args (dict): Keyword module arguments.
+
+        Returns:
+            ModuleResult or None: None if the invocation is not supported by the fast path or the host can't be
+                reached over ssh. The caller is supposed to fall back to ansible in that case.
+        """
+        if self.disabled or module_name not in ("shell", "command"):
+            return None
+        if any(arg not in SUPPORTED_ARGS for arg in complex_args):
+            return None
+        raw_params = complex_args.get("_raw_params")
+        if module_args:
+            if raw_params is not None or len(module_args) != 1:
+                return None
+            raw_params = module_args[0]
+        if not isinstance(raw_params, str) or not raw_params.strip():
+            return None
+        if module_name == "command" and complex_args.get("executable"):
+            return None
+
+        transport = self._transport()
+        if transport is None:
+            return None
+
+        cmd = self.build_command(module_name, raw_params, complex_args.get("chdir"),
+                                 complex_args.get("executable"), self._use_sudo)
+        try:
+            channel = transport.open_session()
+        except (paramiko.SSHException, socket.error, EOFError) as e:
+            # Nothing was run yet, let the caller run the command over ansible
+            logger.info("[%s] ssh fast path failed to open channel: %s", self.hostname, repr(e))
+            self.close()
+            return None
+
+        start = datetime.datetime.now()
+        try:
+            rc, stdout, stderr = self._exec(channel, cmd)
+        except (paramiko.SSHException, socket.error, EOFError) as e:
+            # The command may have been started already, don't run it again over ansible behind the caller's back
+            self.close()
+            raise AnsibleConnectionFailure("ssh fast path failed to run '{}' on {}: {}".format(
+                raw_params, self.hostname, repr(e)))
+        end = datetime.datetime.now()
+        return self.build_result(module_name, raw_params, rc, stdout, stderr, start, end)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
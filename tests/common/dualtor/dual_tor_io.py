@@ -8,16 +8,15 @@ import logging
 import jinja2
 import json
 import os
-import six
 import scapy.all as scapyall
 import ptf.testutils as testutils
 from itertools import groupby
 
 from tests.common.dualtor.dual_tor_common import CableType
+from tests.common.dualtor.pcap_flow import read_flows, SENT, RECEIVED
 from tests.common.helpers.constants import ARP_RESPONDER_DEFAULT_CONFIG
 from tests.common.utilities import wait_until, convert_scapy_packet_to_bytes
 from natsort import natsorted
-from collections import defaultdict
 
 TCP_DST_PORT = 5000
 SOCKET_RECV_BUFFER_SIZE = 10 * 1024 * 1024
@@ -34,6 +33,11 @@ DUAL_TOR_SNIFFER_CONF = "dual_tor_sniffer.conf"
 logger = logging.getLogger(__name__)
 
 
+def _parse_payload_id(payload):
+    """Get the packet id from the TCP payload, e.g. b'123XXXX...XXX'"""
+    return int(payload.decode().replace('X', ''))
+
+
 class DualTorIO:
     """Class to conduct IO over ports in `active-standby` mode."""
 
@@ -623,8 +627,9 @@ class DualTorIO:
         """Fetch the captured packet file generated by the ptf sniffer."""
         logger.info('Fetching pcap file from ptf')
         self.ptfhost.fetch(src=self.capture_pcap, dest='/tmp/', flat=True, fail_on_missing=False)
-        self.all_packets = scapyall.rdpcap(self.capture_pcap)
-        logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
+        # The capture is streamed from the file by examine_flow(), not loaded into scapy packets
+        if os.path.exists(self.capture_pcap):
+            logger.info("Size of the capture file: {} bytes".format(os.path.getsize(self.capture_pcap)))
 
     def send_packets(self):
         """Send packets generated."""
@@ -688,52 +693,31 @@ class DualTorIO:
         examine_start = datetime.datetime.now()
         logger.info("Packet flow examine started {}".format(str(examine_start)))
 
-        if not self.all_packets:
-            logger.error("self.all_packets not defined.")
+        if not os.path.exists(self.capture_pcap):
+            logger.error("Captured pcap file {} not found.".format(self.capture_pcap))
             return None
 
-        # Filter out packets:
-        filtered_packets = [pkt for pkt in self.all_packets if
-                            scapyall.TCP in pkt and
-                            scapyall.ICMP not in pkt and
-                            pkt[scapyall.TCP].sport == self.tcp_sport and
-                            pkt[scapyall.TCP].dport == TCP_DST_PORT and
-                            self.check_tcp_payload(pkt) and
-                            (
-                                pkt[scapyall.Ether].dst == self.sent_pkt_dst_mac or
-                                pkt[scapyall.Ether].src in self.received_pkt_src_mac
-                            )]
-        logger.info("Number of filtered packets captured: {}".format(len(filtered_packets)))
-        if not filtered_packets or len(filtered_packets) == 0:
+        # Read the packets of the test flow, split by server IP
+        if self.traffic_direction in ("t1_to_server", "t1_to_soc"):
+            group_by = 'ip_dst'
+        else:
+            group_by = 'ip_src'
+        server_to_packet_map, captured_count = read_flows(
+            self.capture_pcap, self.tcp_sport, TCP_DST_PORT,
+            sent_dst_macs=[self.sent_pkt_dst_mac],
+            received_src_macs=self.received_pkt_src_mac,
+            parse_payload=_parse_payload_id,
+            group_by=group_by,
+            filtered_pcap='/tmp/capture_filtered_{}.pcap')
+        logger.info("Number of all packets captured: {}".format(captured_count))
+        filtered_count = sum(len(packets) for packets in server_to_packet_map.values())
+        logger.info("Number of filtered packets captured: {}".format(filtered_count))
+        if not filtered_count:
             logger.error("Sniffer failed to capture any traffic")
-
-        server_to_packet_map = defaultdict(list)
-
-        # Split packets into separate lists based on server IP
-        for packet in filtered_packets:
-            server_addr = self.get_server_address(packet)
-            server_to_packet_map[server_addr].append(packet)
-
-        # E731 Use a def instead of a lambda
-        def get_packet_sort_key(packet):
-            payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-            if six.PY2:
-                payload_int = int(payload_bytes.replace('X', ''))
-            else:
-                payload_int = int(payload_bytes.decode().replace('X', ''))
-            return (payload_int, packet.time)
-
-        # For each server's packet list, sort by payload then timestamp
-        # (in case of duplicates)
-        for server in list(server_to_packet_map.keys()):
-            server_to_packet_map[server].sort(key=get_packet_sort_key)
+        for server_ip in server_to_packet_map:
+            logger.info("Filtered pcap dumped to /tmp/capture_filtered_{}.pcap".format(server_ip))
 
         logger.info("Measuring traffic disruptions...")
-        for server_ip, packet_list in list(server_to_packet_map.items()):
-            filename = '/tmp/capture_filtered_{}.pcap'.format(server_ip)
-            scapyall.wrpcap(filename, packet_list)
-            logger.info("Filtered pcap dumped to {}".format(filename))
-
         self.test_results = {}
 
         for server_ip in natsorted(list(server_to_packet_map.keys())):
@@ -751,22 +735,13 @@ class DualTorIO:
         disruption_after_traffic = False
         duplicate_ranges = []
 
-        for packet in packets:
-            if packet[scapyall.Ether].dst == self.sent_pkt_dst_mac:
+        for curr_payload, curr_time, direction in packets.sorted():
+            if direction == SENT:
                 # This is a sent packet
                 num_sent_packets += 1
                 continue
-            if packet[scapyall.Ether].src in self.received_pkt_src_mac:
+            if direction == RECEIVED:
                 # This is a received packet.
-                # scapy 2.4.5 will use Decimal to calulcate time, but json.dumps
-                # can't recognize Decimal, transform to float here
-                curr_time = float(packet.time)
-                curr_payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-                if six.PY2:
-                    curr_payload = int(curr_payload_bytes.replace('X', ''))
-                else:
-                    curr_payload = int(curr_payload_bytes.decode().replace('X', ''))
-
                 # Look back at the previous received packet to check for gaps/duplicates
                 # Only if we've already received some packets
                 if len(received_packet_list) > 0:
@@ -847,29 +822,9 @@ class DualTorIO:
         }
 
         if num_sent_packets < self.packets_sent_per_server.get(server_ip):
-            server_addr = self.get_server_address(packet)
             logger.error('Not all sent packets were captured. '
                          'Something went wrong!')
             logger.error('Dumping server {} results and continuing:\n{}'
-                         .format(server_addr, json.dumps(result, indent=4)))
+                         .format(server_ip, json.dumps(result, indent=4)))
 
         return result
-
-    def check_tcp_payload(self, packet):
-        """
-        @summary: Helper method
-
-        Returns: Bool: True if a packet is not corrupted and has a valid TCP
-            sequential TCP Payload
-        """
-        try:
-            payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-            if six.PY2:
-                int(payload_bytes.replace('X', '')) in range(
-                    self.packets_to_send)
-            else:
-                int(payload_bytes.decode().replace('X', '')) in range(
-                    self.packets_to_send)
-            return True
-        except Exception:
-            return False
@@ -41,6 +41,7 @@ __all__ = [
     'toggle_simulator_port_to_upper_tor',
     'toggle_simulator_port_to_lower_tor',
     'toggle_all_simulator_ports',
+    'bulk_toggle_simulator_ports',
     'check_mux_status',
     'validate_check_result',
     'simulator_flap_counter',
@@ -502,6 +503,64 @@ def toggle_all_simulator_ports(mux_server_url, tbinfo, duthosts):
     return _toggle
 
 
+def _bulk_toggle_simulator_ports(mux_server_url, side, port_indexes=None, timeout=60, interval=1):
+    """
+    Set the active side of multiple mux simulator ports in parallel and wait for the result.
+
+    Args:
+        mux_server_url: a str, the address of mux simulator server + vmset_name, like http://10.0.0.64:8080/mux/vms17-8
+        side: a str, one of upper_tor, lower_tor, toggle and random
+        port_indexes: a list of the indexes of the mux bridges, all the ports if it is None
+        timeout: seconds to wait for the bulk toggle to finish
+        interval: seconds between the queries of the bulk toggle result
+    Returns:
+        dict: The finished bulk toggle, its "results" has the "completion_time" of every port, key is port index.
+    """
+    pytest_assert(side in TOGGLE_SIDES, "Unsupported side '{}'".format(side))
+    data = {"active_side": side}
+    if port_indexes is not None:
+        data["port_indexes"] = list(port_indexes)
+    server_url = mux_server_url + "/bulk_toggle"
+    logger.info('Bulk toggle ports {} to "{}"'.format(port_indexes or "all", side))
+    # Not _post, the bulk toggle is started once and responded with HTTP code 202
+    headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+    resp = requests.post(server_url, json=data, headers=headers, timeout=(3.5, 30))
+    pytest_assert(resp.status_code == 202,
+                  "Failed to start bulk toggle with {}: {}".format(data, resp.text))
+    toggle_url = "{}/{}".format(server_url, resp.json()["toggle_id"])
+
+    toggle = {}
+
+    def _toggle_finished():
+        toggle.update(_get(toggle_url) or {})
+        return toggle.get("state") in ("done", "failed")
+
+    pytest_assert(utilities.wait_until(timeout, interval, 0, _toggle_finished),
+                  "Bulk toggle {} didn't finish in {} seconds".format(toggle_url, timeout))
+    failed_ports = {port_index: result["error"] for port_index, result in (toggle["results"] or {}).items()
+                    if result["error"]}
+    pytest_assert(toggle["state"] == "done",
+                  "Bulk toggle to '{}' failed: {}, failed ports: {}".format(side, toggle["err_msg"], failed_ports))
+    return toggle
+
+
+@pytest.fixture(scope='module')
+def bulk_toggle_simulator_ports(mux_server_url, tbinfo):
+    """
+    A module level fixture to set the active side of multiple ports in parallel.
+
+    The returned function takes the side, the list of indexes of the mux bridges (all the ports by default) and the
+    timeout, and returns the finished bulk toggle. See _bulk_toggle_simulator_ports.
+    """
+    def _bulk_toggle(side, port_indexes=None, timeout=60):
+        # Skip on non dualtor testbed
+        if 'dualtor' not in tbinfo['topo']['name']:
+            return None
+        return _bulk_toggle_simulator_ports(mux_server_url, side, port_indexes, timeout)
+
+    return _bulk_toggle
+
+
 def restart_linkmgrd(duthosts):
     """Restart linkmgrd on all DUTs."""
     duthosts.shell("docker exec mux supervisorctl restart linkmgrd")
@@ -0,0 +1 @@
+../../../ansible/roles/test/files/ptftests/py3/pcap_flow.py
\ No newline at end of file
@@ -2,7 +2,9 @@ import ansible
 import datetime
 import logging
 import math
+import multiprocessing
 import os
+import pickle
 import shutil
 import signal
 import tempfile
@@ -10,6 +12,7 @@ import threading
 import time
 import traceback
 from multiprocessing import Process, Manager, Pipe, TimeoutError
+from multiprocessing.connection import wait as wait_connections
 from multiprocessing.pool import ThreadPool
 from ansible.executor.process.worker import WorkerProcess
 
@@ -19,6 +22,17 @@ from tests.common.helpers.assertions import pytest_assert as pt_assert
 
 logger = logging.getLogger(__name__)
 
+# Executors of parallel_run:
+#   process: fork a new SonicProcess per node, return results through a multiprocessing.Manager().dict() proxy
+#   pool: run the nodes on the workers of WorkerPool, a worker runs several nodes, return results through pipes
+PARALLEL_RUN_EXECUTORS = ("process", "pool")
+_parallel_run_executor = "process"
+
+# Number of tasks a pool worker runs before it is replaced by a freshly forked worker
+POOL_MAX_TASKS_PER_WORKER = 50
+# Interval of checking task timeouts of the pool workers
+POOL_POLL_INTERVAL = 1
+
 
 def patch_ansible_worker_process():
     """
@@ -127,8 +141,232 @@ class SonicProcess(Process):
         return self._exception
 
 
+def _assert_no_failed_processes(failed_processes):
+    """Fail the test with the exception and exit code of the failed processes, if any.
+
+    Args:
+        failed_processes (dict): Key is process name, value is a dict with 'exit_code' and 'exception' keys. The
+            'exception' is a tuple of the exception and its formatted traceback, the same as SonicProcess.exception.
+    """
+    if len(list(failed_processes.keys())):
+        for process_name, process in list(failed_processes.items()):
+            p_exitcode = ""
+            p_exception = ""
+            p_traceback = ""
+            if 'exception' in process and process['exception']:
+                p_exception = process['exception'][0]
+                p_traceback = process['exception'][1]
+                p_exitcode = process['exit_code']
+            # For analyzed matched syslog, don't need to log the traceback
+            if "analyze_logs" in process_name and "Match Messages" in str(p_exception):
+                failure_message = 'Got matched syslog in processes "{}" exit code:"{}"\n{}'.format(
+                    process_name, p_exitcode, p_exception
+                )
+            else:
+                failure_message = 'Processes "{}" failed with exit code "{}"\nException:\n{}\nTraceback:\n{}'.format(
+                    list(failed_processes.keys()), p_exitcode, p_exception, p_traceback)
+            pt_assert(False, failure_message)
+
+
+def _pool_worker_main(conn, context, nodes):
+    """Main loop of a WorkerPool worker process.
+
+    Args:
+        conn (Connection): Duplex pipe to the parent.
+        context (tuple): (target, args, kwargs) of the task, inherited from the parent at fork time.
+        nodes (list): Nodes inherited from the parent at fork time, the task messages are indexes of this list.
+    """
+    # Don't let SIGINT of the pytest session interrupt a task, the parent decides when workers are stopped
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target, args, kwargs = context
+    while True:
+        try:
+            node_index = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if node_index is None:
+            break
+
+        results = {}
+        task_kwargs = dict(kwargs, node=nodes[node_index], results=results)
+        exception = None
+        try:
+            target(*args, **task_kwargs)
+        except Exception as e:
+            tb = traceback.format_exc()
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = Exception(repr(e))
+            exception = (e, tb)
+        try:
+            conn.send((results, exception))
+        except Exception as e:
+            conn.send(({}, (Exception("Failed to send results: {}".format(repr(e))), traceback.format_exc())))
+
+
+class _PoolWorker(object):
+    """Parent side handle of a WorkerPool worker process."""
+
+    def __init__(self, mp_context, context, nodes):
+        self.conn, child_conn = mp_context.Pipe(duplex=True)
+        self.tasks_done = 0
+        self.process = mp_context.Process(target=_pool_worker_main, args=(child_conn, context, nodes), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, node_index):
+        self.conn.send(node_index)
+
+    def stop(self, kill=False):
+        if kill:
+            try:
+                os.kill(self.process.pid, signal.SIGKILL)
+            except OSError as err:
+                logger.error("Unable to kill pool worker {}, error:{}".format(self.process.pid, err))
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class WorkerPool(object):
+    """Pool of worker processes for parallel_run, each worker runs the target on several nodes of a call.
+
+    Forking the pytest process with ansible loaded once per node per parallel_run call is expensive. The workers of
+    this pool are forked lazily by run(), at most one per concurrent task, and a worker done with a node runs the
+    target on the next pending node. A call on N nodes with C concurrent tasks costs min(N, C) forks instead of N.
+
+    The target, its arguments and the nodes are inherited by the workers at fork time, only the index of the node
+    is sent through the pipe of a worker, so targets can be closures defined in fixtures. The workers are stopped
+    at the end of the call: the nodes may be changed by the parent after the call, and the copies inherited by the
+    workers would be stale for the next call. A worker is also replaced after running max_tasks_per_worker tasks,
+    to bound its memory growth.
+
+    Results written by the target into kwargs['results'] are sent back through the pipe of the worker. Exceptions
+    raised by the target are sent back the same as SonicProcess.exception, as a tuple of the exception and its
+    formatted traceback.
+    """
+
+    def __init__(self, size=24, max_tasks_per_worker=POOL_MAX_TASKS_PER_WORKER):
+        self.size = size
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._mp_context = multiprocessing.get_context("fork")
+
+    def _new_worker(self, context, nodes):
+        # Before forking the worker, ensure current thread is holding the
+        # logging handler locks to avoid deadlock in child process.
+        fix_logging_handler_fork_lock()
+        return _PoolWorker(self._mp_context, context, nodes)
+
+    def run(self, target, args, kwargs, nodes, timeout=None, concurrent_tasks=None, init_result=None):
+        """Run target on each node on the pool workers.
+
+        Args:
+            target, args, kwargs, nodes, init_result: Same as parallel_run.
+            timeout (int or float, optional): Time allowed for the target to run on one node. A worker exceeding it
+                is killed and the result of the node is marked as failed.
+            concurrent_tasks (int, optional): Maximum number of nodes running at the same time, defaults to the pool
+                size.
+
+        Returns:
+            tuple: (results, failed_processes). results is a dict of the results of all the nodes, failed_processes is
+                a dict keyed by process name of the exit code and exception of the failed tasks.
+        """
+        concurrent_tasks = min(concurrent_tasks or self.size, self.size)
+        kwargs = {k: v for k, v in kwargs.items() if k not in ('node', 'results')}
+        context = (target, args, kwargs)
+        nodes = list(nodes)
+
+        results = {}
+        failed_processes = {}
+        pending = list(range(len(nodes)))
+        running = {}
+        idle = []
+
+        def _mark_failed(node, process_name):
+            # If sanity check process is killed, it still has init results, set its failed to True.
+            if init_result:
+                results[node.hostname] = dict(results.get(node.hostname, init_result), failed=True)
+            else:
+                results[process_name] = {'failed': True}
+
+        try:
+            while pending or running:
+                while pending and len(running) < concurrent_tasks:
+                    node_index = pending.pop(0)
+                    node = nodes[node_index]
+                    process_name = "{}--{}".format(target.__name__, node)
+                    # For sanity check process, initial results in case of timeout.
+                    if init_result:
+                        results[node.hostname] = dict(init_result, host=node.hostname)
+                    worker = idle.pop(0) if idle else self._new_worker(context, nodes)
+                    worker.run(node_index)
+                    logger.debug('Started task "{}" on pool worker {}'.format(process_name, worker.process.pid))
+                    running[worker.conn] = (worker, node, process_name, time.time())
+
+                for conn in wait_connections(list(running), timeout=POOL_POLL_INTERVAL):
+                    worker, node, process_name, _ = running.pop(conn)
+                    try:
+                        task_results, exception = conn.recv()
+                    except (EOFError, OSError):
+                        logger.error('Pool worker {} running "{}" exited with exit code {}'.format(
+                            worker.process.pid, process_name, worker.process.exitcode))
+                        _mark_failed(node, process_name)
+                        worker.stop(kill=True)
+                        continue
+                    results.update(task_results)
+                    if exception is not None:
+                        logger.info("Task {} has exception, record the error.".format(process_name))
+                        failed_processes[process_name] = {'exit_code': 1, 'exception': exception}
+                    worker.tasks_done += 1
+                    if worker.tasks_done >= self.max_tasks_per_worker:
+                        worker.stop()
+                    else:
+                        idle.append(worker)
+
+                now = time.time()
+                for conn, (worker, node, process_name, start) in list(running.items()):
+                    if timeout is not None and now - start > timeout:
+                        logger.error('Task "{}" exceeds {} seconds, kill pool worker {}'.format(
+                            process_name, timeout, worker.process.pid))
+                        del running[conn]
+                        _mark_failed(node, process_name)
+                        worker.stop(kill=True)
+        finally:
+            for worker, _, _, _ in running.values():
+                worker.stop(kill=True)
+            for worker in idle:
+                worker.stop()
+
+        return results, failed_processes
+
+
+_worker_pool = None
+
+
+def get_worker_pool():
+    """Get the WorkerPool shared by parallel_run calls of the session."""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = WorkerPool()
+    return _worker_pool
+
+
+def set_parallel_run_executor(executor):
+    """Set the default executor of parallel_run, one of PARALLEL_RUN_EXECUTORS."""
+    global _parallel_run_executor
+    if executor not in PARALLEL_RUN_EXECUTORS:
+        raise ValueError("Unknown parallel_run executor '{}', expected one of {}".format(
+            executor, PARALLEL_RUN_EXECUTORS))
+    _parallel_run_executor = executor
+
+
 def parallel_run(
-    target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None
+    target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None, executor=None
 ):
     """Run target function on nodes in parallel
 
@@ -143,16 +381,28 @@ def parallel_run(
         timeout (int or float, optional): Total time allowed for the spawned multiple processes to run. Defaults to
             None. When timeout is specified, this function will wait at most 'timeout' seconds for the processes to
             run. When time is up, this function will try to terminate or even kill all the processes.
+        executor (str, optional): 'process' or 'pool', defaults to the executor set by set_parallel_run_executor().
+            With 'process', a new process is forked for each node. With 'pool', the nodes are run on the workers of
+            WorkerPool, a worker runs several nodes, results are returned through pipes, and timeout applies to each
+            node.
 
     Raises:
         flag.: In case any of the spawned process cannot be terminated, fail the test.
 
     Returns:
-        dict: An instance of multiprocessing.Manager().dict(). It is a proxy to the shared dict that is used by all the
-            spawned processes.
+        dict: A copy of the shared dict that is used by all the spawned processes for returning results.
     """
     nodes = [node for node in nodes_list]
 
+    if (executor or _parallel_run_executor) == "pool":
+        start_time = datetime.datetime.now()
+        results, failed_processes = get_worker_pool().run(
+            target, args, kwargs, nodes, timeout=timeout, concurrent_tasks=concurrent_tasks, init_result=init_result)
+        _assert_no_failed_processes(failed_processes)
+        logger.info('Completed running tasks for target "{}" on pool workers in {} seconds'.format(
+            target.__name__, str(datetime.datetime.now() - start_time)))
+        return results
+
     # Callback API for wait_procs
     def on_terminate(worker):
         logger.info("process {} terminated with exit code {}".format(
@@ -285,24 +535,7 @@ def parallel_run(
 
     # if we have failed processes, we should log the exception and exit code
     # of each Process and fail
-    if len(list(failed_processes.keys())):
-        for process_name, process in list(failed_processes.items()):
-            p_exitcode = ""
-            p_exception = ""
-            p_traceback = ""
-            if 'exception' in process and process['exception']:
-                p_exception = process['exception'][0]
-                p_traceback = process['exception'][1]
-                p_exitcode = process['exit_code']
-            # For analyzed matched syslog, don't need to log the traceback
-            if "analyze_logs" in process_name and "Match Messages" in str(p_exception):
-                failure_message = 'Got matched syslog in processes "{}" exit code:"{}"\n{}'.format(
-                    process_name, p_exitcode, p_exception
-                )
-            else:
-                failure_message = 'Processes "{}" failed with exit code "{}"\nException:\n{}\nTraceback:\n{}'.format(
-                    list(failed_processes.keys()), p_exitcode, p_exception, p_traceback)
-            pt_assert(False, failure_message)
+    _assert_no_failed_processes(failed_processes)
 
     logger.info(
         'Completed running processes for target "{}" in {} seconds'.format(
@@ -0,0 +1,120 @@
+"""
+Helpers for running a list of shell commands in one remote execution.
+
+The commands are wrapped into a single /bin/sh script. Each command runs in its own /bin/sh with stdin redirected
+from /dev/null, optionally under 'timeout'. Delimiter lines carrying the index and return code of each command are
+written to both stdout and stderr, so the output of the script can be split back into per-command results.
+"""
+import re
+import shlex
+import uuid
+
+# Return code of the 'timeout' utility when the time limit was hit
+TIMEOUT_RC = 124
+# Grace period before sending SIGKILL to a command which doesn't exit on SIGTERM after its time limit
+TIMEOUT_KILL_AFTER = 5
+
+
+def new_delimiter():
+    return "__SHELL_BATCH_{}__".format(uuid.uuid4().hex)
+
+
+def normalize_timeouts(cmds, timeout):
+    """Return the time limit of each command.
+
+    Args:
+        cmds (list): List of commands.
+        timeout (int or list): Time limit in seconds applied to all the commands, or a list with one time limit per
+            command. 0 means no limit.
+    """
+    if isinstance(timeout, (list, tuple)):
+        if len(timeout) != len(cmds):
+            raise ValueError("Got {} timeouts for {} commands".format(len(timeout), len(cmds)))
+        return [int(t or 0) for t in timeout]
+    return [int(timeout or 0)] * len(cmds)
+
+
+def build_batch_script(cmds, timeouts, delimiter, continue_on_fail=True):
+    """Build the script running all the commands.
+
+    Args:
+        cmds (list): List of commands.
+        timeouts (list): Time limit of each command, 0 means no limit.
+        delimiter (str): Delimiter unique to this batch, see new_delimiter().
+        continue_on_fail (bool): Whether to run the remaining commands after a command failed.
+
+    Returns:
+        str: The script.
+    """
+    lines = []
+    for index, (cmd, timeout) in enumerate(zip(cmds, timeouts)):
+        run = "/bin/sh -c {} </dev/null".format(shlex.quote(cmd))
+        if timeout:
+            run = "timeout -k {} {} {}".format(TIMEOUT_KILL_AFTER, timeout, run)
+        lines.append("echo '{0} {1} BEGIN'; echo '{0} {1} BEGIN' >&2".format(delimiter, index))
+        lines.append(run)
+        lines.append("rc=$?; echo; echo \"{0} {1} END $rc\"; echo >&2; echo '{0} {1} END' >&2".format(
+            delimiter, index))
+        if not continue_on_fail:
+            lines.append("[ $rc -eq 0 ] || exit 1")
+    return "\n".join(lines)
+
+
+def _split_output(output, delimiter):
+    """Split the output of the script into {index: (output, rc)}.
+
+    The rc is None if the END delimiter of the command is missing, e.g. the script was killed while the command
+    was running.
+    """
+    segments = {}
+    escaped = re.escape(delimiter)
+    begin_re = re.compile(r"^{} (\d+) BEGIN$".format(escaped), re.M)
+    end_re = re.compile(r"^{} (\d+) END ?(\d*)$".format(escaped), re.M)
+
+    for begin in begin_re.finditer(output):
+        index = int(begin.group(1))
+        content_start = begin.end() + 1
+        end = end_re.search(output, begin.end())
+        if end is None or int(end.group(1)) != index:
+            segments[index] = (output[content_start:], None)
+            continue
+        # Drop the newline echoed before the END delimiter
+        segments[index] = (output[content_start:max(end.start() - 1, content_start)],
+                           int(end.group(2)) if end.group(2) else None)
+    return segments
+
+
+def parse_batch_output(cmds, timeouts, delimiter, stdout, stderr):
+    """Split the stdout and stderr of the script into per-command results.
+
+    Commands which were not started, because a previous command failed and continue_on_fail was False, are not
+    included in the results.
+
+    Returns:
+        list: One dict per command with the keys of the ansible 'shell' module result: 'cmd', 'rc', 'stdout',
+            'stdout_lines', 'stderr', 'stderr_lines' and 'failed', plus 'timeout' and 'timed_out'.
+    """
+    stdout_segments = _split_output(stdout, delimiter)
+    stderr_segments = _split_output(stderr, delimiter)
+
+    results = []
+    for index, (cmd, timeout) in enumerate(zip(cmds, timeouts)):
+        if index not in stdout_segments:
+            break
+        out, rc = stdout_segments[index]
+        err = stderr_segments.get(index, ("", None))[0]
+        out = out.rstrip("\r\n")
+        err = err.rstrip("\r\n")
+        result = {
+            "cmd": cmd,
+            "rc": rc if rc is not None else -1,
+            "stdout": out,
+            "stdout_lines": out.splitlines(),
+            "stderr": err,
+            "stderr_lines": err.splitlines(),
+            "timeout": timeout,
+            "timed_out": bool(timeout) and rc == TIMEOUT_RC,
+        }
+        result["failed"] = result["rc"] != 0
+        results.append(result)
+    return results
@@ -0,0 +1,198 @@
+"""
+Parser of the tabular output of SONiC show commands, used by SonicHost.show_and_parse.
+
+The output is expected to look like the output of 'show interfaces status': one or more lines of column headers, a
+separation line with '-' under each column, then one line per row. The column layout derived from the header and
+separation lines is cached, so parsing the output of the same command again only costs slicing the content lines.
+
+Besides the list of dicts returned by parse_show, the parsed output can be returned as a ShowTable, which keeps
+the values column by column and only builds a row dict when the row is accessed, or be parsed incrementally from the
+output text by iter_parse_show.
+"""
+import functools
+import io
+import itertools
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+SEP_LINE_PATTERN = re.compile(r"^( *-+ *)+$")
+
+# Maximum number of distinct column layouts kept in the cache
+LAYOUT_CACHE_SIZE = 256
+
+
+def parse_column_positions(sep_line, sep_char='-'):
+    """Parse the position of each columns in the command output
+
+    Args:
+        sep_line: The output line separating actual data and column headers
+        sep_char: The character used in separation line. Defaults to '-'.
+
+    Returns:
+        Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
+        The second element is the end position of the column.
+    """
+    prev = ' ',
+    positions = []
+    for pos, char in enumerate(sep_line + ' '):
+        if char == sep_char:
+            if char != prev:
+                left = pos
+        else:
+            if char != prev:
+                right = pos
+                positions.append((left, right))
+        prev = char
+    return positions
+
+
+class ColumnLayout(object):
+    """Column headers and positions of a show command output, with a compiled row parser.
+
+    The row parser is generated for the layout as a single dict display of slices, e.g.
+    "lambda line: {'interface': line[0:15].strip(), 'lanes': line[17:32].strip()}", which avoids the per-column
+    Python loop when parsing large tables.
+    """
+
+    def __init__(self, header_lines, sep_line):
+        self.positions = parse_column_positions(sep_line)
+        self.headers = [" ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
+                        for (left, right) in self.positions]
+        # Same as building the dict column by column, the last column wins when column headers are duplicated.
+        # The headers are embedded with repr() and the positions are integers, so the source is always literal.
+        source = "lambda line: {{{}}}".format(", ".join(
+            "{!r}: line[{}:{}].strip()".format(header, left, right)
+            for header, (left, right) in zip(self.headers, self.positions)))
+        self.parse_row = eval(compile(source, "<show_parser row>", "eval"))
+
+    def parse_columns(self, content_lines):
+        """Parse content lines into one list of values per column."""
+        return [[line[left:right].strip() for line in content_lines] for (left, right) in self.positions]
+
+
+@functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def get_layout(header_lines, sep_line):
+    """Get the cached column layout for the header signature of a show command output.
+
+    Args:
+        header_lines (tuple): Header lines above the separation line.
+        sep_line (str): The separation line.
+    """
+    return ColumnLayout(header_lines, sep_line)
+
+
+class ShowTable(object):
+    """Columnar result of a parsed show command output.
+
+    Values are stored as one list per column. Rows are materialized as dicts, the same as the items of the list
+    returned by parse_show, only when they are accessed by index or iteration.
+    """
+
+    def __init__(self, headers, columns):
+        self.headers = headers
+        self._columns = columns
+        # Same as building a dict from the row, the last column wins when column headers are duplicated
+        self._column_index = {header: idx for idx, header in enumerate(headers)}
+
+    def __len__(self):
+        return len(self._columns[0]) if self._columns else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self)))]
+        return dict(zip(self.headers, [column[index] for column in self._columns]))
+
+    def __iter__(self):
+        for values in zip(*self._columns):
+            yield dict(zip(self.headers, values))
+
+    def __eq__(self, other):
+        if isinstance(other, ShowTable):
+            other = other.to_list()
+        return self.to_list() == other
+
+    def column(self, header):
+        """Get the values of a column, header is the lowercase column header."""
+        return self._columns[self._column_index[header]]
+
+    def to_dict(self):
+        """Get the table as a dict of lists keyed by column header."""
+        return {header: self._columns[idx] for header, idx in self._column_index.items()}
+
+    def to_list(self):
+        """Materialize all the rows, same as the result of parse_show."""
+        return list(self)
+
+
+def _find_layout(lines, header_len):
+    """Consume lines until the separation line is found.
+
+    Returns:
+        ColumnLayout or None: None if the separation line is not found or the output is malformed.
+    """
+    header_window = []
+    for line in lines:
+        if SEP_LINE_PATTERN.match(line):
+            header_lines = tuple(header_window[len(header_window) - header_len:]) if header_len else ()
+            try:
+                return get_layout(header_lines, line)
+            except Exception as e:
+                logger.error('Possibly bad command output, exception: {}'.format(repr(e)))
+                return None
+        header_window.append(line)
+        if len(header_window) > header_len:
+            header_window.pop(0)
+
+    logger.error('Failed to find separation line in the show command output')
+    return None
+
+
+def _content_lines(lines):
+    # When an empty line is encountered while parsing the tabulate content, it is highly possible that the
+    # tabulate content has been drained. The empty line and rest of the lines should not be parsed.
+    return itertools.takewhile(len, lines)
+
+
+def parse_show(output_lines, header_len=1, columnar=False):
+    """Parse the lines of a show command output.
+
+    Args:
+        output_lines (list): Output lines of the show command.
+        header_len (int): Number of header lines above the separation line.
+        columnar (bool): Return a ShowTable instead of a list of dicts.
+
+    Returns:
+        list or ShowTable: One dict per content line, keys are the lowercase column headers. Empty if the output
+            can't be parsed.
+    """
+    lines = iter(output_lines)
+    layout = _find_layout(lines, header_len)
+    if layout is None:
+        return ShowTable([], []) if columnar else []
+
+    if columnar:
+        return ShowTable(layout.headers, layout.parse_columns(list(_content_lines(lines))))
+    parse_row = layout.parse_row
+    return [parse_row(line) for line in _content_lines(lines)]
+
+
+def iter_parse_show(output, header_len=1, start_line_index=0, end_line_index=None):
+    """Parse a show command output incrementally, yielding one dict per content line.
+
+    Args:
+        output (str): Output text of the show command, it is not split into a list of lines up front.
+        header_len (int): Number of header lines above the separation line.
+        start_line_index (int): Index of the first output line to parse.
+        end_line_index (int): Index after the last output line to parse, None for the end of output.
+    """
+    lines = (line.rstrip("\r\n") for line in io.StringIO(output))
+    lines = itertools.islice(lines, start_line_index, end_line_index)
+    layout = _find_layout(lines, header_len)
+    if layout is None:
+        return
+
+    parse_row = layout.parse_row
+    for line in _content_lines(lines):
+        yield parse_row(line)
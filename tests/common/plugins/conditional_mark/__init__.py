@@ -6,18 +6,21 @@ marks, and conditions can be specified in a centralized file.
 import json
 import logging
 import os
-import re
 import subprocess
 import yaml
 import glob
 import pytest
 
+from tests.common.cache.config_fingerprint import CONFIG_FINGERPRINT_CMD, fingerprint_of
 from tests.common.testbed import TestbedInfo
-from .issue import check_issues
+from .condition_index import ConditionEvaluator, ConditionIndex, ENTRY_OPTIONS, ISSUE_URL_PATTERN
+from .issue import DEFAULT_TTL, IssueResolver, IssueStatusCache
 from tests.common.utilities import get_duts_from_host_pattern
 
 logger = logging.getLogger(__name__)
 
+CONDITION_INDEX_KEY = pytest.StashKey[ConditionIndex]()
+ISSUE_RESOLVER_KEY = pytest.StashKey[IssueResolver]()
 DEFAULT_CONDITIONS_FILE = 'common/plugins/conditional_mark/tests_mark_conditions*.yaml'
 ASIC_NAME_PATH = '/../../../../ansible/group_vars/sonic/variables'
 ANSIBLE_LIBRARY_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../../../../ansible/library'))
@@ -69,6 +72,30 @@ def pytest_addoption(parser):
         help="Dynamically update the skip reason based on the conditions, "
              "by default it will not use the static reason specified in the mark conditions file")
 
+    parser.addoption(
+        '--issue-status-cache',
+        action='store',
+        dest='issue_status_cache',
+        default=None,
+        help="Location of the cache file of the issue states in the conditions. "
+             "If it is not specified, the file is in the pytest cache directory.")
+
+    parser.addoption(
+        '--issue-status-ttl',
+        action='store',
+        dest='issue_status_ttl',
+        type=int,
+        default=DEFAULT_TTL,
+        help="Seconds the cached state of an issue is used without checking the issue again. "
+             "Expired states are still used while the issues are checked again in the background.")
+
+    parser.addoption(
+        '--issue-status-offline',
+        action='store_true',
+        dest='issue_status_offline',
+        default=False,
+        help="Don't check the issues in the conditions, use their cached states regardless of their age.")
+
 
 def load_conditions(session):
     """Load the content from mark conditions file
@@ -187,11 +214,54 @@ def get_dut_name(session):
     return dut_name
 
 
+def load_config_fingerprint(inv_name, dut_name):
+    """Run 'ansible -m shell' command to get fingerprint of the DUT config files and image version.
+
+    Args:
+        inv_name (str): The name of inventory.
+        dut_name (str): The name of dut.
+
+    Returns:
+        str or None: Return the fingerprint or None if something went wrong.
+    """
+    try:
+        ansible_cmd = ['ansible', '-i', '../ansible/{}'.format(inv_name), dut_name,
+                       '-m', 'shell', '-a', CONFIG_FINGERPRINT_CMD, '-o']
+        raw_output = subprocess.check_output(ansible_cmd).decode('utf-8')
+        output_fields = raw_output.split('(stdout)', 1)
+        if len(output_fields) >= 2:
+            return fingerprint_of(output_fields[1].replace('\\n', '\n'))
+    except Exception as e:
+        logger.error('Failed to load config fingerprint, exception: {}'.format(repr(e)))
+
+    return None
+
+
+def basic_facts_fresh(session, dut_name):
+    """Check whether the cached basic facts were loaded from the current DUT config.
+
+    Args:
+        session (obj): Pytest session object, for getting cached data.
+        dut_name (str): The name of dut.
+
+    Returns:
+        bool: False if the config of the DUT changed since the basic facts were loaded.
+    """
+    meta = session.config.cache.get(f'BASIC_FACTS_META_{dut_name}', None)
+    if not meta or not meta.get('fingerprint'):
+        return True
+    fingerprint = load_config_fingerprint(meta['inv_name'], dut_name)
+    if fingerprint is not None and fingerprint != meta['fingerprint']:
+        logger.info('Config of {} changed, reloading basic facts'.format(dut_name))
+        return False
+    return True
+
+
 def get_basic_facts(session):
     dut_name = get_dut_name(session)
     cached_facts_name = f'BASIC_FACTS_{dut_name}'
     basic_facts_cached = session.config.cache.get(cached_facts_name, None)
-    if not basic_facts_cached:
+    if not basic_facts_cached or not basic_facts_fresh(session, dut_name):
         basic_facts = load_basic_facts(dut_name, session)
         session.config.cache.set(cached_facts_name, basic_facts)
 
@@ -417,6 +487,12 @@ def load_basic_facts(dut_name, session):
     # Since internal repo add vendor test support, add check to see if it's sonic-os, other wise skip load facts.
     vendor = session.config.getoption("--dut_vendor", "sonic")
     if vendor == "sonic":
+        # Record the config fingerprint before loading the facts which depend on the config
+        session.config.cache.set(f'BASIC_FACTS_META_{dut_name}', {
+            'inv_name': inv_name,
+            'fingerprint': load_config_fingerprint(inv_name, dut_name)
+        })
+
         # Load DUT basic facts
         _facts = load_dut_basic_facts(inv_name, dut_name)
         if _facts:
@@ -450,58 +526,39 @@ def load_basic_facts(dut_name, session):
     return results
 
 
-def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts):
+def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts, index=None,
+                     evaluator=None):
     """Find all matches of the given test case name in the conditions list.
 
     Args:
         nodeid (str): Full test case name
         conditions (list): List of conditions
+        index (ConditionIndex): Optional index of the conditions list, it is built from the list if not supplied.
+        evaluator (ConditionEvaluator): Optional evaluator of the condition strings with the basic facts.
 
     Returns:
         list: All match test case name or None if not found
     """
-    all_matches = []
+    if index is None:
+        index = ConditionIndex(conditions)
+    if evaluator is None:
+        evaluator = get_condition_evaluator(basic_facts, session)
     max_length = -1
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
-        condition_entry = list(condition.keys())[0]
-        condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
-            else:
-                match = None
-
-        elif "use_longest" in condition_items.keys():
-            assert isinstance(condition_items["use_longest"], bool), \
-                "The value of 'use_longest' in the mark conditions yaml should be bool type."
-            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
-                all_matches = []
-
-            match = nodeid.startswith(condition_entry)
-        else:
-            match = nodeid.startswith(condition_entry)
-
-        if match:
-            all_matches.append(condition)
-
-    for match in all_matches:
-        case_starting_substring = list(match.keys())[0]
+    for match_index in index.match(nodeid):
+        case_starting_substring, match_items = index.entry(match_index)
         length = len(case_starting_substring)
-        marks = match[case_starting_substring].keys()
-        for mark in marks:
-            if mark in ["regex", "use_longest"]:
+        for mark in match_items.keys():
+            if mark in ENTRY_OPTIONS:
                 continue
 
-            condition_value = evaluate_conditions(dynamic_update_skip_reason, match[case_starting_substring][mark],
-                                                  match[case_starting_substring][mark].get('conditions'), basic_facts,
-                                                  match[case_starting_substring][mark].get(
-                                                      'conditions_logical_operator', 'AND').upper(), session)
+            condition_value = evaluate_conditions(dynamic_update_skip_reason, match_items[mark],
+                                                  match_items[mark].get('conditions'), basic_facts,
+                                                  match_items[mark].get(
+                                                      'conditions_logical_operator', 'AND').upper(), session,
+                                                  evaluator=evaluator)
 
             if condition_value:
                 if mark in conditional_marks:
@@ -509,14 +566,14 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
                         conditional_marks.update({
                             mark: {
                                 case_starting_substring: {
-                                    mark: match[case_starting_substring][mark]}
+                                    mark: match_items[mark]}
                             }})
                         max_length = length
                 else:
                     conditional_marks.update({
                         mark: {
                             case_starting_substring: {
-                                mark: match[case_starting_substring][mark]}
+                                mark: match_items[mark]}
                         }})
                     max_length = length
 
@@ -529,6 +586,46 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     return matches
 
 
+def get_issue_resolver(session):
+    """Get the resolver of the issue states of the session, it is created on the first call.
+
+    Args:
+        session (obj): Pytest session object.
+
+    Returns:
+        IssueResolver: The resolver.
+    """
+    resolver = session.config.stash.get(ISSUE_RESOLVER_KEY, None)
+    if resolver is None:
+        option = session.config.option
+        cache_file = option.issue_status_cache
+        if not cache_file:
+            cache_file = os.path.join(str(session.config.cache.mkdir('conditional_mark')), 'issue_status.json')
+        resolver = IssueResolver(IssueStatusCache(cache_file, ttl=option.issue_status_ttl),
+                                 proxies=session.config.cache.get('PROXIES', {}),
+                                 offline=option.issue_status_offline)
+        session.config.stash[ISSUE_RESOLVER_KEY] = resolver
+    return resolver
+
+
+def resolve_issue_status(issues, session):
+    """Get the active state of issues.
+
+    The states are cached in a file. The issues without a fresh state in the cache are checked concurrently.
+
+    Args:
+        issues (iterable of str): Issue URLs.
+        session (obj): Pytest session object, for getting cached data.
+
+    Returns:
+        dict: Issue URL => True if the issue is active. Issues failed to be checked are not included.
+    """
+    resolver = get_issue_resolver(session)
+    # The proxies are loaded with the basic facts
+    resolver.proxies = session.config.cache.get('PROXIES', {})
+    return resolver.resolve(issues)
+
+
 def update_issue_status(condition_str, session):
     """Replace issue URL with 'True' or 'False' based on its active state.
 
@@ -544,32 +641,34 @@ def update_issue_status(condition_str, session):
     Returns:
         str: New condition string with issue URLs already replaced with 'True' or 'False'.
     """
-    issues = re.findall('https?://[^ )]+', condition_str)
+    issues = ISSUE_URL_PATTERN.findall(condition_str)
     if not issues:
         logger.debug('No issue specified in condition')
         return condition_str
 
-    issue_status_cache = session.config.cache.get('ISSUE_STATUS', {})
-    proxies = session.config.cache.get('PROXIES', {})
+    issue_status = resolve_issue_status(issues, session)
+    for issue_url in issues:
+        # Consider the issue as active anyway if unable to get issue state
+        condition_str = condition_str.replace(issue_url, str(issue_status.get(issue_url, True)))
+    return condition_str
 
-    unknown_issues = [issue_url for issue_url in issues if issue_url not in issue_status_cache]
-    if unknown_issues:
-        results = check_issues(unknown_issues, proxies=proxies)
-        issue_status_cache.update(results)
-        session.config.cache.set('ISSUE_STATUS', issue_status_cache)
 
-    for issue_url in issues:
-        if issue_url in issue_status_cache:
-            replace_str = str(issue_status_cache[issue_url])
-        else:
-            # Consider the issue as active anyway if unable to get issue state
-            replace_str = 'True'
+def get_condition_evaluator(basic_facts, session, issue_status=None):
+    """Get an evaluator of the condition strings with the basic facts.
 
-        condition_str = condition_str.replace(issue_url, replace_str)
-    return condition_str
+    Args:
+        basic_facts (dict): A one level dict with basic facts.
+        session (obj): Pytest session object, the states of the issues not in issue_status are looked up with it.
+        issue_status (dict): Optional states of the issues already resolved.
+
+    Returns:
+        ConditionEvaluator: The evaluator.
+    """
+    return ConditionEvaluator(basic_facts, issue_status=issue_status,
+                              resolve_issues=lambda issues: resolve_issue_status(issues, session))
 
 
-def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session):
+def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session, evaluator=None):
     """Evaluate a condition string based on supplied basic facts.
 
     Args:
@@ -581,6 +680,8 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
         basic_facts (dict): A one level dict with basic facts. Keys of the dict can be used as variables in the
             condition string evaluation.
         session (obj): Pytest session object, for getting cached data.
+        evaluator (ConditionEvaluator): Optional evaluator with the basic facts, the compiled conditions and their
+            results are shared by the calls using the same evaluator.
 
     Returns:
         bool: True or False based on condition string evaluation result.
@@ -588,30 +689,17 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
     if condition is None or condition.strip() == '':
         return True    # Empty condition item will be evaluated as True. Equivalent to be ignored.
 
-    condition_str = update_issue_status(condition, session)
-    try:
-        safe_facts = {k: v for k, v in basic_facts.items()}
-        safe_globals = {}
-        safe_globals.update(safe_facts)
-
-        for var in ["asic_type", "platform", "hwsku", "asic_gen"]:
-            if var not in safe_globals:
-                logger.warning("Variable %s not found in basic_facts, defaulting to None", var)
-                safe_globals[var] = None
-
-        condition_result = bool(eval(condition_str, safe_globals))
+    if evaluator is None:
+        evaluator = get_condition_evaluator(basic_facts, session)
+    condition_result = evaluator.evaluate(condition)
 
-        if condition_result and dynamic_update_skip_reason:
-            mark_details['reason'].append(condition)
-        return condition_result
-    except Exception:
-        raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
-            condition,
-            condition_str))
+    if condition_result and dynamic_update_skip_reason:
+        mark_details['reason'].append(condition)
+    return condition_result
 
 
 def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, basic_facts,
-                        conditions_logical_operator, session):
+                        conditions_logical_operator, session, evaluator=None):
     """Evaluate all the condition strings.
 
     Evaluate a single condition or multiple conditions. If multiple conditions are supplied, apply AND or OR
@@ -626,30 +714,36 @@ def evaluate_conditions(dynamic_update_skip_reason, mark_details, conditions, ba
             condition string evaluation.
         conditions_logical_operator (str): logical operator which should be applied to conditions(by default 'AND')
         session (obj): Pytest session object, for getting cached data.
+        evaluator (ConditionEvaluator): Optional evaluator with the basic facts.
 
     Returns:
         bool: True or False based on condition strings evaluation result.
     """
     if dynamic_update_skip_reason:
         mark_details['reason'] = []
+    if evaluator is None:
+        evaluator = get_condition_evaluator(basic_facts, session)
     if isinstance(conditions, list):
         # Apply 'AND' or 'OR' operation to list of conditions based on conditions_logical_operator(by default 'AND')
         if conditions_logical_operator == 'OR':
-            return any([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session)
+            return any([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session,
+                                           evaluator=evaluator)
                         for c in conditions])
         else:
-            return all([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session)
+            return all([evaluate_condition(dynamic_update_skip_reason, mark_details, c, basic_facts, session,
+                                           evaluator=evaluator)
                         for c in conditions])
     else:
         if conditions is None or conditions.strip() == '':
             return True
-        return evaluate_condition(dynamic_update_skip_reason, mark_details, conditions, basic_facts, session)
+        return evaluate_condition(dynamic_update_skip_reason, mark_details, conditions, basic_facts, session,
+                                  evaluator=evaluator)
 
 
 def pytest_collection(session):
     """Hook for loading conditions.
 
-    The pytest session.config.cache is used for caching loaded conditions for later use.
+    The loaded conditions are indexed and the index is kept in the stash of the pytest config for later use.
     DUT facts are loaded lazily in pytest_collection_modifyitems to avoid expensive SSH
     overhead when all tests are already going to be skipped (e.g. topology mismatch).
 
@@ -657,8 +751,8 @@ def pytest_collection(session):
         session (obj): Pytest session object.
     """
 
-    # Always clear cached conditions of previous run.
-    session.config.cache.set('TESTS_MARK_CONDITIONS', None)
+    # Always clear conditions of previous run.
+    session.config.stash[CONDITION_INDEX_KEY] = None
 
     if session.config.option.ignore_conditional_mark:
         logger.info('Ignore conditional mark')
@@ -666,7 +760,15 @@ def pytest_collection(session):
 
     conditions = load_conditions(session)
     if conditions:
-        session.config.cache.set('TESTS_MARK_CONDITIONS', conditions)
+        index = ConditionIndex(conditions)
+        session.config.stash[CONDITION_INDEX_KEY] = index
+
+
+def pytest_unconfigure(config):
+    """Hook for saving the states of the issues checked in the background."""
+    resolver = config.stash.get(ISSUE_RESOLVER_KEY, None)
+    if resolver is not None:
+        resolver.close()
 
 
 @pytest.hookimpl(trylast=True)
@@ -682,8 +784,8 @@ def pytest_collection_modifyitems(session, config, items):
         config (obj): Pytest config object.
         items (obj): List of pytest Item objects.
     """
-    conditions = config.cache.get('TESTS_MARK_CONDITIONS', None)
-    if not conditions:
+    index = config.stash.get(CONDITION_INDEX_KEY, None)
+    if index is None:
         logger.debug('No mark condition is defined')
         return
 
@@ -713,11 +815,24 @@ def pytest_collection_modifyitems(session, config, items):
     basic_facts['constants'] = MARK_CONDITIONS_CONSTANTS
     # Normalize nodeids: strip root directory prefix if present (pytest 9.0+ includes it)
     root_prefix = os.path.basename(str(session.config.rootpath)) + "/"
+    nodeids = []
     for item in items:
         nodeid = item.nodeid
         if nodeid.startswith(root_prefix):
             nodeid = nodeid[len(root_prefix):]
-        all_matches = find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts)
+        nodeids.append(nodeid)
+
+    # Check the state of all the issues in the conditions of the matched entries in one batch
+    matched_indexes = set()
+    for nodeid in nodeids:
+        matched_indexes.update(index.match(nodeid))
+    issues = index.issues_of(matched_indexes)
+    issue_status = resolve_issue_status(issues, session) if issues else {}
+    evaluator = get_condition_evaluator(basic_facts, session, issue_status=issue_status)
+
+    for item, nodeid in zip(items, nodeids):
+        all_matches = find_all_matches(nodeid, index.conditions, session, dynamic_update_skip_reason, basic_facts,
+                                       index=index, evaluator=evaluator)
 
         if all_matches:
             logger.debug('Found match "{}" for test case "{}"'.format(all_matches, item.nodeid))
@@ -725,7 +840,7 @@ def pytest_collection_modifyitems(session, config, items):
             for match in all_matches:
                 # match is a dict which has only one item, so we use match.values()[0] to get its value.
                 for mark_name, mark_details in list(list(match.values())[0].items()):
-                    if mark_name in ["regex", "use_longest"]:
+                    if mark_name in ENTRY_OPTIONS:
                         continue
                     conditions_logical_operator = mark_details.get('conditions_logical_operator', 'AND').upper()
                     add_mark = False
@@ -738,7 +853,8 @@ def pytest_collection_modifyitems(session, config, items):
                             add_mark = True
                         else:
                             add_mark = evaluate_conditions(dynamic_update_skip_reason, mark_details, mark_conditions,
-                                                           basic_facts, conditions_logical_operator, session)
+                                                           basic_facts, conditions_logical_operator, session,
+                                                           evaluator=evaluator)
 
                     if add_mark:
                         reason = ''
@@ -0,0 +1,268 @@
+"""Index of the mark conditions for finding the entries matching a test case and evaluating their conditions.
+
+The mark conditions files have thousands of entries. Scanning all of them and evaluating the condition strings of the
+matched entries again for every collected test case makes the collection of a full run slow. Instead, the entries are
+indexed once per session:
+
+* The entries matching a test case by prefix are stored in a radix trie. The entries matching a nodeid are found by
+  walking down the trie along the nodeid, the cost does not depend on the number of entries.
+* The regex entries are combined into one pattern. Only the nodeids matching the combined pattern are searched with
+  the pattern of each entry.
+* The condition strings are compiled once. The result of a condition is memoized by the condition string, with the
+  issue URLs replaced by their state, and the fingerprint of the basic facts.
+"""
+import hashlib
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+ISSUE_URL_PATTERN = re.compile(r'https?://[^ )]+')
+
+# Keys of a conditions entry which are options of the entry instead of marks
+ENTRY_OPTIONS = ("regex", "use_longest")
+
+# Variables which are None in the conditions if they are not in the basic facts
+DEFAULT_FACTS = ("asic_type", "platform", "hwsku", "asic_gen")
+
+# Patterns using back references can't be combined, the group numbers change in the combined pattern
+_BACK_REFERENCE_PATTERN = re.compile(r'\\[1-9]|\(\?P=')
+
+# Result of the conditions, key is (condition string with issue URLs replaced, fingerprint of the basic facts)
+_condition_results = {}
+_compiled_conditions = {}
+
+
+class _TrieNode(object):
+    __slots__ = ("edges", "indexes")
+
+    def __init__(self):
+        # First character of the edge label => [edge label, child node]
+        self.edges = {}
+        self.indexes = []
+
+
+class PrefixTrie(object):
+    """Radix trie of strings, finds all the stored strings which are prefixes of a string."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key, index):
+        node = self.root
+        pos = 0
+        while pos < len(key):
+            edge = node.edges.get(key[pos])
+            if edge is None:
+                child = _TrieNode()
+                node.edges[key[pos]] = [key[pos:], child]
+                node = child
+                break
+            label, child = edge
+            common = 1
+            while common < len(label) and pos + common < len(key) and label[common] == key[pos + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge, the key ends or branches in the middle of it
+                middle = _TrieNode()
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0] = label[:common]
+                edge[1] = middle
+                child = middle
+            node = child
+            pos += common
+        node.indexes.append(index)
+
+    def prefixes_of(self, string):
+        """Get the indexes of the stored strings which are prefixes of the string, shortest first."""
+        node = self.root
+        indexes = list(node.indexes)
+        pos = 0
+        while pos < len(string):
+            edge = node.edges.get(string[pos])
+            if edge is None or not string.startswith(edge[0], pos):
+                break
+            pos += len(edge[0])
+            node = edge[1]
+            indexes.extend(node.indexes)
+        return indexes
+
+
+class ConditionIndex(object):
+    """Index of a list of mark conditions loaded by load_conditions.
+
+    Args:
+        conditions (list): List of dicts, each has one item. The key is the test case name or pattern, the value is
+            the marks of the test cases.
+    """
+
+    def __init__(self, conditions):
+        self.conditions = conditions
+        self._entries = []
+        self._use_longest = set()
+        self._trie = PrefixTrie()
+        self._regexes = []
+        self._unfiltered_regexes = []
+        combinable = []
+
+        for index, condition in enumerate(conditions):
+            # condition is a dict which has only one item
+            condition_entry, condition_items = next(iter(condition.items()))
+            self._entries.append((condition_entry, condition_items))
+            if "regex" in condition_items:
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    pattern = re.compile(condition_entry)
+                    self._regexes.append((index, pattern))
+                    if _BACK_REFERENCE_PATTERN.search(condition_entry):
+                        self._unfiltered_regexes.append((index, pattern))
+                    else:
+                        combinable.append(condition_entry)
+                continue
+            if "use_longest" in condition_items:
+                assert isinstance(condition_items["use_longest"], bool), \
+                    "The value of 'use_longest' in the mark conditions yaml should be bool type."
+                if condition_items["use_longest"] is True:
+                    self._use_longest.add(index)
+            self._trie.insert(condition_entry, index)
+
+        self._combined_regex = None
+        if combinable:
+            try:
+                self._combined_regex = re.compile("|".join("(?:{})".format(entry) for entry in combinable))
+            except re.error:
+                # For example global flags in the middle of the combined pattern, search each pattern instead
+                self._unfiltered_regexes = self._regexes
+
+    def match(self, nodeid):
+        """Find the conditions entries matching the test case.
+
+        Same as scanning the conditions list, a prefix entry matches the test cases starting with it and a regex
+        entry matches the test cases in which its pattern is found. A matching prefix entry with 'use_longest' drops
+        the entries matched before it.
+
+        Args:
+            nodeid (str): Full test case name.
+
+        Returns:
+            list: Indexes of the matching entries in the conditions list, in the order of the list.
+        """
+        indexes = self._trie.prefixes_of(nodeid)
+        if self._regexes:
+            if self._combined_regex is not None and self._combined_regex.search(nodeid):
+                regexes = self._regexes
+            else:
+                regexes = self._unfiltered_regexes
+            indexes.extend(index for index, pattern in regexes if pattern.search(nodeid))
+        indexes.sort()
+
+        if self._use_longest:
+            for pos in range(len(indexes) - 1, -1, -1):
+                if indexes[pos] in self._use_longest:
+                    del indexes[:pos]
+                    break
+        return indexes
+
+    def entry(self, index):
+        """Get the (test case name or pattern, marks) of an entry."""
+        return self._entries[index]
+
+    def issues_of(self, indexes):
+        """Get the issue URLs in the conditions of the entries."""
+        issues = set()
+        for index in indexes:
+            for mark, mark_details in self._entries[index][1].items():
+                if mark in ENTRY_OPTIONS or not isinstance(mark_details, dict):
+                    continue
+                conditions = mark_details.get('conditions')
+                if not conditions:
+                    continue
+                if not isinstance(conditions, list):
+                    conditions = [conditions]
+                for condition in conditions:
+                    if condition:
+                        issues.update(ISSUE_URL_PATTERN.findall(condition))
+        return issues
+
+
+def facts_fingerprint(basic_facts):
+    """Get the fingerprint of the basic facts, the facts with the same fingerprint have the same content."""
+    content = json.dumps(basic_facts, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def compile_condition(condition_str):
+    """Compile a condition string to a code object, the code objects are cached by the condition string."""
+    code = _compiled_conditions.get(condition_str)
+    if code is None:
+        code = compile(condition_str, '<condition>', 'eval')
+        _compiled_conditions[condition_str] = code
+    return code
+
+
+class ConditionEvaluator(object):
+    """Evaluate condition strings with a set of basic facts and issue states.
+
+    Args:
+        basic_facts (dict): A one level dict with basic facts. Keys of the dict can be used as variables in the
+            condition strings.
+        issue_status (dict): Issue URL => True if the issue is active. Issues not in it are considered as active,
+            unless resolve_issues is supplied.
+        resolve_issues (callable): Optional function called with a list of unknown issue URLs, returns a dict of
+            their states.
+    """
+
+    def __init__(self, basic_facts, issue_status=None, resolve_issues=None):
+        self.fingerprint = facts_fingerprint(basic_facts)
+        self.issue_status = dict(issue_status or {})
+        self._resolve_issues = resolve_issues
+        self._condition_strs = {}
+        self._globals = dict(basic_facts)
+        for var in DEFAULT_FACTS:
+            if var not in self._globals:
+                logger.warning("Variable %s not found in basic_facts, defaulting to None", var)
+                self._globals[var] = None
+
+    def condition_str(self, condition):
+        """Replace the issue URLs in the condition with 'True' or 'False' based on their active state."""
+        condition_str = self._condition_strs.get(condition)
+        if condition_str is not None:
+            return condition_str
+
+        issues = ISSUE_URL_PATTERN.findall(condition)
+        unknown_issues = [issue_url for issue_url in issues if issue_url not in self.issue_status]
+        if unknown_issues and self._resolve_issues is not None:
+            self.issue_status.update(self._resolve_issues(unknown_issues))
+            # Consider the issue as active anyway if unable to get issue state, don't check it again
+            for issue_url in unknown_issues:
+                self.issue_status.setdefault(issue_url, True)
+        condition_str = condition
+        for issue_url in issues:
+            condition_str = condition_str.replace(issue_url, str(self.issue_status.get(issue_url, True)))
+        self._condition_strs[condition] = condition_str
+        return condition_str
+
+    def evaluate(self, condition):
+        """Evaluate a raw condition string.
+
+        Returns:
+            bool: True or False based on condition string evaluation result.
+
+        Raises:
+            RuntimeError: The condition string can't be evaluated.
+        """
+        condition_str = self.condition_str(condition)
+        key = (condition_str, self.fingerprint)
+        result = _condition_results.get(key)
+        if result is None:
+            try:
+                # Copy the globals, eval adds __builtins__ to them
+                result = bool(eval(compile_condition(condition_str), dict(self._globals)))
+            except Exception:
+                raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
+                    condition,
+                    condition_str))
+            _condition_results[key] = result
+        return result
@@ -1,17 +1,34 @@
 """For checking issue state based on supplied issue URL.
+
+The states of the issues can be kept in an IssueStatusCache file. IssueResolver checks the issues concurrently, uses
+the cached states until they expire and serves expired states while checking them again in the background.
 """
+import json
 import logging
-import multiprocessing
 import os
 import re
+import tempfile
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
 import six
 
 logger = logging.getLogger(__name__)
 
+# Max number of issues checked at the same time, also the size of the HTTP connection pool
+DEFAULT_MAX_WORKERS = 16
+
+# Cached issue states are used without checking the issue again during TTL seconds
+DEFAULT_TTL = 3600
+
+# Expired states are used while checking the issue again in the background during STALE_TTL seconds after the TTL
+DEFAULT_STALE_TTL = 24 * 3600
+
 
 class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
     """Base class for issue checker
@@ -27,6 +44,14 @@ class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
         """
         return True
 
+    def get_state(self):
+        """Check if the issue is still active.
+
+        Returns:
+            bool or None: True if the issue is active, None if unable to get the issue state.
+        """
+        return self.is_active()
+
 
 class GitHubIssueChecker(IssueCheckerBase):
     """GitHub issue state checker
@@ -34,23 +59,37 @@ class GitHubIssueChecker(IssueCheckerBase):
 
     NAME = 'GitHub'
 
-    def __init__(self, url, proxies):
+    def __init__(self, url, proxies, session=None):
         super(GitHubIssueChecker, self).__init__(url)
         self.api_url = url.replace('github.com', 'api.github.com/repos')
         self.proxies = proxies
+        self.session = session
 
     def is_active(self):
         """Check if the GitHub issue is still active.
 
-        Attempt to fetch issue details via proxy if configured. If proxy fails, retry with direct GitHub API URL.
         If unable to retrieve issue state, assume the issue is active (safe default).
 
         Returns:
             bool: False if the issue is closed else True.
         """
+        state = self.get_state()
+        if state is None:
+            logger.debug(f"Issue {self.api_url} is considered active due to API access failure.")
+            return True
+        return state
+
+    def get_state(self):
+        """Check if the GitHub issue is still active.
+
+        Attempt to fetch issue details via proxy if configured. If proxy fails, retry with direct GitHub API URL.
+
+        Returns:
+            bool or None: False if the issue is closed, True if it is open, None if unable to retrieve issue state.
+        """
 
         def fetch_issue(url):
-            response = requests.get(url, proxies=self.proxies, timeout=10)
+            response = (self.session or requests).get(url, proxies=self.proxies, timeout=10)
             response.raise_for_status()
             return response.json()
 
@@ -78,8 +117,7 @@ class GitHubIssueChecker(IssueCheckerBase):
                 issue_data = fetch_issue(direct_url)
             except Exception as direct_err:
                 logger.error(f"Access GitHub API directly failed for {direct_url}: {direct_err}")
-                logger.debug(f"Issue {direct_url} is considered active due to API access failure.")
-                return True
+                return None
 
         # Check issue state
         if issue_data.get('state') == 'closed':
@@ -95,11 +133,13 @@ class GitHubIssueChecker(IssueCheckerBase):
         return True
 
 
-def issue_checker_factory(url, proxies):
+def issue_checker_factory(url, proxies, session=None):
     """Factory function for creating issue checker object based on the domain name in the issue URL.
 
     Args:
         url (str): Issue URL.
+        proxies (dict): Proxies of the HTTP requests.
+        session (obj): Optional requests session, for sharing the HTTP connections between the checkers.
 
     Returns:
         obj: An instance of issue checker.
@@ -108,42 +148,239 @@ def issue_checker_factory(url, proxies):
     if m and len(m.groups()) > 0:
         domain_name = m.groups()[0].lower()
         if 'github' in domain_name:
-            return GitHubIssueChecker(url, proxies)
+            return GitHubIssueChecker(url, proxies, session=session)
         else:
             logger.error('Unknown issue website: {}'.format(domain_name))
     logger.error('Creating issue checker failed. Bad issue url {}'.format(url))
     return None
 
 
-def check_issues(issues, proxies=None):
+def _http_session(max_workers):
+    """Create a requests session with a connection pool shared by max_workers threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_state(checker):
+    try:
+        return checker.get_state()
+    except Exception as e:
+        logger.error('Failed to check issue {}, exception: {}'.format(checker.url, repr(e)))
+        return None
+
+
+def check_issues(issues, proxies=None, max_workers=DEFAULT_MAX_WORKERS):
     """Check state of the specified issues.
 
-    Because issue state checking may involve sending HTTP request. This function uses parallel run to speed up
-    issue status checking.
+    Because issue state checking may involve sending HTTP request. This function checks the issues concurrently in a
+    bounded thread pool, the threads share a pool of HTTP connections.
 
     Args:
         issues (list of str): List of issue URLs.
+        proxies (dict): Proxies of the HTTP requests.
+        max_workers (int): Max number of issues checked at the same time.
 
     Returns:
         dict: Issue state check result. Key is issue URL, value is either True or False based on issue state.
     """
-    checkers = [c for c in [issue_checker_factory(issue, proxies) for issue in issues] if c is not None]
+    session = _http_session(max_workers)
+    checkers = [c for c in [issue_checker_factory(issue, proxies, session) for issue in issues] if c is not None]
     if not checkers:
         logger.error('No checker created for issues: {}'.format(issues))
         return {}
 
-    check_results = multiprocessing.Manager().dict()
-    check_procs = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(checkers))) as executor:
+        states = list(executor.map(_get_state, checkers))
+    session.close()
+
+    # Consider the issue as active if unable to get issue state
+    return {checker.url: True if state is None else state for checker, state in zip(checkers, states)}
+
+
+class IssueStatusCache(object):
+    """Issue states persisted in a JSON file.
+
+    The file content is {issue URL: {"active": bool, "checked": timestamp of the check}}. The file may be shared by
+    the pytest processes running at the same time, it is replaced atomically and merged with the states saved by
+    other processes.
 
-    def _check_issue(checker, results):
-        results[checker.url] = checker.is_active()
+    Args:
+        path (str): Path of the cache file.
+        ttl (int): Seconds a state is fresh after it is checked.
+        stale_ttl (int): Seconds an expired state can still be used while the issue is checked again.
+    """
 
-    for checker in checkers:
-        check_procs.append(multiprocessing.Process(target=_check_issue, args=(checker, check_results,)))
+    def __init__(self, path, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                return entries
+        except (IOError, OSError, ValueError):
+            pass
+        return {}
 
-    for proc in check_procs:
-        proc.start()
-    for proc in check_procs:
-        proc.join(timeout=60)
+    def get(self, url):
+        """Get the cached state of an issue.
 
-    return dict(check_results)
+        Returns:
+            tuple: (active, age in seconds), or (None, None) if the issue is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry:
+            return None, None
+        return entry['active'], max(time.time() - entry['checked'], 0)
+
+    def is_fresh(self, age):
+        return age is not None and age < self.ttl
+
+    def is_usable(self, age):
+        """Whether an expired state can be used while the issue is checked again."""
+        return age is not None and age < self.ttl + self.stale_ttl
+
+    def update(self, states):
+        """Record the states of issues checked now."""
+        now = time.time()
+        with self._lock:
+            for url, active in states.items():
+                self._entries[url] = {'active': active, 'checked': now}
+            self._dirty = self._dirty or bool(states)
+
+    def save(self):
+        """Save the cache file, the states saved meanwhile by other processes are kept if they are newer."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = self._load()
+            for url, entry in self._entries.items():
+                if url not in entries or entries[url].get('checked', 0) < entry['checked']:
+                    entries[url] = entry
+            self._entries = entries
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.issue_status')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            logger.warning('Failed to save issue status cache {}: {}'.format(self.path, repr(e)))
+
+
+class IssueResolver(object):
+    """Resolve issue states with a cache and a pool of threads checking the issues.
+
+    * Fresh cached states are used without checking the issues.
+    * Expired states are used if they are not older than the stale TTL, the issues are checked again in the
+      background and the new states are used by the next runs.
+    * Other issues are checked, the caller waits for them. If an issue can't be checked, its expired state is used.
+    * In offline mode no issue is checked, all the cached states are used regardless of their age.
+
+    Args:
+        cache (IssueStatusCache): Cache of the issue states.
+        proxies (dict): Proxies of the HTTP requests.
+        offline (bool): Don't check the issues, only use the cache.
+        max_workers (int): Max number of issues checked at the same time.
+    """
+
+    def __init__(self, cache, proxies=None, offline=False, max_workers=DEFAULT_MAX_WORKERS):
+        self.cache = cache
+        self.proxies = proxies
+        self.offline = offline
+        self._max_workers = max_workers
+        # Reentrant, the done callback of a future runs in the submitting thread if the future is done already
+        self._lock = threading.RLock()
+        self._executor = None
+        self._session = None
+        self._pending = {}
+
+    def _check(self, url):
+        checker = issue_checker_factory(url, self.proxies, self._session)
+        state = _get_state(checker) if checker is not None else None
+        if state is not None:
+            self.cache.update({url: state})
+        return state
+
+    def _submit(self, url):
+        """Start checking an issue in the thread pool, unless it is being checked already."""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is None:
+                if self._executor is None:
+                    self._session = _http_session(self._max_workers)
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                        thread_name_prefix='issue_resolver')
+                future = self._executor.submit(self._check, url)
+                self._pending[url] = future
+                future.add_done_callback(lambda _: self._done(url))
+            return future
+
+    def _done(self, url):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def resolve(self, issues):
+        """Get the states of issues.
+
+        Args:
+            issues (iterable of str): Issue URLs.
+
+        Returns:
+            dict: Issue URL => True if the issue is active. Issues without any known state are not included.
+        """
+        results = {}
+        waiting = {}
+        for url in set(issues):
+            active, age = self.cache.get(url)
+            if active is not None and (self.offline or self.cache.is_fresh(age)):
+                results[url] = active
+            elif active is not None and self.cache.is_usable(age):
+                # Stale while revalidate
+                results[url] = active
+                self._submit(url)
+            elif not self.offline:
+                waiting[url] = self._submit(url)
+
+        for url, future in waiting.items():
+            state = future.result()
+            if state is None:
+                # Unable to check the issue, use the expired state if any
+                state = self.cache.get(url)[0]
+            if state is not None:
+                results[url] = state
+        if waiting:
+            self.cache.save()
+        return results
+
+    def close(self, timeout=5):
+        """Save the cache.
+
+        The issues not being checked yet are cancelled, the checks already started are waited for at most timeout
+        seconds. Nothing is waited for if no issue was checked during the session.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            session, self._session = self._session, None
+            pending = list(self._pending.values())
+        if executor is not None:
+            # Not shutdown(cancel_futures=True), it needs python 3.9
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+            wait(pending, timeout=timeout)
+            session.close()
+        self.cache.save()
@@ -0,0 +1,103 @@
+import logging
+import unittest
+from tests.common.plugins.conditional_mark.condition_index import ConditionEvaluator, ConditionIndex, PrefixTrie
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS = [
+    {"bgp/test_bgp.py": {"skip": {"conditions": ["asic_type in ['vs']"]}}},
+    {"bgp/test_bgp.py::test_bgp_[a-z]+\\[ipv6": {"regex": True, "xfail": {}}},
+    {"bgp/test_bgp.py::test_bgp_fact": {"use_longest": True, "skip": {}}},
+    {"bgp/": {"skip": {"conditions": "https://github.com/sonic-net/sonic-mgmt/issues/1 and topo_type == 't0'"}}},
+    {"bgp/test_bgp.py::test_bgp_fact": {"xfail": {}}},
+    {"bgp/test_bgp.py::test_(bgp)_\\1": {"regex": True, "skip": {}}},
+    {"bgp/test_bgp.py::test_bgp_[a-z]+\\[ipv4": {"regex": False, "skip": {}}},
+    {"": {"skip": {"conditions": ["https://github.com/sonic-net/sonic-mgmt/issues/2"]}}},
+]
+
+
+class TestPrefixTrie(unittest.TestCase):
+    """Test cases for the radix trie of the prefix entries."""
+
+    def test_prefixes_of(self):
+        trie = PrefixTrie()
+        for index, key in enumerate(["abc", "ab", "abd", "abcdef", "x", "abc"]):
+            trie.insert(key, index)
+
+        self.assertEqual(trie.prefixes_of("abcdefg"), [1, 0, 5, 3])
+        self.assertEqual(trie.prefixes_of("abd"), [1, 2])
+        self.assertEqual(trie.prefixes_of("abcd"), [1, 0, 5])
+        self.assertEqual(trie.prefixes_of("a"), [])
+        self.assertEqual(trie.prefixes_of(""), [])
+
+
+class TestConditionIndex(unittest.TestCase):
+    """Test cases for matching the test cases with the indexed conditions."""
+
+    def test_match_in_conditions_order(self):
+        index = ConditionIndex(CONDITIONS)
+
+        self.assertEqual(index.match("bgp/test_bgp.py::test_bgp_neighbor[ipv6-1]"), [0, 1, 3, 7])
+        self.assertEqual(index.match("bgp/test_bgp.py::test_bgp_bgp"), [0, 3, 5, 7])
+        self.assertEqual(index.match("acl/test_acl.py"), [7])
+
+    def test_use_longest(self):
+        index = ConditionIndex(CONDITIONS)
+
+        # The entries matched before the matching entry with 'use_longest' are dropped
+        self.assertEqual(index.match("bgp/test_bgp.py::test_bgp_facts[ipv6-1]"), [2, 3, 4, 7])
+
+    def test_invalid_options(self):
+        with self.assertRaises(AssertionError):
+            ConditionIndex([{"bgp/test_bgp.py": {"regex": "yes"}}])
+        with self.assertRaises(AssertionError):
+            ConditionIndex([{"bgp/test_bgp.py": {"use_longest": 1}}])
+
+    def test_issues_of(self):
+        index = ConditionIndex(CONDITIONS)
+
+        self.assertEqual(index.issues_of([0, 3, 7]), {"https://github.com/sonic-net/sonic-mgmt/issues/1",
+                                                      "https://github.com/sonic-net/sonic-mgmt/issues/2"})
+        self.assertEqual(index.issues_of([1, 2]), set())
+
+
+class TestConditionEvaluator(unittest.TestCase):
+    """Test cases for evaluating the condition strings."""
+
+    def test_evaluate(self):
+        evaluator = ConditionEvaluator({"asic_type": "vs", "topo_type": "t0"})
+
+        self.assertTrue(evaluator.evaluate("asic_type in ['vs'] and hwsku is None"))
+        self.assertFalse(evaluator.evaluate("topo_type == 't1'"))
+        with self.assertRaises(RuntimeError):
+            evaluator.evaluate("unknown_fact == 1")
+
+    def test_issue_status(self):
+        resolved = []
+
+        def _resolve_issues(issues):
+            resolved.append(issues)
+            return {"https://github.com/sonic-net/sonic-mgmt/issues/2": False}
+
+        evaluator = ConditionEvaluator({"topo_type": "t0"},
+                                       issue_status={"https://github.com/sonic-net/sonic-mgmt/issues/1": False},
+                                       resolve_issues=_resolve_issues)
+
+        self.assertFalse(evaluator.evaluate("https://github.com/sonic-net/sonic-mgmt/issues/1 and topo_type == 't0'"))
+        self.assertFalse(evaluator.evaluate("https://github.com/sonic-net/sonic-mgmt/issues/2"))
+        # Issues failed to be checked are active
+        self.assertTrue(evaluator.evaluate("https://github.com/sonic-net/sonic-mgmt/issues/3"))
+        self.assertTrue(evaluator.evaluate("https://github.com/sonic-net/sonic-mgmt/issues/3 or False"))
+        self.assertEqual(resolved, [["https://github.com/sonic-net/sonic-mgmt/issues/2"],
+                                    ["https://github.com/sonic-net/sonic-mgmt/issues/3"]])
+
+    def test_results_depend_on_facts(self):
+        condition = "topo_type == 't0'"
+
+        self.assertTrue(ConditionEvaluator({"topo_type": "t0"}).evaluate(condition))
+        self.assertFalse(ConditionEvaluator({"topo_type": "t1"}).evaluate(condition))
+        self.assertTrue(ConditionEvaluator({"topo_type": "t0"}).evaluate(condition))
+
+
+if __name__ == "__main__":
+    unittest.main()
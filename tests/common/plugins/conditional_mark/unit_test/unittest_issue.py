@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from tests.common.plugins.conditional_mark.issue import check_issues, IssueResolver, IssueStatusCache
+
+logger = logging.getLogger(__name__)
+
+ISSUE_URL = "https://github.com/sonic-net/sonic-mgmt/issues/{}"
+
+
+class IssueProxyStandIn(object):
+    """Local HTTP stand-in of the GitHub issues proxy, the issues are open unless they are in closed."""
+
+    def __init__(self, closed=(), failed=(), delay=0):
+        self.closed = set(closed)
+        self.failed = set(failed)
+        self.delay = delay
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                issue_url = parse_qs(urlparse(self.path).query)['github_issue_url'][0]
+                number = int(issue_url.rsplit('/', 1)[1])
+                stand_in.requests.append(number)
+                time.sleep(stand_in.delay)
+                if number in stand_in.failed:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                body = json.dumps({'state': 'closed' if number in stand_in.closed else 'open'}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestIssueResolver(unittest.TestCase):
+    """Test cases for checking the issues and caching their states."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, 'issue_status.json')
+        self.stand_in = IssueProxyStandIn(closed=[2, 4])
+        # The direct access to the GitHub API fails quickly through a closed proxy port
+        self.proxies = {'https': 'http://127.0.0.1:{}'.format(_closed_port())}
+        env = patch.dict(os.environ, {'SONIC_AUTOMATION_PROXY_GITHUB_ISSUES_URL': self.stand_in.url})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        self.stand_in.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_cache(self, states, age):
+        checked = time.time() - age
+        with open(self.cache_file, 'w') as f:
+            json.dump({ISSUE_URL.format(number): {'active': active, 'checked': checked}
+                       for number, active in states.items()}, f)
+
+    def _resolver(self, **kwargs):
+        return IssueResolver(IssueStatusCache(self.cache_file, ttl=100, stale_ttl=1000), proxies=self.proxies,
+                             **kwargs)
+
+    def test_check_issues_concurrently(self):
+        self.stand_in.delay = 0.3
+        self.stand_in.failed = {5}
+        issues = [ISSUE_URL.format(number) for number in range(1, 9)]
+
+        start = time.time()
+        results = check_issues(issues, proxies=self.proxies, max_workers=8)
+
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual([number for number in range(1, 9) if not results[ISSUE_URL.format(number)]], [2, 4])
+        # Failed to get the state, considered as active
+        self.assertTrue(results[ISSUE_URL.format(5)])
+
+    def test_fresh_cache(self):
+        resolver = self._resolver()
+        results = resolver.resolve([ISSUE_URL.format(1), ISSUE_URL.format(2)])
+        resolver.close()
+
+        self.assertEqual(results, {ISSUE_URL.format(1): True, ISSUE_URL.format(2): False})
+        self.assertEqual(sorted(self.stand_in.requests), [1, 2])
+
+        # A new resolver, e.g. of the next run, uses the cache file
+        resolver = self._resolver()
+        self.assertEqual(resolver.resolve([ISSUE_URL.format(2)]), {ISSUE_URL.format(2): False})
+        resolver.close()
+        self.assertEqual(sorted(self.stand_in.requests), [1, 2])
+
+    def test_stale_while_revalidate(self):
+        self._write_cache({2: True}, age=500)
+
+        resolver = self._resolver()
+        self.assertEqual(resolver.resolve([ISSUE_URL.format(2)]), {ISSUE_URL.format(2): True})
+        resolver.close()
+
+        self.assertEqual(self.stand_in.requests, [2])
+        resolver = self._resolver()
+        self.assertEqual(resolver.resolve([ISSUE_URL.format(2)]), {ISSUE_URL.format(2): False})
+        resolver.close()
+
+    def test_expired_cache(self):
+        self._write_cache({2: True}, age=5000)
+
+        resolver = self._resolver()
+        self.assertEqual(resolver.resolve([ISSUE_URL.format(2)]), {ISSUE_URL.format(2): False})
+        resolver.close()
+
+    def test_unreachable_tracker(self):
+        self._write_cache({2: False}, age=5000)
+        self.stand_in.failed = {2, 3}
+
+        resolver = self._resolver()
+        results = resolver.resolve([ISSUE_URL.format(2), ISSUE_URL.format(3)])
+        resolver.close()
+
+        # The expired state is used, the issue without any state is not included
+        self.assertEqual(results, {ISSUE_URL.format(2): False})
+
+    def test_offline(self):
+        self._write_cache({2: False}, age=5000)
+
+        resolver = self._resolver(offline=True)
+        results = resolver.resolve([ISSUE_URL.format(1), ISSUE_URL.format(2)])
+        resolver.close()
+
+        self.assertEqual(results, {ISSUE_URL.format(2): False})
+        self.assertEqual(self.stand_in.requests, [])
+
+    def test_close_cancels_pending_checks(self):
+        self._write_cache({number: True for number in range(1, 5)}, age=500)
+        self.stand_in.delay = 0.5
+
+        resolver = self._resolver(max_workers=1)
+        # The stale states are used and the issues are checked again in the background, one at a time
+        results = resolver.resolve([ISSUE_URL.format(number) for number in range(1, 5)])
+        start = time.time()
+        resolver.close()
+
+        self.assertEqual(len(results), 4)
+        # Only the check already started is waited for
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual(len(self.stand_in.requests), 1)
+
+    def test_cache_shared_by_processes(self):
+        cache_1 = IssueStatusCache(self.cache_file)
+        cache_2 = IssueStatusCache(self.cache_file)
+        cache_1.update({ISSUE_URL.format(1): True})
+        cache_2.update({ISSUE_URL.format(2): False})
+        cache_1.save()
+        cache_2.save()
+
+        self.assertEqual(IssueStatusCache(self.cache_file).get(ISSUE_URL.format(1))[0], True)
+        self.assertEqual(IssueStatusCache(self.cache_file).get(ISSUE_URL.format(2))[0], False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -49,6 +49,9 @@ def pytest_addoption(parser):
                      help="params that may needed in log_analyzer_bug_handler when err detected, "
                           "log_analyzer_bug_handler is called in _post_err_msg_handler, "
                           "vendor can implement their own logic in log_analyzer_bug_handler.")
+    parser.addoption("--loganalyzer_incremental", action="store_true", default=False,
+                     help="record log files offsets at the start marker and extract only the logs written after it, "
+                          "instead of searching the start marker through all the log files on every analysis")
     parser.addoption("--force_load_err_list", action="store_true", default=False,
                      help="Load the user defined err msgs which is not included in the common ignore file,"
                           "even when disable_loganalyzer is true")
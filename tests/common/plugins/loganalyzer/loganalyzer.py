@@ -1,3 +1,4 @@
+import functools
 import json
 import logging
 import os
@@ -8,8 +9,10 @@ import shutil
 
 from . import system_msg_handler
 from .bug_handler_helper import get_bughandler_instance, BugHandler
+from tests.common.errors import RunAnsibleModuleFail
 
 from .system_msg_handler import AnsibleLogAnalyzer as ansible_loganalyzer
+from .system_msg_handler import MultiPatternMatcher
 from os.path import join, split
 
 ANSIBLE_LOGANALYZER_MODULE = system_msg_handler.__file__.replace(r".pyc", ".py")
@@ -17,6 +20,33 @@ COMMON_MATCH = join(split(__file__)[0], "loganalyzer_common_match.txt")
 COMMON_IGNORE = join(split(__file__)[0], "loganalyzer_common_ignore.txt")
 COMMON_EXPECT = join(split(__file__)[0], "loganalyzer_common_expect.txt")
 SYSLOG_TMP_FOLDER = "/tmp/syslog"
+LOG_OFFSETS_FILE = "loganalyzer.offsets.json"
+
+# Regular expressions loaded from the match/ignore/expect files, keyed by file path and modification time
+_regexp_file_cache = {}
+# (hostname, run dir) of the DUTs the loganalyzer script was uploaded to in the current session
+_uploaded_scripts = set()
+
+
+def load_regexp_file(ansible_loganalyzer, src):
+    """
+    @summary: Get regular expressions defined in src file, parsing the file only once per session.
+
+    @return: New list of regular expressions, so callers are free to extend it.
+    """
+    key = (src, os.path.getmtime(src))
+    if key not in _regexp_file_cache:
+        _regexp_file_cache[key] = ansible_loganalyzer.create_msg_regex([src])[1]
+    return list(_regexp_file_cache[key])
+
+
+@functools.lru_cache(maxsize=32)
+def compile_matcher(patterns):
+    """
+    @summary: Compile tuple of regular expressions into a matcher, reusing the matcher compiled for
+              the same expressions by the previous analysis.
+    """
+    return MultiPatternMatcher(patterns)
 
 
 class DisableLogrotateCronContext:
@@ -186,6 +216,59 @@ class LogAnalyzer:
         self._la_logs_dir = "/tmp/loganalyzer/{}".format(self.ansible_host.hostname)
         self.bughandler = bughandler
 
+        # In incremental mode the DUT records log files offsets at the start marker and only the data
+        # written after it is extracted, instead of searching the start marker through all the log files.
+        self.incremental = False
+        if self.request is not None and getattr(self.request, "config", None) is not None:
+            self.incremental = self.request.config.getoption("--loganalyzer_incremental", default=False)
+        self._offsets_file = os.path.join(self.dut_run_dir, LOG_OFFSETS_FILE)
+
+    def _upload_script(self, force=False):
+        """
+        @summary: Copy loganalyzer script to the DUT. In incremental mode it is copied once per session,
+                  unless force is set.
+        """
+        key = (self.ansible_host.hostname, self.dut_run_dir)
+        if force or not self.incremental or key not in _uploaded_scripts:
+            self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE,
+                                   dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+            _uploaded_scripts.add(key)
+            return True
+        return False
+
+    def _run_script(self, args, module_ignore_errors=False):
+        """
+        @summary: Run loganalyzer script on the DUT.
+
+        The script could be auto removed by rebooting the device, in this case it is copied again
+        and the command is retried.
+
+        @param args: Arguments of loganalyzer script.
+        @param module_ignore_errors: Do not raise exception if the script failed.
+        @return: Result of the command module.
+        """
+        cmd = "python {} {}".format(os.path.join(self.dut_run_dir, "loganalyzer.py"), args)
+        if self._upload_script():
+            return self.ansible_host.command(cmd, module_ignore_errors=module_ignore_errors)
+
+        result = self.ansible_host.command(cmd, module_ignore_errors=True)
+        if result["rc"] != 0 and "can't open file" in result.get("stderr", ""):
+            self._upload_script(force=True)
+            result = self.ansible_host.command(cmd, module_ignore_errors=True)
+        if result["rc"] != 0 and not module_ignore_errors:
+            raise RunAnsibleModuleFail("run module command failed", result)
+        return result
+
+    def _default_marker_files(self):
+        """
+        @summary: Additional files which get the same start/end markers as syslog.
+        """
+        log_files = []
+        for idx, path in enumerate(self.additional_files):
+            if not self.additional_start_str or self.additional_start_str[idx] == '':
+                log_files.append(path)
+        return log_files
+
     def _add_end_marker(self, marker):
         """
         @summary: Add stop marker on the DUT. Markers always go to syslog; when
@@ -195,20 +278,34 @@ class LogAnalyzer:
 
         @return: True for successful execution False otherwise
         """
-        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
-
-        cmd = "python {run_dir}/loganalyzer.py --action add_end_marker --run_id {marker}"\
-            .format(run_dir=self.dut_run_dir, marker=marker)
+        cmd = "--action add_end_marker --run_id {marker}".format(marker=marker)
 
-        log_files_for_end = []
-        for idx, path in enumerate(self.additional_files):
-            if not self.additional_start_str or self.additional_start_str[idx] == '':
-                log_files_for_end.append(path)
+        log_files_for_end = self._default_marker_files()
         if log_files_for_end:
             cmd += " --logs {}".format(','.join(log_files_for_end))
 
         logging.debug("Adding end marker '{}'".format(marker))
-        self.ansible_host.command(cmd)
+        self._run_script(cmd)
+
+    def _extract_incremental(self, marker):
+        """
+        @summary: Extract the logs written since the start marker using the offsets recorded by init.
+
+        @return: True if extracted, False if the offsets are not available and the logs need to be
+                 extracted by searching the start marker.
+        """
+        cmd = "--action extract --run_id {marker} --offsets_file {offsets_file} --out_dir {run_dir}".format(
+            marker=marker, offsets_file=self._offsets_file, run_dir=self.dut_run_dir)
+        log_files = self._default_marker_files()
+        if log_files:
+            cmd += " --logs {}".format(','.join(log_files))
+
+        result = self._run_script(cmd, module_ignore_errors=True)
+        if result["rc"] != 0:
+            logging.info("Incremental log extraction failed, fall back to extract_log: {}".format(
+                result.get("stdout", "")))
+            return False
+        return True
 
     def __call__(self, **kwargs):
         """
@@ -324,9 +421,9 @@ class LogAnalyzer:
                   Loaded regular expressions are used by "analyze" method
                   to match expected text in the downloaded log file.
         """
-        self.match_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_MATCH])[1]
-        self.ignore_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_IGNORE])[1]
-        self.expect_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_EXPECT])[1]
+        self.match_regex = load_regexp_file(self.ansible_loganalyzer, COMMON_MATCH)
+        self.ignore_regex = load_regexp_file(self.ansible_loganalyzer, COMMON_IGNORE)
+        self.expect_regex = load_regexp_file(self.ansible_loganalyzer, COMMON_EXPECT)
         logging.debug('Loaded common config.')
 
         if self.request:
@@ -338,7 +435,7 @@ class LogAnalyzer:
         """
         @summary: Get regular expressions defined in src file.
         """
-        return self.ansible_loganalyzer.create_msg_regex([src])[1]
+        return load_regexp_file(self.ansible_loganalyzer, src)
 
     def run_cmd(self, callback, *args, **kwargs):
         """
@@ -370,62 +467,51 @@ class LogAnalyzer:
         """
         logging.debug("Loganalyzer init")
 
-        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
-
-        log_files = []
-        for idx, path in enumerate(self.additional_files):
-            if not self.additional_start_str or self.additional_start_str[idx] == '':
-                log_files.append(path)
-
-        return self._setup_marker(log_files=log_files)
+        return self._setup_marker(log_files=self._default_marker_files())
 
     def add_start_ignore_mark(self, log_files=None):
         """
         Adds the start ignore marker to the log files
         """
-        # We copy 'loganalyzer.py' to /tmp dir during loganalyzer initialization,
-        # but the file could be auto removed by rebooting device,
-        # always copy script to make sure the marker can be added successfully.
-        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+        # The script could be auto removed by rebooting device, _run_script makes sure
+        # it is present on the DUT so the marker can be added successfully.
         add_start_ignore_mark = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
-        cmd = "python {run_dir}/loganalyzer.py --action add_start_ignore_mark --run_id {add_start_ignore_mark}"\
-            .format(run_dir=self.dut_run_dir, add_start_ignore_mark=add_start_ignore_mark)
+        cmd = "--action add_start_ignore_mark --run_id {add_start_ignore_mark}"\
+            .format(add_start_ignore_mark=add_start_ignore_mark)
         if log_files:
             cmd += " --logs {}".format(','.join(log_files))
 
         logging.debug("Adding start ignore marker '{}'".format(add_start_ignore_mark))
-        self.ansible_host.command(cmd)
+        self._run_script(cmd)
         self._markers.append(add_start_ignore_mark)
 
     def add_end_ignore_mark(self, log_files=None):
         """
         Adds the end ignore marker to the log files
         """
-        # We copy 'loganalyzer.py' to /tmp dir during loganalyzer initialization,
-        # but the file could be auto removed by rebooting device,
-        # always copy script to make sure the marker can be added successfully.
-        self.ansible_host.copy(src=ANSIBLE_LOGANALYZER_MODULE, dest=os.path.join(self.dut_run_dir, "loganalyzer.py"))
+        # The script could be auto removed by rebooting device, _run_script makes sure
+        # it is present on the DUT so the marker can be added successfully.
         marker = self._markers.pop()
-        cmd = "python {run_dir}/loganalyzer.py --action add_end_ignore_mark --run_id {marker}"\
-            .format(run_dir=self.dut_run_dir, marker=marker)
+        cmd = "--action add_end_ignore_mark --run_id {marker}".format(marker=marker)
         if log_files:
             cmd += " --logs {}".format(','.join(log_files))
 
         logging.debug("Adding end ignore marker '{}'".format(marker))
-        self.ansible_host.command(cmd)
+        self._run_script(cmd)
 
     def _setup_marker(self, log_files=None):
         """
         Adds the marker to the log files
         """
         start_marker = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
-        cmd = "python {run_dir}/loganalyzer.py --action init --run_id {start_marker}"\
-            .format(run_dir=self.dut_run_dir, start_marker=start_marker)
+        cmd = "--action init --run_id {start_marker}".format(start_marker=start_marker)
         if log_files:
             cmd += " --logs {}".format(','.join(log_files))
+        if self.incremental:
+            cmd += " --offsets_file {}".format(self._offsets_file)
 
         logging.debug("Adding start marker '{}'".format(start_marker))
-        self.ansible_host.command(cmd)
+        self._run_script(cmd)
         return start_marker
 
     def analyze(self, marker, fail=None, maximum_log_length=None, store_la_logs=None):
@@ -464,14 +550,21 @@ class LogAnalyzer:
             # Add end marker into DUT syslog
             self._add_end_marker(marker)
 
+            # On DUT copy the logs written since the start marker using the recorded offsets,
+            # the offsets are not recorded for an existing syslog message used as start marker
+            extracted = self.incremental and not self.start_marker and self._extract_incremental(marker)
+
             # On DUT extract syslog files from /var/log/ and create one file by location - /tmp/syslog
-            self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
-                                          target_filename=self.extracted_syslog)
+            if not extracted:
+                self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
+                                              target_filename=self.extracted_syslog)
             for idx, path in enumerate(self.additional_files):
                 file_dir, file_name = split(path)
                 extracted_file_name = os.path.join(self.dut_run_dir, file_name)
                 if self.additional_start_str and self.additional_start_str[idx] != '':
                     start_str = self.additional_start_str[idx]
+                elif extracted:
+                    continue
                 else:
                     start_str = start_string
                 self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
@@ -488,17 +581,18 @@ class LogAnalyzer:
             self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
             file_list.append(tmp_folder)
 
-        match_messages_regex = re.compile('|'.join(self.match_regex)) if len(self.match_regex) else None
-        ignore_messages_regex = re.compile('|'.join(self.ignore_regex)) if len(self.ignore_regex) else None
-        expect_messages_regex = re.compile('|'.join(self.expect_regex)) if len(self.expect_regex) else None
+        match_messages_regex = compile_matcher(tuple(self.match_regex)) if len(self.match_regex) else None
+        ignore_messages_regex = compile_matcher(tuple(self.ignore_regex)) if len(self.ignore_regex) else None
+        expect_messages_regex = compile_matcher(tuple(self.expect_regex)) if len(self.expect_regex) else None
 
         logging.debug("Analyze files {}".format(file_list))
         logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
         logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
         logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
+        matched_expect_indexes = set()
         analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
             file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-            maximum_log_length=maximum_log_length)
+            maximum_log_length=maximum_log_length, matched_expect_indexes=matched_expect_indexes)
         # Print file content and remove the file
         for folder in file_list:
             with open(folder) as fo:
@@ -519,7 +613,9 @@ class LogAnalyzer:
             expected_lines_total.extend(expecting_lines)
 
         # Find unused regex matches
-        for regex in self.expect_regex:
+        for index, regex in enumerate(self.expect_regex):
+            if index in matched_expect_indexes:
+                continue
             for line in expected_lines_total:
                 if re.search(regex, line):
                     break
@@ -0,0 +1,182 @@
+"""Unit tests for ``tests/common/cache/facts_cache.py``.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/cache/unit_test_facts_cache.py -v
+"""
+
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "cache" / "facts_cache.py")
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_facts_cache", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def facts_cache():
+    return _load_target_module()
+
+
+def _new_cache(facts_cache, location, **kwargs):
+    # FactsCache is a singleton, drop the instance created by the previous test
+    facts_cache.Singleton._instances.clear()
+    return facts_cache.FactsCache(str(location), **kwargs)
+
+
+def _read_index(location):
+    with open(os.path.join(str(location), ".index.json")) as f:
+        return json.load(f)
+
+
+def test_write_and_read(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path)
+
+    assert cache.write("vlab-01", "basic_facts", {"hwsku": "Force10-S6000"})
+
+    assert (tmp_path / "vlab-01" / "basic_facts.pickle").exists()
+    # Read from the cache files by a new instance, e.g. another process
+    cache = _new_cache(facts_cache, tmp_path)
+    assert cache.read("vlab-01", "basic_facts") == {"hwsku": "Force10-S6000"}
+    assert cache.read("vlab-01", "missing") is facts_cache.FactsCache.NOTEXIST
+
+
+def test_index_accounting(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path)
+    cache.write("vlab-01", "a", "x" * 100)
+    cache.write("vlab-01", "b", "y" * 100)
+    cache.write("vlab-02", "a", "z" * 100)
+    index = _read_index(tmp_path)
+    assert len(index["entries"]) == 3
+    assert index["size"] == sum(entry["size"] for entry in index["entries"].values())
+
+    cache.cleanup("vlab-01", "a")
+    assert set(_read_index(tmp_path)["entries"]) == {"vlab-01/b", "vlab-02/a"}
+
+    cache.cleanup("vlab-01")
+    index = _read_index(tmp_path)
+    assert set(index["entries"]) == {"vlab-02/a"}
+    assert index["size"] == index["entries"]["vlab-02/a"]["size"]
+
+
+def test_index_is_rebuilt(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path)
+    cache.write("vlab-01", "a", "x" * 100)
+    (tmp_path / ".index.json").write_text("broken")
+
+    cache.write("vlab-01", "b", "y")
+
+    assert set(_read_index(tmp_path)["entries"]) == {"vlab-01/a", "vlab-01/b"}
+
+
+def test_entry_limit(facts_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(facts_cache, "ENTRY_LIMIT", 1)
+    cache = _new_cache(facts_cache, tmp_path)
+    cache.write("vlab-01", "a", 1)
+    # Overwriting an existing entry doesn't add a new one
+    cache.write("vlab-01", "a", 2)
+
+    with pytest.raises(Exception, match="Cache usage exceeds limitations"):
+        cache.write("vlab-01", "b", 1)
+
+
+def test_memory_lru_eviction(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path, memory_limit=250)
+    cache.write("vlab-01", "a", "x" * 100)
+    cache.write("vlab-01", "b", "y" * 100)
+    # Touch "a" so "b" is the least recently used one
+    cache.read("vlab-01", "a")
+    cache.write("vlab-01", "c", "z" * 100)
+
+    assert list(cache._cache) == [("vlab-01", "a"), ("vlab-01", "c")]
+    # Evicted facts are loaded from the cache file again
+    assert cache.read("vlab-01", "b") == "y" * 100
+
+
+def test_broken_cache_file(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path)
+    (tmp_path / "vlab-01").mkdir()
+    (tmp_path / "vlab-01" / "a.pickle").write_bytes(b"")
+
+    assert cache.read("vlab-01", "a") is facts_cache.FactsCache.NOTEXIST
+
+
+def test_fingerprint_invalidation(facts_cache, tmp_path):
+    cache = _new_cache(facts_cache, tmp_path)
+    cache.write("vlab-01", "mg_facts", {"a": 1}, fingerprint="fp1")
+
+    assert cache.read("vlab-01", "mg_facts", fingerprint="fp1") == {"a": 1}
+    assert cache.read("vlab-01", "mg_facts", fingerprint="fp2") is facts_cache.FactsCache.NOTEXIST
+    # Reading without fingerprint doesn't check it
+    assert cache.read("vlab-01", "mg_facts") == {"a": 1}
+
+    # The fingerprint is persisted in the index for other processes
+    cache = _new_cache(facts_cache, tmp_path)
+    assert cache.read("vlab-01", "mg_facts", fingerprint="fp2") is facts_cache.FactsCache.NOTEXIST
+    assert cache.read("vlab-01", "mg_facts", fingerprint="fp1") == {"a": 1}
+
+
+def test_cached_decorator_with_fingerprint(facts_cache, tmp_path):
+    _new_cache(facts_cache, tmp_path)
+    fingerprints = ["fp1"]
+    calls = []
+
+    class Host(object):
+        hostname = "vlab-01"
+
+        @facts_cache.cached(name="facts", fingerprint_getter=lambda function, args, kargs: fingerprints[0])
+        def get_facts(self):
+            calls.append(1)
+            return len(calls)
+
+    # The decorator holds the cache instance created when it was applied
+    host = Host()
+    assert host.get_facts() == 1
+    assert host.get_facts() == 1
+    fingerprints[0] = "fp2"
+    assert host.get_facts() == 2
+    assert host.get_facts() == 2
+
+
+def _load_config_fingerprint():
+    # config_fingerprint imports facts_cache relatively, load both as submodules of a stand-in package
+    package = type(sys)("unit_target_cache")
+    package.__path__ = [str(MODULE_PATH.parent)]
+    modules = {"unit_target_cache": package}
+    with patch.dict(sys.modules, modules):
+        for name in ("facts_cache", "config_fingerprint"):
+            spec = importlib.util.spec_from_file_location("unit_target_cache." + name,
+                                                          MODULE_PATH.parent / (name + ".py"))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[spec.name] = module
+            spec.loader.exec_module(module)
+    return module
+
+
+def test_changes_config():
+    changes_config = _load_config_fingerprint().changes_config
+
+    assert changes_config("shell", ("config reload -y",), {})
+    assert changes_config("shell", ("sudo config load_minigraph -y &>/dev/null",), {})
+    assert changes_config("command", (), {"cmd": "config load /etc/sonic/config_db.json -y"})
+    assert changes_config("shell", (), {"_raw_params": "config reload -y -f"})
+    assert changes_config("shell_cmds", (), {"cmds": ["config save -y", "config reload -y"]})
+    assert changes_config("command", (), {"argv": ["sudo", "config", "reload", "-y"]})
+
+    assert not changes_config("shell", ("config save -y",), {})
+    assert not changes_config("shell", ("config load_mgmt_config -y",), {})
+    assert not changes_config("shell", ("show runningconfiguration all",), {})
+    assert not changes_config("copy", ("config reload -y",), {})
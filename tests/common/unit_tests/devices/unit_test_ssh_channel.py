@@ -0,0 +1,246 @@
+"""Unit tests for ``tests/common/devices/ssh_channel.py``.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/devices/unit_test_ssh_channel.py -v
+"""
+
+import datetime
+import importlib.util
+import sys
+import types
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "devices" / "ssh_channel.py")
+
+
+def _load_target_module():
+    """Load the target module, stub paramiko and pytest_ansible if they are not installed."""
+    if "paramiko" not in sys.modules:
+        try:
+            import paramiko  # noqa F401
+        except ImportError:
+            paramiko_stub = types.ModuleType("paramiko")
+            paramiko_stub.SSHException = type("SSHException", (Exception,), {})
+            sys.modules["paramiko"] = paramiko_stub
+    try:
+        import pytest_ansible.results  # noqa F401
+    except ImportError:
+        pytest_ansible_stub = types.ModuleType("pytest_ansible")
+        errors_stub = types.ModuleType("pytest_ansible.errors")
+        errors_stub.AnsibleConnectionFailure = type("AnsibleConnectionFailure", (Exception,), {})
+        results_stub = types.ModuleType("pytest_ansible.results")
+        results_stub.ModuleResult = type("ModuleResult", (dict,), {})
+        sys.modules.update({
+            "pytest_ansible": pytest_ansible_stub,
+            "pytest_ansible.errors": errors_stub,
+            "pytest_ansible.results": results_stub,
+        })
+
+    spec = importlib.util.spec_from_file_location("unit_target_ssh_channel", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def ssh_channel():
+    return _load_target_module()
+
+
+class FakeChannel(object):
+    """Channel returning the given output in small chunks, interleaving stdout and stderr."""
+
+    def __init__(self, rc, stdout, stderr):
+        self.rc = rc
+        self.stdout = [stdout[i:i + 3] for i in range(0, len(stdout), 3)]
+        self.stderr = [stderr[i:i + 3] for i in range(0, len(stderr), 3)]
+        self.cmd = None
+        self.closed = False
+
+    def exec_command(self, cmd):
+        self.cmd = cmd
+
+    def shutdown_write(self):
+        pass
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        return self.stdout.pop(0)
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        return not self.stdout and not self.stderr
+
+    def recv_exit_status(self):
+        return self.rc
+
+    def close(self):
+        self.closed = True
+
+
+def test_build_command_shell(ssh_channel):
+    cmd = ssh_channel.PersistentSSHChannel.build_command("shell", "echo 'a b' | wc -l", use_sudo=False)
+
+    assert cmd == "/bin/sh -c 'echo '\"'\"'a b'\"'\"' | wc -l'"
+
+
+def test_build_command_command_is_not_interpreted_by_shell(ssh_channel):
+    cmd = ssh_channel.PersistentSSHChannel.build_command("command", "echo a | wc -l", use_sudo=False)
+
+    assert cmd == "echo a '|' wc -l"
+
+
+def test_build_command_sudo_and_chdir(ssh_channel):
+    cmd = ssh_channel.PersistentSSHChannel.build_command("shell", "ls", chdir="/tmp", executable="/bin/bash")
+
+    assert cmd == "sudo -n -H /bin/sh -c 'cd /tmp && exec /bin/bash -c ls'"
+
+
+def test_exec_collects_interleaved_output(ssh_channel):
+    channel = FakeChannel(2, b"hello world\n", b"some error\n")
+
+    rc, stdout, stderr = ssh_channel.PersistentSSHChannel._exec(channel, "cmd")
+
+    assert (rc, stdout, stderr) == (2, b"hello world\n", b"some error\n")
+    assert channel.cmd == "cmd"
+    assert channel.closed
+
+
+def test_build_result_matches_module_result_keys(ssh_channel):
+    start = datetime.datetime.now()
+    end = start + datetime.timedelta(seconds=1)
+
+    res = ssh_channel.PersistentSSHChannel.build_result("shell", "false", 1, b"a\nb\n", b"", start, end)
+
+    assert res["rc"] == 1
+    assert res["failed"] is True
+    assert res["stdout"] == "a\nb"
+    assert res["stdout_lines"] == ["a", "b"]
+    assert res["stderr"] == ""
+    assert res["stderr_lines"] == []
+    assert res["msg"] == "non-zero return code"
+    assert res["delta"] == "0:00:01"
+
+    res = ssh_channel.PersistentSSHChannel.build_result("command", "ls /", 0, b"", b"", start, end)
+    assert res["cmd"] == ["ls", "/"]
+    assert res["failed"] is False
+    assert "msg" not in res
+
+
+@pytest.mark.parametrize("module_name, module_args, complex_args", [
+    ("copy", (), {"src": "a", "dest": "b"}),
+    ("shell", ("ls",), {"creates": "/tmp/a"}),
+    ("shell", ("ls", "-l"), {}),
+    ("shell", (), {}),
+    ("command", ("ls",), {"executable": "/bin/bash"}),
+])
+def test_run_falls_back_for_unsupported_invocations(ssh_channel, module_name, module_args, complex_args):
+    channel = ssh_channel.PersistentSSHChannel(MagicMock(), "dut")
+    channel._transport = MagicMock(side_effect=AssertionError("must not connect"))
+
+    assert channel.run(module_name, module_args, complex_args) is None
+
+
+def test_run_over_transport(ssh_channel):
+    channel = ssh_channel.PersistentSSHChannel(MagicMock(), "dut")
+    fake_channel = FakeChannel(0, b"sonic\n", b"")
+    transport = MagicMock()
+    transport.open_session.return_value = fake_channel
+    channel._transport = MagicMock(return_value=transport)
+    channel._use_sudo = True
+
+    res = channel.run("shell", ("cat /etc/hostname",), {})
+
+    assert res["stdout"] == "sonic"
+    assert res["rc"] == 0
+    assert fake_channel.cmd == "sudo -n -H /bin/sh -c '/bin/sh -c '\"'\"'cat /etc/hostname'\"'\"''"
+
+
+def test_run_disabled_channel_falls_back(ssh_channel):
+    channel = ssh_channel.PersistentSSHChannel(MagicMock(), "dut")
+    channel.disabled = True
+
+    assert channel.run("shell", ("ls",), {}) is None
+
+
+SSH_OPTION_VARS = {
+    "remote_user": ["ansible_user", "ansible_ssh_user"],
+    "password": ["ansible_password", "ansible_ssh_pass", "ansible_ssh_password"],
+    "port": ["ansible_port", "ansible_ssh_port"],
+}
+
+
+def _ansible_stubs():
+    """Stub the ansible modules used for resolving the connection variables."""
+    ansible_stub = types.ModuleType("ansible")
+    template_stub = types.ModuleType("ansible.template")
+    template_stub.Templar = lambda loader, variables: types.SimpleNamespace(template=lambda value: value)
+    constants_stub = types.ModuleType("ansible.constants")
+    constants_stub.config = types.SimpleNamespace(
+        get_configuration_definition=lambda option, plugin_type, name: {
+            "vars": [{"name": var} for var in SSH_OPTION_VARS[option]]})
+    plugins_stub = types.ModuleType("ansible.plugins")
+    loader_stub = types.ModuleType("ansible.plugins.loader")
+    loader_stub.connection_loader = MagicMock()
+    ansible_stub.template = template_stub
+    ansible_stub.constants = constants_stub
+    ansible_stub.plugins = plugins_stub
+    plugins_stub.loader = loader_stub
+    return {
+        "ansible": ansible_stub,
+        "ansible.template": template_stub,
+        "ansible.constants": constants_stub,
+        "ansible.plugins": plugins_stub,
+        "ansible.plugins.loader": loader_stub,
+    }
+
+
+def _channel_with_vars(ssh_channel, host_vars, extra_vars):
+    vm = MagicMock()
+    vm.extra_vars = extra_vars
+    vm.get_vars.return_value = dict(host_vars, **extra_vars)
+    ansible_host = MagicMock()
+    ansible_host.options = {"inventory_manager": MagicMock(), "variable_manager": vm}
+    return ssh_channel.PersistentSSHChannel(ansible_host, "dut1")
+
+
+def test_connection_params_extra_vars_override_host_vars(ssh_channel):
+    host_vars = {"ansible_host": "10.0.0.1", "ansible_connection": "ssh",
+                 "ansible_user": "admin", "ansible_password": "password"}
+    # Credentials set by SonicHost with ssh_user/ssh_passwd
+    extra_vars = {"ansible_ssh_user": "other", "ansible_ssh_pass": "other_password"}
+    channel = _channel_with_vars(ssh_channel, host_vars, extra_vars)
+
+    with patch.dict(sys.modules, _ansible_stubs()):
+        params = channel._connection_params()
+
+    assert params["hostname"] == "10.0.0.1"
+    assert params["username"] == "other"
+    assert params["password"] == "other_password"
+    assert params["port"] == 22
+
+
+def test_connection_params_last_listed_var_wins(ssh_channel):
+    host_vars = {"ansible_host": "10.0.0.1", "ansible_user": "admin", "ansible_ssh_user": "ssh_admin",
+                 "ansible_password": "password", "ansible_port": 2222}
+    channel = _channel_with_vars(ssh_channel, host_vars, {})
+
+    with patch.dict(sys.modules, _ansible_stubs()):
+        params = channel._connection_params()
+
+    assert params["username"] == "ssh_admin"
+    assert params["password"] == "password"
+    assert params["port"] == 2222
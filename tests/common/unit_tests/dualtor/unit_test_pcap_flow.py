@@ -0,0 +1,245 @@
+"""Unit tests for ``tests/common/dualtor/pcap_flow.py``.
+
+The capture files are built by the test, in the pcap and pcapng formats written by scapy, tcpdump and dumpcap.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/dualtor/unit_test_pcap_flow.py -v
+"""
+
+import importlib.util
+import socket
+import struct
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "dualtor" / "pcap_flow.py")
+
+DUT_MAC = "4c:76:25:f5:48:80"
+VLAN_MAC = "4c:76:25:f5:48:81"
+HOST_MAC = "00:11:22:33:44:55"
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_pcap_flow", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def pcap_flow():
+    return _load_target_module()
+
+
+def _mac(mac):
+    return bytes.fromhex(mac.replace(":", ""))
+
+
+def _ipv4(payload, src="10.0.0.1", dst="192.168.0.2", proto=6, frag=0):
+    return struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 1, frag, 64, proto, 0,
+                       socket.inet_aton(src), socket.inet_aton(dst)) + payload
+
+
+def _ipv6(payload, next_header=6):
+    return struct.pack("!IHBB16s16s", 0x60000000, len(payload), next_header, 64,
+                       socket.inet_pton(socket.AF_INET6, "fc00::1"),
+                       socket.inet_pton(socket.AF_INET6, "fc00::2")) + payload
+
+
+def _tcp(payload, sport=1234, dport=5000):
+    return struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 0x50, 0x18, 8192, 0, 0) + payload
+
+
+def _ether(dst, src, l3, ethertype=0x0800, vlans=()):
+    tags = b"".join(struct.pack("!HH", 0x8100, vlan) for vlan in vlans)
+    return _mac(dst) + _mac(src) + tags + struct.pack("!H", ethertype) + l3
+
+
+def _flow_frame(packet_id, sent, **kwargs):
+    payload = ("0" * 60 + str(packet_id)).encode()
+    if sent:
+        return _ether(DUT_MAC, HOST_MAC, _ipv4(_tcp(payload), **kwargs))
+    return _ether(HOST_MAC, VLAN_MAC, _ipv4(_tcp(payload), **kwargs))
+
+
+def _write_pcap(path, packets, endian="<", nano=False):
+    magic = 0xa1b23c4d if nano else 0xa1b2c3d4
+    with open(path, "wb") as f:
+        f.write(struct.pack(endian + "IHHiIII", magic, 2, 4, 0, 0, 65535, 1))
+        for timestamp, frame in packets:
+            seconds = int(timestamp)
+            fraction = int(round((timestamp - seconds) * (1e9 if nano else 1e6)))
+            f.write(struct.pack(endian + "IIII", seconds, fraction, len(frame), len(frame)) + frame)
+
+
+def _pcapng_block(block_type, body):
+    body += b"\x00" * (-len(body) % 4)
+    return struct.pack("<II", block_type, len(body) + 12) + body + struct.pack("<I", len(body) + 12)
+
+
+def _write_pcapng(path, packets):
+    """Two interfaces, microsecond and nanosecond timestamps, packets are interleaved between them"""
+    tsresol_ns = struct.pack("<HHB3x", 9, 1, 9) + struct.pack("<HH", 0, 0)
+    with open(path, "wb") as f:
+        f.write(_pcapng_block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)))
+        f.write(_pcapng_block(1, struct.pack("<HHI", 1, 0, 65535)))
+        f.write(_pcapng_block(1, struct.pack("<HHI", 1, 0, 65535) + tsresol_ns))
+        for index, (timestamp, frame) in enumerate(packets):
+            interface = index % 2
+            ticks = int(round(timestamp * (1e9 if interface else 1e6)))
+            f.write(_pcapng_block(6, struct.pack("<IIIII", interface, ticks >> 32, ticks & 0xffffffff,
+                                                 len(frame), len(frame)) + frame))
+
+
+def _capture():
+    """Packets 0-9 sent and received, 4-6 lost, 8 flooded, received packets delayed by 1ms"""
+    packets = []
+    for packet_id in range(10):
+        timestamp = 1700000000.5 + packet_id * 0.01
+        packets.append((timestamp, _flow_frame(packet_id, sent=True)))
+        if packet_id not in (4, 5, 6):
+            packets.append((timestamp + 0.001, _flow_frame(packet_id, sent=False)))
+        if packet_id == 8:
+            packets.append((timestamp + 0.002, _flow_frame(packet_id, sent=False)))
+    # Not part of the flow
+    packets.append((1700000001.0, _ether(DUT_MAC, HOST_MAC, _ipv4(_tcp(b"0" * 61 + b"1", sport=22)))))
+    packets.append((1700000001.0, _ether(DUT_MAC, HOST_MAC, _ipv4(_tcp(b"not an id")))))
+    packets.append((1700000001.0, _ether(HOST_MAC, HOST_MAC, _ipv4(_tcp(b"0" * 61 + b"1")))))
+    packets.append((1700000001.0, _ether(DUT_MAC, HOST_MAC, _ipv4(b"\x00" * 8, proto=1))))
+    # The delayed received packet 2 is captured after packet 3
+    packets[4], packets[6] = packets[6], packets[4]
+    return packets
+
+
+def _read(pcap_flow, path, **kwargs):
+    flows, count = pcap_flow.read_flows(str(path), 1234, 5000, [DUT_MAC, VLAN_MAC], [DUT_MAC, VLAN_MAC], **kwargs)
+    return flows, count
+
+
+def test_pcap_formats(pcap_flow, tmp_path):
+    packets = _capture()
+    _write_pcap(tmp_path / "le.pcap", packets)
+    _write_pcap(tmp_path / "be_ns.pcap", packets, endian=">", nano=True)
+    _write_pcapng(tmp_path / "capture.pcapng", packets)
+
+    results = []
+    for name in ("le.pcap", "be_ns.pcap", "capture.pcapng"):
+        flows, count = _read(pcap_flow, tmp_path / name)
+        assert count == len(packets)
+        assert list(flows) == [None]
+        results.append([(payload_id, round(timestamp, 6), direction)
+                        for payload_id, timestamp, direction in flows[None].sorted()])
+
+    assert results[0] == results[1] == results[2]
+    assert [record[0] for record in results[0] if record[2] == pcap_flow.SENT] == list(range(10))
+    assert [record[0] for record in results[0] if record[2] == pcap_flow.RECEIVED] == [0, 1, 2, 3, 7, 8, 8, 9]
+    assert results[0][0] == (0, 1700000000.5, pcap_flow.SENT)
+
+
+def test_sorted_by_id_then_time(pcap_flow):
+    records = pcap_flow.FlowRecords()
+    for record in [(2, 1.5, 1), (1, 2.0, 1), (1, 1.0, 0), (2, 1.5, 0), (0, 3.0, 0)]:
+        records.append(*record)
+
+    # Same id and timestamp keep the capture order
+    assert list(records.sorted()) == [(0, 3.0, 0), (1, 1.0, 0), (1, 2.0, 1), (2, 1.5, 1), (2, 1.5, 0)]
+    assert len(records) == 5
+
+
+def test_unique_received(pcap_flow, tmp_path):
+    _write_pcap(tmp_path / "capture.pcap", _capture())
+
+    flows, _ = _read(pcap_flow, tmp_path / "capture.pcap", unique_received=True)
+
+    received = [(payload_id, timestamp) for payload_id, timestamp, direction in flows[None].sorted()
+                if direction == pcap_flow.RECEIVED]
+    assert [payload_id for payload_id, _ in received] == [0, 1, 2, 3, 7, 8, 9]
+    # The first received copy is kept
+    assert received[5][1] == pytest.approx(1700000000.581)
+
+
+def test_decode_frame(pcap_flow):
+    payload = b"0" * 61 + b"7"
+    # QinQ tagged
+    tagged = _mac(DUT_MAC) + _mac(HOST_MAC) + struct.pack("!HHHH", 0x88a8, 10, 0x8100, 20) + \
+        struct.pack("!H", 0x0800) + _ipv4(_tcp(payload))
+    decoded = pcap_flow.decode_frame(tagged)
+    assert decoded[0] == _mac(DUT_MAC)
+    assert decoded[2:7] == (socket.inet_aton("10.0.0.1"), socket.inet_aton("192.168.0.2"), 1234, 5000, payload)
+    assert decoded[7] is None
+
+    # IPv6 with a hop-by-hop extension header
+    hop_by_hop = struct.pack("!BB6x", 6, 0)
+    decoded = pcap_flow.decode_frame(_ether(DUT_MAC, HOST_MAC, _ipv6(hop_by_hop + _tcp(payload), 0), 0x86dd))
+    assert decoded[3] == socket.inet_pton(socket.AF_INET6, "fc00::2")
+    assert decoded[6] == payload
+
+    # IP in IP, the addresses are from the outer header
+    decoded = pcap_flow.decode_frame(_ether(DUT_MAC, HOST_MAC, _ipv4(_ipv4(_tcp(payload)), src="1.1.1.1", proto=4)))
+    assert decoded[2] == socket.inet_aton("1.1.1.1")
+    assert decoded[6] == payload
+
+    # Ethernet padding is part of the payload
+    decoded = pcap_flow.decode_frame(_ether(DUT_MAC, HOST_MAC, _ipv4(_tcp(b"7"))) + b"\x00" * 5)
+    assert decoded[6] == b"7\x00\x00\x00\x00\x00"
+
+    assert pcap_flow.decode_frame(_ether(DUT_MAC, HOST_MAC, _ipv4(_tcp(payload), frag=10))) is None
+    assert pcap_flow.decode_frame(_ether(DUT_MAC, HOST_MAC, b"\x00" * 28, ethertype=0x0806)) is None
+    assert pcap_flow.decode_frame(b"\x00" * 10) is None
+
+
+def test_vxlan_decap(pcap_flow, tmp_path):
+    def _vxlan(inner):
+        udp = struct.pack("!HHHH", 1234, 4789, 16 + len(inner), 0) + b"\x08" + b"\x00" * 7 + inner
+        return _ether(DUT_MAC, HOST_MAC, _ipv4(udp, proto=17))
+
+    packets = [
+        # Received encapsulated before the plain copy, the plain copy is kept
+        (1.0, _vxlan(_flow_frame(1, sent=False))),
+        (2.0, _flow_frame(1, sent=False)),
+        (3.0, _vxlan(_flow_frame(2, sent=False))),
+        (4.0, _vxlan(_flow_frame(2, sent=False))),
+    ]
+    _write_pcap(tmp_path / "capture.pcap", packets)
+
+    flows, _ = _read(pcap_flow, tmp_path / "capture.pcap", unique_received=True, vxlan_sport=1234)
+    assert list(flows[None].sorted()) == [(1, 2.0, pcap_flow.RECEIVED), (2, 3.0, pcap_flow.RECEIVED)]
+
+    flows, _ = _read(pcap_flow, tmp_path / "capture.pcap")
+    assert list(flows[None].sorted()) == [(1, 2.0, pcap_flow.RECEIVED)]
+
+
+def test_group_by_and_filtered_pcap(pcap_flow, tmp_path):
+    packets = [(1.0 + index, _flow_frame(index, sent=bool(index % 2), dst="192.168.0.{}".format(index % 3)))
+               for index in range(9)]
+    packets.append((20.0, _ether(HOST_MAC, HOST_MAC, _ipv4(_tcp(b"1")))))
+    _write_pcap(tmp_path / "capture.pcap", packets)
+    filtered = str(tmp_path / "filtered_{}.pcap")
+
+    flows, count = _read(pcap_flow, tmp_path / "capture.pcap", group_by="ip_dst", filtered_pcap=filtered)
+
+    assert count == 10
+    assert sorted(flows) == ["192.168.0.0", "192.168.0.1", "192.168.0.2"]
+    assert [record[0] for record in flows["192.168.0.1"].sorted()] == [1, 4, 7]
+    for server_ip, records in flows.items():
+        dumped, dumped_count = _read(pcap_flow, filtered.format(server_ip))
+        assert dumped_count == 3
+        assert list(dumped[None]) == list(records)
+
+
+def test_truncated_and_empty_files(pcap_flow, tmp_path):
+    _write_pcap(tmp_path / "capture.pcap", _capture()[:4])
+    data = (tmp_path / "capture.pcap").read_bytes()
+    (tmp_path / "truncated.pcap").write_bytes(data[:-10])
+    (tmp_path / "empty.pcap").write_bytes(b"")
+    (tmp_path / "text.pcap").write_bytes(b"not a capture")
+
+    flows, count = _read(pcap_flow, tmp_path / "truncated.pcap")
+    assert count == 3
+    assert _read(pcap_flow, tmp_path / "empty.pcap") == ({}, 0)
+    with pytest.raises(ValueError):
+        _read(pcap_flow, tmp_path / "text.pcap")
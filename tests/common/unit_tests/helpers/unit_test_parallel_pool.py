@@ -0,0 +1,209 @@
+"""Unit tests for the WorkerPool executor of ``tests/common/helpers/parallel.py``.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/helpers/unit_test_parallel_pool.py -v
+"""
+
+import gc
+import importlib.util
+import os
+import sys
+import threading
+import time
+import types
+import weakref
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "helpers" / "parallel.py")
+
+
+def _stub_modules():
+    """Stubs of the modules imported by parallel.py which are not needed by WorkerPool."""
+    stubs = {}
+    try:
+        import ansible.utils.display  # noqa F401
+        import ansible.executor.process.worker  # noqa F401
+    except ImportError:
+        display = types.ModuleType("ansible.utils.display")
+
+        class Display(object):
+            def __init__(self):
+                self._lock = threading.Lock()
+
+        display.Display = Display
+        worker = types.ModuleType("ansible.executor.process.worker")
+        worker.WorkerProcess = type("WorkerProcess", (object,), {})
+        ansible = types.ModuleType("ansible")
+        ansible.utils = types.ModuleType("ansible.utils")
+        ansible.utils.display = display
+        stubs.update({
+            "ansible": ansible,
+            "ansible.utils": ansible.utils,
+            "ansible.utils.display": display,
+            "ansible.executor": types.ModuleType("ansible.executor"),
+            "ansible.executor.process": types.ModuleType("ansible.executor.process"),
+            "ansible.executor.process.worker": worker,
+        })
+    try:
+        import psutil  # noqa F401
+    except ImportError:
+        psutil = types.ModuleType("psutil")
+        psutil.wait_procs = None
+        stubs["psutil"] = psutil
+
+    assertions = types.ModuleType("tests.common.helpers.assertions")
+    assertions.pytest_assert = lambda condition, message=None: condition or pytest.fail(message)
+    for name in ("tests", "tests.common", "tests.common.helpers"):
+        stubs[name] = types.ModuleType(name)
+    stubs["tests.common.helpers.assertions"] = assertions
+    return stubs
+
+
+def _load_target_module():
+    with patch.dict(sys.modules, _stub_modules()):
+        spec = importlib.util.spec_from_file_location("unit_target_parallel", MODULE_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def parallel():
+    return _load_target_module()
+
+
+@pytest.fixture
+def pool(parallel):
+    return parallel.WorkerPool(size=2)
+
+
+class Node(object):
+    def __init__(self, hostname):
+        self.hostname = hostname
+
+    def __str__(self):
+        return self.hostname
+
+
+def record_pid(*args, **kwargs):
+    node = kwargs['node']
+    kwargs['results'][node.hostname] = {'pid': os.getpid(), 'args': list(args), 'prefix': kwargs.get('prefix'),
+                                        'state': getattr(node, 'state', None)}
+
+
+def test_results_and_worker_reuse(pool):
+    nodes = [Node("dut{}".format(i)) for i in range(6)]
+
+    results, failed = pool.run(record_pid, ("a",), {'prefix': 'p'}, nodes)
+
+    assert failed == {}
+    assert sorted(results) == [node.hostname for node in nodes]
+    assert results["dut0"]["args"] == ["a"]
+    assert results["dut0"]["prefix"] == "p"
+    pids = {res['pid'] for res in results.values()}
+    assert len(pids) <= 2
+    assert os.getpid() not in pids
+
+    assert all(not _is_alive(pid) for pid in pids)
+
+
+def test_next_call_sees_changed_nodes(pool):
+    nodes = [Node("dut{}".format(i)) for i in range(4)]
+
+    results, _ = pool.run(record_pid, ("a",), {}, nodes)
+    assert {res['state'] for res in results.values()} == {None}
+
+    # The workers of a call are not reused by the next one, their copies of the nodes would be stale
+    for node in nodes:
+        node.state = "reloaded"
+    new_results, _ = pool.run(record_pid, ("b",), {}, nodes)
+    assert {res['state'] for res in new_results.values()} == {"reloaded"}
+    assert {res['args'][0] for res in new_results.values()} == {"b"}
+    assert not {res['pid'] for res in new_results.values()} & {res['pid'] for res in results.values()}
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def test_closure_target(pool):
+    nodes = [Node("dut0"), Node("dut1")]
+    marker = object()
+
+    def _closure(*args, **kwargs):
+        # Closures can't be pickled, the workers running it inherit it by fork
+        kwargs['results'][kwargs['node'].hostname] = marker is not None
+
+    results, failed = pool.run(_closure, (), {}, nodes)
+
+    assert failed == {}
+    assert results == {"dut0": True, "dut1": True}
+
+
+def test_exception_propagation(pool):
+    nodes = [Node("dut0"), Node("dut1")]
+
+    def _fail_on_dut1(*args, **kwargs):
+        if kwargs['node'].hostname == "dut1":
+            raise ValueError("broken dut")
+        kwargs['results'][kwargs['node'].hostname] = "ok"
+
+    results, failed = pool.run(_fail_on_dut1, (), {}, nodes)
+
+    assert results == {"dut0": "ok"}
+    assert list(failed) == ["_fail_on_dut1--dut1"]
+    exception, tb = failed["_fail_on_dut1--dut1"]['exception']
+    assert isinstance(exception, ValueError)
+    assert "broken dut" in tb
+
+
+def test_per_task_timeout(pool):
+    nodes = [Node("dut0"), Node("dut1")]
+    init_result = {"failed": False, "check_item": "slow"}
+
+    def _slow_on_dut0(*args, **kwargs):
+        node = kwargs['node']
+        if node.hostname == "dut0":
+            time.sleep(30)
+        kwargs['results'][node.hostname] = {"failed": False, "host": node.hostname, "done": True}
+
+    start = time.time()
+    results, failed = pool.run(_slow_on_dut0, (), {}, nodes, timeout=2, init_result=init_result)
+
+    assert time.time() - start < 10
+    assert failed == {}
+    assert results["dut0"] == {"failed": True, "check_item": "slow", "host": "dut0"}
+    assert results["dut1"]["done"] is True
+
+
+def test_worker_replaced_after_max_tasks(parallel):
+    pool = parallel.WorkerPool(size=1, max_tasks_per_worker=2)
+    nodes = [Node("dut{}".format(i)) for i in range(4)]
+    results, _ = pool.run(record_pid, (), {}, nodes)
+    pids = [results[node.hostname]['pid'] for node in nodes]
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3]
+    assert pids[0] != pids[2]
+
+
+def test_nodes_released_after_run(parallel):
+    pool = parallel.WorkerPool(size=1)
+    nodes = [Node("dut0"), Node("dut1")]
+    refs = [weakref.ref(node) for node in nodes]
+
+    results, _ = pool.run(record_pid, (), {}, nodes)
+    assert sorted(results) == ["dut0", "dut1"]
+
+    del nodes
+    gc.collect()
+    assert [ref() for ref in refs] == [None, None]
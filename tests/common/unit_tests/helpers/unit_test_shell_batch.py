@@ -0,0 +1,112 @@
+"""Unit tests for ``tests/common/helpers/shell_batch.py``.
+
+The batch scripts are run by the local /bin/sh.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/helpers/unit_test_shell_batch.py -v
+"""
+
+import importlib.util
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "helpers" / "shell_batch.py")
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_shell_batch", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def shell_batch():
+    return _load_target_module()
+
+
+def _run_batch(shell_batch, cmds, timeout=0, continue_on_fail=True):
+    timeouts = shell_batch.normalize_timeouts(cmds, timeout)
+    delimiter = shell_batch.new_delimiter()
+    script = shell_batch.build_batch_script(cmds, timeouts, delimiter, continue_on_fail)
+    proc = subprocess.run(["/bin/sh", "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    return shell_batch.parse_batch_output(cmds, timeouts, delimiter, proc.stdout, proc.stderr)
+
+
+def test_per_command_output_and_rc(shell_batch):
+    results = _run_batch(shell_batch, [
+        "echo hello; echo world",
+        "echo oops >&2; exit 3",
+        "printf 'no newline'",
+        "true",
+    ])
+
+    assert [res["rc"] for res in results] == [0, 3, 0, 0]
+    assert results[0]["stdout_lines"] == ["hello", "world"]
+    assert results[0]["stderr"] == ""
+    assert results[1]["stdout"] == ""
+    assert results[1]["stderr"] == "oops"
+    assert results[1]["failed"] is True
+    assert results[2]["stdout"] == "no newline"
+    assert results[3]["stdout"] == ""
+    assert results[3]["stdout_lines"] == []
+
+
+def test_quoting_and_exit_isolation(shell_batch):
+    results = _run_batch(shell_batch, [
+        "echo \"it's\" '$HOME' | tr a-z A-Z",
+        "exit 1",
+        "echo still running",
+    ])
+
+    assert results[0]["stdout"] == "IT'S $HOME"
+    assert results[1]["rc"] == 1
+    assert results[2]["stdout"] == "still running"
+
+
+def test_stop_on_failure(shell_batch):
+    results = _run_batch(shell_batch, ["echo a", "false", "echo c"], continue_on_fail=False)
+
+    assert [res["cmd"] for res in results] == ["echo a", "false"]
+    assert results[-1]["failed"] is True
+
+
+def test_per_command_timeout(shell_batch):
+    results = _run_batch(shell_batch, ["sleep 5", "echo fast"], timeout=[1, 0])
+
+    assert results[0]["rc"] == shell_batch.TIMEOUT_RC
+    assert results[0]["timed_out"] is True
+    assert results[1]["stdout"] == "fast"
+    assert results[1]["timed_out"] is False
+
+
+def test_stdin_is_not_consumed(shell_batch):
+    results = _run_batch(shell_batch, ["cat", "echo after"])
+
+    assert results[0]["stdout"] == ""
+    assert results[1]["stdout"] == "after"
+
+
+def test_truncated_output(shell_batch):
+    delimiter = shell_batch.new_delimiter()
+    stdout = "{0} 0 BEGIN\nfirst\n\n{0} 0 END 0\n{0} 1 BEGIN\npartial".format(delimiter)
+
+    results = shell_batch.parse_batch_output(["a", "b", "c"], [0, 0, 0], delimiter, stdout, "")
+
+    assert [res["rc"] for res in results] == [0, -1]
+    assert results[0]["stdout"] == "first"
+    assert results[1]["stdout"] == "partial"
+    assert results[1]["failed"] is True
+
+
+def test_normalize_timeouts(shell_batch):
+    assert shell_batch.normalize_timeouts(["a", "b"], 10) == [10, 10]
+    assert shell_batch.normalize_timeouts(["a", "b"], [1, None]) == [1, 0]
+    with pytest.raises(ValueError):
+        shell_batch.normalize_timeouts(["a", "b"], [1])
@@ -0,0 +1,211 @@
+"""Unit tests and micro-benchmarks for ``tests/common/helpers/show_parser.py``.
+
+The benchmarks parse large outputs in the format of 'show interfaces counters' on a 512-port system and 'show mac'
+with 100k FDB entries, and compare the parser with the previous per-row implementation of SonicHost._parse_show.
+Timings are logged, run with ``-s --log-cli-level=INFO`` to see them.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/helpers/unit_test_show_parser.py -v
+"""
+
+import importlib.util
+import logging
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[2]
+               / "helpers" / "show_parser.py")
+
+logger = logging.getLogger(__name__)
+
+INTERFACE_STATUS_OUTPUT = """\
+      Interface            Lanes    Speed    MTU    FEC    Alias             Vlan    Oper    Admin             Type    Asym PFC
+---------------  ---------------  -------  -----  -----  -------  ---------------  ------  -------  ---------------  ----------
+      Ethernet0          0,1,2,3      40G   9100    N/A     etp1  PortChannel0002      up       up   QSFP+ or later         off
+      Ethernet4          4,5,6,7      40G   9100    N/A     etp2           routed    down     down              N/A         off
+
+Some trailing text
+"""  # noqa: E501
+
+TWO_LINE_HEADER_OUTPUT = """\
+Stage    Bind Point    Resource Name       Used    Available
+                                          Count        Count
+-------  ------------  ---------------  -------  -----------
+INGRESS  PORT          ACL_GROUP              2          198
+EGRESS   PORT          ACL_TABLE              0         1024
+"""
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_show_parser", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def show_parser():
+    return _load_target_module()
+
+
+def _legacy_parse_show(output_lines, header_len=1):
+    """The previous implementation of SonicHost._parse_show, used as reference."""
+    def _parse_column_positions(sep_line, sep_char='-'):
+        prev = ' ',
+        positions = []
+        for pos, char in enumerate(sep_line + ' '):
+            if char == sep_char:
+                if char != prev:
+                    left = pos
+            else:
+                if char != prev:
+                    right = pos
+                    positions.append((left, right))
+            prev = char
+        return positions
+
+    result = []
+    sep_line_pattern = re.compile(r"^( *-+ *)+$")
+    for idx, line in enumerate(output_lines):
+        if sep_line_pattern.match(line):
+            header_lines = output_lines[idx - header_len:idx]
+            sep_line = output_lines[idx]
+            content_lines = output_lines[idx + 1:]
+            break
+    else:
+        return result
+
+    positions = _parse_column_positions(sep_line)
+    headers = []
+    for (left, right) in positions:
+        headers.append(" ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip())
+    for content_line in content_lines:
+        if len(content_line) == 0:
+            break
+        item = {}
+        for idx, (left, right) in enumerate(positions):
+            item[headers[idx]] = content_line[left:right].strip()
+        result.append(item)
+    return result
+
+
+def _interface_counters_output(num_ports):
+    lines = [
+        "      IFACE    STATE            RX_OK        RX_BPS    RX_UTIL    RX_ERR    RX_DRP    RX_OVR"
+        "            TX_OK        TX_BPS    TX_UTIL    TX_ERR    TX_DRP    TX_OVR",
+        "-----------  -------  ---------------  ------------  ---------  --------  --------  --------"
+        "  ---------------  ------------  ---------  --------  --------  --------",
+    ]
+    for port in range(num_ports):
+        lines.append(
+            "{:>11}  {:>7}  {:>15,}  {:>12}  {:>9}  {:>8}  {:>8}  {:>8}  {:>15,}  {:>12}  {:>9}  {:>8}  {:>8}  {:>8}"
+            .format("Ethernet{}".format(port * 8), "U", port * 1234567, "1.23 MB/s", "0.01%", 0, port % 7, 0,
+                    port * 7654321, "3.21 MB/s", "0.03%", 0, port % 5, 0))
+    return "\n".join(lines)
+
+
+def _show_mac_output(num_entries):
+    lines = [
+        "  No.    Vlan  MacAddress         Port         Type",
+        "-----  ------  -----------------  -----------  -------",
+    ]
+    for entry in range(num_entries):
+        mac = ":".join("{:02X}".format((entry >> shift) & 0xff) for shift in (40, 32, 24, 16, 8, 0))
+        lines.append("{:>5}  {:>6}  {}  {:<11}  {}".format(
+            entry + 1, 1000 + entry % 4, mac, "Ethernet{}".format(entry % 64 * 4), "Dynamic"))
+    lines.append("Total number of entries {}".format(num_entries))
+    return "\n".join(lines)
+
+
+def test_parse_show_matches_legacy(show_parser):
+    for output, header_len in ((INTERFACE_STATUS_OUTPUT, 1), (TWO_LINE_HEADER_OUTPUT, 2)):
+        lines = output.splitlines()
+        assert show_parser.parse_show(lines, header_len) == _legacy_parse_show(lines, header_len)
+
+
+def test_parse_show_result(show_parser):
+    result = show_parser.parse_show(INTERFACE_STATUS_OUTPUT.splitlines())
+
+    assert len(result) == 2
+    assert result[0]["interface"] == "Ethernet0"
+    assert result[0]["asym pfc"] == "off"
+    assert result[1]["vlan"] == "routed"
+
+    result = show_parser.parse_show(TWO_LINE_HEADER_OUTPUT.splitlines(), header_len=2)
+    assert result[0]["used count"] == "2"
+    assert result[1]["available count"] == "1024"
+
+
+def test_parse_show_without_separation_line(show_parser):
+    assert show_parser.parse_show(["no table here", "at all"]) == []
+    assert len(show_parser.parse_show(["no table here"], columnar=True)) == 0
+    assert list(show_parser.iter_parse_show("no table here\n")) == []
+
+
+def test_layout_is_cached(show_parser):
+    show_parser.get_layout.cache_clear()
+    lines = INTERFACE_STATUS_OUTPUT.splitlines()
+
+    show_parser.parse_show(lines)
+    show_parser.parse_show(lines)
+    show_parser.parse_show(TWO_LINE_HEADER_OUTPUT.splitlines(), header_len=2)
+
+    info = show_parser.get_layout.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_columnar_result(show_parser):
+    lines = INTERFACE_STATUS_OUTPUT.splitlines()
+
+    table = show_parser.parse_show(lines, columnar=True)
+
+    assert len(table) == 2
+    assert table.column("interface") == ["Ethernet0", "Ethernet4"]
+    assert table.to_dict()["oper"] == ["up", "down"]
+    assert table[1] == show_parser.parse_show(lines)[1]
+    assert table[-1]["interface"] == "Ethernet4"
+    assert table[0:1] == show_parser.parse_show(lines)[0:1]
+    assert table == show_parser.parse_show(lines)
+
+
+def test_streaming_result(show_parser):
+    rows = show_parser.iter_parse_show(INTERFACE_STATUS_OUTPUT)
+
+    assert next(rows)["interface"] == "Ethernet0"
+    assert [row["interface"] for row in rows] == ["Ethernet4"]
+    assert list(show_parser.iter_parse_show(INTERFACE_STATUS_OUTPUT, start_line_index=0, end_line_index=3)) == \
+        show_parser.parse_show(INTERFACE_STATUS_OUTPUT.splitlines()[:3])
+
+
+def _best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+@pytest.mark.parametrize("name, output", [
+    ("show interfaces counters, 512 ports", _interface_counters_output(512)),
+    ("show mac, 100k entries", _show_mac_output(100000)),
+])
+def test_benchmark_parse_show(show_parser, name, output):
+    lines = output.splitlines()
+
+    legacy_time, expected = _best_of(lambda: _legacy_parse_show(lines))
+    list_time, result = _best_of(lambda: show_parser.parse_show(lines))
+    columnar_time, table = _best_of(lambda: show_parser.parse_show(lines, columnar=True))
+    stream_time, streamed = _best_of(lambda: list(show_parser.iter_parse_show(output)))
+
+    assert result == expected
+    assert table == expected
+    assert streamed == expected
+    logger.info("%s: legacy %.4fs, list %.4fs, columnar %.4fs, stream %.4fs",
+                name, legacy_time, list_time, columnar_time, stream_time)
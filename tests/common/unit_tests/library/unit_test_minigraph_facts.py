@@ -0,0 +1,119 @@
+"""Unit tests for ``ansible/library/minigraph_facts.py``, gathering the facts of SonicHost.get_extended_minigraph_facts.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/library/unit_test_minigraph_facts.py -v
+"""
+
+import copy
+import importlib.util
+import os
+import sys
+import types
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("natsort")
+pytest.importorskip("ipaddr")
+
+from lxml import etree  # noqa: E402
+
+
+REPO_ROOT = Path(__file__).resolve().parents[4]
+MODULE_PATH = REPO_ROOT / "ansible" / "library" / "minigraph_facts.py"
+PORT_UTILS_PATH = REPO_ROOT / "ansible" / "module_utils" / "port_utils.py"
+MINIGRAPH_PATH = REPO_ROOT / "ansible" / "minigraph" / "SONIC01DPU.xml"
+HOSTNAME = "SONIC01DPU"
+NAMESPACES = [None, "asic0", "asic1"]
+
+
+def _load_target_module():
+    """Load minigraph_facts with a stub of AnsibleModule, and port_utils from the repository."""
+    stubs = {}
+    for name in ("ansible", "ansible.module_utils", "ansible.module_utils.basic"):
+        stubs[name] = types.ModuleType(name)
+    stubs["ansible.module_utils.basic"].AnsibleModule = object
+    with patch.dict(sys.modules, stubs):
+        for name, path in (("ansible.module_utils.port_utils", PORT_UTILS_PATH),
+                           ("unit_target_minigraph_facts", MODULE_PATH)):
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            # The source of the modules is part of the cache key of the facts
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def minigraph_facts(tmp_path):
+    module = _load_target_module()
+    cache_path = tmp_path / "cache"
+    cache_path.mkdir()
+    module.ANSIBLE_USER_MINIGRAPH_PATH = str(cache_path)
+    return module
+
+
+@pytest.fixture
+def multi_asic_minigraph(tmp_path):
+    """The minigraph of SONIC01DPU with a DPG of the host for each ASIC namespace."""
+    tree = etree.parse(str(MINIGRAPH_PATH))
+    ns = "{Microsoft.Search.Autopilot.Evolution}"
+    dpg = tree.getroot().find(ns + "DpgDec")
+    host_dpg = dpg.find(ns + "DeviceDataPlaneInfo")
+    for asic_name in NAMESPACES[1:]:
+        asic_dpg = copy.deepcopy(host_dpg)
+        asic_dpg.find(ns + "Hostname").text = asic_name
+        dpg.append(asic_dpg)
+    path = str(tmp_path / "minigraph.xml")
+    tree.write(path)
+    return path
+
+
+def test_namespaces_facts_match_parse_xml(minigraph_facts, multi_asic_minigraph):
+    expected = {asic_name: minigraph_facts.clean_facts(
+                minigraph_facts.parse_xml(multi_asic_minigraph, HOSTNAME, asic_name))
+                for asic_name in NAMESPACES}
+
+    facts = minigraph_facts.get_minigraph_facts(multi_asic_minigraph, HOSTNAME, NAMESPACES, use_cache=False)
+
+    assert facts == expected
+    assert facts["asic0"]["minigraph_hostname"] == HOSTNAME
+    assert facts["asic1"]["minigraph_ports"] == expected["asic1"]["minigraph_ports"]
+
+
+def test_cached_facts_invalidation(minigraph_facts, multi_asic_minigraph):
+    parsed = []
+    parse_xml_namespaces = minigraph_facts.parse_xml_namespaces
+
+    def _parse_xml_namespaces(filename, hostname, asic_names):
+        parsed.append(list(asic_names))
+        return parse_xml_namespaces(filename, hostname, asic_names)
+
+    def _get_facts(asic_names):
+        with patch.object(minigraph_facts, "parse_xml_namespaces", _parse_xml_namespaces):
+            return minigraph_facts.get_minigraph_facts(multi_asic_minigraph, HOSTNAME, asic_names)
+
+    facts = _get_facts([None, "asic0"])
+    assert parsed == [[None, "asic0"]]
+
+    # Cache hit, only the namespaces not cached yet are parsed
+    assert _get_facts(["asic0"]) == {"asic0": facts["asic0"]}
+    facts.update(_get_facts(["asic0", "asic1"]))
+    assert parsed == [[None, "asic0"], ["asic1"]]
+    assert facts == minigraph_facts.get_minigraph_facts(multi_asic_minigraph, HOSTNAME, NAMESPACES, use_cache=False)
+
+    # The cached facts are invalidated by a change of the size of the minigraph
+    with open(multi_asic_minigraph, "a") as f:
+        f.write("\n")
+    assert _get_facts(["asic0"]) == {"asic0": facts["asic0"]}
+    assert parsed[-1] == ["asic0"]
+
+    # Or of its modification time
+    stat = os.stat(multi_asic_minigraph)
+    os.utime(multi_asic_minigraph, (stat.st_atime, stat.st_mtime - 60))
+    assert _get_facts(["asic0"]) == {"asic0": facts["asic0"]}
+    assert parsed[-1] == ["asic0"]
+    assert len(parsed) == 4
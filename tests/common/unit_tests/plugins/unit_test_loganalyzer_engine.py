@@ -0,0 +1,189 @@
+"""Unit tests for the streaming analysis engine of the DUT side log analyzer
+``ansible/roles/test/files/tools/loganalyzer/loganalyzer.py``.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/plugins/unit_test_loganalyzer_engine.py -v
+"""
+
+import importlib.util
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[4]
+               / "ansible" / "roles" / "test" / "files" / "tools" / "loganalyzer" / "loganalyzer.py")
+
+MATCH = [r".*ERR.*", r"kernel:.*error \d+", "segfault"]
+IGNORE = [r".*ERR swss.*ignored"]
+EXPECT = [r".*expected thing \d+", "other expected"]
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_loganalyzer", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def la():
+    module = _load_target_module()
+    # Small blocks make the backward marker scan cross block boundaries
+    module.MARKER_SCAN_BLOCK_SIZE = 16
+    return module
+
+
+def _write_log(tmp_path, lines, name="syslog"):
+    path = tmp_path / name
+    path.write_text("".join("Jan  1 00:00:00 host {}\n".format(line) for line in lines))
+    return str(path)
+
+
+def test_multi_pattern_matcher_reports_pattern_index(la):
+    matcher = la.MultiPatternMatcher(MATCH)
+
+    assert matcher.search("kernel: some error 5") == 1
+    assert matcher.search("app segfault") == 2
+    assert matcher.search("all good") is None
+    assert matcher.pattern == "|".join(MATCH)
+
+
+def test_required_literal(la):
+    assert la.required_literal(r"kernel:.*error \d+") == "kernel:"
+    assert la.required_literal(r"(?i)kernel") is None
+    assert la.required_literal(r"foo|bar") is None
+
+
+def test_analyze_range_between_markers(la, tmp_path):
+    path = _write_log(tmp_path, [
+        "ERR before start",
+        "start-LogAnalyzer-run1",
+        "INFO ok",
+        "ERR bad",
+        "ERR swss is ignored",
+        "start-ignore-LogAnalyzer-ig1",
+        "ERR inside ignore range",
+        "end-ignore-LogAnalyzer-ig1",
+        "expected thing 7",
+        "kernel: error 5",
+        "end-LogAnalyzer-run1",
+        "ERR after end",
+    ])
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+    matched_expect_indexes = set()
+
+    result = analyzer.analyze_file_list([path], la.MultiPatternMatcher(MATCH), la.MultiPatternMatcher(IGNORE),
+                                        la.MultiPatternMatcher(EXPECT), matched_expect_indexes=matched_expect_indexes)
+
+    matching_lines, expected_lines = result[path]
+    assert [line.split("host ")[1] for line in matching_lines] == ["ERR bad\n", "kernel: error 5\n"]
+    assert [line.split("host ")[1] for line in expected_lines] == ["expected thing 7\n"]
+    assert matched_expect_indexes == {0}
+
+
+def test_analyze_accepts_compiled_regex(la, tmp_path):
+    path = _write_log(tmp_path, ["start-LogAnalyzer-run1", "ERR bad", "end-LogAnalyzer-run1"])
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    matching_lines, expected_lines = analyzer.analyze_file(path, re.compile("|".join(MATCH)), None, None)
+
+    assert len(matching_lines) == 1
+    assert expected_lines == []
+
+
+def test_start_marker_of_extract_log_is_skipped(la, tmp_path):
+    path = _write_log(tmp_path, [
+        "start-LogAnalyzer-run1",
+        "ERR bad",
+        "extract_log start-LogAnalyzer-run1",
+        "end-LogAnalyzer-run1",
+    ])
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    matching_lines, _ = analyzer.analyze_file(path, la.MultiPatternMatcher(MATCH), None, None)
+
+    assert len(matching_lines) == 1
+
+
+@pytest.mark.parametrize("lines, error", [
+    (["INFO ok", "end-LogAnalyzer-run1"], "err_no_start_marker"),
+    (["start-LogAnalyzer-run1", "INFO ok"], "err_no_end_marker"),
+    (["start-LogAnalyzer-run1", "end-LogAnalyzer-run1", "end-LogAnalyzer-run1"], "err_duplicate_end_marker"),
+    (["start-LogAnalyzer-run1", "end-ignore-LogAnalyzer-ig1", "end-LogAnalyzer-run1"], "err_end_ignore_marker"),
+    (["start-LogAnalyzer-run1", "start-ignore-LogAnalyzer-ig1", "end-LogAnalyzer-run1"],
+     "err_start_ignore_marker"),
+])
+def test_marker_errors(la, tmp_path, lines, error):
+    path = _write_log(tmp_path, lines)
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    with pytest.raises(SystemExit) as exc_info:
+        analyzer.analyze_file(path, la.MultiPatternMatcher(MATCH), None, None)
+
+    assert exc_info.value.code == getattr(la, error)
+
+
+def test_file_without_default_markers_is_analyzed_entirely(la, tmp_path):
+    path = _write_log(tmp_path, ["ERR one", "INFO ok", "ERR two"], name="sairedis.rec")
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    matching_lines, _ = analyzer.analyze_file(path, la.MultiPatternMatcher(MATCH), None, None)
+
+    assert len(matching_lines) == 2
+
+
+def test_extract_logs_follows_rotation(la, tmp_path):
+    syslog = tmp_path / "syslog"
+    syslog.write_text("old line\n")
+    offsets_file = str(tmp_path / "offsets.json")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    analyzer.record_log_offsets([str(syslog)], offsets_file)
+    with syslog.open("a") as log_file:
+        log_file.write("start-LogAnalyzer-run1\n")
+    # Rotate the log file the way logrotate does
+    syslog.rename(tmp_path / "syslog.1")
+    syslog.write_text("new line\n")
+
+    assert analyzer.extract_logs([str(syslog)], offsets_file, str(out_dir))
+    assert (out_dir / "syslog").read_text() == "start-LogAnalyzer-run1\nnew line\n"
+    # The offsets are consumed by the extraction
+    assert la.load_log_offsets(offsets_file) == {}
+
+
+def test_extract_logs_truncated_file(la, tmp_path):
+    syslog = tmp_path / "syslog"
+    syslog.write_text("old line\n")
+    offsets_file = str(tmp_path / "offsets.json")
+    analyzer = la.AnsibleLogAnalyzer("run1", False)
+
+    analyzer.record_log_offsets([str(syslog)], offsets_file)
+    syslog.write_text("")
+
+    assert not analyzer.extract_logs([str(syslog)], offsets_file, str(tmp_path))
+    assert not analyzer.extract_logs([str(syslog)], offsets_file, str(tmp_path))
+
+
+def test_log_offsets_kept_per_run_and_pruned_by_age(la, tmp_path):
+    syslog = tmp_path / "syslog"
+    syslog.write_text("old line\n")
+    offsets_file = str(tmp_path / "offsets.json")
+    # Offsets of an aborted run which never reached the extraction
+    with open(offsets_file, "w") as f:
+        json.dump({"aborted": {"time": time.time() - la.MAX_LOG_OFFSETS_AGE - 1, "files": {}}}, f)
+
+    la.AnsibleLogAnalyzer("run1", False).record_log_offsets([str(syslog)], offsets_file)
+    la.AnsibleLogAnalyzer("run2", False).record_log_offsets([str(syslog)], offsets_file)
+
+    assert sorted(la.load_log_offsets(offsets_file)) == ["run1", "run2"]
+    assert la.AnsibleLogAnalyzer("run1", False).extract_logs([str(syslog)], offsets_file, str(tmp_path))
+    assert list(la.load_log_offsets(offsets_file)) == ["run2"]
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
@@ -0,0 +1,180 @@
+"""Unit tests for ``LpmTable`` of ``ansible/roles/test/files/ptftests/lpm.py``.
+
+The lookups and the ranges of the table are compared with a brute force longest prefix match.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/ptftests/unit_test_lpm.py -v
+"""
+
+import importlib.util
+import ipaddress
+import random
+import sys
+import types
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[4]
+               / "ansible" / "roles" / "test" / "files" / "ptftests" / "lpm.py")
+
+
+def _load_target_module():
+    # SubnetTree is only used by LpmDict
+    subnet_tree = types.ModuleType("SubnetTree")
+    subnet_tree.SubnetTree = dict
+    with patch.dict(sys.modules, {"SubnetTree": subnet_tree}):
+        spec = importlib.util.spec_from_file_location("unit_target_lpm", MODULE_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def lpm():
+    return _load_target_module()
+
+
+@pytest.fixture(params=["numpy", "bisect"])
+def lpm_module(request, lpm):
+    """The lpm module, with and without numpy for lookup_many."""
+    if request.param == "numpy":
+        if lpm.numpy is None:
+            pytest.skip("numpy is not installed")
+        yield lpm
+    else:
+        with patch.object(lpm, "numpy", None):
+            yield lpm
+
+
+def _brute_force_lookup(prefixes, ip):
+    """Value of the longest prefix containing the IP, None if there is none."""
+    best = None
+    for prefix, value in prefixes.items():
+        if ip in prefix and (best is None or prefix.prefixlen > best[0].prefixlen):
+            best = (prefix, value)
+    return best[1] if best else None
+
+
+def _probe_ips(prefixes, max_ip, count, rnd):
+    """The IPs around the first and the last IP of every prefix, plus random IPs."""
+    ips = {0, max_ip}
+    for prefix in prefixes:
+        first, last = int(prefix.network_address), int(prefix.broadcast_address)
+        ips.update(ip for ip in (first - 1, first, first + 1, last - 1, last, last + 1) if 0 <= ip <= max_ip)
+        ips.update(rnd.randint(first, last) for _ in range(2))
+    ips.update(rnd.randint(0, max_ip) for _ in range(count))
+    return sorted(ips)
+
+
+def _random_prefixes(version, rnd, count):
+    """Overlapping prefixes in a small part of the IP space, with host routes."""
+    if version == 4:
+        base, bits, shortest = int(ipaddress.ip_address(u"10.0.0.0")), 32, 8
+    else:
+        base, bits, shortest = int(ipaddress.ip_address(u"fc00::")), 128, 16
+    prefixes = set()
+    while len(prefixes) < count:
+        # Half of the prefixes are in the same /24 or /120, to nest them deeply
+        prefixlen = rnd.choice([rnd.randint(shortest, bits), rnd.randint(bits - 8, bits)])
+        offset = rnd.getrandbits(bits - shortest - 8 if rnd.random() < 0.5 else 8)
+        prefixes.add(ipaddress.ip_network((base + offset, prefixlen), strict=False))
+    return sorted(prefixes)
+
+
+def _check_table(table, prefixes, version, rnd):
+    max_ip = (1 << (32 if version == 4 else 128)) - 1
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    ips = _probe_ips(prefixes, max_ip, 200, rnd)
+
+    expected = [_brute_force_lookup(prefixes, address(ip)) for ip in ips]
+    for ip, value in zip(ips, expected):
+        if value is None:
+            assert not table.contains(str(address(ip)))
+            with pytest.raises(KeyError):
+                table[str(address(ip))]
+        else:
+            assert table.contains(str(address(ip)))
+            assert table[str(address(ip))] == value
+    assert table.lookup_many([str(address(ip)) for ip in ips]) == expected
+
+    # The ranges are split at the first IP and after the last IP of every prefix, except the default route,
+    # and the longest matching prefix is the same for all the IPs of a range.
+    boundaries = {0}
+    for prefix in prefixes:
+        if prefix.prefixlen:
+            boundaries.add(int(prefix.network_address))
+            if int(prefix.broadcast_address) != max_ip:
+                boundaries.add(int(prefix.broadcast_address) + 1)
+    ranges = table.ranges()
+    assert [int(ipaddress.ip_address(ip_range.get_first_ip())) for ip_range in ranges] == sorted(boundaries)
+    assert ranges[-1].get_last_ip() == str(address(max_ip))
+    for ip_range in ranges:
+        first, last = ipaddress.ip_address(ip_range.get_first_ip()), ipaddress.ip_address(ip_range.get_last_ip())
+        assert _brute_force_lookup(prefixes, first) == _brute_force_lookup(prefixes, last)
+        assert _brute_force_lookup(prefixes, first) == table.lookup_many([str(first)])[0]
+
+
+@pytest.mark.parametrize("version", [4, 6])
+def test_lookup_and_ranges_match_brute_force(lpm_module, version):
+    rnd = random.Random(version)
+    table = lpm_module.LpmTable(ipv4=version == 4)
+    prefixes = {}
+    for prefix in _random_prefixes(version, rnd, 300):
+        prefixes[prefix] = "nh-{}".format(prefix)
+        table[str(prefix)] = prefixes[prefix]
+    assert len(table) == len(prefixes)
+    _check_table(table, prefixes, version, rnd)
+
+    # With a default route every IP has a match
+    default_route = ipaddress.ip_network(u"0.0.0.0/0" if version == 4 else u"::/0")
+    prefixes[default_route] = "default"
+    table[str(default_route)] = "default"
+    _check_table(table, prefixes, version, rnd)
+
+    # Removals, the table is compiled again on the next lookup
+    for prefix in rnd.sample(sorted(prefixes), len(prefixes) // 2) + [default_route]:
+        if prefix in prefixes:
+            del prefixes[prefix]
+            del table[str(prefix)]
+    assert len(table) == len(prefixes)
+    _check_table(table, prefixes, version, rnd)
+
+
+@pytest.mark.parametrize("version", [4, 6])
+def test_nested_host_routes(lpm_module, version):
+    if version == 4:
+        routes = ["0.0.0.0/0", "10.0.0.0/8", "10.1.0.0/16", "10.1.1.0/24", "10.1.1.1/32", "10.1.1.255/32",
+                  "255.255.255.255/32", "0.0.0.0/32"]
+    else:
+        routes = ["::/0", "fc00::/7", "fc00::/64", "fc00::1/128", "fc00::ffff:ffff:ffff:ffff/128",
+                  "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff/128", "::/128"]
+    table = lpm_module.LpmTable(ipv4=version == 4)
+    prefixes = {}
+    for route in routes:
+        prefixes[ipaddress.ip_network(route)] = route
+        table[route] = route
+    _check_table(table, prefixes, version, random.Random(0))
+
+    # Overwriting a route changes its value only
+    table[routes[3]] = "new"
+    prefixes[ipaddress.ip_network(routes[3])] = "new"
+    _check_table(table, prefixes, version, random.Random(1))
+
+
+def test_invalid_keys(lpm):
+    table = lpm.LpmTable()
+    table["10.0.0.0/8"] = 1
+    with pytest.raises(ValueError):
+        table["10.0.0.1/8"] = 2
+    with pytest.raises(ValueError):
+        table["fc00::/7"] = 2
+    with pytest.raises(KeyError):
+        table["fc00::1"]
+    assert not table.contains("fc00::1")
+    assert not table.contains("not an ip")
+    with pytest.raises(KeyError):
+        del table["10.1.0.0/16"]
@@ -0,0 +1,158 @@
+"""Unit tests for ``spytest/spytest/batch_history.py``, the module history of the batch LPT scheduling.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/spytest/unit_test_batch_history.py -v
+"""
+
+import csv
+import importlib
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+for _name in ("yaml", "tabulate", "prettytable", "jinja2"):
+    pytest.importorskip(_name)
+
+
+SPYTEST_ROOT = Path(__file__).resolve().parents[4] / "spytest"
+WORKER_COLS = ["#", "Module", "TestFunction", "Result", "TimeTaken", "ExecutedOn", "Syslogs", "FCLI", "TSSH",
+               "DCNT", "Description", "Devices", "KnownIssue", "Doc"]
+
+
+def _load_target_module():
+    with patch.object(sys, "path", [str(SPYTEST_ROOT)] + sys.path):
+        return importlib.import_module("spytest.batch_history")
+
+
+@pytest.fixture(scope="module")
+def batch_history():
+    return _load_target_module()
+
+
+@pytest.fixture
+def history(batch_history):
+    history = batch_history.ModuleHistory(max_runs=5)
+    yield history
+    history.close()
+
+
+def _write_csv(path, header, rows):
+    with open(str(path), "w", newline="") as fd:
+        writer = csv.writer(fd)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def _row(module, function, time_taken, description="", node=None):
+    row = {"Module": module, "TestFunction": function, "Result": "Pass", "TimeTaken": time_taken,
+           "Description": description}
+    cols = WORKER_COLS if node is None else ["#", "Node"] + WORKER_COLS[1:]
+    return [node if col == "Node" else row.get(col, "") for col in cols]
+
+
+@pytest.mark.parametrize("candidates, last_topo, switch_cost, expected", [
+    # longest first, the first one among equals
+    ([[10, "a"], [30, "b"], [20, "a"]], None, 0, 1),
+    ([[30, "a"], [30, "b"], [30, "a"]], None, 0, 0),
+    ([[30, "a"], [30, "b"]], "b", 0, 0),
+    # the modules of another topology are penalized by the switch cost
+    ([[30, "a"], [30, "b"]], "b", 1, 1),
+    ([[100, "a"], [50, "b"]], "b", 40, 0),
+    ([[100, "a"], [50, "b"]], "b", 60, 1),
+    # equal scores after the penalty
+    ([[50, "b"], [110, "a"]], "b", 60, 0),
+    ([[110, "a"], [50, "b"]], "b", 60, 0),
+    # no penalty without a last topology, or on the same one
+    ([[50, "b"], [100, "a"]], None, 60, 1),
+    ([[50, "a"], [100, "a"]], "a", 60, 1),
+    ([[70, "b"]], "a", 60, 0),
+])
+def test_pick(batch_history, candidates, last_topo, switch_cost, expected):
+    assert batch_history.pick(candidates, last_topo, switch_cost) == expected
+
+
+def test_expected_without_history(batch_history, history):
+    assert history.modules() == []
+    assert history.expected("test_a.py", 3) == 3 * batch_history.default_function_time
+    assert history.expected("test_a.py") == batch_history.default_function_time
+    assert history.get_topo("test_a.py", "default") == "default"
+
+
+def test_expected_with_history(history):
+    # median of the last max_runs runs, the older runs are ignored
+    for index, seconds in enumerate([1000, 1000, 100, 400, 200, 300, 500]):
+        history.add("run{}".format(index), "node", "feature/test_a.py", seconds, functions=2, topo="D1", stamp=index)
+    assert history.expected("test_a.py") == 300
+    assert history.expected("other/test_a.py::test_func", 10) == 300
+    assert history.get_topo("test_a.py") == "D1"
+
+    # even number of runs and the last topology of the module
+    history.add("run0", "node", "test_b.py", 100, functions=4, topo="D1", stamp=0)
+    history.add("run1", "node", "test_b.py", 150, functions=4, topo="D2", stamp=1)
+    assert history.expected("test_b.py") == 125
+    assert history.get_topo("test_b.py") == "D2"
+    assert sorted(history.modules()) == ["test_a.py", "test_b.py"]
+
+    # the modules without history are estimated from the median time of a function
+    # of the runs used, 50s to 250s per function for test_a.py and 25s, 37.5s for test_b.py
+    assert history.expected("test_c.py", 4) == 4 * 100
+
+
+def test_expected_function_time_without_functions(batch_history, history):
+    history.add("run0", "node", "test_a.py", 100)
+    assert history.expected("test_a.py") == 100
+    assert history.expected("test_b.py", 2) == 2 * batch_history.default_function_time
+
+
+def test_read_results_csv_of_node(batch_history, tmp_path):
+    filepath = _write_csv(tmp_path / "results_functions.csv", WORKER_COLS, [
+        _row("feature/test_a.py", "", "0:01:00", "Prolog"),
+        _row("feature/test_a.py", "test_a1", "0:10:00"),
+        _row("feature/test_a.py", "test_a2", "0:05:30"),
+        _row("feature/test_a.py", "", "0:00:30", "Epilog"),
+        [],
+        _row("test_b.py", "test_b1", "1:00:00"),
+        _row("", "test_c1", "0:00:10"),
+    ])
+    assert batch_history.read_results_csv(filepath, "node1") == {
+        ("node1", "test_a.py"): [1020, 2],
+        ("node1", "test_b.py"): [3600, 1],
+    }
+
+
+def test_read_results_csv_consolidated(batch_history, tmp_path):
+    filepath = _write_csv(tmp_path / "results_functions_all.csv", ["#", "Node"] + WORKER_COLS[1:], [
+        _row("test_a.py", "test_a1", "0:10:00", node="D1T1"),
+        _row("test_a.py", "test_a1", "0:20:00", node="D2T1"),
+        _row("test_a.py", "", "0:01:00", "Epilog", node="D2T1"),
+        _row("test_b.py", "test_b1", "invalid", node="D1T1"),
+    ])
+    assert batch_history.read_results_csv(filepath, "ignored") == {
+        ("D1T1", "test_a.py"): [600, 1],
+        ("D2T1", "test_a.py"): [1260, 1],
+        ("D1T1", "test_b.py"): [0, 1],
+    }
+
+
+def test_read_results_csv_without_times(batch_history, tmp_path):
+    filepath = _write_csv(tmp_path / "results_modules.csv", ["#", "Module", "Result"], [["1", "test_a.py", "Pass"]])
+    assert batch_history.read_results_csv(filepath) == {}
+
+
+def test_add_results_csv(history, tmp_path):
+    filepath = _write_csv(tmp_path / "results_functions.csv", WORKER_COLS, [
+        _row("test_a.py", "test_a1", "0:10:00"),
+        _row("test_b.py", "test_b1", "0:01:00"),
+    ])
+    assert history.add_results_csv(filepath, "run0", "node1", {"test_a.py": "D1"}) == 2
+    assert history.expected("test_a.py") == 600
+    assert history.get_topo("test_a.py") == "D1"
+    assert history.get_topo("test_b.py") == ""
+
+    # the same run and node is replaced
+    assert history.add_results_csv(filepath, "run0", "node1") == 2
+    assert history.expected("test_a.py") == 600
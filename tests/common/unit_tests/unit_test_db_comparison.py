@@ -0,0 +1,233 @@
+"""Unit tests for the compact snapshots of ``tests/common/db_comparison.py``.
+
+The compact snapshot files are written with the encoder of ``tests/scripts/redis_snapshot.py``, the helper
+run on the DUT, and a fake redis pipeline.
+
+Run with::
+
+    python3 -m pytest --noconftest tests/common/unit_tests/unit_test_db_comparison.py -v
+"""
+
+import copy
+import gzip
+import importlib.util
+import json
+import re
+import sys
+import types
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+MODULE_PATH = Path(__file__).resolve().parents[1] / "db_comparison.py"
+SCRIPT_PATH = Path(__file__).resolve().parents[2] / "scripts" / "redis_snapshot.py"
+
+
+def _load_module(name, path, stubs=None):
+    with patch.dict(sys.modules, stubs or {}):
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def db_comparison():
+    custom_msg_utils = types.ModuleType("tests.common.helpers.custom_msg_utils")
+    custom_msg_utils.add_custom_msg = lambda request, key, val: None
+    stubs = {name: types.ModuleType(name) for name in ("tests", "tests.common", "tests.common.helpers")}
+    stubs["tests.common.helpers.custom_msg_utils"] = custom_msg_utils
+    return _load_module("unit_target_db_comparison", MODULE_PATH, stubs)
+
+
+@pytest.fixture(scope="module")
+def redis_snapshot():
+    return _load_module("unit_target_redis_snapshot", SCRIPT_PATH)
+
+
+def _entry(value, ttl=None):
+    entry = {"type": "hash", "value": value}
+    if ttl is not None:
+        entry["ttl"] = ttl
+        entry["expireat"] = 1700000000.5 + ttl
+    return entry
+
+
+STATE_DB_A = {
+    "PROCESS_STATS|100": _entry({"CMD": "/usr/bin/orchagent", "CPU": "1.0", "PPID": "1"}),
+    "PROCESS_STATS|101": _entry({"CMD": "/usr/bin/syncd", "CPU": "2.0", "PPID": "1"}),
+    "PORT_TABLE|Ethernet0": _entry({"oper_status": "up", "speed": "100000", "timestamp": "1"}),
+    "PORT_TABLE|Ethernet4": _entry({"oper_status": "up", "mtu": "9100"}),
+    "FAN_INFO|fan1": _entry({"presence": "true", "speed": "50"}),
+    "NEIGH_RESTORE_TABLE|Flags": _entry({"restored": "true", "update_time": "10"}),
+    "WARM_RESTART_TABLE|bgp": _entry({"state": "reconciled", "restore_count": "1"}, ttl=60),
+}
+
+STATE_DB_B = {
+    "PROCESS_STATS|200": _entry({"CMD": "/usr/bin/orchagent", "CPU": "3.0", "PPID": "1"}),
+    "PROCESS_STATS|201": _entry({"CMD": "/usr/bin/bgpd", "CPU": "2.0", "PPID": "1"}),
+    "PORT_TABLE|Ethernet0": _entry({"oper_status": "up", "speed": "100000", "timestamp": "2"}),
+    "PORT_TABLE|Ethernet4": _entry({"oper_status": "down", "mtu": "9100"}),
+    "FAN_INFO|fan1": _entry({"presence": "true", "speed": "60"}),
+    "WARM_RESTART_TABLE|bgp": _entry({"state": "disabled", "restore_count": "0"}, ttl=30),
+    "REBOOT_CAUSE|2024": _entry({"cause": "reboot", "time": "now"}),
+}
+
+
+def _write_compact(redis_snapshot, path, db_type, dump, volatile):
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"format": redis_snapshot.SNAPSHOT_FORMAT, "version": 1, "db": db_type.value}) + "\n")
+        for key, entry in dump.items():
+            f.write(redis_snapshot.encode_entry(key, entry, volatile))
+
+
+def _compact(db_comparison, redis_snapshot, tmp_path, name, db_type, dump):
+    path = tmp_path / "{}.snap.gz".format(name)
+    _write_compact(redis_snapshot, path, db_type, dump, db_comparison.VOLATILE_VALUES.get(db_type, set()))
+    return db_comparison.CompactSnapshot.load(str(path))
+
+
+def test_encoder_matches_dut_helper(db_comparison, redis_snapshot):
+    volatile = db_comparison.VOLATILE_VALUES[db_comparison.DBType.STATE]
+    for key, entry in STATE_DB_A.items():
+        data, digest, total_incl, total_excl = db_comparison.encode_compact_entry(entry, volatile)
+        line = "{}\t{}\t{}\t{}\t{}\n".format(json.dumps(key), digest, total_incl, total_excl, data)
+        assert line == redis_snapshot.encode_entry(key, entry, volatile)
+
+
+def test_compact_snapshot_load(db_comparison, redis_snapshot, tmp_path):
+    db_type = db_comparison.DBType.STATE
+    snapshot = _compact(db_comparison, redis_snapshot, tmp_path, "a", db_type, STATE_DB_A)
+
+    assert len(snapshot) == len(STATE_DB_A)
+    assert set(snapshot) == set(STATE_DB_A)
+    assert snapshot["PORT_TABLE|Ethernet4"] == STATE_DB_A["PORT_TABLE|Ethernet4"]
+    assert snapshot.sum_total_values() == db_comparison._sum_total_values(db_type, STATE_DB_A)
+    assert snapshot.content_hash("FAN_INFO|fan1") != snapshot.content_hash("PORT_TABLE|Ethernet4")
+
+
+@pytest.mark.parametrize("db_name", ["STATE", "APPL", "CONFIG"])
+def test_compact_diff_matches_dict_diff(db_comparison, redis_snapshot, tmp_path, db_name):
+    db_type = db_comparison.DBType[db_name]
+    expected = db_comparison.SnapshotDiff(db_type, copy.deepcopy(STATE_DB_A), copy.deepcopy(STATE_DB_B),
+                                          label_a="warm", label_b="cold")
+
+    snapshot_a = _compact(db_comparison, redis_snapshot, tmp_path, "a", db_type, STATE_DB_A)
+    snapshot_b = _compact(db_comparison, redis_snapshot, tmp_path, "b", db_type, STATE_DB_B)
+    compact = db_comparison.SnapshotDiff(db_type, snapshot_a, snapshot_b, label_a="warm", label_b="cold")
+    assert compact.to_dict() == expected.to_dict()
+
+    # redis-dump snapshot compared with a compact one
+    mixed = db_comparison.SnapshotDiff(db_type, copy.deepcopy(STATE_DB_A), snapshot_b, label_a="warm", label_b="cold")
+    assert mixed.to_dict() == expected.to_dict()
+
+
+def test_compact_diff_skips_same_content(db_comparison, redis_snapshot, tmp_path):
+    db_type = db_comparison.DBType.APPL
+    dump = {"ROUTE_TABLE:10.0.{}.0/24".format(i): _entry({"nexthop": "10.1.0.1", "ifname": "Ethernet0"})
+            for i in range(100)}
+    changed = copy.deepcopy(dump)
+    changed["ROUTE_TABLE:10.0.7.0/24"]["value"]["nexthop"] = "10.1.0.3"
+    snapshot_a = _compact(db_comparison, redis_snapshot, tmp_path, "a", db_type, dump)
+    snapshot_b = _compact(db_comparison, redis_snapshot, tmp_path, "b", db_type, changed)
+
+    decompressed = []
+    getitem = db_comparison.CompactSnapshot.__getitem__
+
+    def tracking_getitem(snapshot, key):
+        decompressed.append(key)
+        return getitem(snapshot, key)
+
+    with patch.object(db_comparison.CompactSnapshot, "__getitem__", tracking_getitem):
+        diff = db_comparison.SnapshotDiff(db_type, snapshot_a, snapshot_b)
+
+    assert decompressed == ["ROUTE_TABLE:10.0.7.0/24", "ROUTE_TABLE:10.0.7.0/24"]
+    assert diff.diff == {"ROUTE_TABLE:10.0.7.0/24": {"value": {"nexthop": {"a": "10.1.0.1", "b": "10.1.0.3"}}}}
+    assert diff.metrics.num_overall_differing_values == 1
+
+
+def test_diff_snapshots_both_formats(db_comparison, redis_snapshot, tmp_path):
+    db_type = db_comparison.DBType.STATE
+    (tmp_path / "warm").mkdir()
+    (tmp_path / "cold").mkdir()
+    (tmp_path / "warm" / "STATE.json").write_text(json.dumps(STATE_DB_A))
+    _write_compact(redis_snapshot, tmp_path / "cold" / "STATE.snap.gz", db_type, STATE_DB_B,
+                   db_comparison.VOLATILE_VALUES[db_type])
+
+    snapshotter = db_comparison.SonicRedisDBSnapshotter(None, str(tmp_path))
+    result = snapshotter.diff_snapshots("warm", "cold")
+
+    expected = db_comparison.SnapshotDiff(db_type, STATE_DB_A, STATE_DB_B, label_a="warm", label_b="cold")
+    assert list(result) == [db_type]
+    assert result[db_type].to_dict() == expected.to_dict()
+
+
+def test_match_key(db_comparison):
+    patterns = {"expireat", "MEM%", r"PORT_TABLE\|Ethernet\d+", "setup.pid"}
+    for key in ["expireat", "expireat_x", "MEM%", "PORT_TABLE|Ethernet0", "setup_pid", "ttl", "MEM", "x"]:
+        expected = any(key.startswith(k) or re.match(k, key) for k in patterns)
+        assert db_comparison.match_key(key, patterns) == expected
+    assert db_comparison.match_key("anything", set()) is False
+
+
+class FakePipeline(object):
+    """Pipeline of a redis client keeping the DB in a dict of key => (type, value, pttl)."""
+
+    def __init__(self, db):
+        self.db = db
+        self.replies = []
+
+    def _reply(self, func):
+        self.replies.append(func)
+
+    def type(self, key):
+        self._reply(lambda: self.db[key][0] if key in self.db else "none")
+
+    def pttl(self, key):
+        self._reply(lambda: self.db[key][2] if key in self.db else -2)
+
+    def hgetall(self, key):
+        self._reply(lambda: dict(self.db[key][1]))
+
+    def get(self, key):
+        self._reply(lambda: self.db[key][1])
+
+    def lrange(self, key, start, end):
+        self._reply(lambda: list(self.db[key][1]))
+
+    def smembers(self, key):
+        self._reply(lambda: set(self.db[key][1]))
+
+    def zrange(self, key, start, end, withscores=False):
+        self._reply(lambda: [tuple(item) for item in self.db[key][1]])
+
+    def execute(self):
+        replies, self.replies = [func() for func in self.replies], []
+        return replies
+
+
+class FakeClient(object):
+    def __init__(self, db):
+        self.db = db
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.db)
+
+
+def test_dut_helper_read_entries(redis_snapshot):
+    db = {
+        "PORT|Ethernet0": ("hash", {"mtu": "9100"}, -1),
+        "VERSIONS": ("string", "1.0", 5500),
+        "QUEUE": ("list", ["b", "a"], -1),
+        "MEMBERS": ("set", ["y", "x"], -1),
+    }
+    entries = dict(redis_snapshot.read_entries(FakeClient(db), list(db) + ["REMOVED"]))
+
+    assert sorted(entries) == sorted(db)
+    assert entries["PORT|Ethernet0"] == {"type": "hash", "value": {"mtu": "9100"}}
+    assert entries["QUEUE"] == {"type": "list", "value": ["b", "a"]}
+    assert entries["MEMBERS"] == {"type": "set", "value": ["x", "y"]}
+    assert entries["VERSIONS"]["value"] == "1.0"
+    assert entries["VERSIONS"]["ttl"] == 5
@@ -79,6 +79,7 @@ from tests.common.plugins.ptfadapter.dummy_testutils import DummyTestUtils
 from tests.common.helpers.multi_thread_utils import SafeThreadPoolExecutor
 from tests.common.helpers.parallel import patch_ansible_worker_process
 from tests.common.helpers.parallel import fix_logging_handler_fork_lock
+from tests.common.helpers.parallel import set_parallel_run_executor
 from tests.common.helpers.counterpoll_helper import ConterpollHelper
 
 import tests.common.gnmi_setup as gnmi_setup
@@ -143,6 +144,11 @@ def pytest_addoption(parser):
     parser.addoption("--testbed_file", action="store", default=None, help="testbed file name")
     parser.addoption("--ipv6_only_mgmt", action="store_true", default=False,
                      help="Use IPv6-only management network. DUT mgmt_ip will be set to IPv6 address.")
+    parser.addoption("--ssh_fast_path", action="store_true", default=False,
+                     help="Run shell/command modules over a persistent ssh channel instead of ansible when possible.")
+    parser.addoption("--parallel_run_executor", action="store", default="process", choices=["process", "pool"],
+                     help="Executor of parallel_run: 'process' forks a new process per node, 'pool' forks at "
+                          "most one worker process per concurrent task and runs several nodes on each")
     parser.addoption("--uhd_config", action="store", help="Enable UHD config mode")
     parser.addoption("--save_uhd_config", action="store_true", help="Save UHD config mode")
     parser.addoption("--npu_dpu_startup", action="store_true", help="Startup NPU and DPUs and install configurations")
@@ -442,6 +448,7 @@ def pytest_configure(config):
         else:
             config.pluginmanager.register(MacsecPluginT0())
     converge_topo_if_needed(config)
+    set_parallel_run_executor(config.getoption("parallel_run_executor"))
 
 
 def _load_testbed_config(tbfile, tbname):
@@ -556,6 +563,25 @@ def ipv6_only_mgmt_enabled(request):
     return enabled
 
 
+@pytest.fixture(scope="session", autouse=True)
+def ssh_fast_path_enabled(request):
+    """
+    Fixture to configure the ssh fast path of the 'shell' and 'command' modules.
+
+    When --ssh_fast_path is passed to pytest, 'shell' and 'command' modules of the hosts are run over a
+    persistent ssh channel per host instead of an ansible adhoc task. Invocations the fast path does not
+    support still go through ansible.
+
+    Returns:
+        bool: True if the ssh fast path is enabled, False otherwise.
+    """
+    from tests.common.devices.base import AnsibleHostBase
+
+    enabled = request.config.getoption("ssh_fast_path", default=False)
+    AnsibleHostBase.set_ssh_fast_path(enabled)
+    return enabled
+
+
 @pytest.fixture(scope="session", autouse=True)
 def enhance_inventory(request, tbinfo):
     """
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Dump a redis DB in the compact snapshot format of tests/common/db_comparison.py.
+
+The keys are read with SCAN and the contents with pipelined TYPE/PTTL and HGETALL/GET/LRANGE/SMEMBERS/ZRANGE
+requests, so the DB is streamed to the output file without loading it in memory.
+
+The output is a gzip file with a header line followed by one line per key:
+
+    <key as JSON string>\t<content hash>\t<values incl volatile>\t<values excl volatile>\t<entry as JSON>
+
+The entry is the same as the one of "redis-dump --pretty", i.e. {"type": ..., "value": ...} with "ttl" and
+"expireat" for the keys having an expiry. The entry is serialized with sorted keys and without white spaces and
+the content hash is computed on it, so the same content always gives the same hash.
+
+Usage:
+    redis_snapshot.py -d 6 -o /tmp/STATE.snap.gz -v timestamp,update_time
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import time
+
+SNAPSHOT_FORMAT = "sonic-redis-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def encode_entry(key, entry, volatile):
+    """Returns the snapshot line of the key."""
+    data = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+    value = entry.get("value", {})
+    total = 0
+    total_excl_volatile = 0
+    for field in value:
+        total += 1
+        if not isinstance(field, str) or field not in volatile:
+            total_excl_volatile += 1
+    return "{}\t{}\t{}\t{}\t{}\n".format(json.dumps(key), digest, total, total_excl_volatile, data)
+
+
+def read_entries(client, keys):
+    """Read the contents of the keys in two pipelined round trips, the keys removed meanwhile are skipped."""
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.pttl(key)
+    replies = pipe.execute()
+
+    readers = {
+        "hash": lambda key: pipe.hgetall(key),
+        "string": lambda key: pipe.get(key),
+        "list": lambda key: pipe.lrange(key, 0, -1),
+        "set": lambda key: pipe.smembers(key),
+        "zset": lambda key: pipe.zrange(key, 0, -1, withscores=True),
+    }
+    found = []
+    for index, key in enumerate(keys):
+        key_type, pttl = replies[2 * index], replies[2 * index + 1]
+        if key_type in readers:
+            readers[key_type](key)
+            found.append((key, key_type, pttl))
+    values = pipe.execute()
+
+    now = time.time()
+    for (key, key_type, pttl), value in zip(found, values):
+        if value is None:
+            continue
+        if key_type == "set":
+            value = sorted(value)
+        elif key_type == "zset":
+            value = [[member, score] for member, score in value]
+        entry = {"type": key_type, "value": value}
+        if pttl is not None and pttl >= 0:
+            entry["ttl"] = pttl // 1000
+            entry["expireat"] = now + pttl / 1000.0
+        yield key, entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump a redis DB in the compact snapshot format")
+    parser.add_argument("-d", "--db", type=int, required=True, help="DB index")
+    parser.add_argument("-o", "--output", required=True, help="output gzip file")
+    parser.add_argument("-s", "--socket", default="/var/run/redis/redis.sock", help="redis unix socket")
+    parser.add_argument("-v", "--volatile", default="", help="comma separated volatile fields")
+    parser.add_argument("-b", "--batch", type=int, default=1000, help="number of keys per pipeline")
+    args = parser.parse_args()
+
+    import redis
+    client = redis.Redis(unix_socket_path=args.socket, db=args.db, decode_responses=True)
+    volatile = set(field for field in args.volatile.split(",") if field)
+
+    # SCAN may return a key more than once, the reader of the snapshot keeps the first one
+    with gzip.open(args.output, "wt", compresslevel=1) as out:
+        out.write(json.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "db": args.db}) + "\n")
+        keys = []
+        for key in client.scan_iter(count=args.batch):
+            keys.append(key)
+            if len(keys) >= args.batch:
+                for name, entry in read_entries(client, keys):
+                    out.write(encode_entry(name, entry, volatile))
+                keys = []
+        for name, entry in read_entries(client, keys):
+            out.write(encode_entry(name, entry, volatile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare results and per-call latency of shell/command modules run by ansible and by the ssh fast path.
+
+The benchmark runs regardless of --ssh_fast_path, both paths are toggled explicitly for the measurement.
+"""
+import logging
+import time
+
+import pytest
+
+from tests.common.devices.base import AnsibleHostBase
+from tests.common.helpers.assertions import pytest_assert, pytest_require
+
+pytestmark = [
+    pytest.mark.disable_loganalyzer,
+    pytest.mark.topology("any"),
+    pytest.mark.device_type("vs"),
+]
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_ITERATIONS = 20
+
+COMPARED_KEYS = ("rc", "stdout", "stdout_lines", "stderr", "failed")
+
+EQUIVALENCE_COMMANDS = [
+    ("shell", "cat /etc/sonic/sonic_version.yml"),
+    ("shell", "redis-cli -n 4 hget 'DEVICE_METADATA|localhost' hostname"),
+    ("shell", "echo out; echo err >&2; exit 3"),
+    ("shell", "id -u"),
+    ("command", "ls /etc/sonic"),
+    ("command", "ls /nonexistent_path"),
+]
+
+
+@pytest.fixture
+def ssh_fast_path_toggle():
+    """Restore the ssh fast path flag changed by the test."""
+    enabled = AnsibleHostBase._ssh_fast_path
+    yield AnsibleHostBase.set_ssh_fast_path
+    AnsibleHostBase.set_ssh_fast_path(enabled)
+
+
+def _run(duthost, module_name, cmd, fast_path, set_ssh_fast_path):
+    set_ssh_fast_path(fast_path)
+    return getattr(duthost, module_name)(cmd, module_ignore_errors=True, verbose=False)
+
+
+def _fast_path_usable(duthost, set_ssh_fast_path):
+    _run(duthost, "shell", "true", True, set_ssh_fast_path)
+    return duthost._ssh_channel is not None and not duthost._ssh_channel.disabled
+
+
+def test_ssh_fast_path_result_equivalence(duthosts, enum_rand_one_per_hwsku_hostname, ssh_fast_path_toggle):
+    duthost = duthosts[enum_rand_one_per_hwsku_hostname]
+    pytest_require(_fast_path_usable(duthost, ssh_fast_path_toggle), "ssh fast path is not usable on this DUT")
+
+    for module_name, cmd in EQUIVALENCE_COMMANDS:
+        ansible_res = _run(duthost, module_name, cmd, False, ssh_fast_path_toggle)
+        fast_res = _run(duthost, module_name, cmd, True, ssh_fast_path_toggle)
+        for key in COMPARED_KEYS:
+            pytest_assert(
+                ansible_res.get(key) == fast_res.get(key),
+                "'{}' of {} '{}' differs, ansible: {}, fast path: {}".format(
+                    key, module_name, cmd, ansible_res.get(key), fast_res.get(key)))
+
+
+def test_ssh_fast_path_latency(duthosts, enum_rand_one_per_hwsku_hostname, ssh_fast_path_toggle):
+    duthost = duthosts[enum_rand_one_per_hwsku_hostname]
+    pytest_require(_fast_path_usable(duthost, ssh_fast_path_toggle), "ssh fast path is not usable on this DUT")
+
+    latency = {}
+    results = {}
+    for fast_path in (False, True):
+        durations = []
+        for _ in range(BENCHMARK_ITERATIONS):
+            start = time.time()
+            results[fast_path] = _run(duthost, "shell", "cat /etc/hostname", fast_path, ssh_fast_path_toggle)
+            durations.append(time.time() - start)
+        durations.sort()
+        latency[fast_path] = {
+            "mean": sum(durations) / len(durations),
+            "median": durations[len(durations) // 2],
+            "max": durations[-1]
+        }
+
+    for fast_path, stats in latency.items():
+        logger.info("{} per-call latency over {} calls: mean {:.3f}s, median {:.3f}s, max {:.3f}s".format(
+            "ssh fast path" if fast_path else "ansible", BENCHMARK_ITERATIONS,
+            stats["mean"], stats["median"], stats["max"]))
+
+    # The timings depend on the load of the testbed, only check that both paths ran the same command
+    for key in ("rc", "stdout"):
+        pytest_assert(results[True].get(key) == results[False].get(key),
+                      "'{}' differs, ansible: {}, fast path: {}".format(
+                          key, results[False].get(key), results[True].get(key)))